@@ -0,0 +1,242 @@
+"""
+Local stand-in for the OpenAI API, used to benchmark the loader without calling the paid endpoint.
+
+The server implements the two endpoints the loader uses:
+- POST /v1/embeddings: deterministic pseudo-random unit vectors derived from the text hash, so that
+  identical texts always get the same embedding
+- POST /v1/chat/completions: a short canned answer
+
+Latency, transient errors and per-minute rate limits are configurable, and rate-limited requests
+get a 429 response with a Retry-After header, like the real API. Connections are kept alive between
+requests, like the real API too.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from llama_index.core.utils import get_tokenizer
+
+HTTP_OK = 200
+HTTP_TOO_MANY_REQUESTS = 429
+HTTP_SERVER_ERROR = 500
+QUOTA_WINDOW_SECONDS = 60
+
+
+@dataclass
+class ServerStats:
+    """
+    Counters of the requests served by the fake OpenAI server.
+
+    Attributes:
+        requests (int): Number of requests received
+        embedded_texts (int): Number of texts embedded by successful requests
+        embedded_tokens (int): Number of tokens embedded by successful requests
+        rate_limited (int): Number of requests rejected with HTTP 429
+        errors (int): Number of requests failed with an injected HTTP 500
+        max_in_flight (int): Maximum number of requests served concurrently
+    """
+
+    requests: int = 0
+    embedded_texts: int = 0
+    embedded_tokens: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    max_in_flight: int = 0
+
+
+class _MinuteWindow:
+    """Fixed one-minute window quota, as enforced by the OpenAI API."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.start = time.monotonic()
+        self.used = 0
+
+    def try_acquire(self, amount: int) -> float | None:
+        """Consume `amount` from the quota, or return the seconds until the window resets."""
+        now = time.monotonic()
+        if now - self.start >= QUOTA_WINDOW_SECONDS:
+            self.start, self.used = now, 0
+        if self.used + amount > self.limit:
+            return QUOTA_WINDOW_SECONDS - (now - self.start)
+        self.used += amount
+        return None
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server emulating the OpenAI embeddings and chat completions endpoints.
+
+    Attributes:
+        latency (float): Base latency of every request, in seconds
+        latency_per_text (float): Additional latency per embedded text, in seconds
+        error_rate (float): Probability of failing a request with HTTP 500
+        requests_per_minute (int, optional): Request quota per minute, unlimited if None
+        tokens_per_minute (int, optional): Embedded token quota per minute, unlimited if None
+        dimensions (int): Dimension of the returned embeddings
+        stats (ServerStats): Counters of the served requests
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency: float = 0.0,
+        latency_per_text: float = 0.0,
+        error_rate: float = 0.0,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        dimensions: int = 3072,
+        seed: int = 0,
+    ):
+        super().__init__((host, port), _FakeOpenAIHandler)
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.error_rate = error_rate
+        self.dimensions = dimensions
+        self.stats = ServerStats()
+        self.lock = threading.Lock()
+        self._in_flight = 0
+        self._random = random.Random(seed)  # noqa: S311
+        self._request_window = _MinuteWindow(requests_per_minute) if requests_per_minute else None
+        self._token_window = _MinuteWindow(tokens_per_minute) if tokens_per_minute else None
+        self.tokenizer = get_tokenizer()
+
+    @property
+    def api_base(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        """Serve requests on a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats = ServerStats()
+
+    def stats_dict(self) -> dict:
+        with self.lock:
+            return asdict(self.stats)
+
+    def embedding(self, text: str) -> list[float]:
+        """Return the deterministic unit embedding of a text."""
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def admit(self, num_tokens: int) -> tuple[int, float | None]:
+        """Apply the injected errors and the quotas to a request, returning its HTTP status and Retry-After."""
+        with self.lock:
+            self.stats.requests += 1
+            if self._random.random() < self.error_rate:
+                self.stats.errors += 1
+                return HTTP_SERVER_ERROR, None
+            for window, amount in ((self._request_window, 1), (self._token_window, num_tokens)):
+                retry_after = window.try_acquire(amount) if window else None
+                if retry_after is not None:
+                    self.stats.rate_limited += 1
+                    return HTTP_TOO_MANY_REQUESTS, retry_after
+        return HTTP_OK, None
+
+    def track_in_flight(self, delta: int) -> None:
+        with self.lock:
+            self._in_flight += delta
+            self.stats.max_in_flight = max(self.stats.max_in_flight, self._in_flight)
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients closing the connection before the answer, e.g. hedged requests losing the race, are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server: FakeOpenAIServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: dict, retry_after: float | None = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        if retry_after is not None:
+            self.send_header("Retry-After", f"{retry_after:.3f}")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.track_in_flight(1)
+        try:
+            if self.path.endswith("/embeddings"):
+                self._embeddings(body)
+            elif self.path.endswith("/chat/completions"):
+                self._chat_completions(body)
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+        finally:
+            server.track_in_flight(-1)
+
+    def _embeddings(self, body: dict) -> None:
+        server = self.server
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        num_tokens = sum(len(server.tokenizer(text)) for text in texts)
+
+        time.sleep(server.latency + server.latency_per_text * len(texts))
+        status, retry_after = server.admit(num_tokens)
+        if status != HTTP_OK:
+            message = "Rate limit reached" if status == HTTP_TOO_MANY_REQUESTS else "Injected server error"
+            self._send_json(status, {"error": {"message": message, "type": "fake"}}, retry_after)
+            return
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = server.embedding(text)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        with server.lock:
+            server.stats.embedded_texts += len(texts)
+            server.stats.embedded_tokens += num_tokens
+
+        usage = {"prompt_tokens": num_tokens, "total_tokens": num_tokens}
+        self._send_json(HTTP_OK, {"object": "list", "data": data, "model": body["model"], "usage": usage})
+
+    def _chat_completions(self, body: dict) -> None:
+        time.sleep(self.server.latency)
+        status, retry_after = self.server.admit(0)
+        if status != HTTP_OK:
+            self._send_json(status, {"error": {"message": "Fake error", "type": "fake"}}, retry_after)
+            return
+        message = {"role": "assistant", "content": "Risposta di prova."}
+        self._send_json(
+            HTTP_OK,
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 3, "total_tokens": 3},
+            },
+        )
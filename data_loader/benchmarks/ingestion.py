@@ -0,0 +1,313 @@
+"""
+Ingestion benchmark for the data_loader.
+
+Runs the loader `main()` against a local fake OpenAI server over the transcripts corpus (or synthetic
+scaled-up copies of it), for a grid of chunk sizes and overlaps, and writes the results to JSON:
+
+    cd data_loader
+    python -m benchmarks.ingestion run --scale 4 --chunk-sizes 256,512 --chunk-overlaps 0,40 \\
+        --latency 0.2 --error-rate 0.01 --output results.json
+    python -m benchmarks.ingestion compare baseline.json results.json
+
+Every grid point runs in a fresh process with an empty Chroma database, so that peak RSS and timings
+are not affected by the previous runs. The embedding cache is disabled unless `--embedding-cache` is set.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import click
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+DATA_LOADER_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_CORPUS_DIR = DATA_LOADER_DIR.parent / "transcripts"
+RESULTS_FORMAT_VERSION = 1
+
+# Functions of the loader main module timed as stages, and the stage they belong to
+TIMED_FUNCTIONS = {
+    "initialize_vector_store": "initialize",
+    "initialize_embedding_model": "initialize",
+    "initialize_text_splitter": "initialize",
+    "initialize_llm": "initialize",
+    "list_document_files": "scan",
+    "compute_file_hash": "hash",
+    "delete_documents": "delete",
+    "find_duplicate_chunks": "dedup",
+    "ingest_documents": "ingest",
+    "save_manifest": "manifest",
+    "export_snapshot": "snapshot",
+    "build_lexical_index": "lexical",
+    "build_entity_catalog": "entities",
+    "build_talk_index": "talks",
+}
+
+# Metrics compared by `compare`, and whether higher values are better
+COMPARED_METRICS = {
+    "docs_per_second": True,
+    "chunks_per_second": True,
+    "tokens_per_second": True,
+    "elapsed": False,
+    "peak_rss_mb": False,
+}
+
+
+def prepare_corpus(corpus_dir: Path, output_dir: Path, scale: int) -> int:
+    """
+    Write `scale` copies of the transcripts corpus to a directory.
+
+    Copies after the first get a distinct YouTube id in their file name (so that the metadata still parses)
+    and a distinct first line, so that they are different documents with their own chunks.
+
+    Args:
+        corpus_dir (Path): Directory of the original transcripts
+        output_dir (Path): Directory to write the copies to
+        scale (int): Number of copies of the corpus
+
+    Returns:
+        int: Number of written transcripts
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for path in sorted(corpus_dir.glob("*.txt")):
+        text = path.read_text(encoding="utf-8")
+        for copy in range(scale):
+            name = path.name if copy == 0 else path.name.replace("[", f"[copy{copy}_", 1)
+            content = text if copy == 0 else f"Copia numero {copy}.\n{text}"
+            (output_dir / name).write_text(content, encoding="utf-8")
+            count += 1
+    return count
+
+
+def _timed(function, stage: str, timings: dict[str, float], results: list):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+        results.append((stage, result))
+        return result
+
+    return wrapper
+
+
+def _run_point(api_base: str, main_kwargs: dict, queue: multiprocessing.Queue) -> None:
+    """Run the loader once, in a fresh process, and report timings and peak RSS through the queue."""
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_API_BASE"] = api_base
+    sys.path.insert(0, str(DATA_LOADER_DIR / "src"))
+    import main as loader_main  # noqa: PLC0415
+
+    timings: dict[str, float] = {}
+    results: list = []
+    for name, stage in TIMED_FUNCTIONS.items():
+        setattr(loader_main, name, _timed(getattr(loader_main, name), stage, timings, results))
+
+    start = time.perf_counter()
+    loader_main.main(**main_kwargs)
+    elapsed = time.perf_counter() - start
+
+    ingestion = next((result for stage, result in results if stage == "ingest"), None)
+    if ingestion is not None:
+        timings["split"] = ingestion.split_seconds
+        timings["embed"] = ingestion.embed_seconds
+        timings["write"] = ingestion.write_seconds
+    queue.put(
+        {
+            "elapsed": elapsed,
+            "documents": ingestion.documents if ingestion else 0,
+            "chunks": ingestion.chunks if ingestion else 0,
+            "stages": {stage: round(seconds, 4) for stage, seconds in sorted(timings.items())},
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            # Largest reaped child process, i.e. a split worker when running with --workers
+            "peak_rss_workers_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+            if main_kwargs["workers"] > 1
+            else None,
+        }
+    )
+
+
+def run_benchmark_point(server: FakeOpenAIServer, main_kwargs: dict) -> dict:
+    """
+    Run the loader on a fresh process and collect its metrics.
+
+    Args:
+        server (FakeOpenAIServer): The running fake OpenAI server
+        main_kwargs (dict): Keyword arguments of the loader `main()`
+
+    Returns:
+        dict: Throughput, peak RSS, per-stage wall time and server counters of the run
+    """
+    server.reset_stats()
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_point, args=(server.api_base, main_kwargs, queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        error_msg = f"Benchmark run failed with exit code {process.exitcode}"
+        raise RuntimeError(error_msg)
+
+    result = queue.get()
+    server_stats = server.stats_dict()
+    elapsed = result["elapsed"]
+    result.update(
+        {
+            "tokens": server_stats["embedded_tokens"],
+            "docs_per_second": round(result["documents"] / elapsed, 3),
+            "chunks_per_second": round(result["chunks"] / elapsed, 3),
+            "tokens_per_second": round(server_stats["embedded_tokens"] / elapsed, 1),
+            "elapsed": round(elapsed, 4),
+            "server": server_stats,
+        }
+    )
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            cwd=DATA_LOADER_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+@click.group()
+def cli():
+    """Benchmark the data_loader ingestion against a local fake OpenAI server."""
+
+
+@cli.command()
+@click.option("--corpus-dir", default=str(DEFAULT_CORPUS_DIR), type=click.Path(exists=True, file_okay=False))
+@click.option("--scale", default=1, type=int, help="Number of synthetic copies of the corpus")
+@click.option("--chunk-sizes", default="512", help="Comma-separated chunk sizes")
+@click.option("--chunk-overlaps", default="40", help="Comma-separated chunk overlaps")
+@click.option("--embedding-model", default="text-embedding-3-large")
+@click.option("--dimensions", default=3072, type=int, help="Dimension of the fake embeddings")
+@click.option("--latency", default=0.0, type=float, help="Fake server latency per request, in seconds")
+@click.option("--latency-per-text", default=0.0, type=float, help="Fake server latency per embedded text, in seconds")
+@click.option("--error-rate", default=0.0, type=float, help="Fraction of requests failed with HTTP 500")
+@click.option("--server-requests-per-minute", default=0, type=int, help="Fake server request quota, 0 for unlimited")
+@click.option("--server-tokens-per-minute", default=0, type=int, help="Fake server token quota, 0 for unlimited")
+@click.option("--embed-concurrency", default=1, type=int)
+@click.option("--embed-batch-size", default=100, type=int)
+@click.option("--batch-size", default=500, type=int)
+@click.option("--workers", default=1, type=int)
+@click.option("--dedup-threshold", default=0.0, type=float)
+@click.option("--embedding-cache", is_flag=True, help="Enable the embedding cache (shared across the grid)")
+@click.option("--output", default="ingestion_benchmark.json", type=click.Path(dir_okay=False))
+def run(**options):
+    """Run the benchmark grid and write the results to JSON."""
+    workdir = Path(tempfile.mkdtemp(prefix="ingestion_benchmark_"))
+    server = FakeOpenAIServer(
+        latency=options["latency"],
+        latency_per_text=options["latency_per_text"],
+        error_rate=options["error_rate"],
+        requests_per_minute=options["server_requests_per_minute"] or None,
+        tokens_per_minute=options["server_tokens_per_minute"] or None,
+        dimensions=options["dimensions"],
+    ).start()
+
+    try:
+        corpus_dir = workdir / "corpus"
+        num_documents = prepare_corpus(Path(options["corpus_dir"]), corpus_dir, options["scale"])
+        click.echo(f"Prepared {num_documents} transcripts in {corpus_dir}")
+
+        results = []
+        for chunk_size in _parse_ints(options["chunk_sizes"]):
+            for chunk_overlap in _parse_ints(options["chunk_overlaps"]):
+                if chunk_overlap >= chunk_size:
+                    continue
+                db_path = workdir / f"chroma_{chunk_size}_{chunk_overlap}"
+                main_kwargs = {
+                    "transcripts_input_dir": str(corpus_dir),
+                    "chroma_db_path": str(db_path),
+                    "collection_name": "benchmark",
+                    "embedding_model": options["embedding_model"],
+                    "llm_model": "gpt-4o-mini",
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "embedding_cache_path": str(workdir / "cache.sqlite3") if options["embedding_cache"] else None,
+                    "embed_concurrency": options["embed_concurrency"],
+                    "embed_batch_size": options["embed_batch_size"],
+                    "batch_size": options["batch_size"],
+                    "workers": options["workers"],
+                    "dedup_threshold": options["dedup_threshold"],
+                }
+                result = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+                result.update(run_benchmark_point(server, main_kwargs))
+                results.append(result)
+                shutil.rmtree(db_path, ignore_errors=True)
+                click.echo(
+                    f"chunk_size={chunk_size} chunk_overlap={chunk_overlap}: {result['elapsed']:.2f}s, "
+                    f"{result['docs_per_second']:.1f} docs/s, {result['chunks_per_second']:.1f} chunks/s, "
+                    f"{result['tokens_per_second']:.0f} tokens/s, peak RSS {result['peak_rss_mb']:.0f} MB"
+                )
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "benchmark": "ingestion",
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "config": {**options, "documents": num_documents},
+        "results": results,
+    }
+    Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {options['output']}")
+
+
+@cli.command()
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("candidate", type=click.Path(exists=True, dir_okay=False))
+@click.option("--tolerance", default=0.1, type=float, help="Relative change above which a metric is a regression")
+def compare(baseline: str, candidate: str, tolerance: float):
+    """Compare two result files grid point by grid point, exiting with status 1 on regressions."""
+    baseline_results = json.loads(Path(baseline).read_text(encoding="utf-8"))["results"]
+    candidate_results = json.loads(Path(candidate).read_text(encoding="utf-8"))["results"]
+    baseline_points = {(r["chunk_size"], r["chunk_overlap"]): r for r in baseline_results}
+
+    regressions = 0
+    for result in candidate_results:
+        point = (result["chunk_size"], result["chunk_overlap"])
+        if point not in baseline_points:
+            continue
+        click.echo(f"chunk_size={point[0]} chunk_overlap={point[1]}")
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = baseline_points[point][metric], result[metric]
+            change = (after - before) / before if before else 0.0
+            regressed = (change < -tolerance) if higher_is_better else (change > tolerance)
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            click.echo(f"  {metric:<18} {before:>12.2f} -> {after:>12.2f} ({change:+.1%}){flag}")
+
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -6,4 +6,22 @@ exec poetry run python handler.py \
     --embedding-model "$EMBEDDING_MODEL" \
     --llm-model "$LLM_MODEL" \
     --chunk-size "$CHUNK_SIZE" \
-    --chunk-overlap "$CHUNK_OVERLAP"
\ No newline at end of file
+    --chunk-overlap "$CHUNK_OVERLAP" \
+    --embedding-cache-path "$EMBEDDING_CACHE_PATH" \
+    --embedding-cache-max-size-mb "${EMBEDDING_CACHE_MAX_SIZE_MB:-1024}" \
+    --embed-concurrency "${EMBED_CONCURRENCY:-8}" \
+    --embed-batch-size "${EMBED_BATCH_SIZE:-100}" \
+    --requests-per-minute "${EMBED_REQUESTS_PER_MINUTE:-0}" \
+    --tokens-per-minute "${EMBED_TOKENS_PER_MINUTE:-0}" \
+    --batch-size "${INGESTION_BATCH_SIZE:-500}" \
+    --workers "${INGESTION_WORKERS:-1}" \
+    --snapshot-dtype "${SNAPSHOT_DTYPE:-none}" \
+    --dedup-threshold "${DEDUP_THRESHOLD:-0}" \
+    --lexical-index "${LEXICAL_INDEX:-true}" \
+    --talk-index "${TALK_INDEX:-true}" \
+    --http-max-connections "${HTTP_MAX_CONNECTIONS:-100}" \
+    --http-keepalive-seconds "${HTTP_KEEPALIVE_SECONDS:-30}" \
+    --http-connect-timeout "${HTTP_CONNECT_TIMEOUT:-5}" \
+    --http-timeout "${HTTP_TIMEOUT:-60}" \
+    --http-max-retries "${HTTP_MAX_RETRIES:-3}" \
+    --http-hedge-quantile "${HTTP_HEDGE_QUANTILE:-0}"
\ No newline at end of file
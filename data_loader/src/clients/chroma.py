@@ -32,3 +32,22 @@ def initialize_vector_store(db_path: str, collection_name: str) -> ChromaVectorS
     log.info("Initialized ChromaVectorStore. Collection: {}, DB path: {}", collection_name, db_path)
 
     return vector_store
+
+
+def delete_collection(db_path: str, collection_name: str) -> bool:
+    """
+    Delete a collection if it exists.
+
+    Args:
+        db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the collection to delete
+
+    Returns:
+        bool: Whether the collection existed
+    """
+    chroma_client = chromadb.PersistentClient(path=db_path)
+    if collection_name not in {collection.name for collection in chroma_client.list_collections()}:
+        return False
+    chroma_client.delete_collection(name=collection_name)
+    log.info("Deleted collection {} from {}", collection_name, db_path)
+    return True
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from loguru import logger as log
+
+# Metadata key of the chunks that absorbed near-duplicates from other sources: JSON list of their file names
+DUPLICATE_SOURCES_KEY = "duplicate_sources"
+# Chunk metadata holding the id of the document a stored chunk was split from
+REF_DOC_KEY = "ref_doc_id"
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class DedupStats:
+    """
+    Counters of a deduplication pass.
+
+    Attributes:
+        chunks (int): Number of chunks seen
+        exact_duplicates (int): Number of chunks with the same normalized text as a kept chunk
+        near_duplicates (int): Number of chunks similar to a kept chunk above the threshold
+    """
+
+    chunks: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+
+    @property
+    def removed(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+
+def _words(text: str) -> list[str]:
+    return WORD_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def shingles(text: str, size: int) -> set[str]:
+    """
+    Return the word shingles (n-grams) of a text, after Unicode normalization and lowercasing.
+
+    Texts shorter than `size` words yield a single shingle with all of their words.
+
+    Args:
+        text (str): The text to shingle
+        size (int): Number of words per shingle
+
+    Returns:
+        set[str]: The shingles of the text
+    """
+    words = _words(text)
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def _exact_key(text: str) -> bytes:
+    return hashlib.sha256(" ".join(_words(text)).encode()).digest()
+
+
+def _add_back_references(node: BaseNode, duplicate_sources: set[str]) -> None:
+    """Record on a kept chunk the file names of the sources its duplicates came from, merged with any recorded."""
+    names = set(json.loads(node.metadata.get(DUPLICATE_SOURCES_KEY, "[]")))
+    names.update(Path(source).name for source in duplicate_sources)
+    node.metadata[DUPLICATE_SOURCES_KEY] = json.dumps(sorted(names), ensure_ascii=False)
+    # The key lists may be shared with the other chunks of the document, so they are copied
+    if DUPLICATE_SOURCES_KEY not in node.excluded_embed_metadata_keys:
+        node.excluded_embed_metadata_keys = [*node.excluded_embed_metadata_keys, DUPLICATE_SOURCES_KEY]
+    if DUPLICATE_SOURCES_KEY not in node.excluded_llm_metadata_keys:
+        node.excluded_llm_metadata_keys = [*node.excluded_llm_metadata_keys, DUPLICATE_SOURCES_KEY]
+
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Pick the number of LSH bands and rows per band whose S-curve midpoint is closest to the threshold."""
+    candidates = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(candidates, key=lambda params: abs((1 / params[0]) ** (1 / params[1]) - threshold))
+
+
+class ChunkDeduplicator:
+    """
+    Detect exact and near-duplicate chunks across sources with MinHash and locality-sensitive hashing.
+
+    Chunks are registered source by source with `add`, in a deterministic order. The first occurrence of
+    a text is kept; a later chunk whose estimated Jaccard similarity (over word shingles) with a kept chunk
+    reaches `threshold` is a duplicate of it. Only kept chunks are indexed, so similarity never chains.
+
+    `apply` then drops the duplicates of a source and records on each kept chunk the other sources its
+    duplicates came from. Sources sharing collapsed chunks are linked: they must be re-ingested together.
+    Chunks are matched by node id between the two steps, so the text splitter must produce stable ids.
+
+    In an incremental run, `add_stored` first registers the chunks already in the collection as kept, so
+    that new or changed sources are compared with them too; `update_stored` then writes the back-references
+    of the stored chunks that absorbed duplicates of the run.
+
+    Attributes:
+        threshold (float): Minimum estimated Jaccard similarity of near-duplicates, in (0, 1]
+        num_perm (int): Number of MinHash permutations
+        shingle_size (int): Number of words per shingle
+        stats (DedupStats): Counters of the registered chunks
+    """
+
+    def __init__(self, threshold: float, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        if not 0 < threshold <= 1:
+            error_msg = "threshold must be in (0, 1]"
+            raise ValueError(error_msg)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.stats = DedupStats()
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+        self._buckets: list[dict[bytes, list[str]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: dict[str, np.ndarray] = {}
+        self._exact: dict[bytes, str] = {}
+        # Kept chunk id -> source, and duplicate chunk id -> kept chunk id
+        self._kept: dict[str, str] = {}
+        self._stored: set[str] = set()
+        self._duplicate_of: dict[str, str] = {}
+        self._duplicate_sources: dict[str, set[str]] = defaultdict(set)
+        self._links: dict[str, set[str]] = defaultdict(set)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of a text.
+
+        Args:
+            text (str): The text
+
+        Returns:
+            np.ndarray: uint64 array of `num_perm` minimum hashes
+        """
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "little")
+                for shingle in shingles(text, self.shingle_size)
+            ),
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+    def _find_duplicate(self, signature: np.ndarray) -> str | None:
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            candidates.update(buckets.get(signature[band * self.rows : (band + 1) * self.rows].tobytes(), ()))
+        best, best_similarity = None, self.threshold
+        for node_id in sorted(candidates):
+            similarity = float(np.mean(self._signatures[node_id] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = node_id, similarity
+        return best
+
+    def _keep(self, node_id: str, source: str, exact_key: bytes, signature: np.ndarray) -> None:
+        self._kept[node_id] = source
+        self._exact[exact_key] = node_id
+        self._signatures[node_id] = signature
+        for band, buckets in enumerate(self._buckets):
+            buckets[signature[band * self.rows : (band + 1) * self.rows].tobytes()].append(node_id)
+
+    def add_stored(self, vector_store: ChromaVectorStore, doc_sources: dict[str, str], page_size: int = 1000) -> int:
+        """
+        Register the chunks already stored in a collection as kept, before the chunks of the run are added.
+
+        Stored chunks were deduplicated by the runs that wrote them, so they are all kept; a chunk of the run
+        duplicating one of them is dropped and links its source to the source of the stored chunk.
+
+        Args:
+            vector_store (ChromaVectorStore): The vector store of the chunks
+            doc_sources (dict[str, str]): Mapping of document id to source name, for the documents left in the
+                collection by this run; the chunks of any other document are ignored
+            page_size (int): Number of chunks read from Chroma at once
+
+        Returns:
+            int: The number of registered chunks
+        """
+        collection = vector_store.client
+        count = collection.count()
+        position = 0
+        while position < count:
+            page = collection.get(limit=page_size, offset=position, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            for node_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"], strict=True):
+                source = doc_sources.get((metadata or {}).get(REF_DOC_KEY))
+                if source is not None and text is not None:
+                    self._keep(node_id, source, _exact_key(text), self.signature(text))
+                    self._stored.add(node_id)
+            position += len(page["ids"])
+        return len(self._stored)
+
+    def add(self, source: str, nodes: list[BaseNode]) -> None:
+        """
+        Register the chunks of a source, in order.
+
+        Args:
+            source (str): Source name, e.g. the file path
+            nodes (list[BaseNode]): The chunks of the source
+        """
+        for node in nodes:
+            self.stats.chunks += 1
+            text = node.get_content()
+            exact_key = _exact_key(text)
+
+            kept_id = self._exact.get(exact_key)
+            if kept_id is not None:
+                self.stats.exact_duplicates += 1
+            else:
+                signature = self.signature(text)
+                kept_id = self._find_duplicate(signature)
+                if kept_id is not None:
+                    self.stats.near_duplicates += 1
+                else:
+                    self._keep(node.node_id, source, exact_key, signature)
+                    continue
+
+            self._duplicate_of[node.node_id] = kept_id
+            kept_source = self._kept[kept_id]
+            if kept_source != source:
+                self._duplicate_sources[kept_id].add(source)
+                self._links[kept_source].add(source)
+                self._links[source].add(kept_source)
+
+    def log_stats(self) -> None:
+        log.info(
+            "Deduplication: {} of {} chunks removed ({} exact, {} near duplicates, threshold {}, {} bands x {} rows)",
+            self.stats.removed,
+            self.stats.chunks,
+            self.stats.exact_duplicates,
+            self.stats.near_duplicates,
+            self.threshold,
+            self.bands,
+            self.rows,
+        )
+
+    def apply(self, nodes: list[BaseNode]) -> list[BaseNode]:
+        """
+        Drop the duplicate chunks and add the back-references of the kept ones.
+
+        Kept chunks that absorbed duplicates from other sources get the `duplicate_sources` metadata, excluded
+        from the embedding and LLM text so that their embedding does not change.
+
+        Args:
+            nodes (list[BaseNode]): Chunks of a source registered with `add`
+
+        Returns:
+            list[BaseNode]: The kept chunks
+        """
+        kept = []
+        for node in nodes:
+            if node.node_id in self._duplicate_of:
+                continue
+            duplicate_sources = self._duplicate_sources.get(node.node_id)
+            if duplicate_sources:
+                _add_back_references(node, duplicate_sources)
+            kept.append(node)
+        return kept
+
+    def update_stored(self, vector_store: ChromaVectorStore) -> int:
+        """
+        Add the back-references of the stored chunks registered with `add_stored` that absorbed duplicates.
+
+        Only the metadata of the chunks is rewritten, their embedding is left as is.
+
+        Args:
+            vector_store (ChromaVectorStore): The vector store of the chunks
+
+        Returns:
+            int: The number of updated chunks
+        """
+        node_ids = sorted(node_id for node_id in self._duplicate_sources if node_id in self._stored)
+        if not node_ids:
+            return 0
+        collection = vector_store.client
+        page = collection.get(ids=node_ids, include=["documents", "metadatas"])
+        metadatas = []
+        for node_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"], strict=True):
+            node = metadata_dict_to_node(metadata, text=text)
+            _add_back_references(node, self._duplicate_sources[node_id])
+            metadatas.append(node_to_metadata_dict(node, remove_text=True, flat_metadata=vector_store.flat_metadata))
+        collection.update(ids=page["ids"], metadatas=metadatas)
+        return len(page["ids"])
+
+    def linked_sources(self, source: str) -> list[str]:
+        """
+        Return the sources that share collapsed chunks with a source.
+
+        Args:
+            source (str): Source name
+
+        Returns:
+            list[str]: The linked sources, sorted
+        """
+        return sorted(self._links.get(source, ()))
@@ -1,8 +1,8 @@
 import re
+from collections.abc import Iterator
 from pathlib import Path
 
 from llama_index.core import Document, SimpleDirectoryReader
-from loguru import logger as log
 
 REGEX_PATTERN = r"""
     (?:.*?/)?                    # Optional path prefix
@@ -50,17 +50,33 @@ def extract_metadata(filepath: str) -> str | None:
     return None
 
 
-def load_documents(input_dir: str) -> list[Document]:
+def list_document_files(input_dir: str) -> list[str]:
     """
-    Load documents from a directory and extract metadata from their filenames using LlamaIndex's SimpleDirectoryReader.
+    List the files of a directory to load with `iter_documents`.
 
     Args:
         input_dir (str): Path to the directory containing documents to be indexed
 
     Returns:
-        list[Document]: List of LlamaIndex Document objects with metadata extracted from filenames
+        list[str]: Sorted list of file paths, as used for the document ids
     """
-    reader = SimpleDirectoryReader(input_dir=input_dir, file_metadata=extract_metadata)
-    docs = reader.load_data()
-    log.info(f"Loaded {len(docs)} documents from {input_dir}")
-    return docs
+    reader = SimpleDirectoryReader(input_dir=input_dir)
+    return [str(input_file) for input_file in reader.input_files]
+
+
+def iter_documents(input_files: list[str]) -> Iterator[tuple[str, list[Document]]]:
+    """
+    Lazily load documents one file at a time, extracting their metadata from the file names.
+
+    Document ids are derived from the file path, so that the vectors of a file can later be
+    found (and deleted) in the vector store by its `ref_doc_id`.
+
+    Args:
+        input_files (list[str]): Paths of the files to load
+
+    Yields:
+        tuple[str, list[Document]]: The file path and the documents loaded from it
+    """
+    for input_file in input_files:
+        reader = SimpleDirectoryReader(input_files=[input_file], file_metadata=extract_metadata, filename_as_id=True)
+        yield input_file, reader.load_data()
@@ -0,0 +1,266 @@
+import asyncio
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import openai
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.utils import get_tokenizer
+from loguru import logger as log
+
+if TYPE_CHECKING:
+    import httpx
+
+HTTP_TOO_MANY_REQUESTS = 429
+HTTP_SERVER_ERROR = 500
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket enforcing a per-minute rate limit.
+
+    The bucket starts full and refills continuously at `rate_per_minute / 60` tokens per second,
+    so short bursts up to the full per-minute budget are allowed.
+
+    Attributes:
+        rate_per_minute (int): Number of tokens granted per minute (also the bucket capacity)
+    """
+
+    def __init__(self, rate_per_minute: int):
+        if rate_per_minute <= 0:
+            error_msg = "rate_per_minute must be positive"
+            raise ValueError(error_msg)
+        self.rate_per_minute = rate_per_minute
+        self._tokens = float(rate_per_minute)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.rate_per_minute, self._tokens + (now - self._updated_at) * self.rate_per_minute / 60)
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Wait until `amount` tokens are available and consume them.
+
+        Requests larger than the bucket capacity are clamped to it, so they are delayed but never deadlock.
+
+        Args:
+            amount (float): Number of tokens to consume
+        """
+        amount = min(amount, self.rate_per_minute)
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                await asyncio.sleep((amount - self._tokens) * 60 / self.rate_per_minute)
+                self._refill()
+            self._tokens -= amount
+
+
+@dataclass
+class EmbeddingStats:
+    """
+    Throughput counters of a concurrent embedding run.
+
+    Attributes:
+        chunks (int): Number of embedded chunks
+        tokens (int): Number of embedded tokens
+        requests (int): Number of successful embedding requests
+        retries (int): Number of requests retried after a rate limit or transient error
+        elapsed (float): Wall-clock time of the run, in seconds
+    """
+
+    chunks: int = 0
+    tokens: int = 0
+    requests: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an error raised by the embedding client is an HTTP 429 (rate limit) response."""
+    return getattr(error, "status_code", None) == HTTP_TOO_MANY_REQUESTS
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Whether a failed embedding request is worth retrying: rate limits, server errors, connection errors and timeouts.
+
+    Any other error (a rejected request, a bug...) would fail again, and is raised at once.
+    """
+    # Timeouts are connection errors too
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code == HTTP_TOO_MANY_REQUESTS or status_code >= HTTP_SERVER_ERROR)
+
+
+def _retry_after(error: BaseException) -> float | None:
+    """Return the delay requested by the server through the Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ConcurrentEmbedder:
+    """
+    Embed nodes with concurrent, rate-limit-aware batched requests.
+
+    Batches are sent concurrently up to `max_concurrency` in-flight requests, while two token buckets
+    keep the request rate below `requests_per_minute` and `tokens_per_minute`. Rate-limited (HTTP 429)
+    requests are retried with jittered exponential backoff, honouring the server Retry-After header.
+
+    Every call of `embed_nodes` runs on the same event loop, kept until `close`, so that the connections
+    the async client of the embedding model keeps alive are reused from one batch to the next. The
+    concurrency limit and the token buckets are shared by every call too, so the quotas hold across
+    the whole run rather than restarting full with each batch.
+
+    Attributes:
+        embed_model (BaseEmbedding): The embedding model used to embed the batches
+        batch_size (int): Number of chunks sent in a single embedding request
+        max_concurrency (int): Maximum number of in-flight embedding requests
+        requests_per_minute (int, optional): Request quota per minute, unlimited if None
+        tokens_per_minute (int, optional): Token quota per minute, unlimited if None
+        max_retries (int): Maximum number of retries of a single batch
+        backoff_base (float): Initial backoff delay, in seconds
+        backoff_max (float): Maximum backoff delay, in seconds
+        tokenizer (Callable, optional): Tokenizer used to count the tokens of a batch, tiktoken by default
+    """
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        *,
+        batch_size: int = 100,
+        max_concurrency: int = 8,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        tokenizer: Callable[[str], list] | None = None,
+    ):
+        if batch_size <= 0 or max_concurrency <= 0:
+            error_msg = "batch_size and max_concurrency must be positive"
+            raise ValueError(error_msg)
+        self.embed_model = embed_model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokenizer = tokenizer or get_tokenizer()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reset_limits()
+
+    def _reset_limits(self) -> None:
+        # Asyncio primitives bind to the loop they are first used on, so they are renewed with the loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._request_bucket = TokenBucket(self.requests_per_minute) if self.requests_per_minute else None
+        self._token_bucket = TokenBucket(self.tokens_per_minute) if self.tokens_per_minute else None
+
+    def embed_nodes(self, nodes: list[BaseNode]) -> EmbeddingStats:
+        """
+        Embed nodes in place, setting the `embedding` attribute of those that do not have one yet.
+
+        Args:
+            nodes (list[BaseNode]): Nodes to embed
+
+        Returns:
+            EmbeddingStats: Throughput counters of the run
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.aembed_nodes(nodes))
+
+    def close(self, async_client: "httpx.AsyncClient | None" = None) -> None:
+        """
+        Close the event loop of the embedder, once every node is embedded.
+
+        Args:
+            async_client (httpx.AsyncClient, optional): The async client of the embedding model, whose connections,
+                bound to the event loop, are closed on it first
+        """
+        if self._loop is None:
+            return
+        if async_client is not None:
+            self._loop.run_until_complete(async_client.aclose())
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        self._loop.close()
+        self._loop = None
+        self._reset_limits()
+
+    async def aembed_nodes(self, nodes: list[BaseNode]) -> EmbeddingStats:
+        """Asynchronous version of `embed_nodes`."""
+        pending = [node for node in nodes if node.embedding is None]
+        batches = [pending[start : start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+
+        stats = EmbeddingStats()
+        semaphore = self._semaphore
+        request_bucket = self._request_bucket
+        token_bucket = self._token_bucket
+
+        async def embed_batch(batch: list[BaseNode]) -> None:
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+            num_tokens = sum(len(self._tokenizer(text)) for text in texts)
+
+            for attempt in range(self.max_retries + 1):
+                async with semaphore:
+                    if request_bucket:
+                        await request_bucket.acquire(1)
+                    if token_bucket:
+                        await token_bucket.acquire(num_tokens)
+                    try:
+                        embeddings = await self.embed_model.aget_text_embedding_batch(texts)
+                        break
+                    except Exception as e:
+                        if attempt == self.max_retries or not is_retryable_error(e):
+                            raise
+                        error = e
+
+                # Back off outside the semaphore, so that other batches can use the slot meanwhile
+                delay = _retry_after(error) if is_rate_limit_error(error) else None
+                if delay is None:
+                    delay = min(self.backoff_max, self.backoff_base * 2**attempt) * random.uniform(0.5, 1.0)  # noqa: S311
+                stats.retries += 1
+                log.warning("Embedding request failed ({}), retrying in {:.2f}s", error, delay)
+                await asyncio.sleep(delay)
+
+            for node, embedding in zip(batch, embeddings, strict=True):
+                node.embedding = embedding
+            stats.chunks += len(batch)
+            stats.tokens += num_tokens
+            stats.requests += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        stats.elapsed = time.perf_counter() - start
+
+        log.info(
+            "Embedded {} chunks ({} tokens) in {} requests, {:.2f}s: {:.1f} chunks/s, {:.0f} tokens/s, {} retries",
+            stats.chunks,
+            stats.tokens,
+            stats.requests,
+            stats.elapsed,
+            stats.chunks_per_second,
+            stats.tokens_per_second,
+            stats.retries,
+        )
+        return stats
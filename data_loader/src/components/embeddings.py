@@ -1,16 +1,232 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr, SerializeAsAny
 from llama_index.embeddings.openai import OpenAIEmbedding
+from loguru import logger as log
+
+if TYPE_CHECKING:
+    from clients.http_client import HTTPClients
+
+# Fraction of the maximum size the cache is shrunk to when it overflows, so that
+# eviction does not run again on the very next insert
+EVICTION_TARGET_RATIO = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode and whitespace so that trivially different texts share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
 
 
-def initialize_embedding_model(model_name: str) -> OpenAIEmbedding:
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper that persists embeddings in a local SQLite cache.
+
+    Entries are keyed by (model name, hash of the normalized text), so identical chunks and queries
+    are embedded only once across runs and processes sharing the same cache file. When the cache
+    grows above `max_size_bytes`, the least recently used entries are evicted.
+
+    Attributes:
+        embed_model (BaseEmbedding): The wrapped embedding model, called on cache misses
+        cache_path (str): Path of the SQLite cache file
+        max_size_bytes (int): Maximum size of the cached embeddings, in bytes
+    """
+
+    embed_model: SerializeAsAny[BaseEmbedding] = Field(description="The wrapped embedding model")
+    cache_path: str = Field(description="Path of the SQLite cache file")
+    max_size_bytes: int = Field(gt=0, description="Maximum size of the cached embeddings, in bytes")
+
+    _conn: sqlite3.Connection = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _size_bytes: int = PrivateAttr(default=0)
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, embed_model: BaseEmbedding, cache_path: str, max_size_bytes: int, **kwargs):
+        super().__init__(
+            embed_model=embed_model,
+            cache_path=cache_path,
+            max_size_bytes=max_size_bytes,
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._size_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def hits(self) -> int:
+        """Number of embeddings served from the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Number of embeddings computed by the wrapped model."""
+        return self._misses
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: hits, misses, hit_rate and size_bytes of the cache
+        """
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "size_bytes": self._size_bytes,
+        }
+
+    def _cache_key(self, text: str) -> str:
+        payload = f"{self.model_name}\x00{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list[str]) -> dict[str, Embedding]:
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's limit on the number of bound parameters
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",  # noqa: S608
+                    batch,
+                ).fetchall()
+                found.update({key: array("f", blob).tolist() for key, blob in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+        return found
+
+    def _store(self, entries: dict[str, Embedding]) -> None:
+        now = time.time()
+        rows = []
+        for key, embedding in entries.items():
+            blob = array("f", embedding).tobytes()
+            rows.append((key, blob, len(blob) + len(key), now))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._size_bytes += sum(row[2] for row in rows)
+            if self._size_bytes > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Other processes may share the cache file: recompute the real size before evicting
+        self._size_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        to_free = self._size_bytes - int(self.max_size_bytes * EVICTION_TARGET_RATIO)
+        if to_free <= 0:
+            return
+
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+            evicted.append((key,))
+            to_free -= size
+            self._size_bytes -= size
+            if to_free <= 0:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        self._conn.commit()
+        log.info("Evicted {} entries from embedding cache {}", len(evicted), self.cache_path)
+
+    def _split_hits(self, texts: list[str]) -> tuple[list[str], dict[str, Embedding], dict[str, str]]:
+        keys = [self._cache_key(text) for text in texts]
+        found = self._lookup(keys)
+        # Texts sharing a key are embedded only once
+        missing = {key: text for key, text in zip(keys, texts, strict=True) if key not in found}
+        self._hits += len(texts) - len(missing)
+        self._misses += len(missing)
+        return keys, found, missing
+
+    def _embed_with_cache(self, texts: list[str], embed_fn: Callable[[list[str]], list[Embedding]]) -> list[Embedding]:
+        keys, found, missing = self._split_hits(texts)
+        if missing:
+            computed = dict(zip(missing, embed_fn(list(missing.values())), strict=True))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def _aembed_with_cache(
+        self, texts: list[str], embed_fn: Callable[[list[str]], Awaitable[list[Embedding]]]
+    ) -> list[Embedding]:
+        keys, found, missing = self._split_hits(texts)
+        if missing:
+            computed = dict(zip(missing, await embed_fn(list(missing.values())), strict=True))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._embed_with_cache([query], lambda texts: [self.embed_model._get_query_embedding(texts[0])])[0]  # noqa: SLF001
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        async def embed(texts: list[str]) -> list[Embedding]:
+            return [await self.embed_model._aget_query_embedding(texts[0])]  # noqa: SLF001
+
+        return (await self._aembed_with_cache([query], embed))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[Embedding]:
+        return self._embed_with_cache(texts, self.embed_model._get_text_embeddings)  # noqa: SLF001
+
+    async def _aget_text_embeddings(self, texts: list[str]) -> list[Embedding]:
+        return await self._aembed_with_cache(texts, self.embed_model._aget_text_embeddings)  # noqa: SLF001
+
+
+def initialize_embedding_model(
+    model_name: str,
+    cache_path: str | None = None,
+    cache_max_size_mb: int = 1024,
+    http_clients: "HTTPClients | None" = None,
+) -> OpenAIEmbedding | CachedEmbedding:
     """
     Initialize an OpenAI embedding model with the specified model name.
 
     Args:
         model_name (str): The name of the OpenAI embedding model to initialize
                          (e.g., 'text-embedding-ada-002')
+        cache_path (str, optional): Path of the SQLite embedding cache. If empty or None,
+                         embeddings are not cached
+        cache_max_size_mb (int, optional): Maximum size of the embedding cache, in megabytes
+        http_clients (HTTPClients, optional): Pooled HTTP clients sending the requests, retrying them instead
+                         of the OpenAI client. The OpenAI client defaults are used if None
 
     Returns:
-        OpenAIEmbedding: An initialized OpenAI embedding model instance for use with LlamaIndex
-                        document embeddings and queries
+        OpenAIEmbedding | CachedEmbedding: An initialized OpenAI embedding model instance for use with LlamaIndex
+                        document embeddings and queries, wrapped in a persistent cache if requested
     """
-    return OpenAIEmbedding(model=model_name)
+    embed_model = OpenAIEmbedding(model=model_name, **(http_clients.openai_kwargs() if http_clients else {}))
+    if not cache_path:
+        return embed_model
+
+    log.info("Initializing embedding cache. Path: {}, Max size: {} MB", cache_path, cache_max_size_mb)
+    return CachedEmbedding(embed_model=embed_model, cache_path=cache_path, max_size_bytes=cache_max_size_mb * 1024 * 1024)
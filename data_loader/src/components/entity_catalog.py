@@ -0,0 +1,75 @@
+import json
+from collections import Counter
+from pathlib import Path
+
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from loguru import logger as log
+
+ENTITY_CATALOG_SUFFIX = ".entities.json"
+ENTITY_CATALOG_FORMAT_VERSION = 1
+# Metadata extracted from the transcript file names that questions can refer to
+ENTITY_FIELDS = ("speech_author", "speech_location", "youtube_id")
+
+
+def get_entity_catalog_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the entity catalog of a collection.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the entity catalog file
+    """
+    return Path(chroma_db_path) / f"{collection_name}{ENTITY_CATALOG_SUFFIX}"
+
+
+def build_entity_catalog(vector_store: ChromaVectorStore, catalog_path: str | Path, page_size: int = 1000) -> Path:
+    """
+    Build the catalog of the speakers, TEDx events and YouTube videos of a Chroma collection.
+
+    The query engine matches the names of the catalog in the questions and turns them into metadata
+    filters of the similarity search. The catalog is a JSON file with, for each field of `ENTITY_FIELDS`,
+    the number of chunks of each value, and it is written to a temporary file first, then moved over
+    the previous one.
+
+    Args:
+        vector_store (ChromaVectorStore): The vector store whose chunk metadata is cataloged
+        catalog_path (str | Path): Path of the entity catalog file
+        page_size (int): Number of chunks read from Chroma at once
+
+    Returns:
+        Path: Path of the entity catalog file
+    """
+    collection = vector_store.client
+    count = collection.count()
+
+    entities = {field: Counter() for field in ENTITY_FIELDS}
+    position = 0
+    while position < count:
+        page = collection.get(limit=page_size, offset=position, include=["metadatas"])
+        if not page["ids"]:
+            break
+        for metadata in page["metadatas"]:
+            for field, values in entities.items():
+                if value := (metadata or {}).get(field):
+                    values[str(value)] += 1
+        position += len(page["ids"])
+
+    catalog = {
+        "format_version": ENTITY_CATALOG_FORMAT_VERSION,
+        "count": position,
+        "fields": {field: dict(sorted(values.items())) for field, values in entities.items()},
+    }
+    catalog_path = Path(catalog_path)
+    tmp_path = catalog_path.with_name(f"{catalog_path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    tmp_path.replace(catalog_path)
+
+    log.info(
+        "Entity catalog built: {}",
+        ", ".join(f"{len(values)} {field}" for field, values in entities.items()),
+    )
+    return catalog_path
@@ -0,0 +1,214 @@
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from llama_index.core import Document
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.indices.utils import embed_nodes
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.schema import BaseNode, TransformComponent
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+from loguru import logger as log
+
+if TYPE_CHECKING:
+    from components.dedup import ChunkDeduplicator
+    from components.embedding_pipeline import ConcurrentEmbedder
+    from components.text_splitter import ParallelTextSplitter
+
+
+@dataclass
+class IngestionStats:
+    """
+    Counters of a streaming ingestion run.
+
+    Attributes:
+        documents (int): Number of ingested documents
+        chunks (int): Number of chunks written to the vector store
+        batches (int): Number of batches written to the vector store
+        tokens (int): Number of tokens of the written chunks, as counted by the text splitter
+        elapsed (float): Wall-clock time of the run, in seconds
+        split_seconds (float): Time spent reading and splitting the sources (or waiting for the split workers)
+        embed_seconds (float): Time spent embedding the batches
+        write_seconds (float): Time spent writing the batches to the vector store
+    """
+
+    documents: int = 0
+    chunks: int = 0
+    batches: int = 0
+    tokens: int = 0
+    elapsed: float = 0.0
+    split_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class SourceProgress:
+    """
+    Progress of a source after a batch has been written to the vector store.
+
+    Attributes:
+        doc_ids (list[str]): Ids of the documents of the source
+        node_ids (list[str]): Ids of the chunks of the source written by this batch
+        complete (bool): Whether all the chunks of the source are now in the vector store
+    """
+
+    doc_ids: list[str]
+    node_ids: list[str] = field(default_factory=list)
+    complete: bool = False
+
+
+def split_sources(
+    sources: Iterable[tuple[str, list[Document]]],
+    text_splitter: TransformComponent,
+    parallel_splitter: "ParallelTextSplitter | None" = None,
+) -> Iterator[tuple[str, list[str], list[BaseNode]]]:
+    """
+    Lazily split the documents of each source into chunks, preserving the order of the sources.
+
+    Args:
+        sources (Iterable[tuple[str, list[Document]]]): Pairs of source name and its documents
+        text_splitter (TransformComponent): The text splitter used to chunk the documents
+        parallel_splitter (ParallelTextSplitter, optional): If provided, documents are split through it on
+            a pool of worker processes instead of with `text_splitter`
+
+    Yields:
+        tuple[str, list[str], list[BaseNode]]: Source name, ids of its documents and its chunks
+    """
+    if parallel_splitter is not None:
+        yield from parallel_splitter.split(sources)
+        return
+    for source, documents in sources:
+        yield source, [doc.id_ for doc in documents], run_transformations(documents, [text_splitter])
+
+
+def _embed_batch(nodes: list[BaseNode], embed_model: BaseEmbedding, embedder: "ConcurrentEmbedder | None") -> None:
+    if embedder is not None:
+        embedder.embed_nodes(nodes)
+        return
+    embeddings = embed_nodes(nodes, embed_model)
+    for node in nodes:
+        node.embedding = embeddings[node.node_id]
+
+
+def ingest_documents(
+    sources: Iterable[tuple[str, list[Document]]],
+    vector_store: BasePydanticVectorStore,
+    text_splitter: TransformComponent,
+    embed_model: BaseEmbedding,
+    *,
+    batch_size: int = 500,
+    embedder: "ConcurrentEmbedder | None" = None,
+    on_commit: Callable[[dict[str, SourceProgress]], None] | None = None,
+    skip_node_ids: set[str] | None = None,
+    parallel_splitter: "ParallelTextSplitter | None" = None,
+    deduplicator: "ChunkDeduplicator | None" = None,
+) -> IngestionStats:
+    """
+    Split, embed and write documents to the vector store in fixed-size batches.
+
+    Sources are consumed lazily, one at a time, and chunks are written to the vector store as soon as
+    `batch_size` of them are available. Only the current batch (plus the chunks of a single source) is
+    held in memory, so peak memory does not depend on the number of sources.
+
+    Args:
+        sources (Iterable[tuple[str, list[Document]]]): Pairs of source name (e.g. the file path) and its documents
+        vector_store (BasePydanticVectorStore): The vector store to write the chunks to
+        text_splitter (TransformComponent): The text splitter used to chunk the documents
+        embed_model (BaseEmbedding): The embedding model used when no `embedder` is given
+        batch_size (int): Number of chunks embedded and written to the vector store at once
+        embedder (ConcurrentEmbedder, optional): If provided, each batch is embedded through it
+            with concurrent, rate-limited requests
+        on_commit (Callable, optional): Called after each batch is written, with the progress of the sources
+            the batch wrote chunks of or completed, as a mapping of source name to `SourceProgress`. Use it to
+            checkpoint the run.
+        skip_node_ids (set[str], optional): Ids of chunks already in the vector store, e.g. written by an
+            interrupted run. They are neither embedded nor written again.
+        parallel_splitter (ParallelTextSplitter, optional): If provided, documents are split through it on
+            a pool of worker processes instead of with `text_splitter`
+        deduplicator (ChunkDeduplicator, optional): If provided, the chunks of each source are filtered
+            through it before embedding. The same sources must have been registered with it beforehand.
+
+    Returns:
+        IngestionStats: Counters of the run
+    """
+    if batch_size <= 0:
+        error_msg = "batch_size must be positive"
+        raise ValueError(error_msg)
+
+    stats = IngestionStats()
+    start = time.perf_counter()
+
+    skip_node_ids = skip_node_ids or set()
+    buffer: list[tuple[str, BaseNode]] = []
+    # Sources not fully written yet, with their document ids and the position of their last chunk in the stream
+    pending: deque[tuple[str, list[str], int]] = deque()
+    produced = 0
+    committed = 0
+
+    def commit(batch: list[tuple[str, BaseNode]]) -> None:
+        nonlocal committed
+        nodes = [node for _, node in batch]
+        if nodes:
+            embed_start = time.perf_counter()
+            _embed_batch(nodes, embed_model, embedder)
+            write_start = time.perf_counter()
+            vector_store.add(nodes)
+            stats.embed_seconds += write_start - embed_start
+            stats.write_seconds += time.perf_counter() - write_start
+
+            committed += len(nodes)
+            stats.chunks += len(nodes)
+            stats.batches += 1
+            # Counted by the `TokenCountingTextSplitter`, chunks split without it count as 0
+            stats.tokens += sum(node.metadata.get("num_tokens", 0) for node in nodes)
+            log.info("Wrote batch {} ({} chunks, {} total) to vector store", stats.batches, len(nodes), stats.chunks)
+
+        doc_ids = {source: ids for source, ids, _ in pending}
+        progress: dict[str, SourceProgress] = {}
+        for source, node in batch:
+            progress.setdefault(source, SourceProgress(doc_ids=doc_ids[source])).node_ids.append(node.node_id)
+        while pending and pending[0][2] <= committed:
+            source, ids, _ = pending.popleft()
+            progress.setdefault(source, SourceProgress(doc_ids=ids)).complete = True
+        if progress and on_commit is not None:
+            on_commit(progress)
+
+    split_start = time.perf_counter()
+    for source, doc_ids, split_nodes in split_sources(sources, text_splitter, parallel_splitter):
+        stats.split_seconds += time.perf_counter() - split_start
+        if deduplicator is not None:
+            split_nodes = deduplicator.apply(split_nodes)  # noqa: PLW2901
+        nodes = [node for node in split_nodes if node.node_id not in skip_node_ids]
+        buffer.extend((source, node) for node in nodes)
+        produced += len(nodes)
+        pending.append((source, doc_ids, produced))
+        stats.documents += len(doc_ids)
+
+        while len(buffer) >= batch_size:
+            batch, buffer = buffer[:batch_size], buffer[batch_size:]
+            commit(batch)
+        split_start = time.perf_counter()
+
+    commit(buffer)
+
+    stats.elapsed = time.perf_counter() - start
+    log.info(
+        "Ingested {} documents, {} chunks in {} batches, {:.2f}s: {:.1f} chunks/s "
+        "(split {:.2f}s, embed {:.2f}s, write {:.2f}s)",
+        stats.documents,
+        stats.chunks,
+        stats.batches,
+        stats.elapsed,
+        stats.chunks_per_second,
+        stats.split_seconds,
+        stats.embed_seconds,
+        stats.write_seconds,
+    )
+    return stats
@@ -0,0 +1,154 @@
+import json
+import re
+import shutil
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+import llama_index.core
+import nltk
+import numpy as np
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from loguru import logger as log
+from nltk.corpus import stopwords
+from nltk.stem.snowball import SnowballStemmer
+
+LEXICAL_INDEX_SUFFIX = ".lexical"
+LEXICAL_INDEX_FORMAT_VERSION = 1
+# Name of the analyzer, recorded in the index header: the query engine must tokenize queries the same way
+ANALYZER = "italian-snowball-v1"
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+
+# Metadata indexed together with the chunk text, so that speakers, titles and events are searchable
+INDEXED_METADATA_KEYS = ("speech_name", "speech_author", "speech_location")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+_stemmer = SnowballStemmer("italian")
+# The Italian stop-word list ships with the NLTK data bundled by llama_index
+NLTK_DATA_DIR = str(Path(llama_index.core.__file__).parent / "_static" / "nltk_cache")
+
+
+@lru_cache(maxsize=1)
+def _stopwords() -> frozenset[str]:
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.append(NLTK_DATA_DIR)
+    try:
+        nltk.data.find("corpora/stopwords")
+    except LookupError:
+        nltk.download("stopwords", download_dir=NLTK_DATA_DIR, quiet=True)
+    return frozenset(stopwords.words("italian"))
+
+
+@lru_cache(maxsize=1 << 16)
+def _stem(word: str) -> str:
+    return _stemmer.stem(word)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split a text into Italian index terms: lowercased words, without stop words, stemmed with Snowball.
+
+    Args:
+        text (str): The text to tokenize
+
+    Returns:
+        list[str]: The terms of the text, in order
+    """
+    stop = _stopwords()
+    words = TOKEN_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+    return [_stem(word) for word in words if word not in stop and (len(word) > 1 or word.isdigit())]
+
+
+def get_lexical_index_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the lexical (BM25) index of a collection.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the lexical index directory
+    """
+    return Path(chroma_db_path) / f"{collection_name}{LEXICAL_INDEX_SUFFIX}"
+
+
+def _indexed_text(text: str | None, metadata: dict | None) -> str:
+    metadata = metadata or {}
+    fields = [str(metadata[key]) for key in INDEXED_METADATA_KEYS if metadata.get(key)]
+    return " ".join([*fields, text or ""])
+
+
+def build_lexical_index(vector_store: ChromaVectorStore, index_path: str | Path, page_size: int = 1000) -> Path:
+    """
+    Build the inverted index of the chunks of a Chroma collection, for BM25 retrieval in the query engine.
+
+    The index covers the same chunk ids as the collection, and is a directory with:
+        - lexical.json: header with format version, analyzer, number of chunks, terms and average chunk length
+        - terms.txt: the sorted index terms, one per line
+        - offsets.npy: int64 start of the posting list of each term (number of terms + 1 entries)
+        - postings_docs.npy: int32 chunk positions of the postings, ascending within each posting list
+        - postings_tf.npy: uint16 term frequencies of the postings
+        - doc_lengths.npy: int32 number of terms of each chunk
+        - node_ids.txt: the chunk ids, one per line, in chunk position order
+
+    The index is written to a temporary directory first, then moved over the previous one.
+
+    Args:
+        vector_store (ChromaVectorStore): The vector store whose chunks are indexed
+        index_path (str | Path): Path of the lexical index directory
+        page_size (int): Number of chunks read from Chroma at once
+
+    Returns:
+        Path: Path of the lexical index directory
+    """
+    collection = vector_store.client
+    count = collection.count()
+    log.info("Building lexical index of {} chunks", count)
+
+    node_ids: list[str] = []
+    doc_lengths: list[int] = []
+    postings: dict[str, list[tuple[int, int]]] = {}
+    while len(node_ids) < count:
+        page = collection.get(limit=page_size, offset=len(node_ids), include=["documents", "metadatas"])
+        if not page["ids"]:
+            break
+        for node_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"], strict=True):
+            terms = Counter(tokenize(_indexed_text(text, metadata)))
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append((len(node_ids), min(frequency, MAX_TERM_FREQUENCY)))
+            doc_lengths.append(sum(terms.values()))
+            node_ids.append(node_id)
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+    pairs = np.array([pair for term in terms for pair in postings[term]], dtype=np.int64).reshape(-1, 2)
+
+    index_path = Path(index_path)
+    tmp_path = index_path.with_name(f"{index_path.name}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    (tmp_path / "terms.txt").write_text("\n".join(terms), encoding="utf-8")
+    (tmp_path / "node_ids.txt").write_text("\n".join(node_ids), encoding="utf-8")
+    np.save(tmp_path / "offsets.npy", offsets)
+    np.save(tmp_path / "postings_docs.npy", pairs[:, 0].astype(np.int32))
+    np.save(tmp_path / "postings_tf.npy", pairs[:, 1].astype(np.uint16))
+    np.save(tmp_path / "doc_lengths.npy", np.array(doc_lengths, dtype=np.int32))
+
+    header = {
+        "format_version": LEXICAL_INDEX_FORMAT_VERSION,
+        "analyzer": ANALYZER,
+        "count": len(node_ids),
+        "num_terms": len(terms),
+        "avg_length": float(np.mean(doc_lengths)) if doc_lengths else 0.0,
+    }
+    with (tmp_path / "lexical.json").open("w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+    shutil.rmtree(index_path, ignore_errors=True)
+    tmp_path.replace(index_path)
+    log.info("Lexical index built: {} chunks, {} terms, {} postings", len(node_ids), len(terms), len(pairs))
+    return index_path
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger as log
+
+MANIFEST_SUFFIX = ".manifest.json"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class ManifestDiff:
+    """
+    Difference between the files recorded in a manifest and the files currently on disk.
+
+    Attributes:
+        new (list[str]): Files that are not recorded in the manifest
+        changed (list[str]): Files whose content hash differs from the recorded one
+        resumed (list[str]): Files only partially ingested by an interrupted run, with unchanged content
+        removed (list[str]): Files recorded in the manifest that no longer exist
+        unchanged (list[str]): Files whose content hash matches the recorded one
+    """
+
+    new: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    resumed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+
+    @property
+    def to_embed(self) -> list[str]:
+        """Files that need to be (re-)embedded."""
+        return self.new + self.changed + self.resumed
+
+    @property
+    def to_delete(self) -> list[str]:
+        """Files whose vectors must be removed from the collection before (re-)embedding."""
+        return self.changed + self.removed
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the run has nothing to embed and nothing to delete."""
+        return not self.to_embed and not self.removed
+
+
+def get_manifest_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the ingestion manifest of a collection.
+
+    The manifest lives inside the Chroma database directory so that it shares the same volume
+    (and lifecycle) as the vectors it describes.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the manifest file
+    """
+    return Path(chroma_db_path) / f"{collection_name}{MANIFEST_SUFFIX}"
+
+
+def compute_file_hash(filepath: str | Path) -> str:
+    """
+    Compute the SHA-256 hash of a file content, reading it in fixed-size blocks.
+
+    Args:
+        filepath (str | Path): Path to the file
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with Path(filepath).open("rb") as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path: str | Path) -> dict:
+    """
+    Load an ingestion manifest from disk.
+
+    Args:
+        manifest_path (str | Path): Path of the manifest file
+
+    Returns:
+        dict: The manifest, with keys:
+            - settings: ingestion settings the recorded vectors were built with
+            - files: mapping of file path to {"hash": str, "doc_ids": list[str]}. Files partially ingested by
+              an interrupted run also have "partial": true and the "node_ids" of the chunks already written.
+              Files sharing deduplicated chunks with other files list them in "linked".
+            - exports: mapping of query index name to the collection version and options it was exported with,
+              empty while the indexes of the current files are not all exported
+            An empty manifest is returned if the file does not exist.
+    """
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        log.info("No ingestion manifest found at {}", manifest_path)
+        return {"settings": {}, "files": {}, "exports": {}}
+
+    with manifest_path.open(encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    log.info("Loaded ingestion manifest with {} files from {}", len(manifest.get("files", {})), manifest_path)
+    return {
+        "settings": manifest.get("settings", {}),
+        "files": manifest.get("files", {}),
+        "exports": manifest.get("exports", {}),
+    }
+
+
+def compute_manifest_version(manifest: dict) -> str:
+    """
+    Return the version of the collection described by a manifest, changing whenever its files or settings change.
+
+    Args:
+        manifest (dict): The manifest, with its "settings" and "files"
+
+    Returns:
+        str: Short hash of the settings and files of the manifest
+    """
+    payload = json.dumps({"settings": manifest["settings"], "files": manifest["files"]}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def save_manifest(manifest_path: str | Path, manifest: dict) -> None:
+    """
+    Atomically write an ingestion manifest to disk.
+
+    The manifest is written to a temporary file first and then moved over the previous one,
+    so that a crash never leaves a truncated manifest behind.
+
+    Args:
+        manifest_path (str | Path): Path of the manifest file
+        manifest (dict): The manifest to write
+    """
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_path.replace(manifest_path)
+
+
+def _expand_linked_files(diff: ManifestDiff, recorded: dict) -> None:
+    links: dict[str, set[str]] = {}
+    for filepath, entry in recorded.items():
+        for linked in entry.get("linked", []):
+            links.setdefault(filepath, set()).add(linked)
+            links.setdefault(linked, set()).add(filepath)
+
+    reached = set(diff.changed + diff.removed + diff.resumed)
+    frontier = list(reached)
+    while frontier:
+        for linked in links.get(frontier.pop(), ()):
+            if linked not in reached:
+                reached.add(linked)
+                frontier.append(linked)
+
+    # Resumed files with links are re-embedded from scratch, together with the files they are linked to
+    expanded = [fp for fp in diff.unchanged if fp in reached] + [fp for fp in diff.resumed if fp in links]
+    if expanded:
+        log.info("{} files linked by deduplicated chunks will be re-embedded as well", len(expanded))
+        diff.changed = sorted(diff.changed + expanded)
+        diff.unchanged = [fp for fp in diff.unchanged if fp not in reached]
+        diff.resumed = [fp for fp in diff.resumed if fp not in links]
+
+
+def diff_manifest(manifest: dict, file_hashes: dict[str, str], settings: dict) -> ManifestDiff:
+    """
+    Compare the files recorded in a manifest with the files currently on disk.
+
+    If the ingestion settings differ from the recorded ones (e.g. a different chunk size or
+    embedding model), every file is considered changed since none of the stored vectors is reusable.
+    Files left partial by an interrupted run are resumed if their content did not change.
+
+    Files linked by chunk deduplication are re-embedded together: if a file is changed, removed or
+    resumed, the files transitively linked to it are considered changed as well.
+
+    Args:
+        manifest (dict): The manifest loaded with `load_manifest`
+        file_hashes (dict[str, str]): Mapping of file path to content hash for the files on disk
+        settings (dict): Ingestion settings of the current run
+
+    Returns:
+        ManifestDiff: The files to embed, delete and skip
+    """
+    recorded = manifest["files"]
+    settings_changed = bool(recorded) and manifest["settings"] != settings
+    if settings_changed:
+        log.info("Ingestion settings changed since last run, all files will be re-embedded")
+
+    diff = ManifestDiff()
+    for filepath, file_hash in sorted(file_hashes.items()):
+        if filepath not in recorded:
+            diff.new.append(filepath)
+        elif settings_changed or recorded[filepath]["hash"] != file_hash:
+            diff.changed.append(filepath)
+        elif recorded[filepath].get("partial"):
+            diff.resumed.append(filepath)
+        else:
+            diff.unchanged.append(filepath)
+
+    diff.removed = sorted(filepath for filepath in recorded if filepath not in file_hashes)
+    _expand_linked_files(diff, recorded)
+
+    log.info(
+        "Manifest diff: {} new, {} changed, {} resumed, {} removed, {} unchanged (skipped)",
+        len(diff.new),
+        len(diff.changed),
+        len(diff.resumed),
+        len(diff.removed),
+        len(diff.unchanged),
+    )
+    return diff
@@ -0,0 +1,86 @@
+import json
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+from loguru import logger as log
+
+RUN_METRICS_SUFFIX = ".metrics.json"
+
+
+@dataclass
+class RunMetrics:
+    """
+    Wall time of the stages of a loader run and its counters, summarized at the end of the run.
+
+    Attributes:
+        stage_seconds (dict[str, float]): Time spent in each stage, in the order the stages first ran
+        counters (dict[str, float]): Counters of the run, e.g. embedded chunks and tokens
+        started (float): Monotonic time the run started at
+    """
+
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, float] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the code run within the context as part of a stage, added to its previous runs."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, stage_seconds: dict[str, float] | None = None, counters: dict[str, float] | None = None) -> None:
+        """Add the time of stages timed elsewhere, e.g. the sub-stages of the ingestion, and counters."""
+        for name, seconds in (stage_seconds or {}).items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        for name, value in (counters or {}).items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        """Return the summary of the run: end time, total and per-stage wall time, and counters."""
+        return {
+            "finished_at": datetime.now(UTC).isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "stage_seconds": {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+            "counters": self.counters,
+        }
+
+
+def get_run_metrics_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the metrics summary of the last run of the loader on a collection.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the metrics summary, next to the manifest
+    """
+    return Path(chroma_db_path) / f"{collection_name}{RUN_METRICS_SUFFIX}"
+
+
+def save_run_metrics(path: str | Path, metrics: RunMetrics) -> dict:
+    """
+    Log the metrics summary of a run and write it to disk, replacing the one of the previous run.
+
+    Args:
+        path (str | Path): Path of the metrics summary
+        metrics (RunMetrics): The metrics of the run
+
+    Returns:
+        dict: The summary
+    """
+    summary = metrics.summary()
+    stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary["stage_seconds"].items())
+    log.info("Run took {:.2f}s ({}), counters: {}", summary["total_seconds"], stages or "no stage", summary["counters"])
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return summary
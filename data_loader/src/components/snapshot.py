@@ -0,0 +1,175 @@
+import json
+import shutil
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from loguru import logger as log
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_DTYPES = ("int8", "float16")
+INT8_MAX = 127
+
+# Columns of the snapshot metadata, one entry per vector
+SNAPSHOT_COLUMNS = ("node_id", "text", "metadata")
+
+
+def get_snapshot_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the vector snapshot of a collection.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the snapshot directory
+    """
+    return Path(chroma_db_path) / f"{collection_name}{SNAPSHOT_SUFFIX}"
+
+
+def quantize_embeddings(embeddings: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    L2-normalize and quantize a block of embeddings.
+
+    int8 embeddings use a symmetric per-vector scale, so that the dot product of a row with a query is
+    approximately `scale * (row @ query)`. float16 embeddings have a scale of 1.
+
+    Args:
+        embeddings (np.ndarray): float32 matrix of shape (n, dim)
+        dtype (str): "int8" or "float16"
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The quantized matrix and the float32 per-vector scales
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+    if dtype == "float16":
+        return embeddings.astype(np.float16), np.ones(len(embeddings), dtype=np.float32)
+
+    max_abs = np.abs(embeddings).max(axis=1)
+    scales = np.where(max_abs == 0, 1, max_abs / INT8_MAX).astype(np.float32)
+    quantized = np.rint(embeddings / scales[:, None]).clip(-INT8_MAX, INT8_MAX).astype(np.int8)
+    return quantized, scales
+
+
+def _write_column(handle: BinaryIO, offsets: np.ndarray, position: int, values: list[bytes]) -> None:
+    for i, value in enumerate(values):
+        handle.write(value)
+        offsets[position + i + 1] = offsets[position + i] + len(value)
+
+
+def _open_matrices(
+    path: Path, dtype: str, shape: tuple[int, int], full_precision: bool
+) -> tuple[np.memmap, np.memmap, np.memmap | None]:
+    quantized = np.lib.format.open_memmap(path / "embeddings.npy", mode="w+", dtype=dtype, shape=shape)
+    scales = np.lib.format.open_memmap(path / "scales.npy", mode="w+", dtype=np.float32, shape=shape[:1])
+    full = None
+    if full_precision:
+        full = np.lib.format.open_memmap(path / "embeddings_full.npy", mode="w+", dtype=np.float32, shape=shape)
+    return quantized, scales, full
+
+
+def export_snapshot(
+    vector_store: ChromaVectorStore,
+    snapshot_path: str | Path,
+    dtype: str = "int8",
+    full_precision: bool = True,
+    page_size: int = 1000,
+) -> Path:
+    """
+    Export the vectors of a Chroma collection to a compact, memory-mappable snapshot.
+
+    The snapshot is a directory with:
+        - snapshot.json: header with format version, number of vectors, dimension and dtype
+        - embeddings.npy: L2-normalized embedding matrix, quantized to int8 or float16
+        - scales.npy: float32 per-vector quantization scales
+        - embeddings_full.npy: L2-normalized float32 embedding matrix, for full-precision rescoring (optional)
+        - <column>.bin and <column>.offsets.npy for each of node_id, text and metadata: UTF-8 values
+          concatenated in a single file, and the int64 offsets of each value (n + 1 entries)
+
+    The collection is read page by page and the snapshot is written to a temporary directory first,
+    then moved over the previous snapshot.
+
+    Args:
+        vector_store (ChromaVectorStore): The vector store to export
+        snapshot_path (str | Path): Path of the snapshot directory
+        dtype (str): "int8" or "float16"
+        full_precision (bool): Whether to also write the float32 matrix used to rescore the top candidates
+        page_size (int): Number of vectors read from Chroma at once
+
+    Returns:
+        Path: Path of the snapshot directory
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        error_msg = f"Unknown snapshot dtype: {dtype}"
+        raise ValueError(error_msg)
+
+    collection = vector_store.client
+    count = collection.count()
+    snapshot_path = Path(snapshot_path)
+    tmp_path = snapshot_path.with_name(f"{snapshot_path.name}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    log.info("Exporting {} vectors to {} snapshot {}", count, dtype, snapshot_path)
+
+    quantized = scales = full = None
+    offsets = {column: np.zeros(count + 1, dtype=np.int64) for column in SNAPSHOT_COLUMNS}
+    handles = {column: (tmp_path / f"{column}.bin").open("wb") for column in SNAPSHOT_COLUMNS}
+    position = 0
+    try:
+        while position < count:
+            page = collection.get(limit=page_size, offset=position, include=["embeddings", "documents", "metadatas"])
+            if not page["ids"]:
+                break
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+
+            if quantized is None:
+                quantized, scales, full = _open_matrices(tmp_path, dtype, (count, embeddings.shape[1]), full_precision)
+
+            end = position + len(page["ids"])
+            quantized[position:end], scales[position:end] = quantize_embeddings(embeddings, dtype)
+            if full is not None:
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                full[position:end] = embeddings / np.where(norms == 0, 1, norms)
+
+            columns = {
+                "node_id": [node_id.encode() for node_id in page["ids"]],
+                "text": [(text or "").encode() for text in page["documents"]],
+                "metadata": [json.dumps(metadata or {}, ensure_ascii=False).encode() for metadata in page["metadatas"]],
+            }
+            for column, values in columns.items():
+                _write_column(handles[column], offsets[column], position, values)
+            position = end
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    for column in SNAPSHOT_COLUMNS:
+        np.save(tmp_path / f"{column}.offsets.npy", offsets[column][: position + 1])
+    if quantized is None:
+        # Empty collection
+        quantized, scales, full = _open_matrices(tmp_path, dtype, (0, 0), full_precision)
+    for matrix in (quantized, scales, full):
+        if matrix is not None:
+            matrix.flush()
+
+    header = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "count": position,
+        "dim": int(quantized.shape[1]),
+        "dtype": dtype,
+        "full_precision": full is not None,
+    }
+    with (tmp_path / "snapshot.json").open("w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+    del quantized, scales, full
+
+    shutil.rmtree(snapshot_path, ignore_errors=True)
+    tmp_path.replace(snapshot_path)
+    log.info("Snapshot exported: {} vectors of dimension {}", header["count"], header["dim"])
+    return snapshot_path
@@ -0,0 +1,100 @@
+import numpy as np
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from loguru import logger as log
+
+TALK_COLLECTION_SUFFIX = "_talks"
+# Chunk metadata identifying the talk (transcript) of a chunk, also the id of the talk vectors
+TALK_KEY = "ref_doc_id"
+TALK_METADATA_KEYS = ("speech_name", "speech_author", "speech_location", "youtube_id")
+
+
+def get_talk_collection_name(collection_name: str) -> str:
+    """
+    Return the name of the Chroma collection holding the talk vectors of a collection.
+
+    Args:
+        collection_name (str): Name of the chunk collection
+
+    Returns:
+        str: Name of the talk collection
+    """
+    return f"{collection_name}{TALK_COLLECTION_SUFFIX}"
+
+
+def compute_talk_centroids(
+    vector_store: ChromaVectorStore, page_size: int = 1000
+) -> tuple[list[str], np.ndarray, list[dict]]:
+    """
+    Compute the representative vector of every talk: the normalized mean of its normalized chunk embeddings.
+
+    Args:
+        vector_store (ChromaVectorStore): The vector store of the chunks
+        page_size (int): Number of chunks read from Chroma at once
+
+    Returns:
+        tuple[list[str], np.ndarray, list[dict]]: The talk ids, their float32 unit centroids (one row per talk)
+            and their metadata, with the number of chunks of each talk under `num_chunks`
+    """
+    collection = vector_store.client
+    count = collection.count()
+
+    rows: dict[str, int] = {}
+    sums: list[np.ndarray] = []
+    metadatas: list[dict] = []
+    position = 0
+    while position < count:
+        page = collection.get(limit=page_size, offset=position, include=["embeddings", "metadatas"])
+        if not page["ids"]:
+            break
+        embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+        for embedding, chunk_metadata in zip(embeddings, page["metadatas"], strict=True):
+            metadata = chunk_metadata or {}
+            if not (talk_id := metadata.get(TALK_KEY)):
+                continue
+            if talk_id not in rows:
+                rows[talk_id] = len(sums)
+                sums.append(np.zeros_like(embedding))
+                talk_metadata = {key: metadata[key] for key in TALK_METADATA_KEYS if metadata.get(key) is not None}
+                metadatas.append({TALK_KEY: talk_id, **talk_metadata, "num_chunks": 0})
+            sums[rows[talk_id]] += embedding
+            metadatas[rows[talk_id]]["num_chunks"] += 1
+        position += len(page["ids"])
+
+    if not sums:
+        return [], np.zeros((0, 0), dtype=np.float32), []
+    centroids = np.stack(sums)
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    return list(rows), centroids / np.where(norms == 0, 1, norms), metadatas
+
+
+def build_talk_index(vector_store: ChromaVectorStore, talk_vector_store: ChromaVectorStore, page_size: int = 1000) -> int:
+    """
+    Write the representative vector of every talk to the talk collection, for two-stage retrieval.
+
+    The query engine first finds the talks closest to the question in the talk collection, then
+    searches the chunks of those talks only. Talks no longer in the chunk collection are removed.
+
+    Args:
+        vector_store (ChromaVectorStore): The vector store of the chunks
+        talk_vector_store (ChromaVectorStore): The vector store of the talks, written in place
+        page_size (int): Number of vectors read from or written to Chroma at once
+
+    Returns:
+        int: The number of talks
+    """
+    talk_ids, centroids, metadatas = compute_talk_centroids(vector_store, page_size=page_size)
+
+    talk_collection = talk_vector_store.client
+    stale_ids = sorted(set(talk_collection.get(include=[])["ids"]) - set(talk_ids))
+    if stale_ids:
+        talk_collection.delete(ids=stale_ids)
+    for start in range(0, len(talk_ids), page_size):
+        end = start + page_size
+        talk_collection.upsert(
+            ids=talk_ids[start:end], embeddings=centroids[start:end].tolist(), metadatas=metadatas[start:end]
+        )
+
+    log.info("Talk index built: {} talks, {} removed", len(talk_ids), len(stale_ids))
+    return len(talk_ids)
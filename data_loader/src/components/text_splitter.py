@@ -1,6 +1,63 @@
+import multiprocessing
+import uuid
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from llama_index.core import Document
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.schema import BaseNode, MetadataMode
 from llama_index.core.text_splitter import TokenTextSplitter
 from loguru import logger as log
 
+# Metadata key of the number of tokens of a chunk, used by the query engine to pack the prompt context
+NUM_TOKENS_KEY = "num_tokens"
+
+# Text splitter of a worker process, built once by `_initialize_worker`
+_worker_text_splitter: TokenTextSplitter | None = None
+
+
+def stable_node_id(index: int, document: Document) -> str:
+    """
+    Build a deterministic node id from the source document and the position of the chunk in it.
+
+    Splitting the same document with the same settings always yields the same ids, so chunks written
+    by an interrupted run can be recognized (and skipped) when the run is resumed.
+
+    Args:
+        index (int): Position of the chunk in the document
+        document (Document): The document the chunk was split from
+
+    Returns:
+        str: The node id
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{document.id_}\x00{document.hash}\x00{index}"))
+
+
+class TokenCountingTextSplitter(TokenTextSplitter):
+    """
+    TokenTextSplitter that also stores the number of tokens of every chunk in its metadata.
+
+    The count (`num_tokens`) is excluded from the embedding and LLM text, so that embeddings do not change.
+    Together with the character offsets of the chunk in its transcript (`start_char_idx`, `end_char_idx`),
+    it lets the query engine merge overlapping chunks and pack them into a token budget without tokenizing.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TokenCountingTextSplitter"
+
+    def _postprocess_parsed_nodes(self, nodes: list[BaseNode], parent_doc_map: dict[str, Document]) -> list[BaseNode]:
+        nodes = super()._postprocess_parsed_nodes(nodes, parent_doc_map)
+        for node in nodes:
+            node.metadata[NUM_TOKENS_KEY] = len(self._tokenizer(node.get_content(metadata_mode=MetadataMode.NONE)))
+            # The key lists may be shared with the other chunks of the document, so they are copied
+            if NUM_TOKENS_KEY not in node.excluded_embed_metadata_keys:
+                node.excluded_embed_metadata_keys = [*node.excluded_embed_metadata_keys, NUM_TOKENS_KEY]
+            if NUM_TOKENS_KEY not in node.excluded_llm_metadata_keys:
+                node.excluded_llm_metadata_keys = [*node.excluded_llm_metadata_keys, NUM_TOKENS_KEY]
+        return nodes
+
 
 def initialize_text_splitter(chunk_size: int, chunk_overlap: int) -> TokenTextSplitter:
     """
@@ -11,7 +68,74 @@ def initialize_text_splitter(chunk_size: int, chunk_overlap: int) -> TokenTextSp
         chunk_overlap (int, optional): The number of overlapping tokens between chunks.
 
     Returns:
-        TokenTextSplitter: A configured text splitter instance for document processing
+        TokenTextSplitter: A configured text splitter instance for document processing, producing stable node ids
+            and storing the number of tokens of every chunk in its metadata
     """
     log.info("Initializing TokenTextSplitter. Chunk size: {}, Chunk overlap: {}", chunk_size, chunk_overlap)
-    return TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return TokenCountingTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, id_func=stable_node_id)
+
+
+def _initialize_worker(chunk_size: int, chunk_overlap: int) -> None:
+    global _worker_text_splitter  # noqa: PLW0603
+    _worker_text_splitter = initialize_text_splitter(chunk_size, chunk_overlap)
+
+
+def _split_source(source: str, documents: list[Document]) -> tuple[str, list[str], list[BaseNode]]:
+    nodes = run_transformations(documents, [_worker_text_splitter])
+    return source, [doc.id_ for doc in documents], nodes
+
+
+class ParallelTextSplitter:
+    """
+    Split documents into chunks on a pool of worker processes.
+
+    Each worker builds its own TokenTextSplitter (and tokenizer) once, at startup. Sources are sharded
+    across the workers as they are read, with at most a few of them in flight per worker, and the results
+    are returned in the order of the sources. Node ids are stable, so the output is the same as splitting
+    serially with `initialize_text_splitter`.
+
+    Attributes:
+        chunk_size (int): The size of each text chunk in tokens
+        chunk_overlap (int): The number of overlapping tokens between chunks
+        workers (int): Number of worker processes
+        max_pending_per_worker (int): Number of sources queued per worker ahead of the one being split
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, workers: int, max_pending_per_worker: int = 2):
+        if workers <= 0:
+            error_msg = "workers must be positive"
+            raise ValueError(error_msg)
+        # Build a splitter in the parent too, so that invalid settings fail before any worker is started
+        initialize_text_splitter(chunk_size, chunk_overlap)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.workers = workers
+        self.max_pending_per_worker = max_pending_per_worker
+
+    def split(self, sources: Iterable[tuple[str, list[Document]]]) -> Iterator[tuple[str, list[str], list[BaseNode]]]:
+        """
+        Split the documents of each source, preserving the order of the sources.
+
+        Sources are consumed lazily, so only a bounded number of them is held in memory at once.
+
+        Args:
+            sources (Iterable[tuple[str, list[Document]]]): Pairs of source name and its documents
+
+        Yields:
+            tuple[str, list[str], list[BaseNode]]: Source name, ids of its documents and its chunks
+        """
+        log.info("Splitting documents on {} worker processes", self.workers)
+        # Spawn workers instead of forking, the parent may already run threads (e.g. the Chroma client)
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(self.chunk_size, self.chunk_overlap),
+        ) as executor:
+            pending: deque[Future] = deque()
+            for source, documents in sources:
+                pending.append(executor.submit(_split_source, source, documents))
+                if len(pending) >= self.workers * (self.max_pending_per_worker + 1):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
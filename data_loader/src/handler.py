@@ -1,4 +1,5 @@
 import click
+from components.snapshot import SNAPSHOT_DTYPES
 from main import main
 
 
@@ -10,14 +11,95 @@ from main import main
 @click.option("--llm-model", required=True, type=str, help="Name or path of the LLM model to use")
 @click.option("--chunk-size", required=True, type=int, help="Refers to how big those chunks of text are")
 @click.option("--chunk-overlap", required=True, type=int, help="Refers to how much overlap there is between chunks")
+@click.option("--embedding-cache-path", default=None, type=str, help="Path of the SQLite embedding cache, disabled if empty")
+@click.option("--embedding-cache-max-size-mb", default=1024, type=int, help="Maximum size of the embedding cache in MB")
+@click.option("--embed-concurrency", default=8, type=int, help="Maximum number of in-flight embedding requests")
+@click.option("--embed-batch-size", default=100, type=int, help="Number of chunks sent in a single embedding request")
+@click.option("--requests-per-minute", default=0, type=int, help="Embedding requests per minute quota, 0 for unlimited")
+@click.option("--tokens-per-minute", default=0, type=int, help="Embedding tokens per minute quota, 0 for unlimited")
+@click.option(
+    "--batch-size",
+    default=500,
+    type=int,
+    help="Number of chunks embedded and written to the vector store at once",
+)
+@click.option("--workers", default=1, type=int, help="Number of worker processes splitting the documents")
+@click.option(
+    "--snapshot-dtype",
+    default="none",
+    type=click.Choice(["none", *SNAPSHOT_DTYPES]),
+    help="Export a quantized vector snapshot for the query engine with this dtype, none to disable",
+)
+@click.option(
+    "--dedup-threshold",
+    default=0.0,
+    type=click.FloatRange(0, 1),
+    help="Jaccard similarity above which chunks are collapsed as near-duplicates, 0 to disable",
+)
+@click.option(
+    "--lexical-index",
+    default=True,
+    type=bool,
+    help="Build the inverted index used by the query engine for hybrid (BM25 + vector) retrieval",
+)
+@click.option(
+    "--talk-index",
+    default=True,
+    type=bool,
+    help="Write the per-talk centroid vectors used by the query engine for two-stage (talk, then chunk) retrieval",
+)
+@click.option(
+    "--http-max-connections",
+    default=100,
+    type=click.IntRange(min=1),
+    help="Maximum number of pooled connections to the OpenAI API, all kept alive when idle",
+)
+@click.option(
+    "--http-keepalive-seconds", default=30.0, type=float, help="Time an idle connection to the OpenAI API is kept open"
+)
+@click.option("--http-connect-timeout", default=5.0, type=float, help="Timeout of a connection to the OpenAI API")
+@click.option("--http-timeout", default=60.0, type=float, help="Timeout of the OpenAI API requests, per read or write")
+@click.option(
+    "--http-max-retries",
+    default=3,
+    type=click.IntRange(min=0),
+    help="Retries of the OpenAI API requests failed with a rate limit, a server or a connection error, "
+    "made by the concurrent embedder when embedding concurrently",
+)
+@click.option(
+    "--http-hedge-quantile",
+    default=0.0,
+    type=click.FloatRange(0, 1),
+    help="Send a concurrent embedding request again when unanswered after this quantile of the recent latencies "
+    "(e.g. 0.95), the first answer winning, 0 to disable",
+)
 def run(
     transcripts_input_dir: str,
     chroma_db_path: str,
     collection_name: str,
+    *,
     embedding_model: str,
     llm_model: str,
     chunk_size: int,
     chunk_overlap: int,
+    embedding_cache_path: str | None,
+    embedding_cache_max_size_mb: int,
+    embed_concurrency: int,
+    embed_batch_size: int,
+    requests_per_minute: int,
+    tokens_per_minute: int,
+    batch_size: int,
+    workers: int,
+    snapshot_dtype: str,
+    dedup_threshold: float,
+    lexical_index: bool,
+    talk_index: bool,
+    http_max_connections: int,
+    http_keepalive_seconds: float,
+    http_connect_timeout: float,
+    http_timeout: float,
+    http_max_retries: int,
+    http_hedge_quantile: float,
 ):
     """
     Handler function to process transcripts and interact with a language model.
@@ -31,6 +113,24 @@ def run(
         llm_model=llm_model,
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
+        embedding_cache_path=embedding_cache_path,
+        embedding_cache_max_size_mb=embedding_cache_max_size_mb,
+        embed_concurrency=embed_concurrency,
+        embed_batch_size=embed_batch_size,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        batch_size=batch_size,
+        workers=workers,
+        snapshot_dtype=None if snapshot_dtype == "none" else snapshot_dtype,
+        dedup_threshold=dedup_threshold,
+        lexical_index=lexical_index,
+        talk_index=talk_index,
+        http_max_connections=http_max_connections,
+        http_keepalive_seconds=http_keepalive_seconds,
+        http_connect_timeout=http_connect_timeout,
+        http_timeout=http_timeout,
+        http_max_retries=http_max_retries,
+        http_hedge_quantile=http_hedge_quantile,
     )
 
 
@@ -3,60 +3,549 @@ Main module for initializing and creating a vector index from document transcrip
 
 This module orchestrates the process of loading documents, setting up necessary components,
 and creating a searchable vector index. It handles:
+- Incremental ingestion through a content-hash manifest (only new or changed transcripts are embedded)
+- Crash-safe checkpoints: the manifest is updated after every batch, so an interrupted run resumes where it stopped
 - Document loading from transcripts
 - Vector store initialization
-- Embedding model setup
-- Text splitting configuration
+- Embedding model setup, optionally with concurrent rate-limited embedding requests
+- Text splitting configuration, optionally on a pool of worker processes
 - Language model initialization
-- Vector index creation
+- Pooled keep-alive HTTP clients of the OpenAI API, retrying failed requests and optionally hedging slow ones
+- Streaming ingestion: transcripts are split, embedded and written to the vector store in fixed-size batches
+- Chroma-only storage: no LlamaIndex docstore JSON is written next to the Chroma database
+- Optional near-duplicate chunk detection (MinHash/LSH) before embedding
+- Optional export of a quantized, memory-mappable vector snapshot for the query engine
+- Inverted index of the chunks (Italian analyzer) for the BM25 side of hybrid retrieval
+- Catalog of the speakers, TEDx events and videos, matched in the questions to pre-filter retrieval
+- Per-talk centroid vectors in a separate collection, for two-stage (talk, then chunk) retrieval
+- Summary of the run (wall time per stage, chunks and tokens embedded) written next to the manifest
 
 Dependencies:
     - clients.chroma: Vector store client
     - clients.openai: OpenAI API key validation
+    - clients.http_client: Pooled HTTP clients of the OpenAI API
     - components.*: Various component initializers
     - llama_index.core: Core indexing functionality
     - loguru: Logging utility
 """
 
-from clients.chroma import initialize_vector_store
+import shutil
+from collections.abc import Callable
+from pathlib import Path
+
+from clients.chroma import delete_collection, initialize_vector_store
+from clients.http_client import HTTPClients, initialize_http_clients
 from clients.openai import check_openai_api_key
-from components.documents import load_documents
-from components.embeddings import initialize_embedding_model
+from components.dedup import ChunkDeduplicator
+from components.documents import iter_documents, list_document_files
+from components.embedding_pipeline import ConcurrentEmbedder
+from components.embeddings import CachedEmbedding, initialize_embedding_model
+from components.entity_catalog import build_entity_catalog, get_entity_catalog_path
+from components.ingestion import SourceProgress, ingest_documents, split_sources
+from components.lexical_index import build_lexical_index, get_lexical_index_path
 from components.llm import initialize_llm
-from components.text_splitter import initialize_text_splitter
-from components.vector_store import create_vector_index
+from components.manifest import (
+    compute_file_hash,
+    compute_manifest_version,
+    diff_manifest,
+    get_manifest_path,
+    load_manifest,
+    save_manifest,
+)
+from components.run_metrics import RunMetrics, get_run_metrics_path, save_run_metrics
+from components.snapshot import export_snapshot, get_snapshot_path
+from components.talk_index import build_talk_index, get_talk_collection_name
+from components.text_splitter import ParallelTextSplitter, initialize_text_splitter
+from components.vector_store import delete_documents
 from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.text_splitter import TokenTextSplitter
+from llama_index.vector_stores.chroma import ChromaVectorStore
 from loguru import logger as log
 
 
-def main(
-    transcripts_input_dir: str,
+def initialize_settings(
     chroma_db_path: str,
     collection_name: str,
+    *,
     embedding_model: str,
     llm_model: str,
     chunk_size: int,
     chunk_overlap: int,
-) -> VectorStoreIndex:
-    check_openai_api_key()
+    embedding_cache_path: str | None = None,
+    embedding_cache_max_size_mb: int = 1024,
+    http_clients: HTTPClients | None = None,
+) -> tuple[ChromaVectorStore, BaseEmbedding, TokenTextSplitter]:
+    """
+    Initialize the vector store and the models of the run, and set them as the llama_index defaults.
 
-    documents = load_documents(input_dir=transcripts_input_dir)
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+        embedding_model (str): Name of the OpenAI embedding model
+        llm_model (str): Name of the OpenAI LLM model
+        chunk_size (int): Size of the chunks, in tokens
+        chunk_overlap (int): Overlap between consecutive chunks, in tokens
+        embedding_cache_path (str, optional): Path of the embedding cache, None to disable it
+        embedding_cache_max_size_mb (int): Maximum size of the embedding cache
+        http_clients (HTTPClients, optional): HTTP clients of the OpenAI API shared by the models, their defaults if None
 
+    Returns:
+        tuple[ChromaVectorStore, BaseEmbedding, TokenTextSplitter]: The vector store, embedding model and text splitter
+    """
     vector_store = initialize_vector_store(db_path=chroma_db_path, collection_name=collection_name)
 
-    embed_model = initialize_embedding_model(embedding_model)
+    embed_model = initialize_embedding_model(
+        embedding_model,
+        cache_path=embedding_cache_path,
+        cache_max_size_mb=embedding_cache_max_size_mb,
+        http_clients=http_clients,
+    )
 
     text_splitter = initialize_text_splitter(chunk_size, chunk_overlap)
 
-    llm = initialize_llm(llm_model)
+    llm = initialize_llm(llm_model, http_clients=http_clients)
 
     Settings.llm = llm
     Settings.text_splitter = text_splitter
     Settings.embed_model = embed_model
     log.info("Settings initialized")
+    return vector_store, embed_model, text_splitter
+
+
+def initialize_ingestion_workers(
+    embed_model: BaseEmbedding,
+    chunk_size: int,
+    chunk_overlap: int,
+    *,
+    embed_concurrency: int = 8,
+    embed_batch_size: int = 100,
+    requests_per_minute: int | None = None,
+    tokens_per_minute: int | None = None,
+    workers: int = 1,
+    max_retries: int = 3,
+) -> tuple[ConcurrentEmbedder | None, ParallelTextSplitter | None]:
+    """
+    Initialize the concurrent embedder and the parallel text splitter of the ingestion, when enabled.
+
+    Args:
+        embed_model (BaseEmbedding): The embedding model
+        chunk_size (int): Size of the chunks, in tokens
+        chunk_overlap (int): Overlap between consecutive chunks, in tokens
+        embed_concurrency (int): Maximum number of concurrent embedding requests, 1 to embed sequentially
+        embed_batch_size (int): Number of chunks per embedding request
+        requests_per_minute (int, optional): Embedding requests rate limit
+        tokens_per_minute (int, optional): Embedding tokens rate limit
+        workers (int): Number of text splitting processes, 1 to split in process
+        max_retries (int): Retries of a failed embedding request by the concurrent embedder
+
+    Returns:
+        tuple[ConcurrentEmbedder | None, ParallelTextSplitter | None]: The embedder and the splitter, None when disabled
+    """
+    embedder = None
+    if embed_concurrency > 1:
+        embedder = ConcurrentEmbedder(
+            embed_model=embed_model,
+            batch_size=embed_batch_size,
+            max_concurrency=embed_concurrency,
+            requests_per_minute=requests_per_minute or None,
+            tokens_per_minute=tokens_per_minute or None,
+            max_retries=max_retries,
+        )
+
+    parallel_splitter = None
+    if workers > 1:
+        parallel_splitter = ParallelTextSplitter(chunk_size, chunk_overlap, workers=workers)
+    return embedder, parallel_splitter
+
+
+def make_checkpoint(
+    manifest_path: Path,
+    settings: dict,
+    files: dict[str, dict],
+    file_hashes: dict[str, str],
+    deduplicator: ChunkDeduplicator | None = None,
+) -> Callable[[dict[str, SourceProgress]], None]:
+    """
+    Build the callback that checkpoints the manifest after each batch written by `ingest_documents`.
+
+    Args:
+        manifest_path (Path): Path of the manifest file
+        settings (dict): Ingestion settings of the run
+        files (dict[str, dict]): Manifest entries, updated in place
+        file_hashes (dict[str, str]): Mapping of file path to content hash
+        deduplicator (ChunkDeduplicator, optional): The deduplicator of the run, to record the linked files
+
+    Returns:
+        Callable[[dict[str, SourceProgress]], None]: The `on_commit` callback
+    """
+
+    def checkpoint(progress: dict[str, SourceProgress]) -> None:
+        for filepath, source_progress in progress.items():
+            if source_progress.complete:
+                files[filepath] = {"hash": file_hashes[filepath], "doc_ids": source_progress.doc_ids}
+            else:
+                entry = files.setdefault(filepath, {"hash": file_hashes[filepath], "partial": True, "node_ids": []})
+                entry["doc_ids"] = source_progress.doc_ids
+                entry["node_ids"] = entry["node_ids"] + source_progress.node_ids
+            if deduplicator is not None and (linked := deduplicator.linked_sources(filepath)):
+                files[filepath]["linked"] = linked
+        save_manifest(manifest_path, {"settings": settings, "files": files})
+
+    return checkpoint
+
+
+def find_committed_chunks(resumed: list[str], recorded: dict[str, dict]) -> set[str]:
+    """
+    Collect the chunks of the partially ingested files already written by an interrupted run.
+
+    Args:
+        resumed (list[str]): The partially ingested files
+        recorded (dict[str, dict]): Manifest entries of the previous run
+
+    Returns:
+        set[str]: The ids of the chunks already written
+    """
+    committed_node_ids = {node_id for filepath in resumed for node_id in recorded[filepath]["node_ids"]}
+    if committed_node_ids:
+        log.info(
+            "Resuming {} partially ingested files ({} chunks already written)",
+            len(resumed),
+            len(committed_node_ids),
+        )
+    return committed_node_ids
+
+
+def find_duplicate_chunks(
+    input_files: list[str],
+    text_splitter: TokenTextSplitter,
+    parallel_splitter: ParallelTextSplitter | None,
+    threshold: float,
+    *,
+    vector_store: ChromaVectorStore | None = None,
+    stored: dict[str, dict] | None = None,
+) -> ChunkDeduplicator:
+    """
+    First ingestion pass: find the duplicate chunks of all the transcripts to embed.
+
+    Running it before ingestion lets the chunks that are kept carry the back-references to every
+    transcript they were collapsed from as soon as they are written. The chunks of the transcripts
+    left in the collection are registered first, so that an incremental run does not store again
+    the duplicates of chunks ingested by previous runs; those that absorb duplicates get their
+    back-references right away.
+
+    Args:
+        input_files (list[str]): The transcripts to embed, in ingestion order
+        text_splitter (TokenTextSplitter): The text splitter used by the ingestion
+        parallel_splitter (ParallelTextSplitter, optional): The parallel splitter used by the ingestion, if any
+        threshold (float): Minimum similarity of near-duplicate chunks
+        vector_store (ChromaVectorStore, optional): The vector store holding the chunks of previous runs
+        stored (dict[str, dict], optional): Manifest entries of the transcripts left in the collection
+
+    Returns:
+        ChunkDeduplicator: The deduplicator to filter the ingested chunks with
+    """
+    deduplicator = ChunkDeduplicator(threshold=threshold)
+    if vector_store is not None and stored:
+        doc_sources = {doc_id: filepath for filepath, entry in stored.items() for doc_id in entry["doc_ids"]}
+        log.info(
+            "Registered {} chunks already in the collection for deduplication",
+            deduplicator.add_stored(vector_store, doc_sources),
+        )
+    for source, _, nodes in split_sources(iter_documents(input_files), text_splitter, parallel_splitter):
+        deduplicator.add(source, nodes)
+    deduplicator.log_stats()
+    if vector_store is not None and (updated := deduplicator.update_stored(vector_store)):
+        log.info("Added back-references to {} chunks already in the collection", updated)
+    return deduplicator
+
+
+def initialize_query_indexes(
+    chroma_db_path: str, collection_name: str, snapshot_dtype: str | None, lexical_index: bool, talk_index: bool
+) -> dict:
+    """
+    Locate the indexes the query engine reads next to the collection, removing the talk collection if disabled.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+        snapshot_dtype (str, optional): Dtype of the snapshot, None to skip the snapshot
+        lexical_index (bool): Whether to build the lexical index
+        talk_index (bool): Whether to build the talk vectors
+
+    Returns:
+        dict: The arguments of `export_query_indexes` but the vector store, the version and the previous exports
+    """
+    talk_collection_name = get_talk_collection_name(collection_name)
+    talk_vector_store = None
+    if talk_index:
+        talk_vector_store = initialize_vector_store(db_path=chroma_db_path, collection_name=talk_collection_name)
+    elif delete_collection(chroma_db_path, talk_collection_name):
+        # Left by a previous run, it would be served stale by the query engine
+        log.info("Talk index disabled, removed the talk collection {}", talk_collection_name)
+    return {
+        "snapshot_path": get_snapshot_path(chroma_db_path, collection_name),
+        "snapshot_dtype": snapshot_dtype,
+        "lexical_index_path": get_lexical_index_path(chroma_db_path, collection_name),
+        "lexical_index": lexical_index,
+        "entity_catalog_path": get_entity_catalog_path(chroma_db_path, collection_name),
+        "talk_vector_store": talk_vector_store,
+    }
+
+
+def export_query_indexes(
+    vector_store: ChromaVectorStore,
+    version: str,
+    *,
+    snapshot_path: Path,
+    snapshot_dtype: str | None,
+    lexical_index_path: Path,
+    lexical_index: bool,
+    entity_catalog_path: Path,
+    talk_vector_store: ChromaVectorStore | None = None,
+    exported: dict | None = None,
+) -> dict:
+    """
+    Write the indexes the query engine reads next to the collection.
+
+    These are the memory-mapped vector snapshot served in "snapshot" storage mode, the inverted index
+    used for hybrid (BM25 + vector) retrieval, the entity catalog used to pre-filter retrieval and the
+    talk vectors used for two-stage retrieval.
+
+    Each index is recorded with the version of the collection and the options it is built from. Given the
+    records of the previous export, the indexes still current are kept, and the missing or stale ones (built
+    from other files, e.g. by a run that crashed before exporting, or with other options) are written again.
+    A disabled snapshot or lexical index left by a previous run is removed, so that it is never served stale.
+
+    Args:
+        vector_store (ChromaVectorStore): The vector store to export
+        version (str): Version of the collection, see `compute_manifest_version`
+        snapshot_path (Path): Path of the snapshot directory
+        snapshot_dtype (str, optional): Dtype of the snapshot, None to skip the snapshot
+        lexical_index_path (Path): Path of the lexical index directory
+        lexical_index (bool): Whether to build the lexical index
+        entity_catalog_path (Path): Path of the entity catalog file
+        talk_vector_store (ChromaVectorStore, optional): The talk collection, None to skip the talk vectors
+        exported (dict, optional): Records of the previous export, None to write every index
+
+    Returns:
+        dict: Records of the exported indexes, to save in the manifest under "exports"
+    """
+    exported = exported or {}
+    exports = {"entity_catalog": {"version": version}}
+    if snapshot_dtype:
+        exports["snapshot"] = {"version": version, "dtype": snapshot_dtype}
+    if lexical_index:
+        exports["lexical_index"] = {"version": version}
+    if talk_vector_store is not None:
+        exports["talk_index"] = {"version": version}
+
+    def is_current(name: str, exists: bool) -> bool:
+        return exists and exported.get(name) == exports[name]
+
+    if snapshot_dtype and not is_current("snapshot", snapshot_path.exists()):
+        export_snapshot(vector_store, snapshot_path, dtype=snapshot_dtype)
+    if lexical_index and not is_current("lexical_index", lexical_index_path.exists()):
+        build_lexical_index(vector_store, lexical_index_path)
+    if not is_current("entity_catalog", entity_catalog_path.exists()):
+        build_entity_catalog(vector_store, entity_catalog_path)
+    if talk_vector_store is not None and not is_current("talk_index", bool(talk_vector_store.client.count())):
+        build_talk_index(vector_store, talk_vector_store)
+
+    for enabled, path in ((snapshot_dtype, snapshot_path), (lexical_index, lexical_index_path)):
+        if not enabled and path.exists():
+            log.info("Removing {}, no longer exported", path)
+            shutil.rmtree(path)
+    return exports
+
+
+def export_and_record(vector_store: ChromaVectorStore, manifest_path: Path, manifest: dict, query_indexes: dict) -> None:
+    """
+    Export the missing or stale query indexes of the collection described by a manifest, then record them in it.
+
+    The manifest is saved only once every index is written, and only if its records changed (always when it has
+    none): a run crashing meanwhile leaves the records of the previous export, and the next run exports again.
+
+    Args:
+        vector_store (ChromaVectorStore): The vector store to export
+        manifest_path (Path): Path of the manifest file
+        manifest (dict): The manifest of the collection, with the records of the previous export if any
+        query_indexes (dict): The indexes to export, see `initialize_query_indexes`
+    """
+    exported = manifest.get("exports")
+    exports = export_query_indexes(vector_store, compute_manifest_version(manifest), **query_indexes, exported=exported)
+    if exports != exported:
+        save_manifest(manifest_path, manifest | {"exports": exports})
+
+
+def main(
+    transcripts_input_dir: str,
+    chroma_db_path: str,
+    collection_name: str,
+    *,
+    embedding_model: str,
+    llm_model: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_cache_path: str | None = None,
+    embedding_cache_max_size_mb: int = 1024,
+    embed_concurrency: int = 8,
+    embed_batch_size: int = 100,
+    requests_per_minute: int | None = None,
+    tokens_per_minute: int | None = None,
+    batch_size: int = 500,
+    workers: int = 1,
+    snapshot_dtype: str | None = None,
+    dedup_threshold: float = 0.0,
+    lexical_index: bool = True,
+    talk_index: bool = True,
+    http_max_connections: int = 100,
+    http_keepalive_seconds: float = 30.0,
+    http_connect_timeout: float = 5.0,
+    http_timeout: float = 60.0,
+    http_max_retries: int = 3,
+    http_hedge_quantile: float = 0.0,
+) -> VectorStoreIndex:
+    check_openai_api_key()
+    run_metrics = RunMetrics()
+
+    with run_metrics.stage("initialize"):
+        # The concurrent embedder retries the failed requests itself, through its rate limiters: the clients must not
+        http_clients = initialize_http_clients(
+            max_connections=http_max_connections,
+            keepalive_seconds=http_keepalive_seconds,
+            connect_timeout=http_connect_timeout,
+            timeout=http_timeout,
+            max_retries=0 if embed_concurrency > 1 else http_max_retries,
+            hedge_quantile=http_hedge_quantile,
+        )
+        vector_store, embed_model, text_splitter = initialize_settings(
+            chroma_db_path,
+            collection_name,
+            embedding_model=embedding_model,
+            llm_model=llm_model,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            embedding_cache_path=embedding_cache_path,
+            embedding_cache_max_size_mb=embedding_cache_max_size_mb,
+            http_clients=http_clients,
+        )
+
+    # Compare the transcripts on disk with the ones already indexed
+    manifest_path = get_manifest_path(chroma_db_path, collection_name)
+    manifest = load_manifest(manifest_path)
+    settings = {"embedding_model": embedding_model, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+    if dedup_threshold:
+        settings["dedup_threshold"] = dedup_threshold
+    with run_metrics.stage("scan"):
+        file_hashes = {filepath: compute_file_hash(filepath) for filepath in list_document_files(transcripts_input_dir)}
+        diff = diff_manifest(manifest, file_hashes, settings)
+
+    # Indexes read by the query engine, exported after the collection is updated
+    query_indexes = initialize_query_indexes(chroma_db_path, collection_name, snapshot_dtype, lexical_index, talk_index)
+
+    if diff.is_empty:
+        log.info("Collection is up to date, nothing to index")
+        # The indexes may still be stale: a run may have crashed before exporting them, or their options changed
+        with run_metrics.stage("export"):
+            export_and_record(vector_store, manifest_path, manifest, query_indexes)
+        save_run_metrics(get_run_metrics_path(chroma_db_path, collection_name), run_metrics)
+        return VectorStoreIndex.from_vector_store(vector_store)
+
+    # Drop stale vectors. New files are included too, in case a previous run crashed after
+    # writing their vectors but before checkpointing them in the manifest.
+    recorded = manifest["files"]
+    stale_doc_ids = [
+        doc_id for filepath in diff.new + diff.to_delete for doc_id in recorded.get(filepath, {}).get("doc_ids", [filepath])
+    ]
+    with run_metrics.stage("delete"):
+        delete_documents(vector_store=vector_store, doc_ids=stale_doc_ids)
+
+    files = {filepath: recorded[filepath] for filepath in diff.unchanged + diff.resumed}
+
+    if diff.to_embed:
+        embedder, parallel_splitter = initialize_ingestion_workers(
+            embed_model,
+            chunk_size,
+            chunk_overlap,
+            embed_concurrency=embed_concurrency,
+            embed_batch_size=embed_batch_size,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            workers=workers,
+            max_retries=http_max_retries,
+        )
+
+        deduplicator = None
+        if dedup_threshold:
+            with run_metrics.stage("dedup"):
+                deduplicator = find_duplicate_chunks(
+                    diff.to_embed,
+                    text_splitter,
+                    parallel_splitter,
+                    dedup_threshold,
+                    vector_store=vector_store,
+                    stored={filepath: recorded[filepath] for filepath in diff.unchanged},
+                )
+
+        # Chunks written by an interrupted run are not embedded again
+        committed_node_ids = find_committed_chunks(diff.resumed, recorded)
+
+        # Stream transcripts file by file: split, embed and write them in fixed-size batches,
+        # checkpointing the manifest after every batch
+        try:
+            ingestion_stats = ingest_documents(
+                sources=iter_documents(diff.to_embed),
+                vector_store=vector_store,
+                text_splitter=text_splitter,
+                embed_model=embed_model,
+                batch_size=batch_size,
+                embedder=embedder,
+                on_commit=make_checkpoint(manifest_path, settings, files, file_hashes, deduplicator),
+                skip_node_ids=committed_node_ids,
+                parallel_splitter=parallel_splitter,
+                deduplicator=deduplicator,
+            )
+        finally:
+            # The concurrent embedder kept its event loop, and the connections opened on it, across the batches
+            if embedder is not None:
+                embedder.close(http_clients.async_client)
+        run_metrics.add(
+            stage_seconds={
+                "ingest": ingestion_stats.elapsed,
+                "ingest.split": ingestion_stats.split_seconds,
+                "ingest.embed": ingestion_stats.embed_seconds,
+                "ingest.write": ingestion_stats.write_seconds,
+            },
+            counters={
+                "documents": ingestion_stats.documents,
+                "chunks": ingestion_stats.chunks,
+                "chunk_tokens": ingestion_stats.tokens,
+                "batches": ingestion_stats.batches,
+            },
+        )
+
+    with run_metrics.stage("export"):
+        export_and_record(vector_store, manifest_path, {"settings": settings, "files": files}, query_indexes)
 
-    vector_index = create_vector_index(documents=documents, vector_store=vector_store, chroma_db_path=chroma_db_path)
+    if isinstance(embed_model, CachedEmbedding):
+        log.info("Embedding cache stats: {}", embed_model.stats())
+        run_metrics.add(counters={"embedding_cache_hits": embed_model.hits, "embedding_cache_misses": embed_model.misses})
 
-    log.info("Indexing complete")
+    log.info(
+        "Indexing complete. Embedded {} files, deleted {} files, skipped {} unchanged files",
+        len(diff.to_embed),
+        len(diff.removed),
+        len(diff.unchanged),
+    )
+    run_metrics.add(
+        counters={
+            "files_embedded": len(diff.to_embed),
+            "files_deleted": len(diff.removed),
+            "files_unchanged": len(diff.unchanged),
+            **{f"http_{name}": value for name, value in http_clients.stats.as_dict().items()},
+        }
+    )
+    save_run_metrics(get_run_metrics_path(chroma_db_path, collection_name), run_metrics)
 
-    return vector_index
+    return VectorStoreIndex.from_vector_store(vector_store)
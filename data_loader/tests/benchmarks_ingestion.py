@@ -0,0 +1,87 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.ingestion import prepare_corpus
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+
+@pytest.fixture
+def server():
+    server = FakeOpenAIServer(dimensions=8).start()
+    yield server
+    server.stop()
+
+
+def post(server, payload):
+    request = urllib.request.Request(
+        f"{server.api_base}/embeddings",
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:  # noqa: S310
+        return json.loads(response.read())
+
+
+def test_fake_server_serves_openai_embeddings(server):
+    embed_model = OpenAIEmbedding(api_key="fake", api_base=server.api_base, max_retries=0)
+
+    embeddings = embed_model.get_text_embedding_batch(["ciao mondo", "buongiorno", "ciao mondo"])
+
+    assert len(embeddings) == 3
+    assert all(len(embedding) == 8 for embedding in embeddings)
+    assert embeddings[0] == pytest.approx(embeddings[2])
+    assert embeddings[0] != pytest.approx(embeddings[1])
+    stats = server.stats_dict()
+    assert stats["requests"] == 1
+    assert stats["embedded_texts"] == 3
+    assert stats["embedded_tokens"] > 0
+
+
+def test_fake_server_reports_usage(server):
+    response = post(server, {"model": "text-embedding-3-large", "input": ["uno due tre"]})
+
+    assert response["usage"]["prompt_tokens"] == server.stats_dict()["embedded_tokens"]
+    assert response["data"][0]["index"] == 0
+
+
+def test_fake_server_rate_limits_requests():
+    server = FakeOpenAIServer(dimensions=8, requests_per_minute=1).start()
+    try:
+        post(server, {"model": "text-embedding-3-large", "input": ["uno"]})
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(server, {"model": "text-embedding-3-large", "input": ["due"]})
+    finally:
+        server.stop()
+
+    assert error.value.code == 429
+    assert float(error.value.headers["Retry-After"]) > 0
+    assert server.stats_dict()["rate_limited"] == 1
+
+
+def test_fake_server_injects_errors():
+    server = FakeOpenAIServer(dimensions=8, error_rate=1.0).start()
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(server, {"model": "text-embedding-3-large", "input": ["uno"]})
+    finally:
+        server.stop()
+
+    assert error.value.code == 500
+    assert server.stats_dict()["errors"] == 1
+
+
+def test_prepare_corpus_writes_distinct_copies(tmp_path):
+    corpus_dir = tmp_path / "corpus"
+    corpus_dir.mkdir()
+    (corpus_dir / "Titolo [abc123].txt").write_text("testo del talk", encoding="utf-8")
+
+    count = prepare_corpus(corpus_dir, tmp_path / "scaled", scale=3)
+
+    files = sorted(path.name for path in (tmp_path / "scaled").iterdir())
+    assert count == 3
+    assert files == ["Titolo [abc123].txt", "Titolo [copy1_abc123].txt", "Titolo [copy2_abc123].txt"]
+    texts = {path.read_text(encoding="utf-8") for path in (tmp_path / "scaled").iterdir()}
+    assert len(texts) == 3
@@ -0,0 +1,101 @@
+import socket
+
+import httpx
+import pytest
+from benchmarks.fake_openai import FakeOpenAIServer
+from llama_index.core.schema import TextNode
+from src.clients.http_client import HTTPClientStats, RetryPolicy, RetryTransport, initialize_http_clients
+from src.components.embedding_pipeline import ConcurrentEmbedder
+from src.components.embeddings import initialize_embedding_model
+from src.components.llm import initialize_llm
+
+FAST_RETRIES = RetryPolicy(max_retries=8, backoff_base=0.001, backoff_max=0.01)
+EMBEDDING = {"model": "m", "input": ["ciao"]}
+
+
+@pytest.fixture
+def server():
+    server = FakeOpenAIServer(dimensions=8).start()
+    yield server
+    server.stop()
+
+
+def retrying_client(retry_policy: RetryPolicy = FAST_RETRIES) -> tuple[httpx.Client, HTTPClientStats]:
+    stats = HTTPClientStats()
+    return httpx.Client(transport=RetryTransport(httpx.HTTPTransport(), retry_policy, stats)), stats
+
+
+def test_retries_server_errors(server):
+    server.error_rate = 0.3
+    client, stats = retrying_client()
+
+    statuses = [client.post(f"{server.api_base}/embeddings", json=EMBEDDING).status_code for _ in range(20)]
+
+    assert statuses == [200] * 20
+    assert stats.retries == server.stats_dict()["errors"] > 0
+    assert stats.requests == 20 + stats.retries
+
+
+def test_returns_last_response_once_retries_exhausted(server):
+    server.error_rate = 1.0
+    client, stats = retrying_client(RetryPolicy(max_retries=2, backoff_base=0.001))
+
+    response = client.post(f"{server.api_base}/embeddings", json=EMBEDDING)
+
+    assert response.status_code == 500
+    assert stats.as_dict() == {"requests": 3, "retries": 2, "hedges": 0, "hedge_wins": 0}
+
+
+def test_retries_rate_limits_after_retry_after():
+    server = FakeOpenAIServer(dimensions=8, requests_per_minute=1).start()
+    client, stats = retrying_client(RetryPolicy(max_retries=1, backoff_max=0.01))
+    try:
+        client.post(f"{server.api_base}/embeddings", json=EMBEDDING)
+        response = client.post(f"{server.api_base}/embeddings", json=EMBEDDING)
+    finally:
+        server.stop()
+
+    # The Retry-After delay, up to the end of the minute, is capped to the maximum backoff
+    assert response.status_code == 429
+    assert stats.retries == 1
+
+
+def test_retries_connection_errors():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    client, stats = retrying_client(RetryPolicy(max_retries=2, backoff_base=0.001))
+
+    with pytest.raises(httpx.ConnectError):
+        client.post(f"http://127.0.0.1:{port}/v1/embeddings", json=EMBEDDING)
+    assert stats.retries == 2
+
+
+def test_retry_delay():
+    policy = RetryPolicy(max_retries=3, backoff_base=1.0, backoff_max=5.0)
+
+    assert 0.5 <= policy.retry_delay(0) <= 1.0
+    assert 2.0 <= policy.retry_delay(2, httpx.Response(503)) <= 4.0
+    assert policy.retry_delay(0, httpx.Response(429, headers={"retry-after-ms": "250"})) == 0.25
+    assert policy.retry_delay(0, httpx.Response(400)) is None
+    assert policy.retry_delay(3, httpx.Response(503)) is None
+
+
+def test_concurrent_embedder_over_http_clients(server, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    monkeypatch.setenv("OPENAI_API_BASE", server.api_base)
+    server.error_rate = 0.2
+    # Concurrent embedding retries the failed requests itself, through its rate limiters, the clients do not
+    http_clients = initialize_http_clients(max_retries=0)
+    embed_model = initialize_embedding_model("text-embedding-3-small", http_clients=http_clients)
+    embedder = ConcurrentEmbedder(embed_model, batch_size=2, max_concurrency=4, max_retries=8, backoff_base=0.001)
+    batches = [[TextNode(text=f"testo {batch} {i}") for i in range(6)] for batch in range(3)]
+
+    # Every call runs on the embedder loop, reusing the connections kept alive by the previous ones
+    retries = sum(embedder.embed_nodes(nodes).retries for nodes in batches)
+    embedder.close(http_clients.async_client)
+
+    assert all(len(node.embedding) == 8 for nodes in batches for node in nodes)
+    assert http_clients.stats.retries == 0
+    assert http_clients.stats.requests == 9 + retries == server.stats_dict()["requests"]
+    assert initialize_llm("gpt-4o-mini", http_clients=http_clients).max_retries == 0
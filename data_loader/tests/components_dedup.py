@@ -0,0 +1,135 @@
+import json
+import chromadb
+import pytest
+from llama_index.core import Document
+from llama_index.core.schema import MetadataMode, NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.components.dedup import DUPLICATE_SOURCES_KEY, ChunkDeduplicator, shingles
+
+WORDS = [f"parola{i}" for i in range(200)]
+
+
+def make_node(node_id, words):
+    return TextNode(id_=node_id, text=" ".join(words), metadata={"speech_name": node_id})
+
+
+@pytest.fixture
+def nodes():
+    return {
+        "a": make_node("a", WORDS[:100]),
+        # Same text, different case and spacing
+        "a_copy": make_node("a_copy", [word.upper() for word in WORDS[:100]]),
+        # Same text with a couple of words changed
+        "a_near": make_node("a_near", WORDS[:50] + ["diversa"] + WORDS[51:99] + ["fine"]),
+        "b": make_node("b", WORDS[100:200]),
+    }
+
+
+def test_shingles():
+    """Test word shingles of long and short texts"""
+    assert shingles("Uno due, TRE quattro", 2) == {"uno due", "due tre", "tre quattro"}
+    assert shingles("Uno due", 5) == {"uno due"}
+
+
+def test_signature_estimates_jaccard_similarity(nodes):
+    """Test that signatures of similar texts agree much more than those of different texts"""
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+    a, a_near, b = (deduplicator.signature(nodes[name].text) for name in ("a", "a_near", "b"))
+
+    assert (a == deduplicator.signature(nodes["a"].text)).all()
+    assert (a == a_near).mean() > 0.7
+    assert (a == b).mean() < 0.1
+
+
+def test_deduplicator_collapses_exact_and_near_duplicates(nodes):
+    """Test that duplicates are dropped and kept chunks reference the sources of their duplicates"""
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+    deduplicator.add("/data/talk1.txt", [nodes["a"], nodes["b"]])
+    deduplicator.add("/data/talk2.txt", [nodes["a_copy"]])
+    deduplicator.add("/data/talk3.txt", [nodes["a_near"]])
+
+    assert deduplicator.stats.chunks == 4
+    assert deduplicator.stats.exact_duplicates == 1
+    assert deduplicator.stats.near_duplicates == 1
+
+    kept = deduplicator.apply([nodes["a"], nodes["b"]])
+    assert [node.node_id for node in kept] == ["a", "b"]
+    assert json.loads(kept[0].metadata[DUPLICATE_SOURCES_KEY]) == ["talk2.txt", "talk3.txt"]
+    assert DUPLICATE_SOURCES_KEY not in kept[1].metadata
+    assert deduplicator.apply([nodes["a_copy"]]) == []
+    assert deduplicator.apply([nodes["a_near"]]) == []
+
+    assert deduplicator.linked_sources("/data/talk1.txt") == ["/data/talk2.txt", "/data/talk3.txt"]
+    assert deduplicator.linked_sources("/data/talk2.txt") == ["/data/talk1.txt"]
+
+
+def test_deduplicator_back_references_do_not_change_embedding_text(nodes):
+    """Test that the back-references are excluded from the embedded and LLM text"""
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+    deduplicator.add("talk1.txt", [nodes["a"]])
+    deduplicator.add("talk2.txt", [nodes["a_copy"]])
+    embed_text = nodes["a"].get_content(metadata_mode=MetadataMode.EMBED)
+
+    (kept,) = deduplicator.apply([nodes["a"]])
+
+    assert kept.get_content(metadata_mode=MetadataMode.EMBED) == embed_text
+    assert DUPLICATE_SOURCES_KEY not in kept.get_content(metadata_mode=MetadataMode.LLM)
+
+
+def test_deduplicator_does_not_modify_shared_metadata_keys():
+    """Test that adding back-references does not leak to the other chunks of the same document"""
+    document = Document(text="testo", excluded_embed_metadata_keys=["speech_name"])
+    first = TextNode(id_="first", text=" ".join(WORDS[:100]), excluded_embed_metadata_keys=document.excluded_embed_metadata_keys)
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+    deduplicator.add("talk1.txt", [first])
+    deduplicator.add("talk2.txt", [make_node("copy", WORDS[:100])])
+
+    deduplicator.apply([first])
+
+    assert document.excluded_embed_metadata_keys == ["speech_name"]
+
+
+def test_deduplicator_compares_with_stored_chunks(tmp_path, nodes):
+    """Test that the chunks of an incremental run are compared with the chunks already in the collection"""
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    vector_store = ChromaVectorStore(chroma_collection=client.create_collection("talks"))
+    for node, talk_id in ((nodes["a"], "talk1"), (nodes["b"], "talk4")):
+        node.relationships = {NodeRelationship.SOURCE: RelatedNodeInfo(node_id=talk_id)}
+        node.embedding = [1.0, 0.0]
+    vector_store.add([nodes["a"], nodes["b"]])
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+
+    # The chunks of talk4 are about to be re-embedded, so they are not registered
+    assert deduplicator.add_stored(vector_store, {"talk1": "/data/talk1.txt"}, page_size=1) == 1
+    deduplicator.add("/data/talk2.txt", [nodes["a_copy"]])
+
+    assert deduplicator.stats.chunks == 1
+    assert deduplicator.stats.exact_duplicates == 1
+    assert deduplicator.apply([nodes["a_copy"]]) == []
+    assert deduplicator.linked_sources("/data/talk2.txt") == ["/data/talk1.txt"]
+
+    assert deduplicator.update_stored(vector_store) == 1
+    record = vector_store.client.get(ids=["a"], include=["documents", "metadatas"])
+    stored = metadata_dict_to_node(record["metadatas"][0], text=record["documents"][0])
+    assert json.loads(stored.metadata[DUPLICATE_SOURCES_KEY]) == ["talk2.txt"]
+    assert stored.get_content(metadata_mode=MetadataMode.EMBED) == nodes["a"].get_content(metadata_mode=MetadataMode.EMBED)
+    assert vector_store.client.get(ids=["a"], include=["embeddings"])["embeddings"][0] == pytest.approx([1.0, 0.0])
+
+
+def test_deduplicator_threshold(nodes):
+    """Test that near-duplicates below the threshold are kept"""
+    deduplicator = ChunkDeduplicator(threshold=1.0)
+    deduplicator.add("talk1.txt", [nodes["a"]])
+    deduplicator.add("talk3.txt", [nodes["a_near"]])
+
+    assert deduplicator.stats.removed == 0
+    assert deduplicator.linked_sources("talk1.txt") == []
+
+
+def test_deduplicator_invalid_threshold():
+    """Test that thresholds outside (0, 1] are rejected"""
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(threshold=0)
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(threshold=1.5)
@@ -1,7 +1,11 @@
 import pytest
 from pathlib import Path
 from llama_index.core import Document
-from src.components.documents import extract_metadata, load_documents 
+from src.components.documents import (
+    extract_metadata,
+    iter_documents,
+    list_document_files,
+)
 
 # Test data for extract_metadata
 VALID_FILENAMES = [
@@ -50,69 +54,62 @@ def test_extract_metadata_empty():
     result = extract_metadata("")
     assert result is None
 
-# Tests for load_documents function
-def test_load_documents(tmp_path):
-    """Test load_documents with temporary directory"""
-    # Create temporary test files
+# Tests for iter_documents function
+def test_iter_documents_metadata(tmp_path):
+    """Test that the metadata of the documents is extracted from their filenames"""
     test_file = tmp_path / "Test Speech｜Author Name｜Test Location[test123]"
     test_file.write_text("Test content")
 
-    # Load documents
-    docs = load_documents(str(tmp_path))
+    ((filepath, docs),) = iter_documents([str(test_file)])
 
-    # Assertions
+    assert filepath == str(test_file)
     assert len(docs) == 1
     assert isinstance(docs[0], Document)
+    assert docs[0].id_ == str(test_file)
     assert docs[0].metadata["speech_name"] == "Test Speech"
     assert docs[0].metadata["speech_author"] == "Author Name"
     assert docs[0].metadata["speech_location"] == "Test Location"
     assert docs[0].metadata["youtube_id"] == "test123"
 
-def test_load_documents_empty_dir(tmp_path):
-    """Test load_documents with empty directory"""
-    # Since SimpleDirectoryReader raises ValueError for empty directories
-    with pytest.raises(ValueError, match="No files found in"):
-        docs = load_documents(str(tmp_path))
-
 @pytest.mark.parametrize("filename", INVALID_FILENAMES)
-def test_load_documents_invalid_filenames(tmp_path, filename):
-    """Test load_documents with files having invalid filenames"""
-    # Create test file with invalid filename
+def test_iter_documents_invalid_filenames(tmp_path, filename):
+    """Test that files with invalid filenames are loaded without speech metadata"""
     test_file = tmp_path / filename
     test_file.write_text("Test content")
 
-    # Load documents
-    docs = load_documents(str(tmp_path))
+    ((_, docs),) = iter_documents([str(test_file)])
 
-    # Verify document is loaded but metadata is None
     assert len(docs) == 1
-    assert isinstance(docs[0], Document)
     assert docs[0].metadata is None or "speech_name" not in docs[0].metadata
 
-def test_load_documents_multiple_files(tmp_path):
-    """Test load_documents with multiple files"""
-    # Create multiple test files
-    files = [
-        ("Speech 1｜Author 1｜Location 1[id1]", "Content 1"),
-        ("Speech 2｜Author 2｜Location 2[id2]", "Content 2"),
-    ]
-    
-    for filename, content in files:
-        (tmp_path / filename).write_text(content)
-
-    # Load documents
-    docs = load_documents(str(tmp_path))
-
-    # Assertions
-    assert len(docs) == 2
-    for i, doc in enumerate(docs):
-        assert isinstance(doc, Document)
-        assert doc.metadata["speech_name"] == f"Speech {i+1}"
-        assert doc.metadata["speech_author"] == f"Author {i+1}"
-        assert doc.metadata["speech_location"] == f"Location {i+1}"
-        assert doc.metadata["youtube_id"] == f"id{i+1}"
-
-def test_load_documents_nonexistent_dir():
-    """Test load_documents with non-existent directory"""
-    with pytest.raises(Exception):  # Adjust exception type as needed
-        load_documents("nonexistent_directory")
\ No newline at end of file
+def test_list_document_files_empty_dir(tmp_path):
+    """Test list_document_files with empty directory"""
+    # Since SimpleDirectoryReader raises ValueError for empty directories
+    with pytest.raises(ValueError, match="No files found in"):
+        list_document_files(str(tmp_path))
+
+
+def test_list_document_files(tmp_path):
+    """Test that list_document_files returns the ids of the documents iter_documents loads from them"""
+    for i in (2, 1):
+        (tmp_path / f"Speech {i}｜Author {i}｜Location {i}[id{i}]").write_text(f"Content {i}")
+
+    files = list_document_files(str(tmp_path))
+
+    assert files == sorted(files)
+    assert files == [doc.id_ for _, docs in iter_documents(files) for doc in docs]
+
+
+def test_iter_documents(tmp_path):
+    """Test that iter_documents yields each file with its documents"""
+    files = []
+    for i in (1, 2):
+        test_file = tmp_path / f"Speech {i}｜Author {i}｜Location {i}[id{i}]"
+        test_file.write_text(f"Content {i}")
+        files.append(str(test_file))
+
+    loaded = list(iter_documents(files))
+
+    assert [filepath for filepath, _ in loaded] == files
+    assert [docs[0].id_ for _, docs in loaded] == files
+    assert loaded[1][1][0].metadata["youtube_id"] == "id2"
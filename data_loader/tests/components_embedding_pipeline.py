@@ -0,0 +1,248 @@
+import asyncio
+import base64
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.embeddings.openai import OpenAIEmbedding
+import httpx
+import openai
+from src.components.embedding_pipeline import ConcurrentEmbedder, TokenBucket, is_rate_limit_error, is_retryable_error
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    """Local stand-in for the OpenAI embeddings endpoint with latency, rate limiting and concurrency tracking"""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, rate_limited_requests=0):
+        super().__init__(("127.0.0.1", 0), FakeEmbeddingHandler)
+        self.latency = latency
+        self.rate_limited_requests = rate_limited_requests
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def api_base(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            rate_limited = server.requests <= server.rate_limited_requests
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.latency)
+            if rate_limited:
+                payload = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode()
+                self.send_response(429)
+                self.send_header("Retry-After", "0.01")
+            else:
+                data = []
+                for i, text in enumerate(body["input"]):
+                    vector = [float(len(text)), float(i), 1.0]
+                    if body.get("encoding_format") == "base64":
+                        vector = base64.b64encode(struct.pack(f"{len(vector)}f", *vector)).decode()
+                    data.append({"object": "embedding", "index": i, "embedding": vector})
+                usage = {"prompt_tokens": len(body["input"]), "total_tokens": len(body["input"])}
+                payload = json.dumps({"object": "list", "data": data, "model": body["model"], "usage": usage}).encode()
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def fake_server(request):
+    server = FakeEmbeddingServer(**getattr(request, "param", {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def embed_model(fake_server):
+    return OpenAIEmbedding(model="text-embedding-3-small", api_base=fake_server.api_base, api_key="fake", max_retries=0)
+
+
+@pytest.fixture
+def nodes():
+    return [TextNode(text=f"chunk numero {i}", id_=f"node-{i}") for i in range(40)]
+
+
+def test_token_bucket_limits_rate():
+    """Test that the bucket allows a burst of its capacity and then waits for the refill"""
+
+    async def acquire():
+        bucket = TokenBucket(rate_per_minute=600)  # 10 tokens per second
+        start = time.monotonic()
+        await bucket.acquire(600)
+        burst = time.monotonic() - start
+        await bucket.acquire(2)
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(acquire())
+
+    assert burst < 0.05
+    assert total == pytest.approx(0.2, abs=0.1)
+
+
+def test_token_bucket_invalid_rate():
+    """Test that a non-positive rate is rejected"""
+    with pytest.raises(ValueError):
+        TokenBucket(rate_per_minute=0)
+
+
+def test_concurrent_embedder_invalid_parameters(embed_model):
+    """Test that non-positive batch size and concurrency are rejected"""
+    with pytest.raises(ValueError):
+        ConcurrentEmbedder(embed_model, batch_size=0)
+    with pytest.raises(ValueError):
+        ConcurrentEmbedder(embed_model, max_concurrency=0)
+
+
+def test_concurrent_embedder_embeds_all_nodes(fake_server, embed_model, nodes):
+    """Test that every node is embedded, in order, with concurrent requests"""
+    embedder = ConcurrentEmbedder(embed_model, batch_size=4, max_concurrency=5)
+
+    stats = embedder.embed_nodes(nodes)
+
+    assert all(node.embedding is not None for node in nodes)
+    assert [node.embedding[1] for node in nodes[:4]] == [0.0, 1.0, 2.0, 3.0]
+    assert stats.chunks == 40
+    assert stats.requests == 10
+    assert stats.chunks_per_second > 0
+    assert fake_server.max_in_flight > 1
+    assert fake_server.max_in_flight <= 5
+
+
+def test_concurrent_embedder_skips_embedded_nodes(fake_server, embed_model, nodes):
+    """Test that nodes that already have an embedding are not sent again"""
+    for node in nodes[:30]:
+        node.embedding = [0.0, 0.0, 0.0]
+
+    stats = ConcurrentEmbedder(embed_model, batch_size=10).embed_nodes(nodes)
+
+    assert stats.chunks == 10
+    assert fake_server.requests == 1
+
+
+@pytest.mark.parametrize("fake_server", [{"rate_limited_requests": 3}], indirect=True)
+def test_concurrent_embedder_retries_rate_limited_requests(fake_server, embed_model, nodes):
+    """Test that HTTP 429 responses are retried after backing off"""
+    embedder = ConcurrentEmbedder(embed_model, batch_size=10, max_concurrency=2, backoff_base=0.01)
+
+    stats = embedder.embed_nodes(nodes)
+
+    assert all(node.embedding is not None for node in nodes)
+    assert stats.retries == 3
+    assert stats.requests == 4
+
+
+@pytest.mark.parametrize("fake_server", [{"rate_limited_requests": 100}], indirect=True)
+def test_concurrent_embedder_gives_up_after_max_retries(fake_server, embed_model, nodes):
+    """Test that the rate limit error is raised once the retries are exhausted"""
+    embedder = ConcurrentEmbedder(embed_model, batch_size=40, max_retries=2, backoff_base=0.01)
+
+    with pytest.raises(Exception) as exc_info:
+        embedder.embed_nodes(nodes)
+
+    assert is_rate_limit_error(exc_info.value)
+    assert fake_server.requests == 3
+
+
+def test_concurrent_embedder_requests_per_minute(fake_server, embed_model):
+    """Test that the request quota throttles the run once the burst is consumed"""
+    nodes = [TextNode(text=f"chunk numero {i}") for i in range(61)]
+    # 60 requests per minute: 60 requests are a burst, the 61st waits about one second
+    embedder = ConcurrentEmbedder(embed_model, batch_size=1, max_concurrency=20, requests_per_minute=60)
+
+    stats = embedder.embed_nodes(nodes)
+
+    assert stats.requests == 61
+    assert 0.8 < stats.elapsed < 3
+
+
+def test_concurrent_embedder_requests_per_minute_across_calls(fake_server, embed_model):
+    """Test that the request quota is shared by successive calls, as made by streamed ingestion"""
+    nodes = [TextNode(text=f"chunk numero {i}") for i in range(61)]
+    embedder = ConcurrentEmbedder(embed_model, batch_size=1, max_concurrency=20, requests_per_minute=60)
+
+    start = time.perf_counter()
+    for offset in range(0, len(nodes), 10):
+        embedder.embed_nodes(nodes[offset : offset + 10])
+    elapsed = time.perf_counter() - start
+    embedder.close()
+
+    assert all(node.embedding is not None for node in nodes)
+    assert fake_server.requests == 61
+    # The first 60 requests consume the burst of the whole run, the 61st waits about one second
+    assert 0.8 < elapsed < 3
+
+
+def test_concurrent_embedder_tokens_per_minute(fake_server, embed_model):
+    """Test that the token quota throttles the run once the burst is consumed"""
+    nodes = [TextNode(text=f"chunk numero {i}") for i in range(61)]
+    # Each chunk counts 100 tokens: 60 chunks are a burst, the 61st waits about one second
+    embedder = ConcurrentEmbedder(
+        embed_model, batch_size=1, max_concurrency=20, tokens_per_minute=6000, tokenizer=lambda text: [0] * 100
+    )
+
+    stats = embedder.embed_nodes(nodes)
+
+    assert stats.tokens == 6100
+    assert 0.8 < stats.elapsed < 3
+
+
+def test_is_retryable_error():
+    """Test that only rate limits, server errors, connection errors and timeouts are retried"""
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+    def status_error(status_code):
+        return openai.APIStatusError("error", response=httpx.Response(status_code, request=request), body=None)
+
+    assert is_retryable_error(status_error(429))
+    assert is_retryable_error(status_error(503))
+    assert is_retryable_error(openai.APIConnectionError(request=request))
+    assert is_retryable_error(openai.APITimeoutError(request=request))
+    assert not is_retryable_error(status_error(400))
+    assert not is_retryable_error(TypeError("bad argument"))
+    assert not is_retryable_error(KeyError("data"))
+
+
+def test_concurrent_embedder_raises_other_errors_at_once(nodes):
+    """Test that an error other than a transient one is not retried"""
+
+    class BrokenEmbedding:
+        calls = 0
+
+        async def aget_text_embedding_batch(self, _texts):
+            self.calls += 1
+            error_msg = "bad input"
+            raise TypeError(error_msg)
+
+    embed_model = BrokenEmbedding()
+    embedder = ConcurrentEmbedder(embed_model, batch_size=40, backoff_base=0.01)
+
+    with pytest.raises(TypeError):
+        embedder.embed_nodes(nodes)
+    assert embed_model.calls == 1
@@ -0,0 +1,45 @@
+import json
+
+import chromadb
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.components.entity_catalog import build_entity_catalog, get_entity_catalog_path
+
+
+@pytest.fixture
+def vector_store(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path / "db")).create_collection("test_collection")
+    return ChromaVectorStore(chroma_collection=collection)
+
+
+def test_build_entity_catalog(tmp_path, vector_store):
+    """Test that the catalog counts the chunks of every speaker, event and video"""
+    talks = [
+        {"speech_author": "Marta Tortia", "speech_location": "TEDxTorino", "youtube_id": "Aj5Eewf_5ug"},
+        {"speech_author": "Rosanna Tabasso", "speech_location": "TEDxTorino", "youtube_id": "EatTvWvYwEw"},
+    ]
+    nodes = [
+        TextNode(id_=f"node{i}", text=f"testo {i}", metadata=talks[i % 2], embedding=[1.0, float(i)]) for i in range(5)
+    ]
+    nodes.append(TextNode(id_="other", text="senza metadati", embedding=[0.0, 1.0]))
+    vector_store.add(nodes)
+
+    path = build_entity_catalog(vector_store, get_entity_catalog_path(str(tmp_path), "talks"), page_size=2)
+
+    catalog = json.loads(path.read_text(encoding="utf-8"))
+    assert path == tmp_path / "talks.entities.json"
+    assert catalog["count"] == 6
+    assert catalog["fields"] == {
+        "speech_author": {"Marta Tortia": 3, "Rosanna Tabasso": 2},
+        "speech_location": {"TEDxTorino": 5},
+        "youtube_id": {"Aj5Eewf_5ug": 3, "EatTvWvYwEw": 2},
+    }
+    assert not (tmp_path / "talks.entities.json.tmp").exists()
+
+
+def test_build_entity_catalog_empty_collection(tmp_path, vector_store):
+    path = build_entity_catalog(vector_store, tmp_path / "talks.entities.json")
+
+    catalog = json.loads(path.read_text(encoding="utf-8"))
+    assert catalog["fields"] == {"speech_author": {}, "speech_location": {}, "youtube_id": {}}
@@ -0,0 +1,220 @@
+import pytest
+from unittest.mock import Mock
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.text_splitter import TokenTextSplitter
+from llama_index.core.vector_stores import SimpleVectorStore
+from src.components.dedup import ChunkDeduplicator
+from src.components.ingestion import ingest_documents, split_sources
+from src.components.text_splitter import ParallelTextSplitter, TokenCountingTextSplitter, initialize_text_splitter
+
+
+def make_sources(num_sources, docs_per_source=1, words=60):
+    """Build (source, documents) pairs with deterministic ids"""
+    sources = []
+    for i in range(num_sources):
+        docs = [
+            Document(text=" ".join(f"parola{i}_{j}_{k}" for k in range(words)), id_=f"file{i}_part_{j}")
+            for j in range(docs_per_source)
+        ]
+        sources.append((f"file{i}", docs))
+    return sources
+
+
+@pytest.fixture
+def text_splitter():
+    return TokenTextSplitter(chunk_size=64, chunk_overlap=0)
+
+
+@pytest.fixture
+def embed_model():
+    return MockEmbedding(embed_dim=4)
+
+
+def test_ingest_documents_writes_all_chunks(text_splitter, embed_model):
+    """Test that every chunk is embedded and written to the vector store"""
+    vector_store = SimpleVectorStore()
+
+    stats = ingest_documents(make_sources(5), vector_store, text_splitter, embed_model, batch_size=3)
+
+    assert stats.documents == 5
+    assert stats.chunks == len(vector_store.data.embedding_dict)
+    assert stats.chunks > 5
+    assert stats.batches == -(-stats.chunks // 3)
+
+
+def test_ingest_documents_fixed_size_batches(text_splitter, embed_model):
+    """Test that chunks are written in batches of at most batch_size"""
+    vector_store = Mock()
+    vector_store.add.side_effect = lambda nodes: [node.node_id for node in nodes]
+
+    stats = ingest_documents(make_sources(7), vector_store, text_splitter, embed_model, batch_size=4)
+
+    sizes = [len(call.args[0]) for call in vector_store.add.call_args_list]
+    assert all(size == 4 for size in sizes[:-1])
+    assert 0 < sizes[-1] <= 4
+    assert sum(sizes) == stats.chunks
+    assert all(node.embedding is not None for call in vector_store.add.call_args_list for node in call.args[0])
+
+
+def test_ingest_documents_consumes_sources_lazily(text_splitter, embed_model):
+    """Test that sources are read only when the pipeline needs them"""
+    consumed = []
+    written = []
+    vector_store = Mock()
+    vector_store.add.side_effect = lambda nodes: written.append(len(consumed)) or []
+
+    def sources():
+        for source in make_sources(6):
+            consumed.append(source[0])
+            yield source
+
+    ingest_documents(sources(), vector_store, text_splitter, embed_model, batch_size=2)
+
+    # The first batch is written before all the sources are read
+    assert written[0] < 6
+
+
+def test_ingest_documents_on_commit_reports_completed_sources(text_splitter, embed_model):
+    """Test that a source is reported complete once all its chunks are written, in order"""
+    commits = []
+
+    ingest_documents(
+        make_sources(4, docs_per_source=2),
+        SimpleVectorStore(),
+        text_splitter,
+        embed_model,
+        batch_size=5,
+        on_commit=commits.append,
+    )
+
+    completed = [source for progress in commits for source, p in progress.items() if p.complete]
+    assert completed == ["file0", "file1", "file2", "file3"]
+    assert commits[0]["file0"].doc_ids == ["file0_part_0", "file0_part_1"]
+
+
+def test_ingest_documents_on_commit_reports_written_chunks(text_splitter, embed_model):
+    """Test that every written chunk is reported exactly once, with the batch that wrote it"""
+    vector_store = SimpleVectorStore()
+    commits = []
+
+    ingest_documents(make_sources(3), vector_store, text_splitter, embed_model, batch_size=2, on_commit=commits.append)
+
+    reported = [node_id for progress in commits for p in progress.values() for node_id in p.node_ids]
+    assert sorted(reported) == sorted(vector_store.data.embedding_dict)
+    assert len(reported) == len(set(reported))
+
+
+def test_ingest_documents_resume_matches_uninterrupted_run(embed_model):
+    """Test that resuming an interrupted run from its checkpoints gives the same vector store"""
+    text_splitter = initialize_text_splitter(chunk_size=64, chunk_overlap=0)
+
+    expected = SimpleVectorStore()
+    ingest_documents(make_sources(4), expected, text_splitter, embed_model, batch_size=3)
+
+    class CrashingVectorStore(SimpleVectorStore):
+        def add(self, nodes, **kwargs):
+            if len(self.data.embedding_dict) >= 6:
+                raise RuntimeError("crash")
+            return super().add(nodes, **kwargs)
+
+    vector_store = CrashingVectorStore()
+    commits = []
+    with pytest.raises(RuntimeError):
+        ingest_documents(make_sources(4), vector_store, text_splitter, embed_model, batch_size=3, on_commit=commits.append)
+    committed = {node_id for progress in commits for p in progress.values() for node_id in p.node_ids}
+    assert committed == set(vector_store.data.embedding_dict)
+
+    resumed = SimpleVectorStore(data=vector_store.data)
+    stats = ingest_documents(
+        make_sources(4), resumed, text_splitter, embed_model, batch_size=3, skip_node_ids=committed
+    )
+
+    assert stats.chunks == len(expected.data.embedding_dict) - len(committed)
+    assert resumed.data.embedding_dict == expected.data.embedding_dict
+    assert resumed.data.text_id_to_ref_doc_id == expected.data.text_id_to_ref_doc_id
+
+
+def test_ingest_documents_with_embedder(text_splitter, embed_model):
+    """Test that batches are embedded by the given embedder"""
+    def embed(nodes):
+        for node in nodes:
+            node.embedding = [1.0, 0.0, 0.0, 0.0]
+
+    embedder = Mock()
+    embedder.embed_nodes.side_effect = embed
+    vector_store = SimpleVectorStore()
+
+    stats = ingest_documents(make_sources(3), vector_store, text_splitter, embed_model, batch_size=2, embedder=embedder)
+
+    assert embedder.embed_nodes.call_count == stats.batches
+    assert all(embedding == [1.0, 0.0, 0.0, 0.0] for embedding in vector_store.data.embedding_dict.values())
+
+
+def test_ingest_documents_with_parallel_splitter(embed_model):
+    """Test that splitting on worker processes writes the same chunks as a serial split"""
+    text_splitter = initialize_text_splitter(chunk_size=64, chunk_overlap=0)
+    expected = SimpleVectorStore()
+    ingest_documents(make_sources(5, docs_per_source=2), expected, text_splitter, embed_model, batch_size=3)
+
+    vector_store = SimpleVectorStore()
+    stats = ingest_documents(
+        make_sources(5, docs_per_source=2),
+        vector_store,
+        text_splitter,
+        embed_model,
+        batch_size=3,
+        parallel_splitter=ParallelTextSplitter(64, 0, workers=2),
+    )
+
+    assert stats.documents == 10
+    assert vector_store.data.embedding_dict == expected.data.embedding_dict
+
+
+def test_ingest_documents_with_deduplicator(embed_model):
+    """Test that duplicate chunks are neither embedded nor written, and completion is still reported"""
+    text_splitter = initialize_text_splitter(chunk_size=64, chunk_overlap=0)
+    sources = make_sources(3)
+    sources.append(("copy", [Document(text=sources[0][1][0].text, id_="copy_part_0")]))
+    deduplicator = ChunkDeduplicator(threshold=0.9)
+    for source, _, nodes in split_sources(sources, text_splitter):
+        deduplicator.add(source, nodes)
+    vector_store = SimpleVectorStore()
+    commits = []
+
+    stats = ingest_documents(
+        sources, vector_store, text_splitter, embed_model, batch_size=2, on_commit=commits.append, deduplicator=deduplicator
+    )
+
+    expected = SimpleVectorStore()
+    ingest_documents(make_sources(3), expected, text_splitter, embed_model, batch_size=2)
+    assert deduplicator.stats.removed > 0
+    assert stats.chunks == len(expected.data.embedding_dict)
+    assert vector_store.data.embedding_dict.keys() == expected.data.embedding_dict.keys()
+    assert [source for progress in commits for source, p in progress.items() if p.complete][-1] == "copy"
+
+
+def test_ingest_documents_empty_sources(text_splitter, embed_model):
+    """Test ingestion of no sources"""
+    vector_store = Mock()
+
+    stats = ingest_documents([], vector_store, text_splitter, embed_model)
+
+    assert stats.chunks == 0
+    vector_store.add.assert_not_called()
+
+
+def test_ingest_documents_invalid_batch_size(text_splitter, embed_model):
+    """Test that a non-positive batch size is rejected"""
+    with pytest.raises(ValueError):
+        ingest_documents(make_sources(1), SimpleVectorStore(), text_splitter, embed_model, batch_size=0)
+
+
+def test_ingest_documents_counts_tokens(embed_model):
+    """Test that the tokens counted by the text splitter are added up"""
+    vector_store = SimpleVectorStore()
+    text_splitter = TokenCountingTextSplitter(chunk_size=64, chunk_overlap=0)
+
+    stats = ingest_documents(make_sources(3), vector_store, text_splitter, embed_model, batch_size=4)
+
+    assert stats.tokens > stats.chunks == len(vector_store.data.embedding_dict)
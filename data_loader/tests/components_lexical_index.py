@@ -0,0 +1,93 @@
+import json
+
+import chromadb
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.components.lexical_index import build_lexical_index, get_lexical_index_path, tokenize
+
+
+@pytest.fixture
+def vector_store(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path / "db")).create_collection("test_collection")
+    return ChromaVectorStore(chroma_collection=collection)
+
+
+def add_nodes(vector_store, texts, metadata=None):
+    nodes = [
+        TextNode(id_=f"node{i}", text=text, metadata=(metadata or {}), embedding=[1.0, float(i)])
+        for i, text in enumerate(texts)
+    ]
+    vector_store.add(nodes)
+
+
+def test_tokenize_removes_stop_words_and_stems():
+    """Test the Italian analyzer, which must stay in sync with the query engine one"""
+    assert tokenize("Marta Tortia parlava dell'importanza del cibo a TEDxTorino nel 2019") == [
+        "mart",
+        "tort",
+        "parl",
+        "import",
+        "cib",
+        "tedxtorin",
+        "2019",
+    ]
+
+
+def test_tokenize_matches_inflected_forms():
+    assert tokenize("alberi") == tokenize("albero")
+    assert tokenize("parlavano") == tokenize("parlare")
+
+
+def test_get_lexical_index_path_is_inside_db_path(tmp_path):
+    assert get_lexical_index_path(str(tmp_path), "talks") == tmp_path / "talks.lexical"
+
+
+def test_build_lexical_index(tmp_path, vector_store):
+    """Test that the posting lists match the term frequencies of each chunk"""
+    add_nodes(vector_store, ["il cibo e il cibo", "gli alberi della città", "cibo e alberi"])
+
+    path = build_lexical_index(vector_store, tmp_path / "talks.lexical", page_size=2)
+
+    header = json.loads((path / "lexical.json").read_text())
+    terms = (path / "terms.txt").read_text().split("\n")
+    node_ids = (path / "node_ids.txt").read_text().split("\n")
+    offsets = np.load(path / "offsets.npy")
+    docs = np.load(path / "postings_docs.npy")
+    tfs = np.load(path / "postings_tf.npy")
+    doc_lengths = np.load(path / "doc_lengths.npy")
+
+    assert header["count"] == 3
+    assert header["analyzer"] == "italian-snowball-v1"
+    assert terms == sorted(terms)
+    postings = {
+        term: {node_ids[doc]: int(tf) for doc, tf in zip(docs[start:end], tfs[start:end])}
+        for term, start, end in zip(terms, offsets[:-1], offsets[1:])
+    }
+    assert postings["cib"] == {"node0": 2, "node2": 1}
+    assert postings["alber"] == {"node1": 1, "node2": 1}
+    assert dict(zip(node_ids, doc_lengths.tolist())) == {"node0": 2, "node1": 2, "node2": 2}
+    assert header["avg_length"] == pytest.approx(2.0)
+
+
+def test_build_lexical_index_includes_speech_metadata(tmp_path, vector_store):
+    """Test that speakers and events are searchable even if the transcript never names them"""
+    add_nodes(vector_store, ["un talk sul cibo"], metadata={"speech_author": "Marta Tortia", "youtube_id": "abc"})
+
+    path = build_lexical_index(vector_store, tmp_path / "talks.lexical")
+
+    terms = (path / "terms.txt").read_text().split("\n")
+    assert "tort" in terms
+    assert "abc" not in terms
+
+
+def test_build_lexical_index_replaces_previous_index(tmp_path, vector_store):
+    add_nodes(vector_store, ["cibo"])
+    path = build_lexical_index(vector_store, tmp_path / "talks.lexical")
+    vector_store.delete_nodes(["node0"])
+
+    build_lexical_index(vector_store, path)
+
+    assert json.loads((path / "lexical.json").read_text())["count"] == 0
+    assert not (tmp_path / "talks.lexical.tmp").exists()
@@ -0,0 +1,168 @@
+import json
+import pytest
+from src.components.manifest import (
+    compute_file_hash,
+    compute_manifest_version,
+    diff_manifest,
+    get_manifest_path,
+    load_manifest,
+    save_manifest,
+)
+
+SETTINGS = {"embedding_model": "text-embedding-3-large", "chunk_size": 512, "chunk_overlap": 40}
+
+
+@pytest.fixture
+def manifest():
+    return {
+        "settings": SETTINGS,
+        "files": {
+            "/data/unchanged.txt": {"hash": "aaa", "doc_ids": ["/data/unchanged.txt"]},
+            "/data/changed.txt": {"hash": "bbb", "doc_ids": ["/data/changed.txt"]},
+            "/data/removed.txt": {"hash": "ccc", "doc_ids": ["/data/removed.txt"]},
+        },
+        "exports": {"lexical_index": {"version": "0123456789abcdef"}},
+    }
+
+
+def test_get_manifest_path_is_inside_db_path(tmp_path):
+    """Test that the manifest is stored inside the Chroma database directory"""
+    path = get_manifest_path(str(tmp_path), "my_collection")
+    assert path.parent == tmp_path
+    assert path.name == "my_collection.manifest.json"
+
+
+def test_compute_file_hash_depends_on_content(tmp_path):
+    """Test that the hash changes with the content and not with the file name"""
+    file1 = tmp_path / "a.txt"
+    file2 = tmp_path / "b.txt"
+    file1.write_text("same content")
+    file2.write_text("same content")
+
+    assert compute_file_hash(file1) == compute_file_hash(file2)
+
+    file2.write_text("other content")
+    assert compute_file_hash(file1) != compute_file_hash(file2)
+
+
+def test_load_manifest_missing_file(tmp_path):
+    """Test that a missing manifest is loaded as an empty one"""
+    assert load_manifest(tmp_path / "missing.json") == {"settings": {}, "files": {}, "exports": {}}
+
+
+def test_save_and_load_manifest_roundtrip(tmp_path, manifest):
+    """Test that a saved manifest is loaded back unchanged"""
+    path = tmp_path / "nested" / "collection.manifest.json"
+    save_manifest(path, manifest)
+
+    assert load_manifest(path) == manifest
+    assert not path.with_name(f"{path.name}.tmp").exists()
+    assert json.loads(path.read_text())["settings"] == SETTINGS
+
+
+def test_load_manifest_without_exports(tmp_path, manifest):
+    """Test that a manifest saved by a checkpoint, without the export records, has no export"""
+    path = tmp_path / "collection.manifest.json"
+    save_manifest(path, {"settings": SETTINGS, "files": manifest["files"]})
+
+    assert load_manifest(path)["exports"] == {}
+
+
+def test_manifest_version_depends_on_files_and_settings(manifest):
+    """Test that the version changes with the indexed files or settings, and not with the export records"""
+    version = compute_manifest_version(manifest)
+
+    assert compute_manifest_version(manifest | {"exports": {}}) == version
+    assert compute_manifest_version(manifest | {"settings": SETTINGS | {"chunk_size": 256}}) != version
+    files = dict(manifest["files"])
+    del files["/data/removed.txt"]
+    assert compute_manifest_version(manifest | {"files": files}) != version
+
+
+def test_diff_manifest(manifest):
+    """Test classification of new, changed, removed and unchanged files"""
+    file_hashes = {
+        "/data/unchanged.txt": "aaa",
+        "/data/changed.txt": "bbb2",
+        "/data/new.txt": "ddd",
+    }
+
+    diff = diff_manifest(manifest, file_hashes, SETTINGS)
+
+    assert diff.new == ["/data/new.txt"]
+    assert diff.changed == ["/data/changed.txt"]
+    assert diff.removed == ["/data/removed.txt"]
+    assert diff.unchanged == ["/data/unchanged.txt"]
+    assert diff.to_embed == ["/data/new.txt", "/data/changed.txt"]
+    assert diff.to_delete == ["/data/changed.txt", "/data/removed.txt"]
+    assert not diff.is_empty
+
+
+def test_diff_manifest_no_changes(manifest):
+    """Test that a re-run over identical files is a no-op"""
+    file_hashes = {path: entry["hash"] for path, entry in manifest["files"].items()}
+
+    diff = diff_manifest(manifest, file_hashes, SETTINGS)
+
+    assert diff.is_empty
+    assert len(diff.unchanged) == 3
+
+
+def test_diff_manifest_settings_changed(manifest):
+    """Test that changing ingestion settings invalidates every recorded file"""
+    file_hashes = {path: entry["hash"] for path, entry in manifest["files"].items()}
+
+    diff = diff_manifest(manifest, file_hashes, {**SETTINGS, "chunk_size": 256})
+
+    assert sorted(diff.changed) == sorted(file_hashes)
+    assert diff.unchanged == []
+
+
+def test_diff_manifest_empty_manifest():
+    """Test that every file is new on the first run"""
+    diff = diff_manifest({"settings": {}, "files": {}}, {"/data/a.txt": "aaa"}, SETTINGS)
+
+    assert diff.new == ["/data/a.txt"]
+    assert diff.changed == []
+
+
+def test_diff_manifest_resumes_partial_files(manifest):
+    """Test that partially ingested files are resumed if unchanged, re-embedded otherwise"""
+    manifest["files"]["/data/unchanged.txt"].update({"partial": True, "node_ids": ["n1", "n2"]})
+    manifest["files"]["/data/changed.txt"].update({"partial": True, "node_ids": ["n3"]})
+    file_hashes = {"/data/unchanged.txt": "aaa", "/data/changed.txt": "zzz", "/data/removed.txt": "ccc"}
+
+    diff = diff_manifest(manifest, file_hashes, SETTINGS)
+
+    assert diff.resumed == ["/data/unchanged.txt"]
+    assert diff.changed == ["/data/changed.txt"]
+    assert diff.unchanged == ["/data/removed.txt"]
+    assert "/data/unchanged.txt" in diff.to_embed
+    assert "/data/unchanged.txt" not in diff.to_delete
+
+
+def test_diff_manifest_re_embeds_linked_files(manifest):
+    """Test that files linked by deduplicated chunks are re-embedded with the files they are linked to"""
+    manifest["files"]["/data/other.txt"] = {"hash": "ddd", "doc_ids": ["/data/other.txt"], "linked": ["/data/unchanged.txt"]}
+    manifest["files"]["/data/unchanged.txt"]["linked"] = ["/data/other.txt", "/data/removed.txt"]
+    manifest["files"]["/data/alone.txt"] = {"hash": "eee", "doc_ids": ["/data/alone.txt"]}
+    file_hashes = {"/data/unchanged.txt": "aaa", "/data/other.txt": "ddd", "/data/alone.txt": "eee"}
+
+    diff = diff_manifest(manifest, file_hashes, SETTINGS)
+
+    assert diff.changed == ["/data/other.txt", "/data/unchanged.txt"]
+    assert diff.removed == ["/data/changed.txt", "/data/removed.txt"]
+    assert diff.unchanged == ["/data/alone.txt"]
+    assert set(diff.to_delete) >= {"/data/other.txt", "/data/unchanged.txt"}
+
+
+def test_diff_manifest_linked_partial_file_is_not_resumed(manifest):
+    """Test that a partial file with links is re-embedded from scratch with its linked files"""
+    manifest["files"]["/data/unchanged.txt"].update({"partial": True, "node_ids": ["n1"], "linked": ["/data/removed.txt"]})
+    file_hashes = {"/data/unchanged.txt": "aaa", "/data/changed.txt": "bbb", "/data/removed.txt": "ccc"}
+
+    diff = diff_manifest(manifest, file_hashes, SETTINGS)
+
+    assert diff.resumed == []
+    assert diff.changed == ["/data/removed.txt", "/data/unchanged.txt"]
+    assert diff.unchanged == ["/data/changed.txt"]
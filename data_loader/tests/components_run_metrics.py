@@ -0,0 +1,38 @@
+import json
+import time
+
+from src.components.run_metrics import RunMetrics, get_run_metrics_path, save_run_metrics
+
+
+def test_stages_add_up():
+    metrics = RunMetrics()
+
+    with metrics.stage("scan"):
+        time.sleep(0.01)
+    with metrics.stage("export"):
+        pass
+    with metrics.stage("scan"):
+        time.sleep(0.01)
+    metrics.add(stage_seconds={"ingest.embed": 1.5}, counters={"chunks": 10})
+    metrics.add(counters={"chunks": 2, "batches": 1})
+
+    assert list(metrics.stage_seconds) == ["scan", "export", "ingest.embed"]
+    assert metrics.stage_seconds["scan"] >= 0.02
+    assert metrics.stage_seconds["ingest.embed"] == 1.5
+    assert metrics.counters == {"chunks": 12, "batches": 1}
+
+
+def test_save_run_metrics(tmp_path):
+    metrics = RunMetrics()
+    with metrics.stage("scan"):
+        pass
+    metrics.add(counters={"chunks": 12})
+    path = get_run_metrics_path(str(tmp_path / "chroma_db"), "tedx")
+
+    summary = save_run_metrics(path, metrics)
+
+    assert path == tmp_path / "chroma_db" / "tedx.metrics.json"
+    assert json.loads(path.read_text(encoding="utf-8")) == summary
+    assert summary["counters"] == {"chunks": 12}
+    assert set(summary["stage_seconds"]) == {"scan"}
+    assert summary["total_seconds"] >= summary["stage_seconds"]["scan"]
@@ -0,0 +1,106 @@
+import json
+import chromadb
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.components.snapshot import export_snapshot, get_snapshot_path, quantize_embeddings
+
+DIM = 16
+
+
+@pytest.fixture
+def vector_store(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path / "db")).create_collection("test_collection")
+    return ChromaVectorStore(chroma_collection=collection)
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).normal(size=(25, DIM)).astype(np.float32)
+
+
+def add_nodes(vector_store, embeddings):
+    nodes = [
+        TextNode(id_=f"node{i:02d}", text=f"testo è {i}", metadata={"talk": f"talk{i}"}, embedding=embedding.tolist())
+        for i, embedding in enumerate(embeddings)
+    ]
+    vector_store.add(nodes)
+
+
+def read_column(path, column):
+    data = (path / f"{column}.bin").read_bytes()
+    offsets = np.load(path / f"{column}.offsets.npy")
+    return [data[start:end].decode() for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def test_get_snapshot_path_is_inside_db_path(tmp_path):
+    """Test that the snapshot lives next to the Chroma database"""
+    assert get_snapshot_path(str(tmp_path), "talks") == tmp_path / "talks.snapshot"
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_quantize_embeddings_roundtrip(embeddings, dtype):
+    """Test that dequantized embeddings are close to the normalized originals"""
+    quantized, scales = quantize_embeddings(embeddings, dtype)
+
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    assert quantized.dtype == np.dtype(dtype)
+    np.testing.assert_allclose(quantized.astype(np.float32) * scales[:, None], normalized, atol=1e-2)
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_export_snapshot(tmp_path, vector_store, embeddings, dtype):
+    """Test that every vector and its node are exported, in pages"""
+    add_nodes(vector_store, embeddings)
+
+    path = export_snapshot(vector_store, tmp_path / "talks.snapshot", dtype=dtype, page_size=10)
+
+    header = json.loads((path / "snapshot.json").read_text())
+    assert header == {"format_version": 1, "count": 25, "dim": DIM, "dtype": dtype, "full_precision": True}
+
+    quantized = np.load(path / "embeddings.npy", mmap_mode="r")
+    scales = np.load(path / "scales.npy")
+    full = np.load(path / "embeddings_full.npy")
+    assert quantized.shape == (25, DIM)
+    assert quantized.dtype == np.dtype(dtype)
+
+    node_ids = read_column(path, "node_id")
+    rows = [int(node_id[4:]) for node_id in node_ids]
+    normalized = embeddings[rows] / np.linalg.norm(embeddings[rows], axis=1, keepdims=True)
+    np.testing.assert_allclose(full, normalized, atol=1e-6)
+    np.testing.assert_allclose(quantized.astype(np.float32) * scales[:, None], normalized, atol=1e-2)
+
+    assert sorted(node_ids) == [f"node{i:02d}" for i in range(25)]
+    assert read_column(path, "text") == [f"testo è {row}" for row in rows]
+    metadata = [json.loads(value) for value in read_column(path, "metadata")]
+    assert [m["talk"] for m in metadata] == [f"talk{row}" for row in rows]
+    assert all("_node_content" in m for m in metadata)
+
+
+def test_export_snapshot_replaces_previous_snapshot(tmp_path, vector_store, embeddings):
+    """Test that a new export replaces the previous snapshot without leftovers"""
+    add_nodes(vector_store, embeddings[:5])
+    export_snapshot(vector_store, tmp_path / "talks.snapshot")
+    add_nodes(vector_store, embeddings)
+
+    path = export_snapshot(vector_store, tmp_path / "talks.snapshot", full_precision=False)
+
+    assert json.loads((path / "snapshot.json").read_text())["count"] == 25
+    assert not (path / "embeddings_full.npy").exists()
+    assert not (tmp_path / "talks.snapshot.tmp").exists()
+
+
+def test_export_snapshot_empty_collection(tmp_path, vector_store):
+    """Test the export of a collection without vectors"""
+    path = export_snapshot(vector_store, tmp_path / "talks.snapshot")
+
+    assert json.loads((path / "snapshot.json").read_text())["count"] == 0
+    assert np.load(path / "embeddings.npy").shape == (0, 0)
+    assert read_column(path, "node_id") == []
+
+
+def test_export_snapshot_invalid_dtype(tmp_path, vector_store):
+    """Test that an unknown dtype is rejected"""
+    with pytest.raises(ValueError):
+        export_snapshot(vector_store, tmp_path / "talks.snapshot", dtype="int4")
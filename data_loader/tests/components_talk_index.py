@@ -0,0 +1,64 @@
+import chromadb
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.components.talk_index import build_talk_index, compute_talk_centroids, get_talk_collection_name
+
+
+def make_node(node_id, talk_id, embedding, **metadata):
+    return TextNode(
+        id_=node_id,
+        text=f"testo {node_id}",
+        metadata=metadata,
+        embedding=embedding,
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=talk_id)},
+    )
+
+
+@pytest.fixture
+def client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "db"))
+
+
+@pytest.fixture
+def vector_store(client):
+    vector_store = ChromaVectorStore(chroma_collection=client.create_collection("talks"))
+    vector_store.add([
+        make_node("a1", "talkA", [2.0, 0.0, 0.0], speech_author="Marta Tortia"),
+        make_node("a2", "talkA", [0.0, 1.0, 0.0], speech_author="Marta Tortia"),
+        make_node("b1", "talkB", [0.0, 0.0, 3.0], speech_author="Rosanna Tabasso"),
+    ])
+    return vector_store
+
+
+def test_compute_talk_centroids(vector_store):
+    """Test that centroids average the normalized chunk embeddings of each talk"""
+    talk_ids, centroids, metadatas = compute_talk_centroids(vector_store, page_size=2)
+
+    rows = {talk_id: row for row, talk_id in enumerate(talk_ids)}
+    assert set(talk_ids) == {"talkA", "talkB"}
+    np.testing.assert_allclose(centroids[rows["talkA"]], [np.sqrt(0.5), np.sqrt(0.5), 0.0], atol=1e-6)
+    np.testing.assert_allclose(centroids[rows["talkB"]], [0.0, 0.0, 1.0], atol=1e-6)
+    assert metadatas[rows["talkA"]] == {"ref_doc_id": "talkA", "speech_author": "Marta Tortia", "num_chunks": 2}
+
+
+def test_build_talk_index(client, vector_store):
+    """Test that every talk gets a vector and that talks no longer in the collection are removed"""
+    talk_vector_store = ChromaVectorStore(chroma_collection=client.create_collection(get_talk_collection_name("talks")))
+    talk_vector_store.client.add(ids=["stale"], embeddings=[[1.0, 1.0, 1.0]])
+
+    assert build_talk_index(vector_store, talk_vector_store, page_size=1) == 2
+
+    talks = talk_vector_store.client.get(include=["metadatas"])
+    assert sorted(talks["ids"]) == ["talkA", "talkB"]
+    result = talk_vector_store.client.query(query_embeddings=[[0.0, 0.0, 1.0]], n_results=1, include=[])
+    assert result["ids"][0] == ["talkB"]
+
+
+def test_build_talk_index_empty_collection(client):
+    vector_store = ChromaVectorStore(chroma_collection=client.create_collection("empty"))
+    talk_vector_store = ChromaVectorStore(chroma_collection=client.create_collection("empty_talks"))
+
+    assert build_talk_index(vector_store, talk_vector_store) == 0
+    assert talk_vector_store.client.count() == 0
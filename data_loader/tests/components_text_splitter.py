@@ -1,6 +1,9 @@
 import pytest
+from llama_index.core import Document
+from llama_index.core.schema import MetadataMode
 from llama_index.core.text_splitter import TokenTextSplitter
-from src.components.text_splitter import initialize_text_splitter
+from llama_index.core.utils import get_tokenizer
+from src.components.text_splitter import NUM_TOKENS_KEY, ParallelTextSplitter, initialize_text_splitter
 
 
 def test_initialize_text_splitter_valid_parameters():
@@ -66,3 +69,82 @@ def test_initialize_text_splitter_multiple_values(chunk_size, chunk_overlap):
     assert isinstance(splitter, TokenTextSplitter)
     assert splitter.chunk_size == chunk_size
     assert splitter.chunk_overlap == chunk_overlap
+
+
+def test_initialize_text_splitter_stable_node_ids():
+    """Test that splitting the same document twice gives the same node ids."""
+    splitter = initialize_text_splitter(chunk_size=32, chunk_overlap=0)
+    text = " ".join(f"parola{i}" for i in range(200))
+
+    first = splitter.get_nodes_from_documents([Document(text=text, id_="talk.txt")])
+    second = splitter.get_nodes_from_documents([Document(text=text, id_="talk.txt")])
+    other = splitter.get_nodes_from_documents([Document(text=text + " fine", id_="talk.txt")])
+
+    assert len(first) > 1
+    assert [node.node_id for node in first] == [node.node_id for node in second]
+    assert len({node.node_id for node in first}) == len(first)
+    assert first[0].node_id != other[0].node_id
+
+
+def make_sources(num_sources):
+    """Build (source, documents) pairs of different lengths."""
+    return [
+        (f"talk{i}.txt", [Document(text=" ".join(f"parola{i}_{k}" for k in range(40 * (i + 1))), id_=f"talk{i}.txt")])
+        for i in range(num_sources)
+    ]
+
+
+def test_parallel_text_splitter_matches_serial_split():
+    """Test that splitting on worker processes gives the same chunks, ids and order as a serial split."""
+    splitter = initialize_text_splitter(chunk_size=32, chunk_overlap=4)
+    expected = [(source, splitter.get_nodes_from_documents(documents)) for source, documents in make_sources(9)]
+
+    result = list(ParallelTextSplitter(32, 4, workers=2, max_pending_per_worker=1).split(make_sources(9)))
+
+    assert [source for source, _, _ in result] == [source for source, _ in expected]
+    assert [doc_ids for _, doc_ids, _ in result] == [[source] for source, _ in expected]
+    for (_, _, nodes), (_, expected_nodes) in zip(result, expected, strict=True):
+        assert [node.node_id for node in nodes] == [node.node_id for node in expected_nodes]
+        assert [node.text for node in nodes] == [node.text for node in expected_nodes]
+
+
+def test_parallel_text_splitter_consumes_sources_lazily():
+    """Test that only a bounded number of sources is read ahead of the consumer."""
+    consumed = []
+
+    def sources():
+        for source in make_sources(12):
+            consumed.append(source[0])
+            yield source
+
+    splits = ParallelTextSplitter(32, 0, workers=1, max_pending_per_worker=2).split(sources())
+    next(splits)
+
+    assert len(consumed) == 3
+    assert len(list(splits)) == 11
+
+
+def test_parallel_text_splitter_invalid_parameters():
+    """Test that invalid settings are rejected before starting any worker."""
+    with pytest.raises(ValueError):
+        ParallelTextSplitter(32, 0, workers=0)
+    with pytest.raises(ValueError):
+        ParallelTextSplitter(10, 20, workers=2)
+
+
+def test_chunks_store_token_counts_and_offsets():
+    """Test that chunks carry their token count and offsets, and that the count is hidden from embeddings and LLM."""
+    document = Document(text=" ".join(f"parola{i}" for i in range(300)), metadata={"youtube_id": "abc"})
+
+    nodes = initialize_text_splitter(chunk_size=64, chunk_overlap=8).get_nodes_from_documents([document])
+
+    assert len(nodes) > 1
+    tokenizer = get_tokenizer()
+    for node in nodes:
+        assert node.metadata[NUM_TOKENS_KEY] == len(tokenizer(node.text))
+        assert document.text[node.start_char_idx : node.end_char_idx] == node.text
+        assert NUM_TOKENS_KEY not in node.get_content(metadata_mode=MetadataMode.EMBED)
+        assert NUM_TOKENS_KEY not in node.get_content(metadata_mode=MetadataMode.LLM)
+    # Consecutive chunks overlap
+    assert nodes[1].start_char_idx < nodes[0].end_char_idx
+    assert document.excluded_embed_metadata_keys == []
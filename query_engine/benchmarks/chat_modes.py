@@ -0,0 +1,128 @@
+"""
+Chat mode benchmark for the query engine: LLM calls and latency per conversation turn.
+
+Every chat mode answers the same conversations (a first question, then follow-ups) over a small
+in-memory index, with a stub LLM answering each call after `--llm-latency-ms`. Since retrieval is
+local and almost free, the latency of a turn is about the number of sequential LLM calls times the
+LLM latency, which is what the chat modes differ in.
+
+    cd query_engine
+    python -m benchmarks.chat_modes run --llm-latency-ms 500 --output results.json
+"""
+
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import click
+import numpy as np
+
+QUERY_ENGINE_DIR = Path(__file__).resolve().parents[1]
+RESULTS_FORMAT_VERSION = 1
+QUESTIONS = [
+    "Di cosa parla il talk di Marta Tortia?",
+    "E cosa dice del cibo?",
+    "Quali esempi fa?",
+    "Come si collega agli altri talk di TEDxTorino?",
+]
+
+
+def build_index(num_chunks: int = 100):
+    """Return an in-memory index of placeholder chunks, embedded with a mock model."""
+    from llama_index.core import VectorStoreIndex  # noqa: PLC0415
+    from llama_index.core.embeddings import MockEmbedding  # noqa: PLC0415
+    from llama_index.core.schema import TextNode  # noqa: PLC0415
+
+    nodes = [TextNode(text=f"Passaggio {i} di un talk TEDx sul cibo e sulla città.") for i in range(num_chunks)]
+    return VectorStoreIndex(nodes, embed_model=MockEmbedding(embed_dim=8))
+
+
+async def run_mode(retriever, llm, chat_mode: str, conversations: int, turns: int) -> dict:
+    """
+    Answer `conversations` conversations of `turns` questions each with a chat mode.
+
+    Args:
+        retriever (BaseRetriever): The retriever of the chat engines
+        llm (StubLLM): The stub LLM, whose calls are counted
+        chat_mode (str): One of `CHAT_MODES`
+        conversations (int): Number of conversations, each with a new chat engine
+        turns (int): Number of questions per conversation
+
+    Returns:
+        dict: LLM calls per turn (overall, first turn and follow-ups) and turn latency percentiles
+    """
+    from components.chat_engine import create_chat_engine  # noqa: PLC0415
+
+    calls, latencies = [], []
+    for _ in range(conversations):
+        chat_engine = create_chat_engine(retriever, llm=llm, chat_mode=chat_mode)
+        for turn in range(turns):
+            llm.calls = 0
+            start = time.perf_counter()
+            await chat_engine.achat(QUESTIONS[turn % len(QUESTIONS)])
+            latencies.append(time.perf_counter() - start)
+            calls.append(llm.calls)
+
+    first_turns = calls[::turns]
+    follow_ups = [count for i, count in enumerate(calls) if i % turns]
+    return {
+        "llm_calls_per_turn": round(float(np.mean(calls)), 2),
+        "llm_calls_first_turn": round(float(np.mean(first_turns)), 2),
+        "llm_calls_follow_up": round(float(np.mean(follow_ups)), 2) if follow_ups else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+    }
+
+
+@click.group()
+def cli():
+    """Benchmark the query engine chat modes."""
+
+
+@cli.command()
+@click.option("--modes", default=None, help="Comma-separated chat modes, all of them by default")
+@click.option("--llm-latency-ms", default=500.0, type=float, help="Latency of every stub LLM call")
+@click.option("--conversations", default=10, type=int, help="Number of conversations per chat mode")
+@click.option("--turns", default=3, type=click.IntRange(min=1), help="Number of questions per conversation")
+@click.option("--similarity-top-k", default=2, type=int, help="Number of chunks retrieved per question")
+@click.option("--output", default="chat_modes_benchmark.json", type=click.Path(dir_okay=False))
+def run(**options):
+    """Measure the LLM calls and latency per turn of every chat mode and write the results to JSON."""
+    sys.path.insert(0, str(QUERY_ENGINE_DIR / "src"))
+    from components.chat_engine import CHAT_MODES  # noqa: PLC0415
+
+    from benchmarks.stub_llm import StubLLM  # noqa: PLC0415
+
+    modes = options["modes"].split(",") if options["modes"] else list(CHAT_MODES)
+    retriever = build_index().as_retriever(similarity_top_k=options["similarity_top_k"])
+    llm = StubLLM(latency_seconds=options["llm_latency_ms"] / 1000)
+
+    results = {}
+    for chat_mode in modes:
+        results[chat_mode] = asyncio.run(run_mode(retriever, llm, chat_mode, options["conversations"], options["turns"]))
+        metrics = results[chat_mode]
+        click.echo(
+            f"{chat_mode}: {metrics['llm_calls_per_turn']:.2f} LLM calls per turn "
+            f"(first {metrics['llm_calls_first_turn']:.2f}, follow-up {metrics['llm_calls_follow_up']}), "
+            f"p50 {metrics['p50_ms']:.0f} ms, p95 {metrics['p95_ms']:.0f} ms"
+        )
+
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "benchmark": "chat_modes",
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "config": options,
+        "results": results,
+    }
+    Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {options['output']}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,174 @@
+"""
+Context compression benchmark for the query engine: prompt tokens before and after merging the chunks.
+
+Reads the chunks of a collection written by the data_loader and, for a sample of queries, retrieves the
+top-k chunks with the BM25 index of the collection, then compresses them with `ContextCompressor` for
+several token budgets. Queries are a few consecutive words taken from a chunk, standing in for a question
+about a passage, so that the chunk they come from is the one the answer needs.
+
+    cd query_engine
+    python -m benchmarks.context_compression run --chroma-db-path ../chroma_db --collection-name tedx \\
+        --similarity-top-k 2,5,10 --token-budgets 0,512,1024 --output results.json
+
+For every top-k and budget it reports the prompt tokens of the retrieved chunks and of the compressed
+context, the share of the retrieved characters still in the context, and how often the chunk a query
+comes from is still in the context.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import click
+import numpy as np
+
+QUERY_ENGINE_DIR = Path(__file__).resolve().parents[1]
+RESULTS_FORMAT_VERSION = 1
+
+
+def load_chunks(collection, page_size: int = 1000) -> dict:
+    """
+    Read the chunks of a Chroma collection as nodes, with their transcript offsets.
+
+    Args:
+        collection (chromadb.Collection): The chunk collection
+        page_size (int): Number of chunks read at once
+
+    Returns:
+        dict[str, TextNode]: The chunks by id
+    """
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node  # noqa: PLC0415
+
+    chunks = {}
+    count = collection.count()
+    while len(chunks) < count:
+        page = collection.get(limit=page_size, offset=len(chunks), include=["metadatas", "documents"])
+        if not page["ids"]:
+            break
+        for node_id, metadata, text in zip(page["ids"], page["metadatas"], page["documents"], strict=True):
+            chunks[node_id] = metadata_dict_to_node(metadata, text=text)
+    return chunks
+
+
+def make_query(text: str, num_words: int, rng: np.random.Generator) -> str:
+    """Return `num_words` consecutive words of a text, starting at a random word."""
+    words = text.split()
+    start = int(rng.integers(max(len(words) - num_words, 0) + 1))
+    return " ".join(words[start : start + num_words])
+
+
+def _covers(passages: list, chunk) -> bool:
+    """Return whether a chunk is part of one of the passages."""
+    return any(chunk.get_content() in passage.node.get_content() for passage in passages)
+
+
+def run_top_k(chunks: dict, lexical_index, queries: list[tuple[str, str]], top_k: int, token_budgets: list[int]) -> dict:
+    """
+    Retrieve the top-k chunks of every query and compress them with every token budget.
+
+    Args:
+        chunks (dict[str, TextNode]): The chunks by id
+        lexical_index (LexicalIndex): The BM25 index of the chunks
+        queries (list[tuple[str, str]]): The queries and the id of the chunk each was taken from
+        top_k (int): Number of chunks retrieved per query
+        token_budgets (list[int]): Token budgets of the context, 0 for no limit
+
+    Returns:
+        dict: Per token budget, the mean tokens and characters before and after compression, the share of the
+            source chunks still in the context, and the compression latency
+    """
+    from components.context_compression import ContextCompressor, count_tokens  # noqa: PLC0415
+    from llama_index.core.schema import NodeWithScore  # noqa: PLC0415
+
+    results = {}
+    for token_budget in token_budgets:
+        compressor = ContextCompressor(token_budget=token_budget)
+        tokens_before, tokens_after, chars_kept, sources_kept, latencies = [], [], [], [], []
+        for query, source_id in queries:
+            nodes = [
+                NodeWithScore(node=chunks[node_id], score=score) for node_id, score in lexical_index.search(query, top_k)
+            ]
+            if not nodes:
+                continue
+            start = time.perf_counter()
+            passages = compressor.postprocess_nodes(nodes)
+            latencies.append(time.perf_counter() - start)
+            tokens_before.append(sum(count_tokens(result.node) for result in nodes))
+            tokens_after.append(sum(count_tokens(passage.node) for passage in passages))
+            kept = [result.node for result in nodes if _covers(passages, result.node)]
+            chars_kept.append(sum(len(node.text) for node in kept) / sum(len(result.node.text) for result in nodes))
+            sources_kept.append(_covers(passages, chunks[source_id]))
+
+        results[str(token_budget)] = {
+            "queries": len(tokens_before),
+            "tokens_before": round(float(np.mean(tokens_before)), 1),
+            "tokens_after": round(float(np.mean(tokens_after)), 1),
+            "token_reduction": round(1 - float(np.sum(tokens_after)) / float(np.sum(tokens_before)), 3),
+            "retrieved_chars_kept": round(float(np.mean(chars_kept)), 3),
+            "source_chunk_kept": round(float(np.mean(sources_kept)), 3),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        }
+    return results
+
+
+def _parse_ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+@click.group()
+def cli():
+    """Benchmark the query engine context compression."""
+
+
+@cli.command()
+@click.option("--chroma-db-path", required=True, type=click.Path(exists=True, file_okay=False))
+@click.option("--collection-name", required=True)
+@click.option("--similarity-top-k", "top_ks", default="2,5,10", help="Comma-separated numbers of chunks retrieved")
+@click.option("--token-budgets", default="0,512,1024", help="Comma-separated token budgets, 0 for no limit")
+@click.option("--queries", "num_queries", default=200, type=int, help="Number of queries")
+@click.option("--query-words", default=12, type=click.IntRange(min=1), help="Number of words of a query")
+@click.option("--seed", default=0, type=int)
+@click.option("--output", default="context_compression_benchmark.json", type=click.Path(dir_okay=False))
+def run(**options):
+    """Measure the prompt tokens saved by the context compression and write the results to JSON."""
+    sys.path.insert(0, str(QUERY_ENGINE_DIR / "src"))
+    from components.lexical_index import LexicalIndex, get_lexical_index_path  # noqa: PLC0415
+    from components.vector_store import chromadb  # noqa: PLC0415
+
+    collection = chromadb.PersistentClient(path=options["chroma_db_path"]).get_collection(options["collection_name"])
+    chunks = load_chunks(collection)
+    lexical_index = LexicalIndex(get_lexical_index_path(options["chroma_db_path"], options["collection_name"]))
+    rng = np.random.default_rng(options["seed"])
+    source_ids = rng.choice(sorted(chunks), size=min(options["num_queries"], len(chunks)), replace=False)
+    queries = [(make_query(chunks[node_id].text, options["query_words"], rng), node_id) for node_id in source_ids]
+
+    results = {}
+    for top_k in _parse_ints(options["top_ks"]):
+        results[str(top_k)] = run_top_k(chunks, lexical_index, queries, top_k, _parse_ints(options["token_budgets"]))
+        for token_budget, metrics in results[str(top_k)].items():
+            click.echo(
+                f"top-{top_k}, budget {token_budget}: {metrics['tokens_before']:.0f} -> {metrics['tokens_after']:.0f} "
+                f"tokens ({metrics['token_reduction']:.1%} less), {metrics['retrieved_chars_kept']:.1%} of the "
+                f"retrieved text kept, source chunk kept {metrics['source_chunk_kept']:.1%}, "
+                f"p50 {metrics['p50_ms']:.2f} ms"
+            )
+
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "benchmark": "context_compression",
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "config": options,
+        "results": results,
+    }
+    Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {options['output']}")
+
+
+if __name__ == "__main__":
+    cli()
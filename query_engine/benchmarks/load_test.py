@@ -0,0 +1,498 @@
+"""
+Load test of the query engine: throughput, latency per stage, error rate and memory under concurrent sessions.
+
+Starts the query engine (`src/handler.py`, JSON API included) on a prebuilt Chroma collection, with the
+OpenAI embeddings and chat completions served by a local stub (`benchmarks.stub_openai`) answering after
+configurable latency distributions, so that no API key nor quota is used. Then, for every number of
+concurrent users, replays multi-turn conversations through `POST /api/query`: each user starts a
+conversation, asks its questions one after the other in the same session, drops the session and starts
+the next conversation, until all the conversations of the level are answered.
+
+    cd query_engine
+    python -m benchmarks.load_test run --chroma-db-path ../chroma_db --collection-name tedx \\
+        --users 1,4,16 --conversations 40 --turns 3 --llm-latency lognormal:0.8,0.4 --output results.json
+    python -m benchmarks.load_test compare baseline.json results.json
+
+Every level runs against a fresh engine process, so that its memory and caches do not depend on the
+previous levels. The report has, per level: queries per second, p50/p95/p99 latency of the queries as
+seen by the client and of each stage as reported by the engine (waiting for a free slot, embedding,
+retrieval, LLM), the error rate, and the RSS of the engine sampled over time. With `--engine-url` an
+engine already running (e.g. the container, pointed at a stub started with `python -m
+benchmarks.stub_openai`) is load tested instead, without RSS.
+
+Questions are a few consecutive words of random chunks of the collection, followed up by generic
+questions, generated from `--seed`, so that runs with the same options replay the same conversations.
+With `--distinct-questions`, the conversations open with a few questions only, asked by many users at
+once: the stub counters of the report (`stub`) then show the upstream calls saved by query coalescing.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+import click
+import numpy as np
+
+QUERY_ENGINE_DIR = Path(__file__).resolve().parents[1]
+RESULTS_FORMAT_VERSION = 1
+# Port the query engine serves on, fixed in `main`
+ENGINE_URL = "http://127.0.0.1:8000"
+HTTP_OK = 200
+PERCENTILES = (50, 95, 99)
+# Stages reported by the engine in `stage_seconds`, and the latency of the query as seen by the client
+STAGES = ("queue", "embedding", "retrieval", "llm")
+FOLLOW_UPS = [
+    "Puoi approfondire questo punto?",
+    "Chi è lo speaker e di cosa si occupa?",
+    "Quali esempi vengono fatti nel talk?",
+    "Come si collega ad altri talk TEDx?",
+]
+
+# Metrics compared by `compare`, and whether higher values are better
+COMPARED_METRICS = {
+    "throughput_qps": True,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "latency_p99_ms": False,
+    "error_rate": False,
+    "peak_rss_mb": False,
+}
+
+
+@dataclass
+class QueryResult:
+    """
+    Outcome of a query of the load test.
+
+    Attributes:
+        turn (int): Position of the question in its conversation, from 0
+        latency_seconds (float): Latency as seen by the client
+        error (str, optional): HTTP status or exception of a failed query
+        stage_seconds (dict[str, float]): Time spent in each stage, as reported by the engine
+    """
+
+    turn: int
+    latency_seconds: float
+    error: str | None = None
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+
+
+def make_conversations(
+    texts: list[str], conversations: int, turns: int, seed: int, *, query_words: int = 8, distinct_questions: int = 0
+) -> list[list[str]]:
+    """
+    Generate the conversations replayed by the load test.
+
+    Args:
+        texts (list[str]): Texts of the chunks to ask about
+        conversations (int): Number of conversations
+        turns (int): Number of questions per conversation
+        seed (int): Seed of the random generator, the same seed giving the same conversations
+        query_words (int): Number of words of a chunk quoted in the first question
+        distinct_questions (int): Number of distinct first questions the conversations open with, e.g. to
+            simulate bursts of users asking the same questions, 0 for a different one per conversation
+
+    Returns:
+        list[list[str]]: The questions of every conversation, a question about a chunk then follow-ups
+    """
+    rng = random.Random(seed)  # noqa: S311
+
+    def first_question() -> str:
+        words = rng.choice(texts).split()
+        start = rng.randrange(max(len(words) - query_words, 0) + 1)
+        quote = " ".join(words[start : start + query_words])
+        return f'Cosa dice il talk a proposito di "{quote}"?'
+
+    first_questions = [first_question() for _ in range(distinct_questions)]
+    result = []
+    for _ in range(conversations):
+        first = rng.choice(first_questions) if first_questions else first_question()
+        result.append([first] + [rng.choice(FOLLOW_UPS) for _ in range(turns - 1)])
+    return result
+
+
+def read_rss_mb(pid: int) -> float | None:
+    """Return the resident memory of a process in MB, None if unavailable (e.g. not on Linux)."""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text(encoding="utf-8").splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def summarize(results: list[QueryResult], wall_seconds: float) -> dict:
+    """
+    Aggregate the outcomes of the queries of a level.
+
+    Args:
+        results (list[QueryResult]): The queries, failed ones included
+        wall_seconds (float): Duration of the level
+
+    Returns:
+        dict: Number of queries, errors and error rate, throughput, and p50/p95/p99 of the latency of the successful
+            queries overall, per stage and per turn, in milliseconds
+    """
+    answered = [result for result in results if result.error is None]
+    summary = {
+        "queries": len(results),
+        "errors": len(results) - len(answered),
+        "error_rate": round((len(results) - len(answered)) / len(results), 4) if results else 0.0,
+        "throughput_qps": round(len(answered) / wall_seconds, 3) if wall_seconds else 0.0,
+        "wall_seconds": round(wall_seconds, 3),
+    }
+    if not answered:
+        return summary
+
+    def percentiles(values: list[float]) -> dict:
+        return {f"p{p}_ms": round(float(np.percentile(values, p)) * 1000, 1) for p in PERCENTILES}
+
+    summary |= {f"latency_{name}": value for name, value in percentiles([r.latency_seconds for r in answered]).items()}
+    summary["stages"] = {
+        stage: percentiles([r.stage_seconds.get(stage, 0.0) for r in answered])
+        for stage in STAGES
+        if any(stage in r.stage_seconds for r in answered)
+    }
+    turns = sorted({result.turn for result in answered})
+    summary["turns"] = {str(turn): percentiles([r.latency_seconds for r in answered if r.turn == turn]) for turn in turns}
+    return summary
+
+
+async def replay(
+    base_url: str, conversations: list[list[str]], users: int, think_time_seconds: float = 0.0, query_timeout: float = 120.0
+) -> tuple[list[QueryResult], float]:
+    """
+    Replay conversations against the engine API with `users` concurrent users.
+
+    Each user takes the next conversation, asks its questions in order in one session, waiting
+    `think_time_seconds` between them, and drops the session once done.
+
+    Args:
+        base_url (str): URL of the engine
+        conversations (list[list[str]]): The questions of every conversation
+        users (int): Number of concurrent users
+        think_time_seconds (float): Pause of a user between two questions
+        query_timeout (float): Timeout of a query, in seconds
+
+    Returns:
+        tuple[list[QueryResult], float]: The outcome of every query and the duration of the replay
+    """
+    import httpx  # noqa: PLC0415
+
+    pending = list(reversed(conversations))
+    results = []
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=query_timeout, limits=limits) as client:
+
+        async def user() -> None:
+            while pending:
+                session_id = None
+                for turn, question in enumerate(pending.pop()):
+                    if turn and think_time_seconds:
+                        await asyncio.sleep(think_time_seconds)
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post("/api/query", json={"question": question, "session_id": session_id})
+                    except httpx.HTTPError as e:
+                        results.append(QueryResult(turn, time.perf_counter() - start, error=type(e).__name__))
+                        continue
+                    latency = time.perf_counter() - start
+                    if response.status_code != HTTP_OK:
+                        results.append(QueryResult(turn, latency, error=f"HTTP {response.status_code}"))
+                        continue
+                    body = response.json()
+                    session_id = body["session_id"]
+                    results.append(QueryResult(turn, latency, stage_seconds=body.get("stage_seconds", {})))
+                if session_id is not None:
+                    await client.delete(f"/api/sessions/{session_id}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(users)))
+    return results, time.perf_counter() - start
+
+
+async def sample_rss(pid: int, interval_seconds: float, samples: list[list[float]], start: float) -> None:
+    """Append `[seconds since start, RSS in MB]` to `samples` every `interval_seconds`, until cancelled."""
+    while True:
+        rss_mb = read_rss_mb(pid)
+        if rss_mb is not None:
+            samples.append([round(time.perf_counter() - start, 2), round(rss_mb, 1)])
+        await asyncio.sleep(interval_seconds)
+
+
+async def run_level(
+    base_url: str,
+    conversations: list[list[str]],
+    users: int,
+    think_time_seconds: float,
+    *,
+    pid: int | None = None,
+    rss_interval_seconds: float = 0.5,
+) -> dict:
+    """
+    Replay the conversations with `users` concurrent users, sampling the RSS of the engine process if given.
+
+    Returns:
+        dict: The `summarize` summary, with the RSS samples and their peak when the engine process is known
+    """
+    rss_samples = []
+    sampler = None
+    if pid is not None:
+        sampler = asyncio.create_task(sample_rss(pid, rss_interval_seconds, rss_samples, time.perf_counter()))
+    try:
+        results, wall_seconds = await replay(base_url, conversations, users, think_time_seconds)
+    finally:
+        if sampler is not None:
+            sampler.cancel()
+    summary = {"users": users} | summarize(results, wall_seconds)
+    if rss_samples:
+        summary["peak_rss_mb"] = max(rss_mb for _, rss_mb in rss_samples)
+        summary["rss_mb"] = rss_samples
+    return summary
+
+
+def wait_until_ready(
+    base_url: str,
+    timeout: float,
+    process: subprocess.Popen | None = None,
+    probe: str = "/api/ready",
+    poll_seconds: float = 0.2,
+) -> float:
+    """
+    Wait for the engine readiness probe, or another probe such as `/api/health`, to succeed.
+
+    Returns:
+        float: Seconds waited
+
+    Raises:
+        RuntimeError: If the engine process exits, or is not ready after `timeout` seconds
+    """
+    import httpx  # noqa: PLC0415
+
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process is not None and process.poll() is not None:
+            error_msg = f"The query engine exited with status {process.returncode} before being ready"
+            raise RuntimeError(error_msg)
+        try:
+            if httpx.get(f"{base_url}{probe}", timeout=5).status_code == HTTP_OK:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(poll_seconds)
+    error_msg = f"The query engine was not ready after {timeout:.0f}s"
+    raise RuntimeError(error_msg)
+
+
+def start_engine(options: dict, api_base: str, log_path: Path) -> subprocess.Popen:
+    """
+    Start the query engine on the collection, with the OpenAI clients pointed at the stub server.
+
+    Args:
+        options (dict): The `run` options: collection, models and `engine_options`
+        api_base (str): URL of the stub OpenAI API
+        log_path (Path): File the engine output is written to
+
+    Returns:
+        subprocess.Popen: The engine process
+    """
+    command = [
+        sys.executable,
+        "handler.py",
+        "--chroma-db-path",
+        str(Path(options["chroma_db_path"]).resolve()),
+        "--collection-name",
+        options["collection_name"],
+        "--embedding-model",
+        options["embedding_model"],
+        "--llm-model",
+        options["llm_model"],
+    ]
+    for engine_option in options["engine_options"]:
+        name, _, value = engine_option.partition("=")
+        command += [f"--{name.removeprefix('--')}", value]
+    env = os.environ | {"OPENAI_API_KEY": "stub", "OPENAI_API_BASE": api_base, "OPENAI_BASE_URL": api_base}
+    with log_path.open("w", encoding="utf-8") as log_file:
+        return subprocess.Popen(command, cwd=QUERY_ENGINE_DIR / "src", env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def stop_engine(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _parse_ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def _latency_distribution(ctx, param, value: str):  # noqa: ARG001
+    from benchmarks.stub_openai import LatencyDistribution  # noqa: PLC0415
+
+    try:
+        return LatencyDistribution.parse(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+
+@click.group()
+def cli():
+    """Load test the query engine."""
+
+
+@cli.command()
+@click.option("--chroma-db-path", required=True, type=click.Path(exists=True, file_okay=False))
+@click.option("--collection-name", required=True)
+@click.option("--embedding-model", default="text-embedding-3-small", help="Model name sent to the stub")
+@click.option("--llm-model", default="gpt-4o-mini", help="Model name sent to the stub")
+@click.option("--users", default="1,4,16", help="Comma-separated numbers of concurrent users, one level each")
+@click.option("--conversations", default=40, type=click.IntRange(min=1), help="Number of conversations per level")
+@click.option("--turns", default=3, type=click.IntRange(min=1), help="Number of questions per conversation")
+@click.option(
+    "--distinct-questions",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Number of distinct first questions, shared by the conversations (bursty load), 0 for one per conversation",
+)
+@click.option("--think-time-seconds", default=0.0, type=click.FloatRange(min=0), help="Pause between two questions")
+@click.option(
+    "--embedding-latency", default="lognormal:0.05,0.3", callback=_latency_distribution, help="Stub embedding latency"
+)
+@click.option("--llm-latency", default="lognormal:0.8,0.4", callback=_latency_distribution, help="Stub LLM latency")
+@click.option("--stub-error-rate", default=0.0, type=click.FloatRange(0, 1), help="Share of stub requests failing")
+@click.option(
+    "--engine-option",
+    "engine_options",
+    multiple=True,
+    help="Option of the engine handler, as name=value (e.g. chat-mode=context), repeatable",
+)
+@click.option("--engine-url", default=None, help="Load test an engine already running at this URL instead")
+@click.option("--startup-timeout", default=300.0, type=float, help="Seconds to wait for the engine to be ready")
+@click.option("--rss-interval-seconds", default=0.5, type=click.FloatRange(min=0.05), help="RSS sampling period")
+@click.option("--seed", default=0, type=int)
+@click.option("--output", default="load_test_benchmark.json", type=click.Path(dir_okay=False))
+def run(**options):
+    """Load test the engine with every number of concurrent users and write the results to JSON."""
+    sys.path.insert(0, str(QUERY_ENGINE_DIR / "src"))
+    from components.vector_store import chromadb  # noqa: PLC0415
+
+    from benchmarks.stub_openai import StubOpenAIServer  # noqa: PLC0415
+
+    collection = chromadb.PersistentClient(path=options["chroma_db_path"]).get_collection(options["collection_name"])
+    sample = collection.get(limit=1000, include=["documents", "embeddings"])
+    conversations = make_conversations(
+        sample["documents"],
+        options["conversations"],
+        options["turns"],
+        options["seed"],
+        distinct_questions=options["distinct_questions"],
+    )
+
+    stub = StubOpenAIServer(
+        embedding_latency=options["embedding_latency"],
+        llm_latency=options["llm_latency"],
+        error_rate=options["stub_error_rate"],
+        dimensions=len(sample["embeddings"][0]),
+        seed=options["seed"],
+    ).start()
+    results = []
+    try:
+        for users in _parse_ints(options["users"]):
+            stub.reset_stats()
+            if options["engine_url"]:
+                wait_until_ready(options["engine_url"], options["startup_timeout"])
+                result = asyncio.run(run_level(options["engine_url"], conversations, users, options["think_time_seconds"]))
+            else:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    log_path = Path(tmp_dir) / "engine.log"
+                    process = start_engine(options, stub.api_base, log_path)
+                    try:
+                        startup_seconds = wait_until_ready(ENGINE_URL, options["startup_timeout"], process)
+                        level = run_level(
+                            ENGINE_URL,
+                            conversations,
+                            users,
+                            options["think_time_seconds"],
+                            pid=process.pid,
+                            rss_interval_seconds=options["rss_interval_seconds"],
+                        )
+                        result = {"startup_seconds": round(startup_seconds, 2)} | asyncio.run(level)
+                    except RuntimeError:
+                        click.echo(log_path.read_text(encoding="utf-8")[-5000:], err=True)
+                        raise
+                    finally:
+                        stop_engine(process)
+            result["stub"] = stub.stats_dict()
+            results.append(result)
+            click.echo(
+                f"{users} users: {result['throughput_qps']:.2f} queries/s, "
+                f"p50 {result.get('latency_p50_ms', float('nan')):.0f} ms, "
+                f"p95 {result.get('latency_p95_ms', float('nan')):.0f} ms, "
+                f"p99 {result.get('latency_p99_ms', float('nan')):.0f} ms, "
+                f"errors {result['error_rate']:.1%}, peak RSS {result.get('peak_rss_mb', float('nan')):.0f} MB"
+            )
+    finally:
+        stub.stop()
+
+    config = options | {
+        "embedding_latency": str(options["embedding_latency"]),
+        "llm_latency": str(options["llm_latency"]),
+        "engine_options": list(options["engine_options"]),
+    }
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "benchmark": "load_test",
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "config": config,
+        "results": results,
+    }
+    Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {options['output']}")
+
+
+@cli.command()
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("candidate", type=click.Path(exists=True, dir_okay=False))
+@click.option("--tolerance", default=0.1, type=float, help="Relative change tolerated before flagging a regression")
+def compare(baseline: str, candidate: str, tolerance: float):
+    """Compare two result files level by level, exiting with status 1 on regressions."""
+    baseline_results = json.loads(Path(baseline).read_text(encoding="utf-8"))["results"]
+    candidate_results = json.loads(Path(candidate).read_text(encoding="utf-8"))["results"]
+    baseline_levels = {result["users"]: result for result in baseline_results}
+
+    regressions = 0
+    for result in candidate_results:
+        if result["users"] not in baseline_levels:
+            continue
+        click.echo(f"users={result['users']}")
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = baseline_levels[result["users"]].get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            # Errors appearing where there were none are a regression whatever the tolerance
+            change = (after - before) / before if before else (float("inf") if after else 0.0)
+            regressed = (change < -tolerance) if higher_is_better else (change > tolerance)
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            click.echo(f"  {metric:<18} {before:>12.2f} -> {after:>12.2f} ({change:+.1%}){flag}")
+
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
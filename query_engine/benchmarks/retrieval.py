@@ -0,0 +1,306 @@
+"""
+Retrieval benchmark for the query engine: flat chunk search versus two-stage (talk, then chunk) search.
+
+Reads the chunk embeddings of a collection written by the data_loader, optionally grows the corpus with
+synthetic talks, and compares, for a sample of queries:
+    - flat: the Chroma similarity search over every chunk
+    - two-stage: the talks closest to the query in the talk collection, then the Chroma similarity
+      search over the chunks of those talks only, for several numbers of talks
+
+    cd query_engine
+    python -m benchmarks.retrieval run --chroma-db-path ../chroma_db --collection-name tedx \\
+        --scales 1,4,16 --talk-top-k 3,5,10 --output results.json
+
+Queries are chunk embeddings perturbed with Gaussian noise (`--query-noise`), standing in for questions
+about a passage. Recall@k is measured against the exact (brute-force) top-k chunks of each query, so
+that it captures both the HNSW approximation and the talks missed by the first stage. Synthetic talks
+are copies of the real talks, shifted as a whole by `--talk-noise` and with per-chunk noise on top, so
+that they are related to the original talk without being duplicates of it.
+
+Collections embedded with a mock model (every chunk with the same vector) can still be benchmarked with
+`--synthetic`, which replaces the stored embeddings with random ones clustered by talk.
+"""
+
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import click
+import numpy as np
+
+QUERY_ENGINE_DIR = Path(__file__).resolve().parents[1]
+RESULTS_FORMAT_VERSION = 1
+# Chunks written to Chroma at once
+WRITE_BATCH_SIZE = 5000
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return the rows of a matrix scaled to unit norm."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def load_corpus(collection, talk_key: str, page_size: int = 1000) -> tuple[np.ndarray, list[str]]:
+    """
+    Read the unit chunk embeddings of a Chroma collection and the talk of each chunk.
+
+    Args:
+        collection (chromadb.Collection): The chunk collection
+        talk_key (str): Metadata key of the talk of a chunk
+        page_size (int): Number of chunks read at once
+
+    Returns:
+        tuple[np.ndarray, list[str]]: The float32 embeddings, one row per chunk, and the talk of each chunk
+    """
+    embeddings, talk_ids = [], []
+    count = collection.count()
+    while len(talk_ids) < count:
+        page = collection.get(limit=page_size, offset=len(talk_ids), include=["embeddings", "metadatas"])
+        if not page["ids"]:
+            break
+        embeddings.append(np.asarray(page["embeddings"], dtype=np.float32))
+        talk_ids.extend(str((metadata or {}).get(talk_key)) for metadata in page["metadatas"])
+    return normalize(np.concatenate(embeddings)), talk_ids
+
+
+def synthetic_embeddings(talk_ids: list[str], dim: int, chunk_spread: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Generate unit chunk embeddings clustered by talk: a random direction per talk plus per-chunk noise.
+
+    Args:
+        talk_ids (list[str]): The talk of each chunk
+        dim (int): Embedding dimension
+        chunk_spread (float): Norm of the noise separating the chunks of a talk from its direction
+        rng (np.random.Generator): The random generator
+
+    Returns:
+        np.ndarray: The float32 embeddings, one row per chunk
+    """
+    talks = sorted(set(talk_ids))
+    directions = normalize(rng.standard_normal((len(talks), dim)).astype(np.float32))
+    rows = [talks.index(talk_id) for talk_id in talk_ids]
+    noise = rng.standard_normal((len(talk_ids), dim)).astype(np.float32) * chunk_spread / np.sqrt(dim)
+    return normalize(directions[rows] + noise)
+
+
+def scale_corpus(
+    embeddings: np.ndarray, talk_ids: list[str], scale: int, talk_noise: float, rng: np.random.Generator
+) -> tuple[np.ndarray, list[str]]:
+    """
+    Grow a corpus to `scale` times its size with synthetic talks derived from the real ones.
+
+    Every chunk of a synthetic talk is the chunk of the real talk, plus a shift shared by the whole talk
+    and a smaller per-chunk noise, both of norm about `talk_noise`.
+
+    Args:
+        embeddings (np.ndarray): The unit chunk embeddings
+        talk_ids (list[str]): The talk of each chunk
+        scale (int): Number of copies of the corpus, the original included
+        talk_noise (float): Norm of the talk shift
+        rng (np.random.Generator): The random generator
+
+    Returns:
+        tuple[np.ndarray, list[str]]: The embeddings and talks of the scaled corpus, the original first
+    """
+    dim = embeddings.shape[1]
+    talks = sorted(set(talk_ids))
+    rows = np.array([talks.index(talk_id) for talk_id in talk_ids]) if talks else np.zeros(0, dtype=int)
+    scaled_embeddings, scaled_talk_ids = [embeddings], list(talk_ids)
+    for copy in range(1, scale):
+        shifts = rng.standard_normal((len(talks), dim)).astype(np.float32) * talk_noise / np.sqrt(dim)
+        noise = rng.standard_normal(embeddings.shape).astype(np.float32) * talk_noise / (2 * np.sqrt(dim))
+        scaled_embeddings.append(normalize(embeddings + shifts[rows] + noise))
+        scaled_talk_ids.extend(f"{talk_id}#{copy}" for talk_id in talk_ids)
+    return np.concatenate(scaled_embeddings), scaled_talk_ids
+
+
+def compute_centroids(embeddings: np.ndarray, talk_ids: list[str]) -> tuple[list[str], np.ndarray]:
+    """Return the talks and their unit centroids, as written by the data_loader to the talk collection."""
+    talks = sorted(set(talk_ids))
+    rows = {talk_id: row for row, talk_id in enumerate(talks)}
+    sums = np.zeros((len(talks), embeddings.shape[1]), dtype=np.float32)
+    np.add.at(sums, [rows[talk_id] for talk_id in talk_ids], embeddings)
+    return talks, normalize(sums)
+
+
+def recall(retrieved: list[list[str]], expected: list[list[str]]) -> float:
+    """Return the mean fraction of the expected ids that were retrieved."""
+    return float(np.mean([len(set(r) & set(e)) / len(e) for r, e in zip(retrieved, expected, strict=True) if e]))
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+    }
+
+
+def run_scale(
+    client,
+    embeddings: np.ndarray,
+    talk_ids: list[str],
+    queries: np.ndarray,
+    *,
+    similarity_top_k: int,
+    talk_top_ks: list[int],
+    talk_key: str,
+) -> dict:
+    """
+    Write a corpus to fresh Chroma collections and compare flat and two-stage search on it.
+
+    Args:
+        client (chromadb.ClientAPI): The Chroma client of the benchmark database
+        embeddings (np.ndarray): The unit chunk embeddings
+        talk_ids (list[str]): The talk of each chunk
+        queries (np.ndarray): The query embeddings
+        similarity_top_k (int): Number of chunks retrieved per query
+        talk_top_ks (list[int]): Numbers of talks searched by two-stage retrieval
+        talk_key (str): Metadata key of the talk of a chunk
+
+    Returns:
+        dict: Corpus size, and recall@k, latency and number of distinct talks in the results of each method
+    """
+    from components.talk_index import TalkIndex  # noqa: PLC0415
+    from llama_index.core.vector_stores.types import VectorStoreQuery  # noqa: PLC0415
+    from llama_index.vector_stores.chroma import ChromaVectorStore  # noqa: PLC0415
+
+    for name in ("chunks", "talks"):
+        if name in {collection.name for collection in client.list_collections()}:
+            client.delete_collection(name)
+    chunks = client.create_collection("chunks")
+    # Node ids are the row numbers, which is also how the exact top-k is expressed
+    for start in range(0, len(embeddings), WRITE_BATCH_SIZE):
+        end = start + WRITE_BATCH_SIZE
+        chunks.add(
+            ids=[str(row) for row in range(start, min(end, len(embeddings)))],
+            embeddings=embeddings[start:end].tolist(),
+            metadatas=[{talk_key: talk_id} for talk_id in talk_ids[start:end]],
+            documents=[""] * len(talk_ids[start:end]),
+        )
+    talks, centroids = compute_centroids(embeddings, talk_ids)
+    talk_collection = client.create_collection("talks")
+    talk_collection.add(ids=talks, embeddings=centroids.tolist())
+
+    expected = [[str(row) for row in np.argsort(-(embeddings @ query))[:similarity_top_k]] for query in queries]
+    chunk_talks = dict(enumerate(talk_ids))
+    vector_store = ChromaVectorStore(chroma_collection=chunks)
+
+    def evaluate(search) -> dict:
+        retrieved, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            retrieved.append(search(query.tolist()))
+            latencies.append(time.perf_counter() - start)
+        return {
+            f"recall_at_{similarity_top_k}": round(recall(retrieved, expected), 4),
+            **_percentiles(latencies),
+            "distinct_talks": round(float(np.mean([len({chunk_talks[int(i)] for i in ids}) for ids in retrieved])), 2),
+        }
+
+    def flat_search(query_embedding: list[float]) -> list[str]:
+        return vector_store.query(VectorStoreQuery(query_embedding=query_embedding, similarity_top_k=similarity_top_k)).ids
+
+    methods = {"flat": evaluate(flat_search)}
+    for talk_top_k in talk_top_ks:
+        talk_index = TalkIndex(talk_collection, top_k=talk_top_k)
+
+        def two_stage_search(query_embedding: list[float], talk_index: TalkIndex = talk_index) -> list[str]:
+            filters = talk_index.filters(query_embedding)
+            query = VectorStoreQuery(query_embedding=query_embedding, similarity_top_k=similarity_top_k, filters=filters)
+            return vector_store.query(query).ids
+
+        methods[f"two_stage_{talk_top_k}"] = evaluate(two_stage_search)
+
+    return {"chunks": len(embeddings), "talks": len(talks), "methods": methods}
+
+
+def _parse_ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+@click.group()
+def cli():
+    """Benchmark the query engine retrieval."""
+
+
+@cli.command()
+@click.option("--chroma-db-path", required=True, type=click.Path(exists=True, file_okay=False))
+@click.option("--collection-name", required=True)
+@click.option("--scales", default="1,4", help="Comma-separated corpus sizes, in copies of the collection")
+@click.option("--talk-top-k", "talk_top_ks", default="3,5,10", help="Comma-separated numbers of talks searched")
+@click.option("--similarity-top-k", default=2, type=int, help="Number of chunks retrieved per query")
+@click.option("--queries", "num_queries", default=200, type=int, help="Number of queries")
+@click.option("--query-noise", default=0.6, type=float, help="Norm of the noise added to a chunk to make a query")
+@click.option("--talk-noise", default=0.8, type=float, help="Norm of the shift of synthetic talks")
+@click.option("--synthetic", is_flag=True, help="Replace the stored embeddings with random ones clustered by talk")
+@click.option("--chunk-spread", default=1.0, type=float, help="Norm of the chunk noise of synthetic embeddings")
+@click.option("--seed", default=0, type=int)
+@click.option("--output", default="retrieval_benchmark.json", type=click.Path(dir_okay=False))
+def run(**options):
+    """Compare flat and two-stage retrieval at growing corpus sizes and write the results to JSON."""
+    sys.path.insert(0, str(QUERY_ENGINE_DIR / "src"))
+    from components.talk_index import TALK_KEY  # noqa: PLC0415
+    from components.vector_store import chromadb  # noqa: PLC0415
+
+    source = chromadb.PersistentClient(path=options["chroma_db_path"]).get_collection(options["collection_name"])
+    embeddings, talk_ids = load_corpus(source, TALK_KEY)
+    click.echo(f"Loaded {len(embeddings)} chunks of {len(set(talk_ids))} talks")
+
+    rng = np.random.default_rng(options["seed"])
+    if options["synthetic"]:
+        embeddings = synthetic_embeddings(talk_ids, embeddings.shape[1], options["chunk_spread"], rng)
+    elif np.allclose(embeddings, embeddings[0], atol=1e-4):
+        click.echo("Warning: every chunk has the same embedding (mock embedding model?), use --synthetic", err=True)
+    workdir = Path(tempfile.mkdtemp(prefix="retrieval_benchmark_"))
+    results = []
+    try:
+        client = chromadb.PersistentClient(path=str(workdir))
+        for scale in _parse_ints(options["scales"]):
+            scaled_embeddings, scaled_talk_ids = scale_corpus(embeddings, talk_ids, scale, options["talk_noise"], rng)
+            sources = rng.choice(len(scaled_embeddings), size=options["num_queries"], replace=False)
+            noise = rng.standard_normal((len(sources), embeddings.shape[1])).astype(np.float32)
+            queries = normalize(scaled_embeddings[sources] + noise * options["query_noise"] / np.sqrt(embeddings.shape[1]))
+
+            result = {"scale": scale}
+            result.update(
+                run_scale(
+                    client,
+                    scaled_embeddings,
+                    scaled_talk_ids,
+                    queries,
+                    similarity_top_k=options["similarity_top_k"],
+                    talk_top_ks=_parse_ints(options["talk_top_ks"]),
+                    talk_key=TALK_KEY,
+                )
+            )
+            results.append(result)
+            for method, metrics in result["methods"].items():
+                click.echo(
+                    f"scale={scale} ({result['chunks']} chunks, {result['talks']} talks) {method}: "
+                    f"recall@{options['similarity_top_k']} {metrics[f'recall_at_{options["similarity_top_k"]}']:.3f}, "
+                    f"p50 {metrics['p50_ms']:.2f} ms, p95 {metrics['p95_ms']:.2f} ms, "
+                    f"{metrics['distinct_talks']:.2f} distinct talks"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "benchmark": "retrieval",
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "config": options,
+        "results": results,
+    }
+    Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {options['output']}")
+
+
+if __name__ == "__main__":
+    cli()
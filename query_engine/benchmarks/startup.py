@@ -0,0 +1,210 @@
+"""
+Startup benchmark of the query engine: time to live, time to ready, startup stages and first questions.
+
+Starts the query engine (`src/handler.py`) on a prebuilt Chroma collection `--runs` times, with the OpenAI
+embeddings and chat completions served by the local stub of the load test (`benchmarks.stub_openai`), and
+measures from the start of the process:
+    - the time until the liveness probe (`/api/health`) succeeds, i.e. the server listens
+    - the time until the readiness probe (`/api/ready`) succeeds, i.e. the engine is warmed up
+    - the time of each startup stage, as reported by the readiness probe (imports, index, warm-up steps...)
+    - the resident memory of the engine once ready, and its peak after the questions (Linux only, 0 elsewhere)
+    - the latency of the first question answered once ready, and of a second, different, question
+
+    cd query_engine
+    python -m benchmarks.startup run --chroma-db-path ../chroma_db --collection-name tedx --runs 3 --output results.json
+    python -m benchmarks.startup run ... --engine-option warm-up=false --output cold.json
+    python -m benchmarks.startup run ... --engine-option storage-mode=snapshot --output snapshot.json
+    python -m benchmarks.startup compare baseline.json results.json
+
+The report has the median over the runs of every metric and stage, and the runs themselves. Without
+warm-up, the first question pays for loading the indexes and connecting to the APIs, which is what the
+gap between the first and the second question measures.
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import click
+import numpy as np
+
+from benchmarks.load_test import ENGINE_URL, _latency_distribution, start_engine, stop_engine, wait_until_ready
+
+RESULTS_FORMAT_VERSION = 2
+# Answered once the engine is ready, the second one different from the first so that it is not cached
+QUESTIONS = ("Di cosa parla il talk sulla musica?", "Chi ha parlato di cibo e alimentazione?")
+
+# Metrics compared by `compare`, all better when lower
+COMPARED_METRICS = ("live_seconds", "ready_seconds", "ready_rss_mb", "peak_rss_mb", "first_query_ms", "second_query_ms")
+
+
+def read_rss_mb(pid: int) -> tuple[float, float]:
+    """Return the resident and peak resident memory of a process in MB, read from /proc (0 where unavailable)."""
+    try:
+        lines = Path(f"/proc/{pid}/status").read_text(encoding="ascii").splitlines()
+    except OSError:
+        return 0.0, 0.0
+    fields = {name: value.split()[0] for name, _, value in (line.partition(":") for line in lines) if value.strip()}
+    return int(fields.get("VmRSS", 0)) / 1024, int(fields.get("VmHWM", 0)) / 1024
+
+
+def ask(base_url: str, question: str) -> float:
+    """Ask a question through the API, returning its latency in milliseconds."""
+    import httpx  # noqa: PLC0415
+
+    start = time.perf_counter()
+    response = httpx.post(f"{base_url}/api/query", json={"question": question}, timeout=120)
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_startup(options: dict, api_base: str, log_path: Path) -> dict:
+    """
+    Start the engine once, wait for it to be live then ready, and answer the `QUESTIONS`.
+
+    Returns:
+        dict: Time to live and to ready from the start of the process, startup stages reported by the engine,
+            and latency of the questions
+    """
+    import httpx  # noqa: PLC0415
+
+    start = time.perf_counter()
+    process = start_engine(options, api_base, log_path)
+    try:
+        timeout, poll_seconds = options["startup_timeout"], options["poll_seconds"]
+        wait_until_ready(ENGINE_URL, timeout, process, probe="/api/health", poll_seconds=poll_seconds)
+        live_seconds = time.perf_counter() - start
+        wait_until_ready(ENGINE_URL, timeout, process, poll_seconds=poll_seconds)
+        ready_seconds = time.perf_counter() - start
+        startup = httpx.get(f"{ENGINE_URL}/api/ready", timeout=5).json().get("startup", {})
+        ready_rss_mb, _ = read_rss_mb(process.pid)
+        first_query_ms, second_query_ms = (ask(ENGINE_URL, question) for question in QUESTIONS)
+        _, peak_rss_mb = read_rss_mb(process.pid)
+    finally:
+        stop_engine(process)
+    return {
+        "live_seconds": round(live_seconds, 3),
+        "ready_seconds": round(ready_seconds, 3),
+        "stage_seconds": startup.get("stage_seconds", {}),
+        "ready_rss_mb": round(ready_rss_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "first_query_ms": round(first_query_ms, 1),
+        "second_query_ms": round(second_query_ms, 1),
+    }
+
+
+def summarize(runs: list[dict]) -> dict:
+    """Return the median over the runs of every metric and of every startup stage."""
+    summary = {metric: round(float(np.median([run[metric] for run in runs])), 3) for metric in COMPARED_METRICS}
+    stages = dict.fromkeys(stage for run in runs for stage in run["stage_seconds"])
+    summary["stage_seconds"] = {
+        stage: round(float(np.median([run["stage_seconds"].get(stage, 0.0) for run in runs])), 3) for stage in stages
+    }
+    return summary
+
+
+@click.group()
+def cli():
+    """Benchmark the startup of the query engine."""
+
+
+@cli.command()
+@click.option("--chroma-db-path", required=True, type=click.Path(exists=True, file_okay=False))
+@click.option("--collection-name", required=True)
+@click.option("--embedding-model", default="text-embedding-3-small", help="Model name sent to the stub")
+@click.option("--llm-model", default="gpt-4o-mini", help="Model name sent to the stub")
+@click.option("--runs", default=3, type=click.IntRange(min=1), help="Number of engine starts")
+@click.option("--embedding-latency", default="0.05", callback=_latency_distribution, help="Stub embedding latency")
+@click.option("--llm-latency", default="0.3", callback=_latency_distribution, help="Stub LLM latency")
+@click.option(
+    "--engine-option",
+    "engine_options",
+    multiple=True,
+    help="Option of the engine handler, as name=value (e.g. warm-up=false), repeatable",
+)
+@click.option("--startup-timeout", default=300.0, type=float, help="Seconds to wait for the engine to be ready")
+@click.option("--poll-seconds", default=0.05, type=click.FloatRange(min=0.01), help="Period of the probe requests")
+@click.option("--output", default="startup_benchmark.json", type=click.Path(dir_okay=False))
+def run(**options):
+    """Start the engine `--runs` times and write the startup times and first question latencies to JSON."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+    from components.vector_store import chromadb  # noqa: PLC0415
+
+    from benchmarks.stub_openai import StubOpenAIServer  # noqa: PLC0415
+
+    collection = chromadb.PersistentClient(path=options["chroma_db_path"]).get_collection(options["collection_name"])
+    dimensions = len(collection.get(limit=1, include=["embeddings"])["embeddings"][0])
+    stub = StubOpenAIServer(
+        embedding_latency=options["embedding_latency"], llm_latency=options["llm_latency"], dimensions=dimensions
+    ).start()
+    runs = []
+    try:
+        for i in range(options["runs"]):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                log_path = Path(tmp_dir) / "engine.log"
+                try:
+                    result = measure_startup(options, stub.api_base, log_path)
+                except RuntimeError:
+                    click.echo(log_path.read_text(encoding="utf-8")[-5000:], err=True)
+                    raise
+            runs.append(result)
+            stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stage_seconds"].items())
+            click.echo(
+                f"run {i + 1}: live {result['live_seconds']:.2f}s, ready {result['ready_seconds']:.2f}s, "
+                f"RSS {result['ready_rss_mb']:.0f} MB (peak {result['peak_rss_mb']:.0f} MB), "
+                f"first query {result['first_query_ms']:.0f} ms, second {result['second_query_ms']:.0f} ms ({stages})"
+            )
+    finally:
+        stub.stop()
+
+    config = options | {
+        "embedding_latency": str(options["embedding_latency"]),
+        "llm_latency": str(options["llm_latency"]),
+        "engine_options": list(options["engine_options"]),
+    }
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "benchmark": "startup",
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "config": config,
+        "results": summarize(runs),
+        "runs": runs,
+    }
+    Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {options['output']}")
+
+
+@cli.command()
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("candidate", type=click.Path(exists=True, dir_okay=False))
+@click.option("--tolerance", default=0.1, type=float, help="Relative change tolerated before flagging a regression")
+def compare(baseline: str, candidate: str, tolerance: float):
+    """Compare the medians of two result files, stages included, exiting with status 1 on regressions."""
+    before = json.loads(Path(baseline).read_text(encoding="utf-8"))["results"]
+    after = json.loads(Path(candidate).read_text(encoding="utf-8"))["results"]
+
+    regressions = 0
+    # Reports of an earlier format version lack the memory metrics
+    for metric in (metric for metric in COMPARED_METRICS if metric in before and metric in after):
+        change = (after[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+        regressions += change > tolerance
+        flag = "  REGRESSION" if change > tolerance else ""
+        click.echo(f"{metric:<18} {before[metric]:>10.2f} -> {after[metric]:>10.2f} ({change:+.1%}){flag}")
+    # Stages are not flagged, they explain the change of the time to ready
+    for stage, seconds in after["stage_seconds"].items():
+        previous = before["stage_seconds"].get(stage)
+        change = "new" if previous is None else f"{seconds - previous:+.2f}s"
+        click.echo(f"  {stage:<20} {'-' if previous is None else f'{previous:.2f}':>8} -> {seconds:>8.2f} ({change})")
+
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,108 @@
+"""
+In-process stand-in for the LLM, used to benchmark the chat engines without calling the paid API.
+
+The stub answers every call after a fixed delay and counts its calls. It follows the ReAct format when
+prompted by an agent (a tool call first, then a final answer once it has seen the tool observation), so
+the agent chat mode goes through the same steps as with a real model.
+"""
+
+import asyncio
+import time
+from typing import Any
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+STUB_ANSWER = "Secondo il talk, la risposta è nei passaggi recuperati."
+
+
+class StubLLM(CustomLLM):
+    """
+    LLM answering after `latency_seconds`, without network calls.
+
+    Attributes:
+        latency_seconds (float): Delay of every call, before the first token when streaming
+        calls (int): Number of calls made so far
+        answer (str): The answer returned to anything but agent reasoning prompts
+    """
+
+    latency_seconds: float = 0.0
+    calls: int = 0
+    answer: str = STUB_ANSWER
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=16384, num_output=512, model_name="stub")
+
+    def _reply(self, prompt: str) -> str:
+        if "Action Input" not in prompt:
+            return self.answer
+        # The ReAct system prompt describes the format with one "Observation:", tool results add more
+        if prompt.count("Observation:") > 1:
+            return f"Thought: I can answer without using any more tools.\nAnswer: {self.answer}"
+        return 'Thought: I need to use a tool.\nAction: query_engine_tool\nAction Input: {"input": "domanda"}'
+
+    def _tokens(self, text: str) -> CompletionResponseGen:
+        streamed = ""
+        for i, word in enumerate(text.split(" ")):
+            delta = word if i == 0 else f" {word}"
+            streamed += delta
+            yield CompletionResponse(text=streamed, delta=delta)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:  # noqa: ARG002
+        self.calls += 1
+        time.sleep(self.latency_seconds)
+        return CompletionResponse(text=self._reply(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:  # noqa: ARG002
+        self.calls += 1
+        time.sleep(self.latency_seconds)
+        return self._tokens(self._reply(prompt))
+
+    # The async methods sleep without blocking the event loop, so that latency budgets can interrupt them
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:  # noqa: ARG002
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        return CompletionResponse(text=self._reply(prompt))
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:  # noqa: ARG002
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        tokens = self._tokens(self._reply(prompt))
+
+        async def gen() -> CompletionResponseAsyncGen:
+            for token in tokens:
+                yield token
+
+        return gen()
+
+    @llm_chat_callback()
+    async def achat(self, messages: list[ChatMessage], **kwargs: Any) -> ChatResponse:  # noqa: ARG002
+        response = await self.acomplete(self.messages_to_prompt(messages), formatted=True)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=response.text))
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: list[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:  # noqa: ARG002
+        tokens = await self.astream_complete(self.messages_to_prompt(messages), formatted=True)
+
+        async def gen() -> ChatResponseAsyncGen:
+            async for token in tokens:
+                message = ChatMessage(role=MessageRole.ASSISTANT, content=token.text)
+                yield ChatResponse(message=message, delta=token.delta)
+
+        return gen()
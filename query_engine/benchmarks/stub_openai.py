@@ -0,0 +1,308 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions endpoints, used to load test the query engine.
+
+The engine is pointed at the server with `OPENAI_API_BASE`, so that it runs unchanged, network client
+included, without calling the paid API. Every request waits for a delay drawn from a latency
+distribution, configured separately for embeddings and chat completions:
+    - `constant:0.2` (or just `0.2`): always 0.2 seconds
+    - `uniform:0.1,0.5`: between 0.1 and 0.5 seconds
+    - `normal:0.5,0.1`: mean 0.5 seconds, standard deviation 0.1, clipped at 0
+    - `lognormal:0.5,0.4`: median 0.5 seconds, sigma 0.4 of the underlying normal (long tail, like real APIs)
+    - `exponential:0.3`: mean 0.3 seconds
+
+Embeddings are deterministic pseudo-random unit vectors derived from the text hash, and chat completions
+a canned answer, streamed word by word when requested. The model list only lists a "stub" model.
+Connections are kept alive between requests, like the real API, except after a streamed answer.
+"""
+
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+import numpy as np
+
+from benchmarks.stub_llm import STUB_ANSWER
+
+HTTP_OK = 200
+HTTP_NOT_FOUND = 404
+HTTP_SERVER_ERROR = 500
+# Number of parameters of each latency distribution
+DISTRIBUTIONS = {"constant": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """
+    Distribution of the latency of a stub endpoint, in seconds.
+
+    Attributes:
+        kind (str): One of `DISTRIBUTIONS`
+        params (tuple[float, ...]): Parameters of the distribution, see the module docstring
+    """
+
+    kind: str = "constant"
+    params: tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """
+        Parse a `kind:param,param` specification, a bare number being a constant latency.
+
+        Raises:
+            ValueError: If the kind is unknown, or the number of parameters wrong
+        """
+        kind, _, params = spec.partition(":") if ":" in spec else ("constant", "", spec)
+        if kind not in DISTRIBUTIONS:
+            error_msg = f"Unknown latency distribution {kind!r}, expected one of {', '.join(DISTRIBUTIONS)}"
+            raise ValueError(error_msg)
+        values = tuple(float(param) for param in params.split(",") if param.strip())
+        if len(values) != DISTRIBUTIONS[kind] or any(value < 0 for value in values):
+            error_msg = f"Latency distribution {kind!r} takes {DISTRIBUTIONS[kind]} non-negative parameters, got {spec!r}"
+            raise ValueError(error_msg)
+        return cls(kind, values)
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a latency, in seconds."""
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * math.exp(rng.gauss(0, sigma)) if median else 0.0
+        return rng.expovariate(1 / self.params[0]) if self.params[0] else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(f'{param:g}' for param in self.params)}"
+
+
+@dataclass
+class StubStats:
+    """
+    Counters of the requests served by the stub server.
+
+    Attributes:
+        embedding_requests (int): Number of embedding requests
+        embedded_texts (int): Number of texts embedded
+        chat_requests (int): Number of chat completion requests, streamed or not
+        errors (int): Number of requests failed with an injected HTTP 500
+        max_in_flight (int): Maximum number of requests served concurrently
+    """
+
+    embedding_requests: int = 0
+    embedded_texts: int = 0
+    chat_requests: int = 0
+    errors: int = 0
+    max_in_flight: int = 0
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server emulating the OpenAI embeddings and chat completions endpoints.
+
+    Attributes:
+        embedding_latency (LatencyDistribution): Latency of the embedding requests
+        llm_latency (LatencyDistribution): Latency of the chat completion requests, before the first token
+        error_rate (float): Probability of failing a request with HTTP 500
+        dimensions (int): Dimension of the returned embeddings, that of the collection queried by the engine
+        answer (str): The answer of every chat completion
+        stats (StubStats): Counters of the served requests
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        embedding_latency: LatencyDistribution | None = None,
+        llm_latency: LatencyDistribution | None = None,
+        error_rate: float = 0.0,
+        dimensions: int = 1536,
+        answer: str = STUB_ANSWER,
+        seed: int = 0,
+    ):
+        super().__init__((host, port), _StubOpenAIHandler)
+        self.embedding_latency = embedding_latency or LatencyDistribution()
+        self.llm_latency = llm_latency or LatencyDistribution()
+        self.error_rate = error_rate
+        self.dimensions = dimensions
+        self.answer = answer
+        self.stats = StubStats()
+        self.lock = threading.Lock()
+        self._in_flight = 0
+        self._random = random.Random(seed)  # noqa: S311
+
+    @property
+    def api_base(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        """Serve requests on a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats = StubStats()
+
+    def stats_dict(self) -> dict:
+        with self.lock:
+            return asdict(self.stats)
+
+    def embedding(self, text: str) -> list[float]:
+        """Return the deterministic unit embedding of a text."""
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def admit(self, counter: str, latency: LatencyDistribution) -> tuple[bool, float]:
+        """Count a request, returning whether it fails with an injected error and its latency."""
+        with self.lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+            failed = self._random.random() < self.error_rate
+            self.stats.errors += failed
+            return failed, latency.sample(self._random)
+
+    def track_in_flight(self, delta: int) -> None:
+        with self.lock:
+            self._in_flight += delta
+            self.stats.max_in_flight = max(self.stats.max_in_flight, self._in_flight)
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients closing the connection before the answer, e.g. hedged requests losing the race, are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _StubOpenAIHandler(BaseHTTPRequestHandler):
+    server: StubOpenAIServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self) -> None:
+        self._send_json(HTTP_SERVER_ERROR, {"error": {"message": "Injected server error", "type": "stub"}})
+
+    def do_GET(self) -> None:
+        # Only the model list, requested by the engine warm-up to open its connection
+        if self.path.endswith("/models"):
+            self._send_json(HTTP_OK, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+        else:
+            self._send_json(HTTP_NOT_FOUND, {"error": {"message": f"Unknown endpoint {self.path}"}})
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.track_in_flight(1)
+        try:
+            if self.path.endswith("/embeddings"):
+                self._embeddings(body)
+            elif self.path.endswith("/chat/completions"):
+                self._chat_completions(body)
+            else:
+                self._send_json(HTTP_NOT_FOUND, {"error": {"message": f"Unknown endpoint {self.path}"}})
+        finally:
+            self.server.track_in_flight(-1)
+
+    def _embeddings(self, body: dict) -> None:
+        server = self.server
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        failed, latency = server.admit("embedding_requests", server.embedding_latency)
+        time.sleep(latency)
+        if failed:
+            self._send_error()
+            return
+        with server.lock:
+            server.stats.embedded_texts += len(texts)
+
+        data = [{"object": "embedding", "index": i, "embedding": server.embedding(text)} for i, text in enumerate(texts)]
+        num_tokens = sum(len(text.split()) for text in texts)
+        usage = {"prompt_tokens": num_tokens, "total_tokens": num_tokens}
+        self._send_json(HTTP_OK, {"object": "list", "data": data, "model": body["model"], "usage": usage})
+
+    def _chat_completions(self, body: dict) -> None:
+        server = self.server
+        failed, latency = server.admit("chat_requests", server.llm_latency)
+        time.sleep(latency)
+        if failed:
+            self._send_error()
+            return
+
+        prompt_tokens = sum(len(str(message.get("content") or "").split()) for message in body["messages"])
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(server.answer.split()),
+            "total_tokens": prompt_tokens + len(server.answer.split()),
+        }
+        completion = {"id": "chatcmpl-stub", "created": int(time.time()), "model": body["model"]}
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": server.answer}
+            choice = {"index": 0, "message": message, "finish_reason": "stop"}
+            self._send_json(HTTP_OK, completion | {"object": "chat.completion", "choices": [choice], "usage": usage})
+            return
+
+        # Streamed word by word as server-sent events, the connection is closed at the end of the stream
+        self.send_response(HTTP_OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = server.answer.split(" ")
+        chunk = completion | {"object": "chat.completion.chunk"}
+        for i, word in enumerate(words):
+            delta = {"role": "assistant", "content": word} if i == 0 else {"content": f" {word}"}
+            choice = {"index": 0, "delta": delta, "finish_reason": "stop" if i == len(words) - 1 else None}
+            self.wfile.write(f"data: {json.dumps(chunk | {'choices': [choice]})}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=8100, type=int)
+@click.option("--embedding-latency", default="lognormal:0.05,0.3", help="Embedding latency distribution")
+@click.option("--llm-latency", default="lognormal:0.8,0.4", help="LLM latency distribution")
+@click.option("--error-rate", default=0.0, type=click.FloatRange(0, 1), help="Share of requests failing with HTTP 500")
+@click.option("--dimensions", default=1536, type=int, help="Dimension of the embeddings, that of the collection")
+@click.option("--seed", default=0, type=int)
+def serve(host: str, port: int, embedding_latency: str, llm_latency: str, **options):
+    """Serve the stub until interrupted, e.g. for an engine started with OPENAI_API_BASE=http://<host>:<port>/v1."""
+    server = StubOpenAIServer(
+        host,
+        port,
+        embedding_latency=LatencyDistribution.parse(embedding_latency),
+        llm_latency=LatencyDistribution.parse(llm_latency),
+        **options,
+    )
+    click.echo(f"Serving the stub OpenAI API at {server.api_base}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -3,4 +3,33 @@ exec poetry run python handler.py \
     --chroma-db-path "$CHROMA_DB_PATH" \
     --collection-name "$COLLECTION_NAME" \
     --embedding-model "$EMBEDDING_MODEL" \
-    --llm-model "$LLM_MODEL"
\ No newline at end of file
+    --llm-model "$LLM_MODEL" \
+    --embedding-cache-path "$EMBEDDING_CACHE_PATH" \
+    --embedding-cache-max-size-mb "${EMBEDDING_CACHE_MAX_SIZE_MB:-1024}" \
+    --storage-mode "${STORAGE_MODE:-chroma}" \
+    --snapshot-rescore-top-k "${SNAPSHOT_RESCORE_TOP_K:-0}" \
+    --max-sessions "${MAX_CHAT_SESSIONS:-1000}" \
+    --session-ttl-seconds "${CHAT_SESSION_TTL_SECONDS:-3600}" \
+    --concurrency-limit "${QUERY_CONCURRENCY:-16}" \
+    --answer-cache-threshold "${ANSWER_CACHE_THRESHOLD:-0.95}" \
+    --answer-cache-path "$ANSWER_CACHE_PATH" \
+    --answer-cache-max-entries "${ANSWER_CACHE_MAX_ENTRIES:-1000}" \
+    --answer-cache-ttl-seconds "${ANSWER_CACHE_TTL_SECONDS:-86400}" \
+    --retrieval-mode "${RETRIEVAL_MODE:-hybrid}" \
+    --entity-filters "${ENTITY_FILTERS:-true}" \
+    --talk-top-k "${TALK_TOP_K:-0}" \
+    --chat-mode "${CHAT_MODE:-condense_plus_context}" \
+    --similarity-top-k "${SIMILARITY_TOP_K:-2}" \
+    --latency-budget-seconds "${LATENCY_BUDGET_SECONDS:-0}" \
+    --context-compression "${CONTEXT_COMPRESSION:-true}" \
+    --context-token-budget "${CONTEXT_TOKEN_BUDGET:-0}" \
+    --coalesce-queries "${COALESCE_QUERIES:-true}" \
+    --http-max-connections "${HTTP_MAX_CONNECTIONS:-100}" \
+    --http-keepalive-seconds "${HTTP_KEEPALIVE_SECONDS:-30}" \
+    --http-connect-timeout "${HTTP_CONNECT_TIMEOUT:-5}" \
+    --http-timeout "${HTTP_TIMEOUT:-60}" \
+    --http-max-retries "${HTTP_MAX_RETRIES:-3}" \
+    --http-hedge-quantile "${HTTP_HEDGE_QUANTILE:-0}" \
+    --api "${QUERY_API:-true}" \
+    --metrics "${QUERY_METRICS:-true}" \
+    --warm-up "${WARM_UP:-true}"
\ No newline at end of file
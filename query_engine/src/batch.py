@@ -0,0 +1,83 @@
+"""
+Offline batch question answering, through the same retrieval and answering path as the service.
+
+Reads the questions from a JSONL file (one {"id": ..., "question": ...} object per line) and appends one
+JSONL record per question to the output: the answer, the talks of the retrieved chunks, the LLM calls and
+tokens, and the latency of each stage. Each question is answered in its own chat session, independently
+of the others, and up to `--concurrency` questions are answered at once.
+
+Runs are resumable: running again with the same output skips the questions already answered and answers
+the failed ones again. When a question appears more than once in the output, its last record is the
+current one.
+
+    python batch.py --chroma-db-path ../chroma_db --collection-name tedx --embedding-model text-embedding-3-small \\
+        --llm-model gpt-4o-mini --input questions.jsonl --output answers.jsonl --concurrency 8
+"""
+
+import asyncio
+import uuid
+
+import click
+from components.batch_queries import read_questions, run_batch
+from components.query_trace import QueryTrace, trace_query
+from handler import pipeline_options
+from interfaces import RAGQueryInterface
+from loguru import logger as log
+from main import initialize_rag_interface
+
+
+def make_answer_fn(rag_interface: RAGQueryInterface):
+    """Return a function answering a question in a new session, dropped once answered, and returning its trace."""
+
+    async def answer(question: str) -> tuple[str, QueryTrace]:
+        session_id = f"batch-{uuid.uuid4().hex}"
+        try:
+            with trace_query() as trace:
+                return await rag_interface.answer(question, session_id, follow_up=False), trace
+        finally:
+            rag_interface.sessions.reset(session_id)
+
+    return answer
+
+
+@click.command()
+@pipeline_options
+@click.option("--input", "input_path", required=True, type=click.Path(exists=True, dir_okay=False), help="JSONL questions")
+@click.option("--output", "output_path", required=True, type=click.Path(dir_okay=False), help="JSONL answers, appended to")
+@click.option("--concurrency", default=8, type=click.IntRange(min=1), help="Maximum number of questions answered at once")
+@click.option("--max-retries", default=2, type=click.IntRange(min=0), help="Retries of a failed or timed out question")
+@click.option("--retry-backoff-seconds", default=1.0, type=click.FloatRange(min=0), help="Initial delay between retries")
+@click.option("--overwrite", is_flag=True, help="Answer every question again, truncating the output, instead of resuming")
+def run(
+    input_path: str,
+    output_path: str,
+    *,
+    concurrency: int,
+    max_retries: int,
+    retry_backoff_seconds: float,
+    overwrite: bool,
+    **options,
+):
+    """
+    Answer the questions of a JSONL file and write the answers, retrieved talks, tokens and latencies to JSONL.
+    """
+    questions = read_questions(input_path)
+    rag_interface = initialize_rag_interface(max_sessions=concurrency, **options)
+    stats = asyncio.run(
+        run_batch(
+            questions,
+            make_answer_fn(rag_interface),
+            output_path,
+            concurrency=concurrency,
+            resume=not overwrite,
+            max_retries=max_retries,
+            backoff_base=retry_backoff_seconds,
+        )
+    )
+    if stats.failed:
+        log.error("{} questions failed, run the command again to retry them", stats.failed)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,367 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import httpx
+from loguru import logger as log
+
+# Timeouts, conflicts, rate limits and transient server errors: the same request may succeed when sent again
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+HTTP_CLIENT_ERROR = 400
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+# The hedging delay is a quantile of the latency of the last requests to the same endpoint
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+@dataclass
+class HTTPClientStats:
+    """
+    Counters of the requests sent by the HTTP clients, shared by the sync and async clients.
+
+    Attributes:
+        requests (int): Number of requests sent, retries and hedges included
+        retries (int): Number of requests sent again after a retryable failure
+        hedges (int): Number of duplicate requests sent because the original one was slow
+        hedge_wins (int): Number of hedges answered before the original request
+    """
+
+    requests: int = 0
+    retries: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self) -> dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "retries": self.retries, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+class LatencyWindow:
+    """Latency of the last successful requests to each endpoint, from sending them to receiving the headers."""
+
+    def __init__(self, size: int = LATENCY_WINDOW, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.size = size
+        self.min_samples = min_samples
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.size)).append(seconds)
+
+    def quantile(self, endpoint: str, q: float) -> float | None:
+        """Return the `q` quantile of the latency of an endpoint, None until `min_samples` requests are recorded."""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retries of the failed requests, with jittered exponential backoff.
+
+    Attributes:
+        max_retries (int): Maximum number of retries of a request
+        backoff_base (float): Initial backoff delay, in seconds
+        backoff_max (float): Maximum backoff delay, in seconds, Retry-After included
+    """
+
+    max_retries: int = 3
+    backoff_base: float = BACKOFF_BASE_SECONDS
+    backoff_max: float = BACKOFF_MAX_SECONDS
+
+    def retry_delay(self, attempt: int, response: httpx.Response | None = None) -> float | None:
+        """
+        Return the delay before retrying a request, or None if it must not be retried.
+
+        Args:
+            attempt (int): Number of the failed attempt, from 0
+            response (httpx.Response, optional): The response, None if the request failed without one
+                (connection error, timeout)
+
+        Returns:
+            float | None: The delay requested by the server through the Retry-After headers if any, the
+                backoff delay otherwise, None if the response is not retryable or the retries are exhausted
+        """
+        if attempt >= self.max_retries or (response is not None and response.status_code not in RETRYABLE_STATUS_CODES):
+            return None
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return min(self.backoff_max, self.backoff_base * 2**attempt) * random.uniform(0.5, 1.0)  # noqa: S311
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Return the delay requested by the server, in seconds, through the Retry-After(-ms) headers, if any."""
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return float(response.headers[header]) / scale
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def _cap_connect_timeout(request: httpx.Request, connect_timeout: float | None) -> None:
+    """Cap the connect timeout of a request, the OpenAI client setting a single timeout for every phase."""
+    if connect_timeout is None:
+        return
+    timeout = dict(request.extensions.get("timeout", {}))
+    timeout["connect"] = min(timeout.get("connect") or connect_timeout, connect_timeout)
+    request.extensions["timeout"] = timeout
+
+
+class RetryTransport(httpx.BaseTransport):
+    """
+    Transport retrying the requests failed with a retryable status or a connection error.
+
+    Attributes:
+        transport (httpx.BaseTransport): The transport sending the requests, holding the connection pool
+        retry_policy (RetryPolicy): When and after how long to retry
+        stats (HTTPClientStats): Counters of the requests
+        connect_timeout (float, optional): Maximum time to open a connection, in seconds
+    """
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        retry_policy: RetryPolicy,
+        stats: HTTPClientStats,
+        connect_timeout: float | None = None,
+    ):
+        self.transport = transport
+        self.retry_policy = retry_policy
+        self.stats = stats
+        self.connect_timeout = connect_timeout
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _cap_connect_timeout(request, self.connect_timeout)
+        attempt = 0
+        while True:
+            self.stats.count("requests")
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                delay = self.retry_policy.retry_delay(attempt)
+                if delay is None:
+                    raise
+                reason = repr(e)
+            else:
+                delay = self.retry_policy.retry_delay(attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+                reason = f"HTTP {response.status_code}"
+            self.stats.count("retries")
+            log.warning("Request to {} failed ({}), retrying in {:.2f}s", request.url.path, reason, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """
+    Asynchronous `RetryTransport`, hedging the slow requests when enabled.
+
+    A request not answered after the `hedge_quantile` quantile of the latency of its endpoint is sent a
+    second time, and the first answer wins, the other request being cancelled: the tail latency no longer
+    depends on a single slow connection or server. At most a `1 - hedge_quantile` share of the requests is
+    duplicated, bounding the extra load.
+
+    Connections are bound to the event loop that opened them: the transport must be used from a single,
+    long-lived event loop (the loop of the server, the loop of the concurrent embedder), and closed on it.
+
+    Attributes:
+        transport (httpx.AsyncBaseTransport): The transport sending the requests, with its connection pool
+        retry_policy (RetryPolicy): When and after how long to retry
+        stats (HTTPClientStats): Counters of the requests
+        connect_timeout (float, optional): Maximum time to open a connection, in seconds
+        hedge_quantile (float): Quantile of the latency after which a request is hedged, 0 to disable hedging
+        latencies (LatencyWindow): Latency of the last requests to each endpoint
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        retry_policy: RetryPolicy,
+        stats: HTTPClientStats,
+        *,
+        connect_timeout: float | None = None,
+        hedge_quantile: float = 0.0,
+        latencies: LatencyWindow | None = None,
+    ):
+        self.transport = transport
+        self.retry_policy = retry_policy
+        self.stats = stats
+        self.connect_timeout = connect_timeout
+        self.hedge_quantile = hedge_quantile
+        self.latencies = latencies or LatencyWindow()
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        self.stats.count("requests")
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        if response.status_code < HTTP_CLIENT_ERROR:
+            self.latencies.record(request.url.path, time.perf_counter() - start)
+        return response
+
+    async def _send_hedged(self, request: httpx.Request) -> httpx.Response:
+        delay = self.latencies.quantile(request.url.path, self.hedge_quantile) if self.hedge_quantile else None
+        if delay is None:
+            return await self._send(request)
+
+        primary = asyncio.ensure_future(self._send(request))
+        tasks = [primary]
+        response = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Hedges are capped to the share of requests slower than the quantile: when the server slows down
+            # for everyone, duplicating every request would only add to its load
+            if done or self.stats.hedges >= (1 - self.hedge_quantile) * self.stats.requests:
+                response = await primary
+                return response
+            self.stats.count("hedges")
+            hedge = asyncio.ensure_future(self._send(request))
+            tasks.append(hedge)
+            # The first answer wins, unless the request failed while the other one can still succeed
+            for future in asyncio.as_completed(tasks):
+                try:
+                    response = await future
+                    break
+                except httpx.TransportError:
+                    if all(task.done() for task in tasks):
+                        raise
+            if hedge.done() and not hedge.cancelled() and hedge.exception() is None and hedge.result() is response:
+                self.stats.count("hedge_wins")
+            return response
+        finally:
+            await _discard_losers(tasks, response)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _cap_connect_timeout(request, self.connect_timeout)
+        attempt = 0
+        while True:
+            try:
+                response = await self._send_hedged(request)
+            except httpx.TransportError as e:
+                delay = self.retry_policy.retry_delay(attempt)
+                if delay is None:
+                    raise
+                reason = repr(e)
+            else:
+                delay = self.retry_policy.retry_delay(attempt, response)
+                if delay is None:
+                    return response
+                await response.aclose()
+                reason = f"HTTP {response.status_code}"
+            self.stats.count("retries")
+            log.warning("Request to {} failed ({}), retrying in {:.2f}s", request.url.path, reason, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+async def _discard_losers(tasks: list[asyncio.Future], winner: httpx.Response | None) -> None:
+    """Cancel the requests still in flight and close the responses that lost the race."""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled() and task.exception() is None and task.result() is not winner:
+            await task.result().aclose()
+
+
+@dataclass
+class HTTPClients:
+    """
+    Sync and async clients of the OpenAI API, sharing their settings and counters.
+
+    Attributes:
+        client (httpx.Client): The client of the sync calls
+        async_client (httpx.AsyncClient): The client of the async calls
+        timeout (float): Timeout of the requests, in seconds
+        stats (HTTPClientStats): Counters of the requests of both clients
+    """
+
+    client: httpx.Client
+    async_client: httpx.AsyncClient
+    timeout: float
+    stats: HTTPClientStats
+
+    def openai_kwargs(self) -> dict:
+        """Return the arguments of the llama_index OpenAI models sending their requests through these clients."""
+        # The clients retry: the OpenAI client must not retry on top of them
+        return {
+            "http_client": self.client,
+            "async_http_client": self.async_client,
+            "timeout": self.timeout,
+            "max_retries": 0,
+        }
+
+
+def initialize_http_clients(
+    *,
+    max_connections: int = 100,
+    keepalive_seconds: float = 30.0,
+    connect_timeout: float = 5.0,
+    timeout: float = 60.0,
+    max_retries: int = 3,
+    hedge_quantile: float = 0.0,
+) -> HTTPClients:
+    """
+    Initialize the pooled, keep-alive HTTP clients of the OpenAI API, retrying and optionally hedging requests.
+
+    Args:
+        max_connections (int): Maximum number of connections of each pool, all kept alive when idle
+        keepalive_seconds (float): Time an idle connection is kept open for the next requests
+        connect_timeout (float): Maximum time to open a connection, in seconds
+        timeout (float): Maximum time to send a request or receive each part of the response, in seconds
+        max_retries (int): Maximum number of retries of a request, with jittered exponential backoff
+        hedge_quantile (float): Quantile of the recent latency after which an async request is sent again,
+            e.g. 0.95, 0 to disable hedging
+
+    Returns:
+        HTTPClients: The sync and async clients
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=keepalive_seconds
+    )
+    client_timeout = httpx.Timeout(timeout, connect=connect_timeout)
+    retry_policy = RetryPolicy(max_retries=max_retries)
+    stats = HTTPClientStats()
+
+    transport = RetryTransport(httpx.HTTPTransport(limits=limits), retry_policy, stats, connect_timeout=connect_timeout)
+    async_transport = AsyncRetryTransport(
+        httpx.AsyncHTTPTransport(limits=limits),
+        retry_policy,
+        stats,
+        connect_timeout=connect_timeout,
+        hedge_quantile=hedge_quantile,
+    )
+    log.info(
+        "HTTP clients initialized. Max connections: {}, keep-alive: {}s, retries: {}, hedging: {}",
+        max_connections,
+        keepalive_seconds,
+        max_retries,
+        f"p{hedge_quantile * 100:g}" if hedge_quantile else "disabled",
+    )
+    return HTTPClients(
+        client=httpx.Client(transport=transport, timeout=client_timeout),
+        async_client=httpx.AsyncClient(transport=async_transport, timeout=client_timeout),
+        timeout=timeout,
+        stats=stats,
+    )
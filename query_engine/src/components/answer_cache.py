@@ -0,0 +1,271 @@
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from loguru import logger as log
+
+MANIFEST_SUFFIX = ".manifest.json"
+ANSWER_CACHE_FORMAT_VERSION = 1
+
+
+def normalize_question(text: str) -> str:
+    """Normalize unicode, case and whitespace so that trivially different questions share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def get_index_version(chroma_db_path: str, collection_name: str) -> str:
+    """
+    Return a version of the indexed collection, changing whenever the data_loader updates it.
+
+    The version is a hash of the ingestion manifest written by the data_loader next to the Chroma database.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        str: Short hash of the manifest, or "unversioned" if there is no manifest
+    """
+    manifest_path = Path(chroma_db_path) / f"{collection_name}{MANIFEST_SUFFIX}"
+    if not manifest_path.exists():
+        return "unversioned"
+    return hashlib.sha256(manifest_path.read_bytes()).hexdigest()[:16]
+
+
+@dataclass
+class CachedAnswer:
+    """
+    Answer stored in the semantic cache.
+
+    Attributes:
+        question (str): The question as it was first asked
+        answer (str): The answer generated for it
+        embedding (np.ndarray): L2-normalized float32 embedding of the question
+        created_at (float): Unix time the answer was generated at
+    """
+
+    question: str
+    answer: str
+    embedding: np.ndarray
+    created_at: float
+
+
+@dataclass
+class CacheLookup:
+    """
+    Result of a semantic cache lookup.
+
+    Attributes:
+        answer (str, optional): The cached answer, None on a miss
+        embedding (list[float]): Embedding of the question, to store the answer with `put` after a miss
+        similarity (float): Cosine similarity with the closest cached question, 0 if the cache is empty
+    """
+
+    answer: str | None
+    embedding: list[float]
+    similarity: float = 0.0
+
+
+class SemanticAnswerCache:
+    """
+    Cache of generated answers, looked up by cosine similarity of the question embeddings.
+
+    A question whose embedding has a cosine similarity of at least `threshold` with a cached question gets
+    the cached answer, without retrieval nor LLM calls. Entries are scoped: a cache persisted with a
+    different scope (e.g. another collection, index version or model) is discarded on load. Entries older
+    than `ttl_seconds` expire, and the least recently used ones are evicted above `max_entries`.
+
+    Only standalone questions should be looked up and stored: answers to follow-up questions depend
+    on the chat history.
+
+    Attributes:
+        embed_model (BaseEmbedding): Embedding model of the questions
+        threshold (float): Minimum cosine similarity of a hit, in (0, 1]
+        scope (str): Scope of the entries, e.g. collection name and index version
+        max_entries (int): Maximum number of cached answers
+        ttl_seconds (float): Lifetime of a cached answer
+        persist_path (Path, optional): File the cache is loaded from and saved to
+        persist_interval_seconds (float): Minimum time between two saves of the cache
+        hits (int): Number of lookups answered from the cache
+        misses (int): Number of lookups not found in the cache
+        bypassed (int): Number of questions not looked up because they depend on the chat history
+    """
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        *,
+        threshold: float = 0.95,
+        scope: str = "",
+        max_entries: int = 1000,
+        ttl_seconds: float = 86400,
+        persist_path: str | Path | None = None,
+        persist_interval_seconds: float = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        if not 0 < threshold <= 1:
+            error_msg = "threshold must be in (0, 1]"
+            raise ValueError(error_msg)
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.scope = scope
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_interval_seconds = persist_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._clock = clock
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._keys: list[str] = []
+        self._matrix: np.ndarray | None = None
+        self._lock = threading.Lock()
+        self._last_save = clock()
+        self._dirty = False
+        if self.persist_path is not None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Return the cache counters."""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hit_rate,
+        }
+
+    def record_bypass(self) -> None:
+        """Count a question not looked up because it depends on the chat history."""
+        self.bypassed += 1
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _search(self, embedding: np.ndarray) -> tuple[str | None, float]:
+        if not self._entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key].embedding for key in self._keys])
+        similarities = self._matrix @ embedding
+        best = int(np.argmax(similarities))
+        return self._keys[best], float(similarities[best])
+
+    async def alookup(self, question: str) -> CacheLookup:
+        """
+        Look up the answer of the cached question most similar to a question.
+
+        Args:
+            question (str): The question
+
+        Returns:
+            CacheLookup: The cached answer (None on a miss), the question embedding and the similarity
+        """
+        embedding = await self.embed_model.aget_query_embedding(question)
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+
+        with self._lock:
+            self._expire(self._clock())
+            key, similarity = self._search(vector)
+            if key is None or similarity < self.threshold:
+                self.misses += 1
+                return CacheLookup(answer=None, embedding=embedding, similarity=similarity)
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            answer = self._entries[key].answer
+
+        log.info("Answer cache hit (similarity {:.3f}, hit rate {:.1%})", similarity, self.hit_rate)
+        return CacheLookup(answer=answer, embedding=embedding, similarity=similarity)
+
+    def put(self, question: str, answer: str, embedding: list[float]) -> None:
+        """
+        Store the answer of a question.
+
+        Args:
+            question (str): The question
+            answer (str): The generated answer
+            embedding (list[float]): Embedding of the question, as returned by `alookup`
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        key = normalize_question(question)
+
+        with self._lock:
+            self._entries[key] = CachedAnswer(question=question, answer=answer, embedding=vector, created_at=self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            self._dirty = True
+
+        if self.persist_path is not None and self._clock() - self._last_save >= self.persist_interval_seconds:
+            self.save()
+
+    def load(self) -> None:
+        """Load the cache from `persist_path`, discarding it if it was saved with a different scope."""
+        if self.persist_path is None or not self.persist_path.exists():
+            return
+        with np.load(self.persist_path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            if header.get("format_version") != ANSWER_CACHE_FORMAT_VERSION or header.get("scope") != self.scope:
+                log.info("Discarding answer cache {} saved with a different scope", self.persist_path)
+                return
+            embeddings = data["embeddings"]
+
+        with self._lock:
+            for entry, embedding in zip(header["entries"], embeddings, strict=True):
+                self._entries[normalize_question(entry["question"])] = CachedAnswer(
+                    question=entry["question"], answer=entry["answer"], embedding=embedding, created_at=entry["created_at"]
+                )
+            self._expire(self._clock())
+            self._matrix = None
+        log.info("Loaded {} cached answers from {}", len(self._entries), self.persist_path)
+
+    def save(self) -> None:
+        """Atomically write the cache to `persist_path`, if it changed since the last save."""
+        if self.persist_path is None or not self._dirty:
+            return
+        with self._lock:
+            entries = list(self._entries.values())
+            self._dirty = False
+            self._last_save = self._clock()
+
+        header = {
+            "format_version": ANSWER_CACHE_FORMAT_VERSION,
+            "scope": self.scope,
+            "entries": [
+                {"question": entry.question, "answer": entry.answer, "created_at": entry.created_at} for entry in entries
+            ],
+        }
+        embeddings = np.stack([entry.embedding for entry in entries]) if entries else np.zeros((0, 0), dtype=np.float32)
+
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.persist_path.with_name(f"{self.persist_path.name}.tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(f, header=np.array(json.dumps(header, ensure_ascii=False)), embeddings=embeddings)
+        tmp_path.replace(self.persist_path)
+        log.debug("Saved {} cached answers to {}", len(entries), self.persist_path)
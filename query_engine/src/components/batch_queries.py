@@ -0,0 +1,243 @@
+import asyncio
+import json
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from loguru import logger as log
+
+if TYPE_CHECKING:
+    from components.query_trace import QueryTrace
+
+# Answers a question, returning the answer and the trace of the question
+AnswerFn = Callable[[str], Awaitable[tuple[str, "QueryTrace"]]]
+
+
+@dataclass
+class BatchQuestion:
+    """
+    A question of a batch.
+
+    Attributes:
+        id (str): Identifier of the question, used to resume a batch
+        question (str): The question
+    """
+
+    id: str
+    question: str
+
+
+@dataclass
+class BatchStats:
+    """
+    Summary of a batch run.
+
+    Attributes:
+        answered (int): Questions answered in this run
+        failed (int): Questions still failing after every retry
+        skipped (int): Questions already answered in a previous run
+        wall_seconds (float): Duration of the run
+        latencies (list[float]): Latency of every question answered in this run, in seconds
+    """
+
+    answered: int = 0
+    failed: int = 0
+    skipped: int = 0
+    wall_seconds: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+
+
+def read_questions(path: str | Path) -> list[BatchQuestion]:
+    """
+    Read the questions of a batch from a JSONL file.
+
+    Every line is an object with a "question" and an optional "id", the line number by default.
+
+    Args:
+        path (str | Path): The JSONL file
+
+    Returns:
+        list[BatchQuestion]: The questions, in file order
+
+    Raises:
+        ValueError: If a line has no question, or two questions have the same id
+    """
+    questions, ids = [], set()
+    with Path(path).open(encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            question = record.get("question")
+            if not isinstance(question, str) or not question.strip():
+                error_msg = f"Line {line_number} of {path} has no question"
+                raise ValueError(error_msg)
+            question_id = str(record.get("id", line_number))
+            if question_id in ids:
+                error_msg = f"Duplicate question id {question_id!r} at line {line_number} of {path}"
+                raise ValueError(error_msg)
+            ids.add(question_id)
+            questions.append(BatchQuestion(id=question_id, question=question))
+    return questions
+
+
+def read_completed(path: str | Path) -> set[str]:
+    """
+    Return the ids of the questions answered without error in the output of a previous run.
+
+    A last line cut short by an interrupted run is ignored, so the question is answered again.
+
+    Args:
+        path (str | Path): The JSONL output file
+
+    Returns:
+        set[str]: Ids of the answered questions
+    """
+    completed = set()
+    if not Path(path).exists():
+        return completed
+    with Path(path).open(encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Records are appended, so a question failed in a run and answered in a later one is completed
+            if record.get("error") is None:
+                completed.add(str(record["id"]))
+    return completed
+
+
+def _terminate_last_line(path: str | Path) -> None:
+    """End the last line of a file cut short by an interrupted run, so that it does not corrupt the next record."""
+    if not Path(path).exists() or not Path(path).stat().st_size:
+        return
+    with Path(path).open("rb+") as file:
+        file.seek(-1, 2)
+        if file.read(1) != b"\n":
+            file.write(b"\n")
+
+
+async def answer_question(
+    question: BatchQuestion,
+    answer_fn: AnswerFn,
+    max_retries: int = 2,
+    backoff_base: float = 1.0,
+    backoff_max: float = 30.0,
+) -> dict:
+    """
+    Answer a question, retrying failures with jittered exponential backoff.
+
+    Args:
+        question (BatchQuestion): The question
+        answer_fn (AnswerFn): Answers a question, e.g. in a new chat session, and returns its trace
+        max_retries (int): Number of retries after a failure, timeouts included
+        backoff_base (float): Initial backoff delay, in seconds
+        backoff_max (float): Maximum backoff delay, in seconds
+
+    Returns:
+        dict: The output record: answer and error, number of attempts and, for answered questions, talks of the
+            retrieved chunks, LLM calls and tokens, and latency per stage
+    """
+    record = {"id": question.id, "question": question.question, "answer": None, "error": None}
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        try:
+            answer, trace = await answer_fn(question.question)
+        except Exception as e:  # noqa: BLE001  recorded in the output: one failed question must not stop the batch
+            record["error"] = f"{type(e).__name__}: {e}"
+            log.warning("Question {} failed (attempt {}/{}): {}", question.id, attempt + 1, max_retries + 1, record["error"])
+            if attempt < max_retries:
+                await asyncio.sleep(min(backoff_max, backoff_base * 2**attempt) * random.uniform(0.5, 1.0))  # noqa: S311
+            continue
+
+        latencies = {"total": time.perf_counter() - start} | trace.stage_seconds
+        return record | {
+            "answer": answer,
+            "error": None,
+            "attempts": attempt + 1,
+            "youtube_ids": trace.youtube_ids,
+            "llm_calls": trace.llm_calls,
+            "prompt_tokens": trace.prompt_tokens,
+            "completion_tokens": trace.completion_tokens,
+            "latency_seconds": {stage: round(seconds, 4) for stage, seconds in latencies.items()},
+        }
+    return record | {"attempts": max_retries + 1}
+
+
+async def run_batch(
+    questions: list[BatchQuestion],
+    answer_fn: AnswerFn,
+    output_path: str | Path,
+    concurrency: int = 8,
+    resume: bool = True,
+    **retry_options: float,
+) -> BatchStats:
+    """
+    Answer a batch of questions concurrently, appending a JSONL record per question to the output as it is answered.
+
+    Up to `concurrency` questions are answered at once, so a batch of N questions takes about
+    N / concurrency times the latency of a question. With `resume`, the questions answered in a previous run
+    with the same output are skipped, and the failed ones answered again.
+
+    Args:
+        questions (list[BatchQuestion]): The questions
+        answer_fn (AnswerFn): Answers a question, e.g. in a new chat session, and returns its trace
+        output_path (str | Path): The JSONL output file, appended to
+        concurrency (int): Maximum number of questions answered at once
+        resume (bool): Skip the questions already answered in the output, instead of truncating it
+        **retry_options: Retry arguments of `answer_question`
+
+    Returns:
+        BatchStats: The summary of the run
+    """
+    stats = BatchStats()
+    completed = read_completed(output_path) if resume else set()
+    pending: asyncio.Queue[BatchQuestion] = asyncio.Queue()
+    for question in questions:
+        if question.id in completed:
+            stats.skipped += 1
+        else:
+            pending.put_nowait(question)
+    log.info("Answering {} questions ({} already answered) with concurrency {}", pending.qsize(), stats.skipped, concurrency)
+
+    start = time.perf_counter()
+    # Records are a few KB written once per answer, blocking the event loop for that is negligible
+    if resume:
+        _terminate_last_line(output_path)
+    with Path(output_path).open("a" if resume else "w", encoding="utf-8") as output:  # noqa: ASYNC230
+
+        async def worker() -> None:
+            while not pending.empty():
+                question = pending.get_nowait()
+                record = await answer_question(question, answer_fn, **retry_options)
+                # Each record is flushed as soon as the question is answered, so an interrupted run can be resumed
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                if record["error"] is None:
+                    stats.answered += 1
+                    stats.latencies.append(record["latency_seconds"]["total"])
+                else:
+                    stats.failed += 1
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, pending.qsize()))))
+    stats.wall_seconds = time.perf_counter() - start
+
+    if stats.latencies:
+        log.info(
+            "Batch done in {:.1f}s: {} answered, {} failed, {} skipped, latency p50 {:.2f}s p95 {:.2f}s, {:.2f} questions/s",
+            stats.wall_seconds,
+            stats.answered,
+            stats.failed,
+            stats.skipped,
+            float(np.percentile(stats.latencies, 50)),
+            float(np.percentile(stats.latencies, 95)),
+            stats.answered / stats.wall_seconds,
+        )
+    else:
+        log.info("Batch done: {} answered, {} failed, {} skipped", stats.answered, stats.failed, stats.skipped)
+    return stats
@@ -0,0 +1,94 @@
+from llama_index.core import Settings
+from llama_index.core.agent import AgentRunner
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.chat_engine import CondensePlusContextChatEngine
+from llama_index.core.chat_engine.types import BaseChatEngine
+from llama_index.core.llms import LLM
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.tools import QueryEngineTool
+
+# "condense_plus_context": follow-up questions are rewritten with the conversation history (one LLM call),
+#     then one retrieval and one LLM call for the answer
+# "context": one retrieval with the message as is and one LLM call for the answer, follow-up questions are
+#     not rewritten
+# "agent": an agent deciding whether to query the retriever, two or three sequential LLM calls per message
+CHAT_MODES = ("condense_plus_context", "context", "agent")
+DEFAULT_CHAT_MODE = "condense_plus_context"
+
+SYSTEM_PROMPT = (
+    "Sei un assistente AI utile e informativo che è stato addestrato "
+    "per utilizzare una base di conoscenza. Sii veritiero e non inventare "
+    "informazioni. Rispondi alle domande solo utilizzando il contesto fornito."
+    "Non aggiungere informazioni non pertinenti."
+)
+# The rewritten question is what is retrieved: it must stay in Italian for BM25 and keep the names for the
+# entity filters
+CONDENSE_PROMPT = (
+    "Data la seguente conversazione tra un utente e un assistente AI e una domanda di follow-up dell'utente, "
+    "riformula la domanda di follow-up come una domanda autonoma, in italiano, mantenendo i nomi propri "
+    "di persone, eventi e luoghi.\n\n"
+    "Conversazione:\n{chat_history}\n\n"
+    "Domanda di follow-up: {question}\n"
+    "Domanda autonoma: "
+)
+CONTEXT_PROMPT = (
+    "Di seguito i passaggi dei talk TEDx pertinenti alla domanda:\n"
+    "{context_str}\n\n"
+    "Istruzione: usa la conversazione precedente e i passaggi qui sopra per rispondere all'utente."
+)
+MEMORY_TOKEN_LIMIT = 1500
+
+
+def create_chat_engine(
+    retriever: BaseRetriever,
+    llm: LLM | None = None,
+    chat_mode: str = DEFAULT_CHAT_MODE,
+    node_postprocessors: list[BaseNodePostprocessor] | None = None,
+) -> BaseChatEngine:
+    """
+    Create the chat engine of a user session, with its own conversational memory.
+
+    The "condense_plus_context" and "context" modes make a fixed number of LLM calls per message: at most
+    one to rewrite a follow-up question, and one for the answer. The "agent" mode is an agent with a query
+    engine tool over `retriever`, as built by `VectorStoreIndex.as_chat_engine(chat_mode="best")`, which
+    makes a call to choose the tool, one to answer from the retrieved chunks and one for the final answer.
+
+    Args:
+        retriever (BaseRetriever): The retriever of the chat engine
+        llm (LLM, optional): The language model, `Settings.llm` if None
+        chat_mode (str): One of `CHAT_MODES`
+        node_postprocessors (list[BaseNodePostprocessor], optional): Applied to the retrieved chunks before
+            they are put in the prompt, e.g. the context compression
+
+    Returns:
+        BaseChatEngine: The chat engine
+
+    Raises:
+        ValueError: If the chat mode is unknown
+    """
+    llm = llm or Settings.llm
+    memory = ChatMemoryBuffer.from_defaults(token_limit=MEMORY_TOKEN_LIMIT)
+    if chat_mode == "agent":
+        query_engine = RetrieverQueryEngine.from_args(retriever, llm=llm, node_postprocessors=node_postprocessors)
+        return AgentRunner.from_llm(
+            tools=[QueryEngineTool.from_defaults(query_engine=query_engine)],
+            llm=llm,
+            memory=memory,
+            system_prompt=SYSTEM_PROMPT,
+            verbose=True,
+        )
+    if chat_mode in {"condense_plus_context", "context"}:
+        return CondensePlusContextChatEngine.from_defaults(
+            retriever,
+            llm=llm,
+            memory=memory,
+            system_prompt=SYSTEM_PROMPT,
+            context_prompt=CONTEXT_PROMPT,
+            condense_prompt=CONDENSE_PROMPT,
+            skip_condense=chat_mode == "context",
+            node_postprocessors=node_postprocessors,
+        )
+    error_msg = f"Unknown chat mode {chat_mode!r}, expected one of {CHAT_MODES}"
+    raise ValueError(error_msg)
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.chat_engine.types import BaseChatEngine
+from loguru import logger as log
+
+
+@dataclass
+class ChatSession:
+    """
+    Chat engine of a single user session.
+
+    Attributes:
+        chat_engine (BaseChatEngine): The session chat engine, with its own conversational memory
+        last_used (float): Monotonic time of the last access
+        lock (asyncio.Lock): Serializes the messages of the session, so that its memory stays consistent
+    """
+
+    chat_engine: BaseChatEngine
+    last_used: float
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def remember(self, question: str, answer: str) -> None:
+        """
+        Add an exchange answered without the chat engine (e.g. from a cache) to the session memory.
+
+        Args:
+            question (str): The user message
+            answer (str): The assistant answer
+        """
+        # Agents expose their memory publicly, the other chat engines keep it private
+        memory = getattr(self.chat_engine, "memory", None) or getattr(self.chat_engine, "_memory", None)
+        if memory is None:
+            return
+        memory.put(ChatMessage(role=MessageRole.USER, content=question))
+        memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+
+
+class ChatSessionPool:
+    """
+    Pool of per-session chat engines with LRU and TTL eviction.
+
+    Each session gets its own chat engine (and conversational memory) on first access. Sessions idle for
+    more than `ttl_seconds` are dropped, and the least recently used session is evicted when the pool
+    holds `max_sessions` sessions, so that the memory held by the pool is bounded by
+    `max_sessions` times the memory of a chat engine.
+
+    Attributes:
+        chat_engine_factory (Callable[[], BaseChatEngine]): Builds the chat engine of a new session
+        max_sessions (int): Maximum number of sessions held at once
+        ttl_seconds (float): Idle time after which a session is dropped
+    """
+
+    def __init__(
+        self,
+        chat_engine_factory: Callable[[], BaseChatEngine],
+        max_sessions: int = 1000,
+        ttl_seconds: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_sessions <= 0:
+            error_msg = "max_sessions must be positive"
+            raise ValueError(error_msg)
+        self.chat_engine_factory = chat_engine_factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _expire(self, now: float) -> None:
+        # Sessions are ordered by last access, so expired ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get(self, session_id: str) -> ChatSession:
+        """
+        Return the session, creating it if needed, and mark it as most recently used.
+
+        Args:
+            session_id (str): Session identifier, e.g. the Gradio session hash
+
+        Returns:
+            ChatSession: The session
+        """
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+                session = ChatSession(chat_engine=self.chat_engine_factory(), last_used=now)
+                self._sessions[session_id] = session
+                log.debug("Created chat session {} ({} active)", session_id, len(self._sessions))
+            else:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def reset(self, session_id: str) -> None:
+        """
+        Drop a session, so that its next message starts with an empty memory.
+
+        Args:
+            session_id (str): Session identifier
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
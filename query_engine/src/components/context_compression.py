@@ -0,0 +1,171 @@
+import math
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle, TextNode
+from llama_index.core.utils import get_tokenizer
+from loguru import logger as log
+
+# Chunk metadata written by the data_loader: number of tokens, and the talk of the chunk
+NUM_TOKENS_KEY = "num_tokens"
+TALK_KEY = "youtube_id"
+# Chunks of the same talk separated by at most this many characters (the whitespace between two chunks split
+# without overlap) are merged too
+MAX_GAP_CHARS = 2
+
+
+def count_tokens(node: TextNode) -> int:
+    """
+    Return the number of tokens of a chunk, as stored by the data_loader or, for older collections, counted.
+
+    Args:
+        node (TextNode): The chunk
+
+    Returns:
+        int: The number of tokens of its text
+    """
+    num_tokens = node.metadata.get(NUM_TOKENS_KEY)
+    if isinstance(num_tokens, int):
+        return num_tokens
+    return len(get_tokenizer()(node.get_content(metadata_mode=MetadataMode.NONE)))
+
+
+def _has_offsets(node: TextNode) -> bool:
+    if node.start_char_idx is None or node.end_char_idx is None:
+        return False
+    # Offsets are only usable if the text is exactly the slice of the transcript they point to
+    return node.end_char_idx - node.start_char_idx == len(node.text)
+
+
+def _merge(passage: NodeWithScore, result: NodeWithScore, tokens: int) -> tuple[NodeWithScore, int]:
+    """Append a chunk starting before the end of a passage (or right after it) to the passage."""
+    node, chunk = passage.node, result.node
+    score = max(passage.score or 0.0, result.score or 0.0)
+    if chunk.end_char_idx <= node.end_char_idx:
+        # Contained in the passage, e.g. a duplicate
+        return NodeWithScore(node=node, score=score), tokens
+
+    num_tokens = count_tokens(chunk)
+    if chunk.start_char_idx < node.end_char_idx:
+        new_text = chunk.text[node.end_char_idx - chunk.start_char_idx :]
+        # The stored count is for the whole chunk, the tokens of its new part are prorated
+        new_tokens = math.ceil(num_tokens * len(new_text) / len(chunk.text))
+        text = node.text + new_text
+    else:
+        new_tokens = num_tokens
+        text = f"{node.text} {chunk.text}"
+
+    merged = node.model_copy()
+    merged.text = text
+    merged.end_char_idx = chunk.end_char_idx
+    merged.metadata = {**node.metadata, NUM_TOKENS_KEY: tokens + new_tokens}
+    return NodeWithScore(node=merged, score=score), tokens + new_tokens
+
+
+def merge_chunks(nodes: list[NodeWithScore], max_gap_chars: int = MAX_GAP_CHARS) -> list[NodeWithScore]:
+    """
+    Merge the overlapping and adjacent chunks of the same talk into contiguous passages.
+
+    Chunks are located in their transcript by the character offsets stored at ingestion, and the text
+    they share with the previous chunk is dropped. Chunks with identical text are kept once. A passage
+    gets the best score of its chunks, and the number of tokens of its text under `num_tokens`.
+
+    Args:
+        nodes (list[NodeWithScore]): The retrieved chunks
+        max_gap_chars (int): Maximum number of characters between two chunks merged as adjacent
+
+    Returns:
+        list[NodeWithScore]: The passages, best score first
+    """
+    passages: list[NodeWithScore] = []
+    talks: dict[str, list[NodeWithScore]] = {}
+    seen_texts = set()
+    for result in nodes:
+        node = result.node
+        if node.get_content(metadata_mode=MetadataMode.NONE) in seen_texts:
+            continue
+        seen_texts.add(node.get_content(metadata_mode=MetadataMode.NONE))
+        talk = node.metadata.get(TALK_KEY) or node.ref_doc_id
+        if isinstance(node, TextNode) and talk is not None and _has_offsets(node):
+            talks.setdefault(talk, []).append(result)
+        else:
+            passages.append(result)
+
+    for results in talks.values():
+        results.sort(key=lambda result: result.node.start_char_idx)
+        passage, tokens = results[0], count_tokens(results[0].node)
+        for result in results[1:]:
+            if result.node.start_char_idx <= passage.node.end_char_idx + max_gap_chars:
+                passage, tokens = _merge(passage, result, tokens)
+            else:
+                passages.append(passage)
+                passage, tokens = result, count_tokens(result.node)
+        passages.append(passage)
+
+    return sorted(passages, key=lambda result: result.score or 0.0, reverse=True)
+
+
+def pack_passages(passages: list[NodeWithScore], token_budget: int) -> list[NodeWithScore]:
+    """
+    Keep the best passages whose total number of tokens fits in a budget.
+
+    Passages are taken best score first, skipping those that do not fit. The best passage is always kept,
+    so that the answer has some context even if it alone exceeds the budget.
+
+    Args:
+        passages (list[NodeWithScore]): The passages, best score first
+        token_budget (int): Maximum number of tokens, 0 for no limit
+
+    Returns:
+        list[NodeWithScore]: The kept passages, best score first
+    """
+    if not token_budget:
+        return passages
+    packed, used = [], 0
+    for passage in passages:
+        tokens = count_tokens(passage.node)
+        if packed and used + tokens > token_budget:
+            continue
+        packed.append(passage)
+        used += tokens
+    return packed
+
+
+class ContextCompressor(BaseNodePostprocessor):
+    """
+    Node postprocessor shrinking the retrieved chunks before they are put in the prompt.
+
+    Chunks are split with an overlap, so neighbouring chunks of a talk repeat part of their text: they are
+    merged back into contiguous passages (see `merge_chunks`), then the best passages are packed into
+    `token_budget` tokens (see `pack_passages`).
+
+    Attributes:
+        token_budget (int): Maximum number of tokens of the context, 0 for no limit
+        max_gap_chars (int): Maximum number of characters between two chunks merged as adjacent
+    """
+
+    token_budget: int = Field(default=0, ge=0, description="Maximum number of tokens of the context, 0 for no limit")
+    max_gap_chars: int = Field(
+        default=MAX_GAP_CHARS, ge=0, description="Maximum number of characters between chunks merged as adjacent"
+    )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextCompressor"
+
+    def _postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,  # noqa: ARG002
+    ) -> list[NodeWithScore]:
+        if not nodes:
+            return nodes
+        passages = pack_passages(merge_chunks(nodes, self.max_gap_chars), self.token_budget)
+        log.info(
+            "Context compressed from {} chunks ({} tokens) to {} passages ({} tokens)",
+            len(nodes),
+            sum(count_tokens(result.node) for result in nodes),
+            len(passages),
+            sum(count_tokens(passage.node) for passage in passages),
+        )
+        return passages
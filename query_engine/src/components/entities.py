@@ -0,0 +1,160 @@
+import json
+import re
+import unicodedata
+from collections.abc import Iterable
+from pathlib import Path
+
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+from loguru import logger as log
+
+ENTITY_CATALOG_SUFFIX = ".entities.json"
+ENTITY_CATALOG_FORMAT_VERSION = 1
+
+WORD_PATTERN = re.compile(r"\w+")
+# YouTube video ids are 11 characters long, e.g. Aj5Eewf_5ug
+YOUTUBE_ID_PATTERN = re.compile(r"(?<![\w-])[\w-]{11}(?![\w-])")
+TEDX_PREFIX = "tedx"
+
+# Key of the trie nodes holding the entities whose name ends at that node
+_ENTITIES = ""
+
+
+def get_entity_catalog_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the entity catalog of a collection, as built by the data_loader.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the entity catalog file
+    """
+    return Path(chroma_db_path) / f"{collection_name}{ENTITY_CATALOG_SUFFIX}"
+
+
+def _words(text: str) -> list[str]:
+    # Accents are dropped, so that "Forli" matches "TEDxForlì"
+    decomposed = unicodedata.normalize("NFKD", text)
+    return WORD_PATTERN.findall("".join(char for char in decomposed if not unicodedata.combining(char)))
+
+
+class EntityMatcher:
+    """
+    Find the speakers, TEDx events and YouTube videos of the collection mentioned in a question.
+
+    Names are matched on whole words, ignoring case and accents, with a trie of the words of every name,
+    so a question is scanned once whatever the size of the catalog. Speakers match on their full name,
+    and single-word names (e.g. stage names) only when capitalized in the question, since they could be
+    common words. Events also match with a space after "TEDx" ("TEDx Torino"). YouTube ids match exactly.
+
+    Attributes:
+        entities (dict[str, set[str]]): Values of each metadata field of the catalog
+    """
+
+    def __init__(self, entities: dict[str, Iterable[str]]):
+        self.entities = {field: set(values) for field, values in entities.items()}
+        self._trie: dict = {}
+        for value in self.entities.get("speech_author", ()):
+            words = _words(value)
+            self._add(words, "speech_author", value, capitalized=len(words) == 1)
+        for value in self.entities.get("speech_location", ()):
+            words = _words(value)
+            self._add(words, "speech_location", value)
+            if words and words[0].casefold().startswith(TEDX_PREFIX) and len(words[0]) > len(TEDX_PREFIX):
+                self._add([words[0][: len(TEDX_PREFIX)], words[0][len(TEDX_PREFIX) :], *words[1:]], "speech_location", value)
+
+    @classmethod
+    def from_catalog(cls, catalog_path: str | Path) -> "EntityMatcher":
+        """
+        Load the entity catalog built by the data_loader.
+
+        Args:
+            catalog_path (str | Path): Path of the entity catalog file
+
+        Returns:
+            EntityMatcher: The matcher of the entities of the catalog
+        """
+        with Path(catalog_path).open(encoding="utf-8") as f:
+            catalog = json.load(f)
+        if catalog["format_version"] != ENTITY_CATALOG_FORMAT_VERSION:
+            error_msg = f"Unsupported entity catalog format version: {catalog['format_version']}"
+            raise ValueError(error_msg)
+        matcher = cls(catalog["fields"])
+        log.info(
+            "Loaded entity catalog {}: {}",
+            catalog_path,
+            ", ".join(f"{len(values)} {field}" for field, values in matcher.entities.items()),
+        )
+        return matcher
+
+    def _add(self, words: list[str], field: str, value: str, capitalized: bool = False) -> None:
+        if not words:
+            return
+        node = self._trie
+        for word in words:
+            node = node.setdefault(word.casefold(), {})
+        node.setdefault(_ENTITIES, []).append((field, value, capitalized))
+
+    def match(self, question: str) -> dict[str, list[str]]:
+        """
+        Find the entities mentioned in a question.
+
+        Where names overlap, the longest one wins.
+
+        Args:
+            question (str): The question
+
+        Returns:
+            dict[str, list[str]]: The matched values of each metadata field, fields without matches excluded
+        """
+        matches: dict[str, set[str]] = {}
+        words = _words(question)
+        start = 0
+        while start < len(words):
+            node, end, found = self._trie, start, []
+            for position in range(start, len(words)):
+                node = node.get(words[position].casefold())
+                if node is None:
+                    break
+                entities = [
+                    (field, value)
+                    for field, value, capitalized in node.get(_ENTITIES, [])
+                    if not capitalized or words[start][0].isupper()
+                ]
+                if entities:
+                    end, found = position + 1, entities
+            for field, value in found:
+                matches.setdefault(field, set()).add(value)
+            start = end if found else start + 1
+
+        youtube_ids = self.entities.get("youtube_id", set())
+        for youtube_id in YOUTUBE_ID_PATTERN.findall(question):
+            if youtube_id in youtube_ids:
+                matches.setdefault("youtube_id", set()).add(youtube_id)
+
+        return {field: sorted(values) for field, values in matches.items()}
+
+    def filters(self, question: str) -> MetadataFilters | None:
+        """
+        Build the metadata filters restricting retrieval to the entities mentioned in a question.
+
+        Values of the same field are alternatives, different fields must all match, e.g. a speaker at an event.
+
+        Args:
+            question (str): The question
+
+        Returns:
+            MetadataFilters | None: The filters, None if the question mentions no entity
+        """
+        matches = self.match(question)
+        if not matches:
+            return None
+        return MetadataFilters(
+            filters=[
+                MetadataFilter(key=field, value=values[0])
+                if len(values) == 1
+                else MetadataFilter(key=field, value=values, operator=FilterOperator.IN)
+                for field, values in matches.items()
+            ]
+        )
@@ -0,0 +1,169 @@
+import json
+import re
+import threading
+import unicodedata
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+
+import llama_index.core
+import nltk
+import numpy as np
+from loguru import logger as log
+from nltk.corpus import stopwords
+from nltk.stem.snowball import SnowballStemmer
+
+LEXICAL_INDEX_SUFFIX = ".lexical"
+LEXICAL_INDEX_FORMAT_VERSION = 1
+# Must match the analyzer the data_loader built the index with
+ANALYZER = "italian-snowball-v1"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+_stemmer = SnowballStemmer("italian")
+# The Italian stop-word list ships with the NLTK data bundled by llama_index
+NLTK_DATA_DIR = str(Path(llama_index.core.__file__).parent / "_static" / "nltk_cache")
+
+
+@lru_cache(maxsize=1)
+def _stopwords() -> frozenset[str]:
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.append(NLTK_DATA_DIR)
+    try:
+        nltk.data.find("corpora/stopwords")
+    except LookupError:
+        nltk.download("stopwords", download_dir=NLTK_DATA_DIR, quiet=True)
+    return frozenset(stopwords.words("italian"))
+
+
+@lru_cache(maxsize=1 << 16)
+def _stem(word: str) -> str:
+    return _stemmer.stem(word)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split a text into Italian index terms, exactly like the data_loader does when building the index.
+
+    Args:
+        text (str): The text to tokenize
+
+    Returns:
+        list[str]: The terms of the text, in order
+    """
+    stop = _stopwords()
+    words = TOKEN_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+    return [_stem(word) for word in words if word not in stop and (len(word) > 1 or word.isdigit())]
+
+
+def get_lexical_index_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the lexical (BM25) index of a collection, as built by the data_loader.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the lexical index directory
+    """
+    return Path(chroma_db_path) / f"{collection_name}{LEXICAL_INDEX_SUFFIX}"
+
+
+class LexicalIndex:
+    """
+    BM25 search over the inverted index built by the data_loader.
+
+    The index is loaded on the first search (or on `load`): posting lists are memory-mapped and each query
+    is scored with vectorized NumPy operations over the posting lists of its terms.
+
+    Attributes:
+        index_path (Path): Path of the lexical index directory
+        k1 (float): BM25 term frequency saturation
+        b (float): BM25 document length normalization
+    """
+
+    def __init__(self, index_path: str | Path, k1: float = 1.2, b: float = 0.75):
+        self.index_path = Path(index_path)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._rows: dict[str, int] | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self) -> None:
+        """Load the index, if it is not loaded yet."""
+        with self._lock:
+            if self._loaded:
+                return
+            path = self.index_path
+            with (path / "lexical.json").open(encoding="utf-8") as f:
+                header = json.load(f)
+            if header["format_version"] != LEXICAL_INDEX_FORMAT_VERSION or header["analyzer"] != ANALYZER:
+                error_msg = f"Unsupported lexical index {path}: format {header['format_version']}, {header['analyzer']}"
+                raise ValueError(error_msg)
+
+            terms = (path / "terms.txt").read_text(encoding="utf-8")
+            self._term_ids = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+            node_ids = (path / "node_ids.txt").read_text(encoding="utf-8")
+            self._node_ids = node_ids.split("\n") if node_ids else []
+            self._offsets = np.load(path / "offsets.npy", mmap_mode="r")
+            self._docs = np.load(path / "postings_docs.npy", mmap_mode="r")
+            self._tfs = np.load(path / "postings_tf.npy", mmap_mode="r")
+            doc_lengths = np.load(path / "doc_lengths.npy").astype(np.float32)
+            avg_length = header["avg_length"] or 1.0
+            # Length normalization of the BM25 denominator, precomputed per chunk
+            self._norms = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+            self._loaded = True
+        log.info("Loaded lexical index {}: {} chunks, {} terms", path, len(self._node_ids), len(self._term_ids))
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self._node_ids)
+
+    def _restrict(self, scores: np.ndarray, node_ids: Iterable[str]) -> np.ndarray:
+        if self._rows is None:
+            self._rows = {node_id: row for row, node_id in enumerate(self._node_ids)}
+        rows = [self._rows[node_id] for node_id in node_ids if node_id in self._rows]
+        restricted = np.zeros_like(scores)
+        restricted[rows] = scores[rows]
+        return restricted
+
+    def search(self, query: str, top_k: int, node_ids: Iterable[str] | None = None) -> list[tuple[str, float]]:
+        """
+        Return the chunks with the best BM25 score for a query.
+
+        Args:
+            query (str): The query text
+            top_k (int): Maximum number of chunks to return
+            node_ids (Iterable[str], optional): Only return these chunks, e.g. the chunks of the talks of a speaker
+
+        Returns:
+            list[tuple[str, float]]: Chunk ids and BM25 scores, best first. Chunks sharing no term with
+                the query are not returned.
+        """
+        self.load()
+        num_docs = len(self._node_ids)
+        term_ids = {self._term_ids[term] for term in tokenize(query) if term in self._term_ids}
+        if not term_ids or top_k <= 0:
+            return []
+
+        scores = np.zeros(num_docs, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs = self._docs[start:end]
+            tfs = self._tfs[start:end].astype(np.float32)
+            idf = np.log1p((num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Chunks appear at most once per posting list, so fancy-indexed accumulation is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._norms[docs])
+
+        if node_ids is not None:
+            scores = self._restrict(scores, node_ids)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._node_ids[row], float(scores[row])) for row in candidates]
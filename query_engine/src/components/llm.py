@@ -1,16 +1,23 @@
+from typing import TYPE_CHECKING
+
 from llama_index.llms.openai import OpenAI
 from loguru import logger as log
 
+if TYPE_CHECKING:
+    from clients.http_client import HTTPClients
+
 
-def initialize_llm(model_name: str) -> OpenAI:
+def initialize_llm(model_name: str, http_clients: "HTTPClients | None" = None) -> OpenAI:
     """
     Initialize the OpenAI language model for use with LlamaIndex.
 
     Args:
         model_name (str): The name of the OpenAI model to initialize (e.g., 'gpt-3.5-turbo', 'gpt-4')
+        http_clients (HTTPClients, optional): Pooled HTTP clients sending the requests, retrying them instead of
+            the OpenAI client. The OpenAI client defaults are used if None
 
     Returns:
         OpenAI: An initialized OpenAI language model instance configured for LlamaIndex operations
     """
     log.info("Initializing OpenAI language model: {}", model_name)
-    return OpenAI(model=model_name)
+    return OpenAI(model=model_name, **(http_clients.openai_kwargs() if http_clients else {}))
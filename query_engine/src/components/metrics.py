@@ -0,0 +1,149 @@
+import bisect
+import threading
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from components.query_trace import QueryTrace
+
+# Prometheus text exposition format served on the metrics endpoint
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds of the latency histogram buckets, in seconds: from a cached answer to a slow LLM call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Outcomes of a query: answered by the chat engine, from the answer cache or by an identical query in flight,
+# over the latency budget, abandoned by the client or failed
+OUTCOMES = ("answered", "cached", "coalesced", "timeout", "cancelled", "error")
+
+# Returns the samples of a metric read at scrape time, as (labels, value) pairs
+Collector = Callable[[], list[tuple[dict[str, str], float]]]
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = {
+        name: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for name, value in labels.items()
+    }
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, in the Prometheus layout.
+
+    Attributes:
+        buckets (tuple[float, ...]): Upper bounds of the buckets, increasing, +Inf excluded
+        counts (list[int]): Number of observations in each bucket, the last one being +Inf (not cumulative)
+        sum (float): Sum of the observations
+        count (int): Number of observations
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: dict[str, str]) -> list[str]:
+        """Return the exposition lines of the histogram: cumulative buckets, sum and count."""
+        lines, cumulative = [], 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts, strict=True):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            lines.append(f"{name}_bucket{_format_labels(labels | {'le': le})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+class QueryMetrics:
+    """
+    Aggregated metrics of the answered queries, rendered in the Prometheus text format.
+
+    Every query is recorded once it is answered, from its `QueryTrace`: the outcome, the total latency,
+    the time spent in each stage (question embedding, retrieval, LLM calls), the LLM calls and the prompt,
+    completion and embedding tokens. Metrics owned by other components, such as cache hit counters and the
+    number of chat sessions, are read from them when the metrics are rendered, through collectors.
+
+    Attributes:
+        stages (tuple[str, ...]): Stages of a query with a latency histogram
+    """
+
+    def __init__(self, stages: tuple[str, ...] = ("embedding", "retrieval", "llm")):
+        self.stages = stages
+        self._lock = threading.Lock()
+        self._queries = dict.fromkeys(OUTCOMES, 0)
+        self._query_seconds = Histogram()
+        self._stage_seconds = {stage: Histogram() for stage in stages}
+        self._llm_calls = 0
+        self._tokens = {"prompt": 0, "completion": 0, "embedding": 0}
+        self._collectors: list[tuple[str, str, str, Collector]] = []
+
+    def add_collector(self, name: str, metric_type: str, description: str, collector: Collector) -> None:
+        """
+        Add a metric read from another component whenever the metrics are rendered.
+
+        Args:
+            name (str): Name of the metric
+            metric_type (str): Prometheus type of the metric, "counter" or "gauge"
+            description (str): Help text of the metric
+            collector (Collector): Returns the samples of the metric
+        """
+        self._collectors.append((name, metric_type, description, collector))
+
+    def record(self, outcome: str, seconds: float, trace: "QueryTrace | None" = None) -> None:
+        """
+        Record an answered query.
+
+        Args:
+            outcome (str): One of `OUTCOMES`
+            seconds (float): Latency of the query
+            trace (QueryTrace, optional): Trace of the query, with its time per stage and LLM usage
+        """
+        with self._lock:
+            self._queries[outcome] += 1
+            self._query_seconds.observe(seconds)
+            if trace is None:
+                return
+            # Cached answers skip retrieval and the LLM: their zero times would only skew the stage histograms
+            for stage, histogram in self._stage_seconds.items():
+                if trace.stage_seconds.get(stage):
+                    histogram.observe(trace.stage_seconds[stage])
+            self._llm_calls += trace.llm_calls
+            self._tokens["prompt"] += trace.prompt_tokens
+            self._tokens["completion"] += trace.completion_tokens
+            self._tokens["embedding"] += trace.embedding_tokens
+
+    def render(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def header(name: str, metric_type: str, description: str) -> None:
+            lines.extend((f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"))
+
+        with self._lock:
+            header("rag_queries_total", "counter", "Queries answered, by outcome")
+            lines.extend(f'rag_queries_total{{outcome="{outcome}"}} {count}' for outcome, count in self._queries.items())
+            header("rag_query_duration_seconds", "histogram", "Latency of the queries, cache lookup included")
+            lines.extend(self._query_seconds.samples("rag_query_duration_seconds", {}))
+            header("rag_stage_duration_seconds", "histogram", "Time spent in each stage of a query")
+            for stage, histogram in self._stage_seconds.items():
+                lines.extend(histogram.samples("rag_stage_duration_seconds", {"stage": stage}))
+            header("rag_llm_calls_total", "counter", "LLM calls made to answer the queries")
+            lines.append(f"rag_llm_calls_total {self._llm_calls}")
+            header("rag_tokens_total", "counter", "Tokens sent to and generated by the LLM, and embedded")
+            lines.extend(f'rag_tokens_total{{kind="{kind}"}} {count}' for kind, count in self._tokens.items())
+
+        for name, metric_type, description, collector in self._collectors:
+            header(name, metric_type, description)
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in collector())
+        return "\n".join(lines) + "\n"
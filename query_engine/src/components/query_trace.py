@@ -0,0 +1,170 @@
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.embedding import EmbeddingEndEvent, EmbeddingStartEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.events.retrieval import RetrievalEndEvent, RetrievalStartEvent
+from llama_index.core.utils import get_tokenizer
+
+# Stages of a question: embedding the question (also done by the answer cache), retrieving the chunks
+# (question embedding included) and the LLM calls (rewriting the question, answering)
+STAGES = ("embedding", "retrieval", "llm")
+TALK_KEY = "youtube_id"
+
+_START_EVENTS = {EmbeddingStartEvent: "embedding", RetrievalStartEvent: "retrieval"}
+
+_current_trace: ContextVar["QueryTrace | None"] = ContextVar("query_trace", default=None)
+_install_lock = threading.Lock()
+_handler: "QueryTraceHandler | None" = None
+
+
+@dataclass
+class QueryTrace:
+    """
+    Time per stage, LLM usage and retrieved talks of a single question, recorded by `QueryTraceHandler`.
+
+    Nested calls of a stage (e.g. a hybrid retriever calling the vector retriever, or a chat call made through
+    a completion call) are counted once, from the start of the outermost call to its end.
+
+    Attributes:
+        stage_seconds (dict[str, float]): Wall time spent in each of the `STAGES`
+        llm_calls (int): Number of LLM calls
+        prompt_tokens (int): Tokens sent to the LLM, as reported by the API or else counted
+        completion_tokens (int): Tokens generated by the LLM, as reported by the API or else counted
+        embedding_tokens (int): Tokens of the embedded texts, cached embeddings included
+        youtube_ids (list[str]): Talks of the retrieved chunks, best first, without duplicates
+    """
+
+    stage_seconds: dict[str, float] = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_tokens: int = 0
+    youtube_ids: list[str] = field(default_factory=list)
+    _open: dict[str, tuple[int, float]] = field(default_factory=dict, repr=False)
+
+    def start(self, stage: str) -> None:
+        depth, started = self._open.get(stage, (0, 0.0))
+        self._open[stage] = (depth + 1, started if depth else time.perf_counter())
+
+    def end(self, stage: str) -> bool:
+        """End a call of a stage, returning whether it was the outermost one."""
+        depth, started = self._open.get(stage, (0, 0.0))
+        if depth == 0:
+            return False
+        if depth > 1:
+            self._open[stage] = (depth - 1, started)
+            return False
+        del self._open[stage]
+        self.stage_seconds[stage] += time.perf_counter() - started
+        return True
+
+
+def _usage(raw: Any) -> tuple[int | None, int | None]:
+    """Return the prompt and completion tokens reported in a raw LLM response, if any."""
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def _record_llm_call(trace: QueryTrace, prompt: str, response: str, raw: Any) -> None:
+    prompt_tokens, completion_tokens = _usage(raw)
+    tokenizer = get_tokenizer()
+    trace.llm_calls += 1
+    trace.prompt_tokens += prompt_tokens if prompt_tokens is not None else len(tokenizer(prompt))
+    trace.completion_tokens += completion_tokens if completion_tokens is not None else len(tokenizer(response))
+
+
+class QueryTraceHandler(BaseEventHandler):
+    """LlamaIndex event handler recording the events of a question into the trace of the running context."""
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "QueryTraceHandler"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:  # noqa: ARG002
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        if isinstance(event, LLMChatStartEvent | LLMCompletionStartEvent):
+            trace.start("llm")
+        elif isinstance(event, LLMChatEndEvent):
+            if trace.end("llm") and event.response is not None:
+                prompt = "\n".join(str(message.content or "") for message in event.messages)
+                _record_llm_call(trace, prompt, str(event.response.message.content or ""), event.response.raw)
+        elif isinstance(event, LLMCompletionEndEvent):
+            if trace.end("llm"):
+                _record_llm_call(trace, event.prompt, event.response.text, event.response.raw)
+        elif isinstance(event, EmbeddingEndEvent):
+            if trace.end("embedding"):
+                tokenizer = get_tokenizer()
+                trace.embedding_tokens += sum(len(tokenizer(chunk)) for chunk in event.chunks)
+        elif type(event) in _START_EVENTS:
+            trace.start(_START_EVENTS[type(event)])
+        elif isinstance(event, RetrievalEndEvent) and trace.end("retrieval"):
+            for result in event.nodes:
+                youtube_id = result.node.metadata.get(TALK_KEY)
+                if youtube_id and youtube_id not in trace.youtube_ids:
+                    trace.youtube_ids.append(youtube_id)
+
+
+def install_query_tracing() -> None:
+    """Register the `QueryTraceHandler` on the root LlamaIndex dispatcher, once per process."""
+    global _handler  # noqa: PLW0603
+    with _install_lock:
+        if _handler is None:
+            # Load the tokenizer now rather than on a traced call, blocking the concurrent queries
+            get_tokenizer()
+            _handler = QueryTraceHandler()
+            get_dispatcher().add_event_handler(_handler)
+
+
+def current_trace() -> QueryTrace | None:
+    """Return the trace of the question answered by the running context, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_query(trace: QueryTrace | None = None) -> Iterator[QueryTrace]:
+    """
+    Record the stages of the question answered within the context into a trace.
+
+    The trace is bound to the running context, so concurrent questions, each answered in its own asyncio
+    task, get separate traces, and the tasks a question starts record into its trace. Within the context
+    of a question already traced (e.g. by the API, around the query interface) the question keeps its
+    trace, so that every caller sees the same one.
+
+    Args:
+        trace (QueryTrace, optional): Trace to record into, e.g. around each step of a streamed answer,
+            a new one by default
+
+    Yields:
+        QueryTrace: The trace of the question
+    """
+    install_query_tracing()
+    current = _current_trace.get()
+    if current is not None:
+        yield current
+        return
+    trace = trace or QueryTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
@@ -0,0 +1,243 @@
+import asyncio
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import MetadataFilters, VectorStoreQuery
+from loguru import logger as log
+
+if TYPE_CHECKING:
+    from components.entities import EntityMatcher
+    from components.lexical_index import LexicalIndex
+    from components.talk_index import TalkIndex
+
+# "vector": dense retrieval only
+# "hybrid": dense and BM25 retrieval, fused with reciprocal rank fusion
+RETRIEVAL_MODES = ("vector", "hybrid")
+
+# Smoothing constant of reciprocal rank fusion, as in the original paper
+RRF_K = 60
+
+# Maximum number of chunks matching metadata filters scored by BM25
+MAX_FILTERED_CHUNKS = 1000
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """
+    Fuse rankings of ids with reciprocal rank fusion: each id scores the sum of 1 / (k + rank) over the rankings.
+
+    Args:
+        rankings (Sequence[Sequence[str]]): Rankings of ids, best first
+        k (int): Smoothing constant, dampening the weight of the top ranks
+
+    Returns:
+        list[tuple[str, float]]: Ids and fused scores, best first (ties keep the order of first appearance)
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking, start=1):
+            scores[node_id] = scores.get(node_id, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing dense (vector) and lexical (BM25) results in a single retrieval step.
+
+    Both retrievers return `candidate_top_k` chunks, which are fused with reciprocal rank fusion. Chunks
+    found only by BM25 are fetched from the index vector store (or docstore) by id. With metadata filters,
+    BM25 only scores the chunks of the vector store matching them.
+
+    Attributes:
+        index (VectorStoreIndex): The vector index
+        lexical_index (LexicalIndex): The BM25 index over the same chunk ids
+        similarity_top_k (int): Number of fused chunks returned
+        candidate_top_k (int): Number of chunks retrieved by each retriever before fusion
+        filters (MetadataFilters, optional): Metadata filters of the retrieved chunks
+    """
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        lexical_index: "LexicalIndex",
+        similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+        candidate_top_k: int = 10,
+        filters: MetadataFilters | None = None,
+    ):
+        super().__init__()
+        self.index = index
+        self.lexical_index = lexical_index
+        self.similarity_top_k = similarity_top_k
+        self.candidate_top_k = max(candidate_top_k, similarity_top_k)
+        self.filters = filters
+        self.vector_retriever = index.as_retriever(similarity_top_k=self.candidate_top_k, filters=filters)
+
+    def _get_nodes(self, node_ids: list[str]) -> list[BaseNode]:
+        if self.index.vector_store.stores_text:
+            return self.index.vector_store.get_nodes(node_ids=node_ids)
+        return self.index.docstore.get_nodes(node_ids)
+
+    def _lexical_search(self, query_str: str) -> tuple[list[tuple[str, float]], dict[str, BaseNode]]:
+        if self.filters is None:
+            return self.lexical_index.search(query_str, self.candidate_top_k), {}
+        # The chunks matching the filters, e.g. those of a few talks, are few enough to be fetched at once:
+        # a query without embedding returns them unranked (a plain `get` with a `where` clause in Chroma)
+        result = self.index.vector_store.query(VectorStoreQuery(similarity_top_k=MAX_FILTERED_CHUNKS, filters=self.filters))
+        nodes = {node.node_id: node for node in result.nodes or []}
+        return self.lexical_index.search(query_str, self.candidate_top_k, node_ids=nodes), nodes
+
+    def _fuse(
+        self,
+        vector_results: list[NodeWithScore],
+        lexical_results: list[tuple[str, float]],
+        nodes: dict[str, BaseNode],
+    ) -> list[NodeWithScore]:
+        fused = reciprocal_rank_fusion(
+            [[result.node.node_id for result in vector_results], [node_id for node_id, _ in lexical_results]]
+        )[: self.similarity_top_k]
+
+        nodes = {**nodes, **{result.node.node_id: result.node for result in vector_results}}
+        missing = [node_id for node_id, _ in fused if node_id not in nodes]
+        if missing:
+            nodes.update((node.node_id, node) for node in self._get_nodes(missing))
+        return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in fused if node_id in nodes]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        vector_results = self.vector_retriever.retrieve(query_bundle)
+        return self._fuse(vector_results, *self._lexical_search(query_bundle.query_str))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        # The filtered `get` of the BM25 branch and the fetch of the chunks found only by BM25 are blocking
+        # vector store calls: they run in threads, so that they do not stall the other requests on the loop
+        vector_results, (lexical_results, nodes) = await asyncio.gather(
+            self.vector_retriever.aretrieve(query_bundle),
+            asyncio.to_thread(self._lexical_search, query_bundle.query_str),
+        )
+        return await asyncio.to_thread(self._fuse, vector_results, lexical_results, nodes)
+
+
+class PreFilteredRetriever(BaseRetriever):
+    """
+    Retriever searching only the chunks of the talks selected for the question.
+
+    Talks are selected, in order of precedence:
+        - by the speakers, events and videos mentioned in the question, found by `entity_matcher`
+        - by the similarity of the question with the talk vectors of `talk_index` (two-stage retrieval)
+
+    The selected talks become metadata filters of the similarity search (a `where` clause in Chroma), so
+    only their chunks are scored and sent to the LLM. If the filtered search finds nothing, e.g. a speaker
+    and an event that do not go together, the unfiltered search is used.
+
+    Attributes:
+        index (VectorStoreIndex): The vector index
+        entity_matcher (EntityMatcher, optional): The matcher of the entities of the collection
+        talk_index (TalkIndex, optional): The talk vectors, searched before the chunks
+        lexical_index (LexicalIndex, optional): If provided, vector results are fused with its BM25 results
+        similarity_top_k (int): Number of chunks returned
+        embed_model (BaseEmbedding): The embedding model of the questions, `Settings.embed_model` if None
+    """
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        entity_matcher: "EntityMatcher | None" = None,
+        *,
+        talk_index: "TalkIndex | None" = None,
+        lexical_index: "LexicalIndex | None" = None,
+        similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+        embed_model: BaseEmbedding | None = None,
+    ):
+        super().__init__()
+        self.index = index
+        self.entity_matcher = entity_matcher
+        self.talk_index = talk_index
+        self.lexical_index = lexical_index
+        self.similarity_top_k = similarity_top_k
+        self.embed_model = embed_model or Settings.embed_model
+        self.retriever = self._make_retriever()
+
+    def _make_retriever(self, filters: MetadataFilters | None = None) -> BaseRetriever:
+        if self.lexical_index is not None:
+            return HybridRetriever(self.index, self.lexical_index, self.similarity_top_k, filters=filters)
+        return self.index.as_retriever(similarity_top_k=self.similarity_top_k, filters=filters)
+
+    def _entity_filters(self, query_bundle: QueryBundle) -> MetadataFilters | None:
+        if self.entity_matcher is None:
+            return None
+        filters = self.entity_matcher.filters(query_bundle.query_str)
+        if filters is not None:
+            log.info("Retrieval filtered on {}", {f.key: f.value for f in filters.filters})
+        return filters
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        filters = self._entity_filters(query_bundle)
+        if filters is None and self.talk_index is not None:
+            # The question embedding is computed once, for both the talk and the chunk search
+            if query_bundle.embedding is None:
+                query_bundle.embedding = self.embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+            filters = self.talk_index.filters(query_bundle.embedding)
+
+        if filters is not None:
+            if results := self._make_retriever(filters).retrieve(query_bundle):
+                return results
+            log.info("No chunk matches the filters, retrieving without them")
+        return self.retriever.retrieve(query_bundle)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        filters = self._entity_filters(query_bundle)
+        if filters is None and self.talk_index is not None:
+            if query_bundle.embedding is None:
+                query_bundle.embedding = await self.embed_model.aget_agg_embedding_from_queries(query_bundle.embedding_strs)
+            filters = self.talk_index.filters(query_bundle.embedding)
+
+        if filters is not None:
+            if results := await self._make_retriever(filters).aretrieve(query_bundle):
+                return results
+            log.info("No chunk matches the filters, retrieving without them")
+        return await self.retriever.aretrieve(query_bundle)
+
+
+def initialize_retriever(
+    index: VectorStoreIndex,
+    lexical_index: "LexicalIndex | None" = None,
+    entity_matcher: "EntityMatcher | None" = None,
+    talk_index: "TalkIndex | None" = None,
+    similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+) -> BaseRetriever:
+    """
+    Initialize the retriever of the chat engines.
+
+    Args:
+        index (VectorStoreIndex): The vector index
+        lexical_index (LexicalIndex, optional): If provided, vector results are fused with its BM25 results
+        entity_matcher (EntityMatcher, optional): If provided, retrieval is restricted to the talks of the
+            speakers, events and videos mentioned in the question
+        talk_index (TalkIndex, optional): If provided, retrieval is restricted to the chunks of the talks
+            closest to the question (two-stage retrieval)
+        similarity_top_k (int): Number of chunks retrieved per question
+
+    Returns:
+        BaseRetriever: The retriever
+    """
+    if lexical_index is not None:
+        log.info("Initialized hybrid (BM25 + vector) retriever, lexical index {}", lexical_index.index_path)
+    else:
+        log.info("Initialized vector retriever")
+
+    if entity_matcher is not None or talk_index is not None:
+        if entity_matcher is not None:
+            log.info("Retrieval pre-filtered on the speakers, events and videos mentioned in the questions")
+        return PreFilteredRetriever(
+            index,
+            entity_matcher=entity_matcher,
+            talk_index=talk_index,
+            lexical_index=lexical_index,
+            similarity_top_k=similarity_top_k,
+        )
+    if lexical_index is not None:
+        return HybridRetriever(index, lexical_index, similarity_top_k=similarity_top_k)
+    return index.as_retriever(similarity_top_k=similarity_top_k)
@@ -0,0 +1,148 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+# Computation of a flight: emits its chunks through the callback it is given, and returns its result
+Producer = Callable[[Callable[[str], None]], Awaitable[Any]]
+
+
+class Flight:
+    """
+    A computation in flight, whose emitted chunks are kept so that every caller receives all of them.
+
+    Attributes:
+        chunks (list[str]): The chunks emitted so far
+        result (Any): The result of the computation, once done
+        error (BaseException, optional): The error the computation failed with, raised to every caller
+        done (bool): Whether the computation is over
+        waiters (int): Number of callers streaming the chunks
+        task (asyncio.Task, optional): The task running the computation
+    """
+
+    def __init__(self, on_abandoned: Callable[[], None]):
+        self.chunks: list[str] = []
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.done = False
+        self.waiters = 0
+        self.task: asyncio.Task | None = None
+        self._on_abandoned = on_abandoned
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Every waiter holds the event of the state it saw: set it, and give the next state a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def emit(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Yield every chunk of the computation, from the first one, as they are emitted.
+
+        The computation is abandoned when the last caller streaming it goes away before it is done.
+
+        Yields:
+            str: The next chunk
+
+        Raises:
+            BaseException: The error the computation failed with, once the chunks emitted before it are yielded
+        """
+        self.waiters += 1
+        try:
+            sent = 0
+            while True:
+                changed = self._changed
+                while sent < len(self.chunks):
+                    yield self.chunks[sent]
+                    sent += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                # Set if anything changed since `changed` was read, even while the consumer had the last chunk
+                await changed.wait()
+        finally:
+            self.waiters -= 1
+            if not self.waiters and not self.done:
+                self._on_abandoned()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical computations into a single one, shared by all of their callers.
+
+    The first caller of a key starts its computation in a task. The callers of the same key joining while it
+    is in flight stream the chunks it emitted so far, then the next ones as they are emitted, and share its
+    result or its error, instead of computing it again. A computation is forgotten once done, so that the next
+    caller starts a new one, and cancelled once every caller has gone away.
+
+    Must be used from a single event loop.
+
+    Attributes:
+        started (int): Number of computations started
+        joined (int): Number of callers that joined a computation in flight instead of starting one
+    """
+
+    def __init__(self):
+        self._flights: dict[str, Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def join(self, key: str, produce: Producer) -> tuple[Flight, bool]:
+        """
+        Join the computation of `key` in flight, or start it with `produce` if there is none.
+
+        The caller must then stream the flight with `Flight.stream`, until its end or until it gives up.
+
+        Args:
+            key (str): Identifies the computation, e.g. the normalized question
+            produce (Producer): Runs the computation, called with the callback emitting its chunks, only if it
+                is not in flight
+
+        Returns:
+            tuple[Flight, bool]: The flight, and whether this call started it
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.joined += 1
+            return flight, False
+
+        flight = Flight(on_abandoned=lambda: self._abandon(key, flight))
+        flight.task = asyncio.create_task(self._run(key, flight, produce))
+        self._flights[key] = flight
+        self.started += 1
+        return flight, True
+
+    def _forget(self, key: str, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _abandon(self, key: str, flight: Flight) -> None:
+        # Forgotten at once, so that a caller coming before the cancellation lands starts a new computation
+        self._forget(key, flight)
+        flight.task.cancel()
+
+    async def _run(self, key: str, flight: Flight, produce: Producer) -> None:
+        try:
+            flight.result = await produce(flight.emit)
+        except asyncio.CancelledError as e:
+            flight.finish(e)
+            raise
+        except Exception as e:  # noqa: BLE001  forwarded to every caller
+            # Raised to the callers, not to the task, which nobody awaits
+            flight.finish(e)
+        else:
+            flight.finish()
+        finally:
+            self._forget(key, flight)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import QueryBundle
+from llama_index.core.utils import get_tokenizer
+from llama_index.llms.openai import OpenAI
+from loguru import logger as log
+
+# Question embedded and retrieved by the warm-up, never answered
+WARM_UP_QUESTION = "Di cosa parla il talk?"
+# The LLM is only connected to: a slow answer is not retried, the engine being usable without it
+LLM_WARM_UP_TIMEOUT_SECONDS = 10
+
+
+def process_uptime() -> float:
+    """
+    Return the time elapsed since the process started, interpreter startup and imports included.
+
+    Returns:
+        float: Seconds since the process started, 0 if unknown (outside Linux)
+    """
+    try:
+        # The process name, in parentheses, may contain spaces: the start time is the 20th field after it
+        start_ticks = int(Path("/proc/self/stat").read_text().rpartition(")")[2].split()[19])
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+@dataclass
+class StartupProfile:
+    """
+    Wall time of the startup stages of the engine, from the start of the process to the end of the warm-up.
+
+    Attributes:
+        started (float): Monotonic time the process started at
+        stage_seconds (dict[str, float]): Time spent in each stage, in the order the stages ran
+        ready_seconds (float, optional): Time from the start of the process to the end of the warm-up,
+            None while warming up
+    """
+
+    started: float = field(default_factory=lambda: time.perf_counter() - process_uptime())
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    ready_seconds: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the code run within the context as a stage of the startup."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def mark_imported(self) -> None:
+        """Record the time spent so far, starting the interpreter and importing the modules, as the first stage."""
+        self.stage_seconds = {"import": time.perf_counter() - self.started} | self.stage_seconds
+
+    def mark_ready(self) -> None:
+        """Record the end of the startup and log its breakdown."""
+        self.ready_seconds = time.perf_counter() - self.started
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stage_seconds.items())
+        log.info("Ready {:.2f}s after the process started ({})", self.ready_seconds, stages or "no stage")
+
+    def summary(self) -> dict:
+        """Return the time to ready, None while warming up, and the time of each stage."""
+        return {
+            "ready_seconds": None if self.ready_seconds is None else round(self.ready_seconds, 3),
+            "stage_seconds": {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+        }
+
+
+async def warm_up_engine(
+    profile: StartupProfile,
+    retriever: BaseRetriever,
+    embed_model: BaseEmbedding,
+    llm: OpenAI | None = None,
+) -> None:
+    """
+    Pay the costs of the first question before serving users, then mark the engine ready.
+
+    The first question otherwise loads the lazily loaded indexes (the HNSW segment of the Chroma collection,
+    the lexical index), the tokenizer and the modules imported on first use, and opens the connections to the
+    embedding and LLM APIs. It must run on the event loop of the server, whose connection pools it fills.
+    A failed step is logged and skipped: the engine can still answer, only more slowly.
+
+    Args:
+        profile (StartupProfile): The startup profile, where each step is timed
+        retriever (BaseRetriever): The retriever of the questions
+        embed_model (BaseEmbedding): The embedding model of the questions, without cache so that it is called
+        llm (OpenAI, optional): The LLM, whose client connects to the API without generating any token
+    """
+    embedding = None
+    with profile.stage("warm_up.embedding"):
+        try:
+            embedding = await embed_model.aget_query_embedding(WARM_UP_QUESTION)
+        except Exception as e:  # noqa: BLE001  best effort: a failed step only leaves the engine cold
+            log.warning("Warm-up embedding failed, skipping the retrieval: {}", e)
+
+    # Retrieval reads the indexes synchronously: in a thread, so that the server answers the probes meanwhile
+    if embedding is not None:
+        with profile.stage("warm_up.retrieval"):
+            try:
+                await asyncio.to_thread(retriever.retrieve, QueryBundle(WARM_UP_QUESTION, embedding=embedding))
+            except Exception as e:  # noqa: BLE001  best effort: a failed step only leaves the engine cold
+                log.warning("Warm-up retrieval failed: {}", e)
+
+    with profile.stage("warm_up.tokenizer"):
+        get_tokenizer()
+
+    if llm is not None:
+        with profile.stage("warm_up.llm"):
+            try:
+                # Listing the models opens a connection of the client pool (shared by the copy), at no cost
+                client = llm._get_aclient().with_options(max_retries=0, timeout=LLM_WARM_UP_TIMEOUT_SECONDS)  # noqa: SLF001
+                await client.models.list()
+            except Exception as e:  # noqa: BLE001  best effort: a failed step only leaves the engine cold
+                log.warning("Warm-up LLM connection failed: {}", e)
+
+    profile.mark_ready()
@@ -0,0 +1,68 @@
+from typing import Any
+
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+from loguru import logger as log
+
+TALK_COLLECTION_SUFFIX = "_talks"
+# Chunk metadata identifying the talk of a chunk, also the id of the talk vectors
+TALK_KEY = "ref_doc_id"
+
+
+def get_talk_collection_name(collection_name: str) -> str:
+    """
+    Return the name of the Chroma collection holding the talk vectors of a collection, as written by the data_loader.
+
+    Args:
+        collection_name (str): Name of the chunk collection
+
+    Returns:
+        str: Name of the talk collection
+    """
+    return f"{collection_name}{TALK_COLLECTION_SUFFIX}"
+
+
+class TalkIndex:
+    """
+    First stage of two-stage retrieval: the talks whose representative vector is closest to the question.
+
+    The talk vectors are the centroids of the chunk embeddings of each talk, written by the data_loader
+    to a separate Chroma collection. The chunk search is then restricted to the chunks of the top talks.
+
+    Attributes:
+        collection (chromadb.Collection): The talk collection
+        top_k (int): Number of talks whose chunks are searched
+    """
+
+    def __init__(self, collection: Any, top_k: int = 5):
+        self.collection = collection
+        self.top_k = top_k
+        log.info("Two-stage retrieval over {} talks, top {} searched", collection.count(), top_k)
+
+    def search(self, query_embedding: list[float], top_k: int | None = None) -> list[str]:
+        """
+        Return the talks closest to a query.
+
+        Args:
+            query_embedding (list[float]): The query embedding
+            top_k (int, optional): Number of talks, `self.top_k` if None
+
+        Returns:
+            list[str]: The talk ids (the `ref_doc_id` of their chunks), closest first
+        """
+        result = self.collection.query(query_embeddings=[query_embedding], n_results=top_k or self.top_k, include=[])
+        return result["ids"][0]
+
+    def filters(self, query_embedding: list[float]) -> MetadataFilters | None:
+        """
+        Build the metadata filters restricting the chunk search to the talks closest to a query.
+
+        Args:
+            query_embedding (list[float]): The query embedding
+
+        Returns:
+            MetadataFilters | None: The filters, None if the talk collection is empty
+        """
+        talk_ids = self.search(query_embedding)
+        if not talk_ids:
+            return None
+        return MetadataFilters(filters=[MetadataFilter(key=TALK_KEY, value=talk_ids, operator=FilterOperator.IN)])
@@ -3,12 +3,271 @@ import sys
 
 sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
 
+import json
+from pathlib import Path
+from typing import Any
+
 import chromadb
+import numpy as np
 from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
 from llama_index.vector_stores.chroma import ChromaVectorStore
+from loguru import logger as log
+
+# "chroma": Chroma is the single source of truth, no LlamaIndex storage context is loaded
+# "snapshot": memory-map the quantized vector snapshot exported by the data_loader, Chroma is not opened
+STORAGE_MODES = ("chroma", "snapshot")
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+# Rows of the quantized matrix converted to float32 at once while scoring a query
+SCORING_BLOCK_SIZE = 2048
+
+
+def get_snapshot_path(chroma_db_path: str, collection_name: str) -> Path:
+    """
+    Return the path of the vector snapshot of a collection, as exported by the data_loader.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the Chroma collection
+
+    Returns:
+        Path: Path of the snapshot directory
+    """
+    return Path(chroma_db_path) / f"{collection_name}{SNAPSHOT_SUFFIX}"
+
+
+class SnapshotVectorStore(BasePydanticVectorStore):
+    """
+    Read-only vector store backed by a memory-mapped vector snapshot.
+
+    The quantized (int8 or float16) embedding matrix and the node columns are memory-mapped, so they
+    are paged in on demand and shared through the page cache by every process serving the same snapshot.
+    Queries are scored by cosine similarity with vectorized NumPy over blocks of the matrix. The top
+    `rescore_top_k` candidates can optionally be rescored with the full-precision embeddings.
+    Metadata filters are supported when they are equality (or "in") conditions, all of which must match.
+
+    Attributes:
+        snapshot_path (str): Path of the snapshot directory
+        rescore_top_k (int): Number of candidates rescored in full precision, 0 to disable rescoring
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = True
+
+    snapshot_path: str
+    rescore_top_k: int = 0
+
+    _header: dict = PrivateAttr()
+    _embeddings: np.ndarray = PrivateAttr()
+    _scales: np.ndarray = PrivateAttr()
+    _full_embeddings: np.ndarray | None = PrivateAttr(default=None)
+    _columns: dict[str, tuple[np.ndarray, np.ndarray]] = PrivateAttr()
+    _rows: dict[str, int] | None = PrivateAttr(default=None)
+    _metadata_columns: dict[str, list] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, snapshot_path: str | Path, rescore_top_k: int = 0, **kwargs: Any):
+        super().__init__(snapshot_path=str(snapshot_path), rescore_top_k=rescore_top_k, **kwargs)
+        path = Path(snapshot_path)
+
+        with (path / "snapshot.json").open(encoding="utf-8") as f:
+            self._header = json.load(f)
+        if self._header["format_version"] != SNAPSHOT_FORMAT_VERSION:
+            error_msg = f"Unsupported snapshot format version: {self._header['format_version']}"
+            raise ValueError(error_msg)
+        if rescore_top_k and not self._header["full_precision"]:
+            error_msg = "Rescoring requires a snapshot exported with full-precision embeddings"
+            raise ValueError(error_msg)
+
+        count = self._header["count"]
+        self._embeddings = np.load(path / "embeddings.npy", mmap_mode="r")[:count]
+        self._scales = np.load(path / "scales.npy", mmap_mode="r")[:count]
+        if rescore_top_k:
+            self._full_embeddings = np.load(path / "embeddings_full.npy", mmap_mode="r")[:count]
+        self._columns = {column: self._load_column(path, column) for column in ("node_id", "text", "metadata")}
+
+        log.info(
+            "Loaded vector snapshot {}: {} {} vectors of dimension {}",
+            path,
+            count,
+            self._header["dtype"],
+            self._header["dim"],
+        )
+
+    @staticmethod
+    def _load_column(path: Path, column: str) -> tuple[np.ndarray, np.ndarray]:
+        data_path = path / f"{column}.bin"
+        # Empty files cannot be memory-mapped
+        data = np.memmap(data_path, dtype=np.uint8, mode="r") if data_path.stat().st_size else np.zeros(0, np.uint8)
+        return data, np.load(path / f"{column}.offsets.npy", mmap_mode="r")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SnapshotVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def __len__(self) -> int:
+        return len(self._embeddings)
+
+    def _value(self, column: str, row: int) -> str:
+        data, offsets = self._columns[column]
+        return data[offsets[row] : offsets[row + 1]].tobytes().decode()
+
+    def _node(self, row: int) -> BaseNode:
+        node = metadata_dict_to_node(json.loads(self._value("metadata", row)))
+        node.set_content(self._value("text", row))
+        return node
+
+    def _metadata_column(self, key: str) -> list:
+        if key not in self._metadata_columns:
+            self._metadata_columns[key] = [json.loads(self._value("metadata", row)).get(key) for row in range(len(self))]
+        return self._metadata_columns[key]
 
+    def filter_rows(self, filters: MetadataFilters) -> np.ndarray:
+        """
+        Return the rows of the snapshot matching metadata filters.
 
-def initialize_vector_index(collection_name: str, chroma_db_path: str) -> VectorStoreIndex:
+        Args:
+            filters (MetadataFilters): Equality or "in" filters, combined with "and"
+
+        Returns:
+            np.ndarray: The matching rows, ascending
+
+        Raises:
+            ValueError: If the filters use other operators or conditions
+        """
+        if filters.condition not in (None, FilterCondition.AND):
+            error_msg = f"Unsupported metadata filter condition for the snapshot vector store: {filters.condition}"
+            raise ValueError(error_msg)
+        mask = np.ones(len(self), dtype=bool)
+        for metadata_filter in filters.filters:
+            if not isinstance(metadata_filter, MetadataFilter) or metadata_filter.operator not in (
+                FilterOperator.EQ,
+                FilterOperator.IN,
+            ):
+                error_msg = f"Unsupported metadata filter for the snapshot vector store: {metadata_filter}"
+                raise ValueError(error_msg)
+            values = metadata_filter.value if metadata_filter.operator == FilterOperator.IN else [metadata_filter.value]
+            values = set(values)
+            column = self._metadata_column(metadata_filter.key)
+            mask &= np.fromiter((value in values for value in column), dtype=bool, count=len(column))
+        return np.flatnonzero(mask)
+
+    def score(self, query_embedding: list[float], rows: np.ndarray | None = None) -> np.ndarray:
+        """
+        Score every vector of the snapshot against a query with the quantized embeddings.
+
+        Args:
+            query_embedding (list[float]): The query embedding
+            rows (np.ndarray, optional): Only score these rows, e.g. the rows matching metadata filters
+
+        Returns:
+            np.ndarray: Approximate cosine similarity of each vector (or of each of `rows`) with the query
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        if rows is not None:
+            return (self._embeddings[rows].astype(np.float32) @ query) * self._scales[rows]
+        scores = np.empty(len(self._embeddings), dtype=np.float32)
+        for start in range(0, len(scores), SCORING_BLOCK_SIZE):
+            block = self._embeddings[start : start + SCORING_BLOCK_SIZE]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        return scores * self._scales
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:  # noqa: ARG002
+        """
+        Return the nodes most similar to the query embedding.
+
+        Without an embedding, the first `similarity_top_k` nodes matching the filters are returned unranked,
+        as Chroma does.
+
+        Args:
+            query (VectorStoreQuery): The query, with its embedding, `similarity_top_k` and optional `filters`
+
+        Returns:
+            VectorStoreQueryResult: The top nodes, their ids and cosine similarities
+        """
+        rows = self.filter_rows(query.filters) if query.filters is not None else None
+
+        top_k = min(query.similarity_top_k, len(self) if rows is None else len(rows))
+        if top_k <= 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        if query.query_embedding is None:
+            nodes = [self._node(row) for row in (range(top_k) if rows is None else rows[:top_k])]
+            return VectorStoreQueryResult(nodes=nodes, ids=[node.node_id for node in nodes])
+
+        eligible_scores = self.score(query.query_embedding, rows)
+        num_candidates = min(max(top_k, self.rescore_top_k), len(eligible_scores))
+        positions = np.argpartition(-eligible_scores, num_candidates - 1)[:num_candidates]
+        candidates = positions if rows is None else rows[positions]
+        scores = dict(zip(candidates.tolist(), eligible_scores[positions].tolist(), strict=True))
+
+        if self._full_embeddings is not None:
+            query_embedding = np.asarray(query.query_embedding, dtype=np.float32)
+            query_embedding /= np.linalg.norm(query_embedding) or 1
+            candidates = np.sort(candidates)
+            scores = dict(zip(candidates, self._full_embeddings[candidates] @ query_embedding, strict=True))
+        top_rows = sorted(candidates, key=lambda row: -scores[row])[:top_k]
+
+        nodes = [self._node(row) for row in top_rows]
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=[float(scores[row]) for row in top_rows],
+            ids=[node.node_id for node in nodes],
+        )
+
+    def get_nodes(self, node_ids: list[str] | None = None, filters: MetadataFilters | None = None) -> list[BaseNode]:
+        """
+        Return the nodes with the given ids, e.g. chunks found by the lexical index, or matching metadata filters.
+
+        Args:
+            node_ids (list[str], optional): Ids of the nodes, unknown ids are skipped
+            filters (MetadataFilters, optional): Metadata filters the nodes must match, all the matching
+                nodes are returned if no ids are given
+
+        Returns:
+            list[BaseNode]: The nodes, in the order of `node_ids` (or of the snapshot)
+        """
+        if node_ids:
+            if self._rows is None:
+                self._rows = {self._value("node_id", row): row for row in range(len(self))}
+            rows = [self._rows[node_id] for node_id in node_ids if node_id in self._rows]
+            if filters is not None:
+                matching = set(self.filter_rows(filters).tolist())
+                rows = [row for row in rows if row in matching]
+        elif filters is not None:
+            rows = self.filter_rows(filters).tolist()
+        else:
+            rows = []
+        return [self._node(row) for row in rows]
+
+    def add(self, nodes: list[BaseNode], **add_kwargs: Any) -> list[str]:
+        error_msg = "The snapshot vector store is read-only, export a new snapshot with the data_loader"
+        raise NotImplementedError(error_msg)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        error_msg = "The snapshot vector store is read-only, export a new snapshot with the data_loader"
+        raise NotImplementedError(error_msg)
+
+
+def initialize_vector_index(
+    collection_name: str, chroma_db_path: str, storage_mode: str = "chroma", snapshot_rescore_top_k: int = 0
+) -> VectorStoreIndex:
     """
     Initialize and return a VectorStoreIndex using ChromaDB as the vector store.
 
@@ -18,10 +277,32 @@ def initialize_vector_index(collection_name: str, chroma_db_path: str) -> Vector
     Args:
         collection_name (str): Name of the ChromaDB collection to use or create
         chroma_db_path (str): File system path where ChromaDB will persist its data
+        storage_mode (str): "chroma" to read everything from the Chroma collection, or "snapshot" to serve
+            the memory-mapped vector snapshot of the collection instead of Chroma
+        snapshot_rescore_top_k (int): In "snapshot" mode, number of candidates rescored with the
+            full-precision embeddings, 0 to disable rescoring
 
     Returns:
         VectorStoreIndex: An initialized vector store index ready for document operations
+
+    Raises:
+        FileNotFoundError: In "snapshot" mode, if the data_loader exported no snapshot of the collection
     """
+    if storage_mode not in STORAGE_MODES:
+        error_msg = f"Unknown storage mode: {storage_mode}"
+        raise ValueError(error_msg)
+
+    if storage_mode == "snapshot":
+        snapshot_path = get_snapshot_path(chroma_db_path, collection_name)
+        if not (snapshot_path / "snapshot.json").is_file():
+            error_msg = (
+                f"No vector snapshot at {snapshot_path}: export one with the data_loader (--snapshot-dtype, "
+                "SNAPSHOT_DTYPE in docker-compose) to serve the snapshot storage mode"
+            )
+            raise FileNotFoundError(error_msg)
+        vector_store = SnapshotVectorStore(snapshot_path, rescore_top_k=snapshot_rescore_top_k)
+        log.info("Initialized vector index. Collection: {}, storage mode: {}", collection_name, storage_mode)
+        return VectorStoreIndex.from_vector_store(vector_store)
 
     # Initialize ChromaDB client with persistent storage
     chroma_client = chromadb.PersistentClient(path=chroma_db_path)
@@ -29,10 +310,28 @@ def initialize_vector_index(collection_name: str, chroma_db_path: str) -> Vector
 
     # Create vector store and storage context
     vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store, persist_dir=chroma_db_path)
+    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    log.info("Initialized vector index. Collection: {}, storage mode: {}", collection_name, storage_mode)
 
     # Initialize and return the vector store index
     return VectorStoreIndex.from_vector_store(
         vector_store,
         storage_context=storage_context,
     )
+
+
+def get_chroma_collection(chroma_db_path: str, collection_name: str) -> Any:
+    """
+    Return an existing Chroma collection, e.g. the talk vectors written by the data_loader.
+
+    Args:
+        chroma_db_path (str): Path to the ChromaDB database
+        collection_name (str): Name of the collection
+
+    Returns:
+        chromadb.Collection | None: The collection, None if it does not exist
+    """
+    chroma_client = chromadb.PersistentClient(path=chroma_db_path)
+    if collection_name not in {collection.name for collection in chroma_client.list_collections()}:
+        return None
+    return chroma_client.get_collection(name=collection_name)
@@ -1,21 +1,230 @@
 import click
-from main import main
+from components.chat_engine import CHAT_MODES, DEFAULT_CHAT_MODE
+from components.retrievers import RETRIEVAL_MODES
+from components.vector_store import STORAGE_MODES
+
+# Options of the components answering the questions, shared by the service and the batch command
+PIPELINE_OPTIONS = [
+    click.option("--chroma-db-path", required=True, type=str, help="Path to store/load the Chroma database"),
+    click.option("--collection-name", required=True, type=str, help="Name of the Chroma collection"),
+    click.option("--embedding-model", required=True, type=str, help="Name or path of the embedding model to use"),
+    click.option("--llm-model", required=True, type=str, help="Name or path of the LLM model to use"),
+    click.option(
+        "--embedding-cache-path", default=None, type=str, help="Path of the SQLite embedding cache, disabled if empty"
+    ),
+    click.option("--embedding-cache-max-size-mb", default=1024, type=int, help="Maximum size of the embedding cache in MB"),
+    click.option(
+        "--storage-mode",
+        default="chroma",
+        type=click.Choice(STORAGE_MODES),
+        help="chroma: read everything from Chroma; snapshot: serve the memory-mapped vector snapshot exported by "
+        "the data_loader",
+    ),
+    click.option(
+        "--snapshot-rescore-top-k",
+        default=0,
+        type=int,
+        help="Number of snapshot candidates rescored in full precision, 0 to disable",
+    ),
+    click.option(
+        "--answer-cache-threshold",
+        default=0.95,
+        type=click.FloatRange(0, 1),
+        help="Minimum cosine similarity of a question with a cached one to reuse its answer, 0 to disable the cache",
+    ),
+    click.option(
+        "--answer-cache-path", default=None, type=str, help="Path of the persisted answer cache, in memory if empty"
+    ),
+    click.option("--answer-cache-max-entries", default=1000, type=int, help="Maximum number of cached answers"),
+    click.option("--answer-cache-ttl-seconds", default=86400, type=float, help="Lifetime of a cached answer"),
+    click.option(
+        "--retrieval-mode",
+        default="hybrid",
+        type=click.Choice(RETRIEVAL_MODES),
+        help="vector: dense retrieval only; hybrid: fuse dense and BM25 retrieval (needs the data_loader lexical index)",
+    ),
+    click.option(
+        "--entity-filters",
+        default=True,
+        type=bool,
+        help="Restrict retrieval to the speakers, events and videos mentioned in the question",
+    ),
+    click.option(
+        "--talk-top-k",
+        default=0,
+        type=click.IntRange(min=0),
+        help="Two-stage retrieval: only search the chunks of this many talks closest to the question, 0 to disable",
+    ),
+    click.option(
+        "--chat-mode",
+        default=DEFAULT_CHAT_MODE,
+        type=click.Choice(CHAT_MODES),
+        help="condense_plus_context: rewrite follow-up questions, retrieve once and answer in one LLM call; "
+        "context: retrieve with the message as is and answer in one LLM call; "
+        "agent: let an agent decide when to retrieve (several sequential LLM calls)",
+    ),
+    click.option(
+        "--similarity-top-k", default=2, type=click.IntRange(min=1), help="Number of chunks retrieved per question"
+    ),
+    click.option(
+        "--latency-budget-seconds",
+        default=0,
+        type=click.FloatRange(min=0),
+        help="Time after which a question is abandoned and the user told to retry, 0 for no limit",
+    ),
+    click.option(
+        "--context-compression",
+        default=True,
+        type=bool,
+        help="Merge the overlapping and adjacent chunks of a talk into contiguous passages before prompting",
+    ),
+    click.option(
+        "--context-token-budget",
+        default=0,
+        type=click.IntRange(min=0),
+        help="Maximum number of tokens of the retrieved passages put in the prompt, 0 for no limit",
+    ),
+    click.option(
+        "--coalesce-queries",
+        default=True,
+        type=bool,
+        help="Answer the identical first questions of conversations asked concurrently once, sharing the answer",
+    ),
+    click.option(
+        "--http-max-connections",
+        default=100,
+        type=click.IntRange(min=1),
+        help="Maximum number of pooled connections to the OpenAI API, all kept alive when idle",
+    ),
+    click.option(
+        "--http-keepalive-seconds", default=30.0, type=float, help="Time an idle connection to the OpenAI API is kept open"
+    ),
+    click.option("--http-connect-timeout", default=5.0, type=float, help="Timeout of a connection to the OpenAI API"),
+    click.option("--http-timeout", default=60.0, type=float, help="Timeout of the OpenAI API requests, per read or write"),
+    click.option(
+        "--http-max-retries",
+        default=3,
+        type=click.IntRange(min=0),
+        help="Retries of the OpenAI API requests failed with a rate limit, a server or a connection error",
+    ),
+    click.option(
+        "--http-hedge-quantile",
+        default=0.0,
+        type=click.FloatRange(0, 1),
+        help="Send a request again when unanswered after this quantile of the recent latencies (e.g. 0.95), "
+        "the first answer winning, 0 to disable",
+    ),
+]
+
+
+def pipeline_options(function):
+    """Add the `PIPELINE_OPTIONS` to a click command."""
+    for option in reversed(PIPELINE_OPTIONS):
+        function = option(function)
+    return function
 
 
 @click.command()
-@click.option("--chroma-db-path", required=True, type=str, help="Path to store/load the Chroma database")
-@click.option("--collection-name", required=True, type=str, help="Name of the Chroma collection")
-@click.option("--embedding-model", required=True, type=str, help="Name or path of the embedding model to use")
-@click.option("--llm-model", required=True, type=str, help="Name or path of the LLM model to use")
-def run(chroma_db_path: str, collection_name: str, embedding_model: str, llm_model: str):
+@pipeline_options
+@click.option("--max-sessions", default=1000, type=int, help="Maximum number of chat sessions kept in memory")
+@click.option("--session-ttl-seconds", default=3600, type=float, help="Idle time after which a chat session is dropped")
+@click.option(
+    "--concurrency-limit", default=16, type=int, help="Maximum number of queries answered concurrently, 0 for no limit"
+)
+@click.option(
+    "--api",
+    default=True,
+    type=bool,
+    help="Serve the JSON/HTTP query API under /api next to the Gradio interface",
+)
+@click.option(
+    "--metrics",
+    default=True,
+    type=bool,
+    help="Trace every query and serve its latency per stage, tokens and cache hits on /metrics (with --api)",
+)
+@click.option(
+    "--warm-up",
+    default=True,
+    type=bool,
+    help="Load the indexes and connect to the OpenAI APIs before the readiness probe succeeds",
+)
+def run(
+    chroma_db_path: str,
+    collection_name: str,
+    *,
+    embedding_model: str,
+    llm_model: str,
+    embedding_cache_path: str | None,
+    embedding_cache_max_size_mb: int,
+    storage_mode: str,
+    snapshot_rescore_top_k: int,
+    max_sessions: int,
+    session_ttl_seconds: float,
+    concurrency_limit: int,
+    answer_cache_threshold: float,
+    answer_cache_path: str | None,
+    answer_cache_max_entries: int,
+    answer_cache_ttl_seconds: float,
+    retrieval_mode: str,
+    entity_filters: bool,
+    talk_top_k: int,
+    chat_mode: str,
+    similarity_top_k: int,
+    latency_budget_seconds: float,
+    context_compression: bool,
+    context_token_budget: int,
+    coalesce_queries: bool,
+    http_max_connections: int,
+    http_keepalive_seconds: float,
+    http_connect_timeout: float,
+    http_timeout: float,
+    http_max_retries: int,
+    http_hedge_quantile: float,
+    api: bool,
+    metrics: bool,
+    warm_up: bool,
+):
     """
     Handler function to process transcripts and interact with a language model.
     """
+    # Imported once the options are parsed: the interfaces import Gradio, the slowest import of the startup
+    from main import main  # noqa: PLC0415
+
     main(
         chroma_db_path=chroma_db_path,
         collection_name=collection_name,
         embedding_model=embedding_model,
         llm_model=llm_model,
+        embedding_cache_path=embedding_cache_path,
+        embedding_cache_max_size_mb=embedding_cache_max_size_mb,
+        storage_mode=storage_mode,
+        snapshot_rescore_top_k=snapshot_rescore_top_k,
+        max_sessions=max_sessions,
+        session_ttl_seconds=session_ttl_seconds,
+        concurrency_limit=concurrency_limit,
+        answer_cache_threshold=answer_cache_threshold,
+        answer_cache_path=answer_cache_path,
+        answer_cache_max_entries=answer_cache_max_entries,
+        answer_cache_ttl_seconds=answer_cache_ttl_seconds,
+        retrieval_mode=retrieval_mode,
+        entity_filters=entity_filters,
+        talk_top_k=talk_top_k,
+        chat_mode=chat_mode,
+        similarity_top_k=similarity_top_k,
+        latency_budget_seconds=latency_budget_seconds,
+        context_compression=context_compression,
+        context_token_budget=context_token_budget,
+        coalesce_queries=coalesce_queries,
+        http_max_connections=http_max_connections,
+        http_keepalive_seconds=http_keepalive_seconds,
+        http_connect_timeout=http_connect_timeout,
+        http_timeout=http_timeout,
+        http_max_retries=http_max_retries,
+        http_hedge_quantile=http_hedge_quantile,
+        api=api,
+        metrics=metrics,
+        warm_up=warm_up,
     )
 
 
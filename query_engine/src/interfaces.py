@@ -1,8 +1,90 @@
-from typing import Any
+import asyncio
+import json
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import AbstractContextManager, aclosing, nullcontext
+from functools import partial
+from typing import Any, TypeVar
 
 import gradio as gr
-from llama_index.core import Settings, VectorStoreIndex
-from llama_index.core.memory import ChatMemoryBuffer
+from components.answer_cache import CacheLookup, SemanticAnswerCache, normalize_question
+from components.chat_engine import DEFAULT_CHAT_MODE, create_chat_engine
+from components.chat_sessions import ChatSession, ChatSessionPool
+from components.metrics import CONTENT_TYPE, QueryMetrics
+from components.query_trace import QueryTrace, current_trace, trace_query
+from components.single_flight import Flight, SingleFlight
+from components.startup import StartupProfile
+from fastapi import APIRouter, FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.chat_engine.types import BaseChatEngine
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from loguru import logger as log
+from pydantic import BaseModel, Field
+
+# Session used when a query does not come from a Gradio browser session
+DEFAULT_SESSION_ID = "default"
+# Routes of the JSON/HTTP API, the Gradio app is mounted at the root
+API_PREFIX = "/api"
+MAX_BATCH_QUESTIONS = 100
+TIMEOUT_MESSAGE = "Mi dispiace, la risposta sta richiedendo troppo tempo. Riprova tra poco o con una domanda più specifica."
+
+T = TypeVar("T")
+
+
+def format_error(error: Exception) -> str:
+    """Return the answer shown to the user when a query fails."""
+    return f"Mi dispiace, si è verificato un errore inaspettato. Dettagli: {error!s}"
+
+
+def get_session_id(request: gr.Request | None) -> str:
+    """Return the id of the Gradio session a request belongs to."""
+    if request is None or not request.session_hash:
+        return DEFAULT_SESSION_ID
+    return request.session_hash
+
+
+def new_session_id() -> str:
+    """Return the id of a new API session."""
+    return uuid.uuid4().hex
+
+
+def format_event(event: str, data: dict) -> str:
+    """Return a server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1, pattern=r"\S", description="The question")
+    session_id: str | None = Field(default=None, description="Session of the conversation, a new one if empty")
+
+
+class QueryResponse(BaseModel):
+    question: str
+    answer: str
+    session_id: str = Field(description="Session to send follow-up questions to")
+    latency_seconds: float
+    stage_seconds: dict[str, float] = Field(
+        default_factory=dict,
+        description="Time waiting for a free slot (queue), embedding the question, retrieving and in the LLM",
+    )
+
+
+class BatchQueryRequest(BaseModel):
+    questions: list[str] = Field(min_length=1, max_length=MAX_BATCH_QUESTIONS, description="Independent questions")
+
+
+class BatchAnswer(BaseModel):
+    question: str
+    answer: str | None = Field(description="The answer, None if the question failed")
+    error: str | None = None
+
+
+class BatchQueryResponse(BaseModel):
+    answers: list[BatchAnswer]
+    latency_seconds: float
 
 
 class RAGQueryInterface:
@@ -10,31 +92,352 @@ class RAGQueryInterface:
     Interface for handling RAG (Retrieval-Augmented Generation) queries and chat interactions.
 
     This class manages the chat engine initialization, query processing, and chat history
-    for a RAG-based conversational system.
+    for a RAG-based conversational system. Every user session gets its own chat engine, and
+    conversational memory, from a pool with LRU and TTL eviction, and queries are answered
+    asynchronously so that concurrent sessions do not wait for each other.
+
+    With an answer cache, the first question of a conversation is answered from the cache when
+    a similar enough question was already answered, skipping retrieval and the LLM.
+
+    With query coalescing, the first questions of conversations asked while an identical one (once
+    normalized) is being answered share its answer, tokens streamed included, instead of looking up
+    the cache, retrieving and calling the LLM again. Each of them is then remembered in its own session.
+
+    With a latency budget, a query still unanswered after `latency_budget_seconds` (cache lookup,
+    wait for the session, retrieval and LLM calls included) is abandoned, and the user is told so.
+
+    With metrics, every query is traced and recorded once answered: its outcome, latency, time per
+    stage and tokens. Without them queries are not traced, so that they cost nothing.
     """
 
-    def __init__(self, index: VectorStoreIndex):
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        *,
+        max_sessions: int = 1000,
+        session_ttl_seconds: float = 3600,
+        answer_cache: SemanticAnswerCache | None = None,
+        retriever: BaseRetriever | None = None,
+        chat_mode: str = DEFAULT_CHAT_MODE,
+        latency_budget_seconds: float | None = None,
+        node_postprocessors: list[BaseNodePostprocessor] | None = None,
+        metrics: QueryMetrics | None = None,
+        coalesce_queries: bool = False,
+    ):
         self.index = index
-        self.chat_engine = index.as_chat_engine(
-            chat_mode="best",
-            verbose=True,
-            llm=Settings.llm,
-            memory=ChatMemoryBuffer.from_defaults(token_limit=1500),
-            system_prompt=(
-                "Sei un assistente AI utile e informativo che è stato addestrato "
-                "per utilizzare una base di conoscenza. Sii veritiero e non inventare "
-                "informazioni. Rispondi alle domande solo utilizzando il contesto fornito."
-                "Non aggiungere informazioni non pertinenti."
-            ),
-        )
+        self.retriever = retriever or index.as_retriever()
+        self.chat_mode = chat_mode
+        self.node_postprocessors = node_postprocessors
+        self.sessions = ChatSessionPool(self._create_chat_engine, max_sessions=max_sessions, ttl_seconds=session_ttl_seconds)
+        self.answer_cache = answer_cache
+        self.latency_budget_seconds = latency_budget_seconds or None
+        self.metrics = metrics
+        self.flights = SingleFlight() if coalesce_queries else None
+        if metrics is not None:
+            metrics.add_collector(
+                "rag_chat_sessions", "gauge", "Chat sessions kept in memory", lambda: [({}, len(self.sessions))]
+            )
+            if answer_cache is not None:
+                metrics.add_collector(
+                    "rag_answer_cache_lookups_total",
+                    "counter",
+                    "Answer cache lookups, by result (follow-up questions bypass the cache)",
+                    lambda: [
+                        ({"result": "hit"}, answer_cache.hits),
+                        ({"result": "miss"}, answer_cache.misses),
+                        ({"result": "bypass"}, answer_cache.bypassed),
+                    ],
+                )
+            if self.flights is not None:
+                flights = self.flights
+                metrics.add_collector(
+                    "rag_query_flights_total",
+                    "counter",
+                    "First questions of conversations, by whether they started an answer or joined an identical one",
+                    lambda: [({"result": "started"}, flights.started), ({"result": "joined"}, flights.joined)],
+                )
+
+    def _new_trace(self) -> QueryTrace | None:
+        """Return the trace to record a query into, that of the caller if any, None if metrics are disabled."""
+        if self.metrics is None:
+            return None
+        return current_trace() or QueryTrace()
+
+    @staticmethod
+    def _tracing(trace: QueryTrace | None) -> AbstractContextManager:
+        """Record the stages of the query run within the context into its trace, if any."""
+        return nullcontext() if trace is None else trace_query(trace)
+
+    def _record(self, outcome: str, start: float, trace: QueryTrace | None) -> None:
+        if self.metrics is not None:
+            self.metrics.record(outcome, time.perf_counter() - start, trace)
+
+    def _create_chat_engine(self) -> BaseChatEngine:
+        return create_chat_engine(self.retriever, chat_mode=self.chat_mode, node_postprocessors=self.node_postprocessors)
+
+    async def _within_budget(self, awaitable: Awaitable[T], start: float | None) -> T:
+        """Await within what is left of the latency budget of a query started at `start`, without limit if None."""
+        if self.latency_budget_seconds is None or start is None:
+            return await awaitable
+        remaining = self.latency_budget_seconds - (time.perf_counter() - start)
+        # Timeouts are applied per await: in `stream_query` a single one would span the yields to Gradio
+        return await asyncio.wait_for(awaitable, max(remaining, 0))
+
+    async def _lookup_answer(self, query_text: str, follow_up: bool, session: ChatSession) -> CacheLookup | None:
+        """Look up a cached answer, adding it to the session memory on a hit. None if the cache is not used."""
+        if self.answer_cache is None:
+            return None
+        if follow_up:
+            # Follow-up questions depend on the conversation, their answers are neither looked up nor cached
+            self.answer_cache.record_bypass()
+            return None
+        try:
+            lookup = await self.answer_cache.alookup(query_text)
+        except Exception:  # noqa: BLE001  the cache must never fail a query: answer it with the chat engine instead
+            log.exception("Answer cache lookup failed")
+            return None
+        if lookup.answer is not None:
+            async with session.lock:
+                session.remember(query_text, lookup.answer)
+        return lookup
+
+    def _store_answer(self, query_text: str, answer: str, lookup: CacheLookup | None) -> None:
+        if self.answer_cache is not None and lookup is not None and answer:
+            self.answer_cache.put(query_text, answer, lookup.embedding)
+
+    @staticmethod
+    def _is_follow_up(session: ChatSession, follow_up: bool | None) -> bool:
+        # Without the client chat history, a question is a follow-up if the session memory is not empty
+        return bool(session.chat_engine.chat_history) if follow_up is None else follow_up
+
+    async def answer(self, query_text: str, session_id: str = DEFAULT_SESSION_ID, follow_up: bool | None = None) -> str:
+        """
+        Answer a question in a session, from the answer cache or with the session chat engine.
+
+        With query coalescing, the first question of a conversation is answered by `stream_answer`, joining
+        an identical question in flight if any.
+
+        Args:
+            query_text (str): The question
+            session_id (str): The session, whose chat engine and memory are used
+            follow_up (bool, optional): Whether the question follows up on the conversation, which bypasses the
+                answer cache. If None, it does when the session memory is not empty.
+
+        Returns:
+            str: The answer
+
+        Raises:
+            TimeoutError: If the question is still unanswered after the latency budget
+        """
+        session = self.sessions.get(session_id)
+        follow_up = self._is_follow_up(session, follow_up)
+        if self.flights is not None and not follow_up:
+            return "".join([token async for token in self.stream_answer(query_text, session_id, follow_up=False)])
+
+        start = time.perf_counter()
+        trace = self._new_trace()
+        outcome = "error"
+        try:
+            with self._tracing(trace):
+                lookup = await self._within_budget(self._lookup_answer(query_text, follow_up, session), start)
+                if lookup is not None and lookup.answer is not None:
+                    outcome = "cached"
+                    return lookup.answer
+
+                # Get response from the session chat engine, one message at a time per session
+                async def chat() -> str:
+                    async with session.lock:
+                        return str(await session.chat_engine.achat(query_text))
+
+                answer = await self._within_budget(chat(), start)
+            self._store_answer(query_text, answer, lookup)
+            outcome = "answered"
+
+        except TimeoutError:
+            outcome = "timeout"
+            log.warning("Query exceeded the latency budget of {}s", self.latency_budget_seconds)
+            raise
+
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+
+        finally:
+            log.info("Answered in {:.2f}s", time.perf_counter() - start)
+            self._record(outcome, start, trace)
+
+        return answer
+
+    async def _stream_chat(
+        self, session: ChatSession, query_text: str, start: float | None, trace: QueryTrace | None
+    ) -> AsyncIterator[str]:
+        """Yield the answer tokens of the session chat engine, holding the session lock, within the latency budget."""
+        await self._within_budget(session.lock.acquire(), start)
+        try:
+            with self._tracing(trace):
+                response = await self._within_budget(session.chat_engine.astream_chat(query_text), start)
+            tokens = response.async_response_gen()
+            streamed = False
+            while True:
+                try:
+                    with self._tracing(trace):
+                        token = await self._within_budget(anext(tokens), start)
+                except StopAsyncIteration:
+                    break
+                streamed = True
+                yield token
+        finally:
+            session.lock.release()
+        if not streamed:
+            yield str(response)
+
+    async def _stream_within_budget(self, tokens: AsyncIterator[str], start: float) -> AsyncIterator[str]:
+        """Yield the tokens of `tokens` within what is left of the latency budget of a query started at `start`."""
+        async with aclosing(tokens):
+            while True:
+                try:
+                    token = await self._within_budget(anext(tokens), start)
+                except StopAsyncIteration:
+                    return
+                yield token
+
+    async def _answer_first_question(
+        self, session: ChatSession, query_text: str, trace: QueryTrace | None, emit: Callable[[str], None]
+    ) -> str:
+        """
+        Answer the first question of a conversation, from the answer cache or with the session chat engine, for
+        every caller asking it meanwhile.
+
+        Runs in its own task, without latency budget: each caller waits for the answer within its own.
+
+        Args:
+            session (ChatSession): The session of the caller that asked first, whose memory gets the exchange
+            query_text (str): The question
+            trace (QueryTrace, optional): The trace of the caller that asked first, where the stages are recorded
+            emit (Callable[[str], None]): Called with each token of the answer
+
+        Returns:
+            str: The outcome of the query for the caller that asked first, "cached" or "answered"
+        """
+        with self._tracing(trace):
+            lookup = await self._lookup_answer(query_text, False, session)
+        if lookup is not None and lookup.answer is not None:
+            emit(lookup.answer)
+            return "cached"
+
+        answer = ""
+        async with aclosing(self._stream_chat(session, query_text, None, trace)) as tokens:
+            async for token in tokens:
+                answer += token
+                emit(token)
+        self._store_answer(query_text, answer, lookup)
+        return "answered"
+
+    def _join_flight(
+        self, session: ChatSession, query_text: str, start: float, trace: QueryTrace | None
+    ) -> tuple[Flight, bool, AsyncIterator[str]]:
+        """
+        Join the identical first question in flight, or start answering it for every caller asking it meanwhile.
+
+        Returns:
+            tuple[Flight, bool, AsyncIterator[str]]: The flight, whether this call started it, and its answer
+                tokens within the latency budget
+        """
+        # The stages are only traced for the caller that asked first, whose answer the others share
+        answer_first = partial(self._answer_first_question, session, query_text, trace)
+        flight, leader = self.flights.join(normalize_question(query_text), answer_first)
+        return flight, leader, self._stream_within_budget(flight.stream(), start)
 
-    def query(self, query_text: str, chat_history: list) -> tuple[list, str]:
+    async def stream_answer(
+        self, query_text: str, session_id: str = DEFAULT_SESSION_ID, follow_up: bool | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Answer a question in a session, yielding the answer tokens as they are generated.
+
+        A cached answer is yielded at once. Time to first token and total latency are logged separately. With
+        query coalescing, the first question of a conversation joins an identical question in flight if any,
+        yielding its tokens from the first one.
+
+        Args:
+            query_text (str): The question
+            session_id (str): The session, whose chat engine and memory are used
+            follow_up (bool, optional): Whether the question follows up on the conversation, which bypasses the
+                answer cache. If None, it does when the session memory is not empty.
+
+        Yields:
+            str: The next tokens of the answer
+
+        Raises:
+            TimeoutError: If the answer is not complete after the latency budget, the tokens already yielded
+                are kept
+        """
+        session = self.sessions.get(session_id)
+        start = time.perf_counter()
+        # Tracing is resumed around each step only: the context of an async generator is that of its consumer
+        trace = self._new_trace()
+        follow_up = self._is_follow_up(session, follow_up)
+        flight = None
+        if self.flights is not None and not follow_up:
+            flight, leader, answer_tokens = self._join_flight(session, query_text, start, trace)
+        else:
+            try:
+                with self._tracing(trace):
+                    lookup = await self._within_budget(self._lookup_answer(query_text, follow_up, session), start)
+            except TimeoutError:
+                lookup = None
+            if lookup is not None and lookup.answer is not None:
+                log.info("Answered from cache in {:.3f}s", time.perf_counter() - start)
+                self._record("cached", start, trace)
+                yield lookup.answer
+                return
+            answer_tokens = self._stream_chat(session, query_text, start, trace)
+
+        first_token = None
+        answer = ""
+        outcome = "error"
+        try:
+            async with aclosing(answer_tokens) as tokens:
+                async for token in tokens:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    answer += token
+                    yield token
+            if flight is None:
+                self._store_answer(query_text, answer, lookup)
+                outcome = "answered"
+            elif leader:
+                outcome = flight.result
+            else:
+                async with session.lock:
+                    session.remember(query_text, answer)
+                outcome = "coalesced"
+
+        except TimeoutError:
+            outcome = "timeout"
+            log.warning("Query exceeded the latency budget of {}s", self.latency_budget_seconds)
+            raise
+
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away before the end of the answer
+            outcome = "cancelled"
+            raise
+
+        finally:
+            log.info(
+                "Answered in {:.2f}s, first token after {}",
+                time.perf_counter() - start,
+                "n/a" if first_token is None else f"{first_token:.2f}s",
+            )
+            self._record(outcome, start, trace)
+
+    async def query(self, query_text: str, chat_history: list, request: gr.Request | None = None) -> tuple[list, str]:
         """
         Process a query and update chat history.
 
         Args:
             query_text (str): The query text
             chat_history (list): Current chat history
+            request (gr.Request, optional): The Gradio request, used to find the session chat engine
 
         Returns:
             tuple[list, str]: Updated chat history and empty string for clearing input
@@ -43,25 +446,198 @@ class RAGQueryInterface:
             return chat_history, ""
 
         try:
-            # Get response from chat engine
-            response = self.chat_engine.chat(query_text)
+            answer = await self.answer(query_text, get_session_id(request), follow_up=bool(chat_history))
+        except TimeoutError:
+            answer = TIMEOUT_MESSAGE
+        except Exception as e:  # noqa: BLE001  shown in the chat instead of an answer
+            log.exception("Query failed")
+            answer = format_error(e)
 
-            # Update chat history with new query-response pair
-            chat_history.append((query_text, str(response)))
+        # Update chat history with new query-response pair, and return an empty string to clear input
+        chat_history.append((query_text, answer))
+        return chat_history, ""
 
-        except Exception as e:
-            error_message = "Mi dispiace, si è verificato un errore inaspettato. " f"Dettagli: {e!s}"
-            chat_history.append((query_text, error_message))
+    async def stream_query(
+        self, query_text: str, chat_history: list, request: gr.Request | None = None
+    ) -> AsyncIterator[tuple[list, str]]:
+        """
+        Process a query, streaming the answer tokens into the chat history as they are generated.
 
-        # Return updated history and empty string to clear input
-        return chat_history, ""
+        Args:
+            query_text (str): The query text
+            chat_history (list): Current chat history
+            request (gr.Request, optional): The Gradio request, used to find the session chat engine
+
+        Yields:
+            tuple[list, str]: Chat history with the partial answer and empty string for clearing input
+        """
+        if not query_text.strip():  # Check for empty or whitespace-only input
+            yield chat_history, ""
+            return
+
+        follow_up = bool(chat_history)
+        chat_history.append((query_text, ""))
+        yield chat_history, ""
+
+        answer = ""
+        try:
+            async with aclosing(self.stream_answer(query_text, get_session_id(request), follow_up=follow_up)) as tokens:
+                async for token in tokens:
+                    answer += token
+                    chat_history[-1] = (query_text, answer)
+                    yield chat_history, ""
+
+        except TimeoutError:
+            # The tokens already shown are kept
+            chat_history[-1] = (query_text, f"{answer}\n\n{TIMEOUT_MESSAGE}" if answer else TIMEOUT_MESSAGE)
 
-    def reset_chat(self) -> tuple[list[Any], str]:
+        except Exception as e:  # noqa: BLE001  shown in the chat: a failed answer must not break the stream
+            log.exception("Query failed")
+            chat_history[-1] = (query_text, format_error(e))
+
+        yield chat_history, ""
+
+    def reset_chat(self, request: gr.Request | None = None) -> tuple[list[Any], str]:
         """Reset the chat session to its initial state."""
-        self.chat_engine.reset()
+        self.sessions.reset(get_session_id(request))
         return [], ""
 
 
+class APIInterface:
+    """
+    JSON/HTTP API over the RAG query interface, for other services, load tests and batch jobs.
+
+    Routes, under `API_PREFIX`:
+        - POST /query: answer a question, continuing the conversation of `session_id` if given, with the time
+          spent in each stage
+        - POST /query/stream: same, streaming the answer as server-sent events: `token` events with the next
+          tokens, then a `done` event with the whole answer, or an `error` event
+        - POST /query/batch: answer independent questions concurrently, each in a new session
+        - DELETE /sessions/{session_id}: drop a session and its memory
+        - GET /health, GET /ready: liveness and readiness probes. With a startup profile, the engine is ready
+          (HTTP 200 rather than 503) once warmed up, and both answers report the time of each startup stage
+
+    With metrics enabled on the query interface, they are served in the Prometheus format on GET /metrics.
+
+    Questions are answered on the event loop of the server, sharing the sessions, caches and index of the
+    Gradio app but not its event queue. At most `concurrency_limit` questions are answered at once.
+
+    Attributes:
+        rag_interface (RAGQueryInterface): The RAG query interface instance
+        app (FastAPI): The API application
+    """
+
+    def __init__(
+        self,
+        rag_interface: RAGQueryInterface,
+        concurrency_limit: int | None = None,
+        startup: StartupProfile | None = None,
+    ):
+        self.rag_interface = rag_interface
+        self.startup = startup
+        self._slots = asyncio.Semaphore(concurrency_limit) if concurrency_limit else nullcontext()
+        self.app = self._create_app()
+
+    def _create_app(self) -> FastAPI:
+        """Create the API application and its routes."""
+        router = APIRouter(prefix=API_PREFIX)
+        router.add_api_route("/health", self.health, methods=["GET"])
+        router.add_api_route("/ready", self.ready, methods=["GET"])
+        router.add_api_route("/query", self.query, methods=["POST"], response_model=QueryResponse)
+        router.add_api_route("/query/stream", self.stream_query, methods=["POST"], response_class=StreamingResponse)
+        router.add_api_route("/query/batch", self.batch_query, methods=["POST"], response_model=BatchQueryResponse)
+        router.add_api_route("/sessions/{session_id}", self.reset_session, methods=["DELETE"], status_code=204)
+
+        app = FastAPI(title="Interfaccia RAG - TEDx Italian Talks")
+        app.include_router(router)
+        # Scraped by Prometheus at the usual path, outside the API prefix
+        if self.rag_interface.metrics is not None:
+            app.add_api_route("/metrics", self.render_metrics, methods=["GET"], include_in_schema=False)
+        return app
+
+    async def health(self) -> dict:
+        return {"status": "ok"}
+
+    async def ready(self) -> JSONResponse:
+        if self.startup is None:
+            return JSONResponse({"status": "ready", "sessions": len(self.rag_interface.sessions)})
+        # Not ready until warmed up, so that no traffic is routed to the engine while it is still cold
+        if not self.startup.ready:
+            return JSONResponse({"status": "warming_up", "startup": self.startup.summary()}, status_code=503)
+        sessions = len(self.rag_interface.sessions)
+        return JSONResponse({"status": "ready", "sessions": sessions, "startup": self.startup.summary()})
+
+    async def render_metrics(self) -> Response:
+        return Response(self.rag_interface.metrics.render(), media_type=CONTENT_TYPE)
+
+    async def query(self, request: QueryRequest) -> QueryResponse:
+        session_id = request.session_id or new_session_id()
+        start = time.perf_counter()
+        async with self._slots:
+            queue_seconds = time.perf_counter() - start
+            try:
+                with trace_query() as trace:
+                    answer = await self.rag_interface.answer(request.question, session_id)
+            except TimeoutError as e:
+                raise HTTPException(status_code=504, detail=TIMEOUT_MESSAGE) from e
+            except Exception as e:
+                log.exception("API query failed")
+                raise HTTPException(status_code=500, detail=format_error(e)) from e
+        return QueryResponse(
+            question=request.question,
+            answer=answer,
+            session_id=session_id,
+            latency_seconds=time.perf_counter() - start,
+            stage_seconds={"queue": queue_seconds} | trace.stage_seconds,
+        )
+
+    async def stream_query(self, request: QueryRequest) -> StreamingResponse:
+        events = self._stream_events(request.question, request.session_id or new_session_id())
+        return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def _stream_events(self, question: str, session_id: str) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        answer = ""
+        async with self._slots:
+            try:
+                async with aclosing(self.rag_interface.stream_answer(question, session_id)) as tokens:
+                    async for token in tokens:
+                        answer += token
+                        yield format_event("token", {"token": token})
+            except TimeoutError:
+                yield format_event("error", {"error": "timeout", "message": TIMEOUT_MESSAGE, "answer": answer})
+                return
+            except Exception as e:  # noqa: BLE001  sent to the client as an error event, the stream has started
+                log.exception("API query failed")
+                yield format_event("error", {"error": "internal", "message": format_error(e), "answer": answer})
+                return
+        done = {"question": question, "answer": answer, "session_id": session_id}
+        yield format_event("done", {**done, "latency_seconds": time.perf_counter() - start})
+
+    async def _batch_answer(self, question: str) -> BatchAnswer:
+        # Every question gets its own session, dropped once answered, so that the questions are independent
+        session_id = new_session_id()
+        async with self._slots:
+            try:
+                return BatchAnswer(question=question, answer=await self.rag_interface.answer(question, session_id))
+            except TimeoutError:
+                return BatchAnswer(question=question, answer=None, error=TIMEOUT_MESSAGE)
+            except Exception as e:  # noqa: BLE001  recorded in the response: one failed question must not fail the batch
+                log.exception("API batch query failed")
+                return BatchAnswer(question=question, answer=None, error=format_error(e))
+            finally:
+                self.rag_interface.sessions.reset(session_id)
+
+    async def batch_query(self, request: BatchQueryRequest) -> BatchQueryResponse:
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(self._batch_answer(question) for question in request.questions))
+        return BatchQueryResponse(answers=answers, latency_seconds=time.perf_counter() - start)
+
+    async def reset_session(self, session_id: str) -> Response:
+        self.rag_interface.sessions.reset(session_id)
+        return Response(status_code=204)
+
+
 class GradioInterface:
     """
     Handles the Gradio interface setup and configuration.
@@ -77,6 +653,23 @@ class GradioInterface:
     def __init__(self, rag_interface: RAGQueryInterface):
         self.rag_interface = rag_interface
         self.gradio_instance = self._create_interface()
+        self._startup_tasks: set[asyncio.Task] = set()
+
+    def run_on_startup(self, task: Callable[[], Awaitable[None]]) -> None:
+        """
+        Run a task in the background on the event loop of the server, once it starts, launched or mounted.
+
+        Args:
+            task (Callable[[], Awaitable[None]]): Returns the awaitable to run, e.g. a warm-up
+        """
+
+        async def start() -> None:
+            # Not awaited, so that the server does not wait for the task to accept connections
+            started = asyncio.create_task(task())
+            self._startup_tasks.add(started)
+            started.add_done_callback(self._startup_tasks.discard)
+
+        self.gradio_instance.extra_startup_events.append(start)
 
     def _create_interface(self) -> gr.Blocks:
         """Create and configure the Gradio interface components."""
@@ -111,13 +704,13 @@ class GradioInterface:
     ) -> None:
         """Configure event handlers for interface components."""
         submit_btn.click(
-            fn=self.rag_interface.query,
+            fn=self.rag_interface.stream_query,
             inputs=[message_input, chatbot],
             outputs=[chatbot, message_input],
         )
 
         message_input.submit(
-            fn=self.rag_interface.query,
+            fn=self.rag_interface.stream_query,
             inputs=[message_input, chatbot],
             outputs=[chatbot, message_input],
         )
@@ -128,6 +721,30 @@ class GradioInterface:
             outputs=[chatbot, message_input],
         )
 
-    def launch(self, **kwargs) -> None:
-        """Launch the Gradio interface."""
+    def mount(self, app: FastAPI, concurrency_limit: int | None = 1, path: str = "/") -> FastAPI:
+        """
+        Mount the Gradio interface on an ASGI application, e.g. next to the JSON API.
+
+        Args:
+            app (FastAPI): The application, whose routes take precedence over the Gradio ones
+            concurrency_limit (int, optional): Maximum number of events processed concurrently by each
+                event listener, None for no limit
+            path (str): Path of the Gradio interface
+
+        Returns:
+            FastAPI: The application
+        """
+        self.gradio_instance.queue(default_concurrency_limit=concurrency_limit)
+        return gr.mount_gradio_app(app, self.gradio_instance, path=path)
+
+    def launch(self, concurrency_limit: int | None = 1, **kwargs) -> None:
+        """
+        Launch the Gradio interface.
+
+        Args:
+            concurrency_limit (int, optional): Maximum number of events processed concurrently by each
+                event listener, None for no limit
+            **kwargs: Arguments of `gr.Blocks.launch`
+        """
+        self.gradio_instance.queue(default_concurrency_limit=concurrency_limit)
         self.gradio_instance.launch(**kwargs)
@@ -4,8 +4,18 @@ Main entry point for the RAG (Retrieval-Augmented Generation) system.
 This module initializes and launches a RAG system with the following components:
 - Embedding model for text vectorization
 - Language Model (LLM) for text generation
-- Vector store for document storage and retrieval
-- Gradio interface for user interaction
+- Vector store for document storage and retrieval, optionally fused with BM25 (hybrid retrieval)
+- Retrieval pre-filtered on the speakers, TEDx events and videos mentioned in the question
+- Optional two-stage retrieval: the talks closest to the question first, then their chunks
+- Context compression: overlapping chunks of a talk merged into passages, packed into a token budget
+- Gradio interface for user interaction, with a chat engine per user session (one retrieval and one
+  answer LLM call per message by default) and an optional latency budget per question
+- Optional semantic cache answering repeated questions without retrieval nor LLM calls
+- Coalescing of identical first questions asked concurrently into a single retrieval and answer
+- JSON/HTTP API (single, streamed and batch queries) served next to the Gradio interface
+- Optional Prometheus metrics: latency per stage, LLM and embedding tokens, cache hit counters
+- Warm-up before reporting ready (indexes loaded, API connections opened) and a timed startup breakdown
+- Pooled keep-alive HTTP clients of the OpenAI API, retrying failed requests and optionally hedging slow ones
 
 The system allows users to query a document collection using natural language,
 retrieving relevant context and generating appropriate responses.
@@ -13,40 +23,320 @@ retrieving relevant context and generating appropriate responses.
 Dependencies:
     - llama_index
     - gradio
+    - fastapi
+    - uvicorn
     - chromadb
     - loguru
 """
 
-from components.embeddings import initialize_embedding_model
+import atexit
+from functools import partial
+
+import uvicorn
+from clients.http_client import HTTPClientStats, initialize_http_clients
 from clients.openai import check_openai_api_key
+from components.answer_cache import SemanticAnswerCache, get_index_version
+from components.chat_engine import DEFAULT_CHAT_MODE
+from components.context_compression import ContextCompressor
+from components.embeddings import CachedEmbedding, initialize_embedding_model
+from components.entities import EntityMatcher, get_entity_catalog_path
+from components.lexical_index import LexicalIndex, get_lexical_index_path
 from components.llm import initialize_llm
-from components.vector_store import initialize_vector_index
-from interfaces import GradioInterface, RAGQueryInterface
+from components.metrics import QueryMetrics
+from components.query_trace import install_query_tracing
+from components.retrievers import initialize_retriever
+from components.startup import StartupProfile, warm_up_engine
+from components.talk_index import TalkIndex, get_talk_collection_name
+from components.vector_store import get_chroma_collection, initialize_vector_index
+from interfaces import API_PREFIX, APIInterface, GradioInterface, RAGQueryInterface
 from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
 from loguru import logger as log
 
 
-def main(chroma_db_path: str, collection_name: str, embedding_model: str, llm_model: str):
-    
+def initialize_query_metrics(
+    embed_model: BaseEmbedding, startup: StartupProfile, http_stats: HTTPClientStats | None = None
+) -> QueryMetrics:
+    """
+    Initialize the query metrics, along with the embedding cache counters, and start tracing the queries.
+
+    Args:
+        embed_model (BaseEmbedding): The embedding model, whose cache lookups are counted if it is cached
+        startup (StartupProfile): The startup profile, whose stages are exported too
+        http_stats (HTTPClientStats, optional): Counters of the requests to the OpenAI API, exported too
+
+    Returns:
+        QueryMetrics: The metrics of the queries
+    """
+    query_metrics = QueryMetrics()
+    query_metrics.add_collector(
+        "rag_startup_stage_seconds",
+        "gauge",
+        "Time spent in each stage of the startup, warm-up included",
+        lambda: [({"stage": stage}, seconds) for stage, seconds in startup.stage_seconds.items()],
+    )
+    query_metrics.add_collector(
+        "rag_startup_ready_seconds",
+        "gauge",
+        "Time from the start of the process to the end of the warm-up, 0 while warming up",
+        lambda: [({}, startup.ready_seconds or 0.0)],
+    )
+    if isinstance(embed_model, CachedEmbedding):
+        query_metrics.add_collector(
+            "rag_embedding_cache_lookups_total",
+            "counter",
+            "Embedding cache lookups, by result",
+            lambda: [({"result": "hit"}, embed_model.hits), ({"result": "miss"}, embed_model.misses)],
+        )
+    if http_stats is not None:
+        query_metrics.add_collector(
+            "rag_openai_http_requests_total",
+            "counter",
+            "Requests sent to the OpenAI API, by kind: first attempt, retry after a failure or hedge of a slow request",
+            lambda: [
+                ({"kind": "first"}, http_stats.requests - http_stats.retries - http_stats.hedges),
+                ({"kind": "retry"}, http_stats.retries),
+                ({"kind": "hedge"}, http_stats.hedges),
+            ],
+        )
+        query_metrics.add_collector(
+            "rag_openai_http_hedge_wins_total",
+            "counter",
+            "Hedged requests to the OpenAI API answered before the original request",
+            lambda: [({}, http_stats.hedge_wins)],
+        )
+    install_query_tracing()
+    log.info("Query metrics enabled")
+    return query_metrics
+
+
+def initialize_rag_interface(
+    chroma_db_path: str,
+    collection_name: str,
+    *,
+    embedding_model: str,
+    llm_model: str,
+    embedding_cache_path: str | None = None,
+    embedding_cache_max_size_mb: int = 1024,
+    storage_mode: str = "chroma",
+    snapshot_rescore_top_k: int = 0,
+    max_sessions: int = 1000,
+    session_ttl_seconds: float = 3600,
+    answer_cache_threshold: float = 0.95,
+    answer_cache_path: str | None = None,
+    answer_cache_max_entries: int = 1000,
+    answer_cache_ttl_seconds: float = 86400,
+    retrieval_mode: str = "hybrid",
+    entity_filters: bool = True,
+    talk_top_k: int = 0,
+    chat_mode: str = DEFAULT_CHAT_MODE,
+    similarity_top_k: int = 2,
+    latency_budget_seconds: float = 0,
+    context_compression: bool = True,
+    context_token_budget: int = 0,
+    coalesce_queries: bool = True,
+    metrics: bool = False,
+    http_max_connections: int = 100,
+    http_keepalive_seconds: float = 30.0,
+    http_connect_timeout: float = 5.0,
+    http_timeout: float = 60.0,
+    http_max_retries: int = 3,
+    http_hedge_quantile: float = 0.0,
+    startup: StartupProfile | None = None,
+) -> RAGQueryInterface:
+    """
+    Initialize the models, the index, the retriever and the caches, and return the query interface over them.
+
+    The time of the slowest steps is recorded in `startup`, if given.
+
+    Args:
+        chroma_db_path (str): Path of the Chroma database
+        collection_name (str): Name of the Chroma collection
+        embedding_model (str): Name or path of the embedding model
+        llm_model (str): Name or path of the LLM
+        embedding_cache_path (str, optional): Path of the SQLite embedding cache, disabled if empty
+        embedding_cache_max_size_mb (int): Maximum size of the embedding cache in MB
+        storage_mode (str): One of `STORAGE_MODES`: "chroma" reads everything from Chroma, "snapshot" serves the
+            vector snapshot exported by the data_loader
+        snapshot_rescore_top_k (int): Number of snapshot candidates rescored in full precision, 0 to disable
+        max_sessions (int): Maximum number of chat sessions kept in memory
+        session_ttl_seconds (float): Idle time after which a chat session is dropped
+        answer_cache_threshold (float): Minimum cosine similarity of a question with a cached one to reuse its
+            answer, 0 to disable the answer cache
+        answer_cache_path (str, optional): Path of the persisted answer cache, in memory if empty
+        answer_cache_max_entries (int): Maximum number of cached answers
+        answer_cache_ttl_seconds (float): Lifetime of a cached answer
+        retrieval_mode (str): "vector" for dense retrieval only, "hybrid" to fuse dense and BM25 retrieval
+        entity_filters (bool): Whether to restrict retrieval to the speakers, events and videos of the question
+        talk_top_k (int): Number of talks closest to the question whose chunks are searched, 0 to search them all
+        chat_mode (str): One of `CHAT_MODES`, how the chat engine retrieves and calls the LLM
+        similarity_top_k (int): Number of chunks retrieved per question
+        latency_budget_seconds (float): Time after which a question is abandoned, 0 for no limit
+        context_compression (bool): Whether to merge the overlapping and adjacent chunks of a talk into passages
+        context_token_budget (int): Maximum number of tokens of the retrieved passages in the prompt, 0 for no limit
+        coalesce_queries (bool): Whether to answer the identical first questions asked concurrently once
+        metrics (bool): Whether to trace every query for the `/metrics` endpoint
+        http_max_connections (int): Maximum number of pooled connections to the OpenAI API
+        http_keepalive_seconds (float): Time an idle connection to the OpenAI API is kept open
+        http_connect_timeout (float): Timeout of a connection to the OpenAI API
+        http_timeout (float): Timeout of the OpenAI API requests, per read or write
+        http_max_retries (int): Retries of the OpenAI API requests failed with a rate limit, a server or a
+            connection error
+        http_hedge_quantile (float): Quantile of the recent latencies after which an unanswered request is sent
+            again, 0 to disable
+        startup (StartupProfile, optional): The startup profile, where the slowest steps are timed
+
+    Returns:
+        RAGQueryInterface: The query interface, answering questions with a chat engine per session
+    """
     check_openai_api_key()
-    
-    # Initialize LLM and embedding model
-    llm = initialize_llm(llm_model)
-    embed_model = initialize_embedding_model(embedding_model)
+    startup = startup or StartupProfile()
+
+    # Initialize LLM and embedding model, sending their requests through the same connection pools
+    with startup.stage("settings"):
+        http_clients = initialize_http_clients(
+            max_connections=http_max_connections,
+            keepalive_seconds=http_keepalive_seconds,
+            connect_timeout=http_connect_timeout,
+            timeout=http_timeout,
+            max_retries=http_max_retries,
+            hedge_quantile=http_hedge_quantile,
+        )
+        llm = initialize_llm(llm_model, http_clients=http_clients)
+        embed_model = initialize_embedding_model(
+            embedding_model,
+            cache_path=embedding_cache_path,
+            cache_max_size_mb=embedding_cache_max_size_mb,
+            http_clients=http_clients,
+        )
 
     Settings.llm = llm
     Settings.embed_model = embed_model
     log.info("Settings initialized")
 
     # Initialize vector index
-    index = initialize_vector_index(
-        collection_name=collection_name,
-        chroma_db_path=chroma_db_path,
+    with startup.stage("index"):
+        index = initialize_vector_index(
+            collection_name=collection_name,
+            chroma_db_path=chroma_db_path,
+            storage_mode=storage_mode,
+            snapshot_rescore_top_k=snapshot_rescore_top_k,
+        )
+
+    # Hybrid retrieval fuses the vector results with BM25 over the lexical index built by the data_loader
+    lexical_index = None
+    if retrieval_mode == "hybrid":
+        lexical_index_path = get_lexical_index_path(chroma_db_path, collection_name)
+        if lexical_index_path.exists():
+            lexical_index = LexicalIndex(lexical_index_path)
+        else:
+            log.warning("No lexical index found at {}, falling back to vector retrieval", lexical_index_path)
+
+    # Questions naming a speaker, an event or a video only retrieve the chunks of the matching talks
+    entity_matcher = None
+    if entity_filters:
+        entity_catalog_path = get_entity_catalog_path(chroma_db_path, collection_name)
+        if entity_catalog_path.exists():
+            with startup.stage("entities"):
+                entity_matcher = EntityMatcher.from_catalog(entity_catalog_path)
+        else:
+            log.warning("No entity catalog found at {}, retrieval is not pre-filtered", entity_catalog_path)
+
+    # Two-stage retrieval only searches the chunks of the `talk_top_k` talks closest to the question
+    talk_index = None
+    if talk_top_k:
+        talk_collection_name = get_talk_collection_name(collection_name)
+        talk_collection = get_chroma_collection(chroma_db_path, talk_collection_name)
+        if talk_collection is not None:
+            talk_index = TalkIndex(talk_collection, top_k=talk_top_k)
+        else:
+            log.warning("No talk collection {} found, falling back to flat retrieval", talk_collection_name)
+    retriever = initialize_retriever(
+        index,
+        lexical_index=lexical_index,
+        entity_matcher=entity_matcher,
+        talk_index=talk_index,
+        similarity_top_k=similarity_top_k,
     )
 
-    # Initialize RAG query interface and Gradio interface
-    rag_interface = RAGQueryInterface(index)
-    gradio_interface = GradioInterface(rag_interface)
+    # Retrieved chunks are merged into passages and packed into the token budget before prompting
+    node_postprocessors = []
+    if context_compression:
+        node_postprocessors.append(ContextCompressor(token_budget=context_token_budget))
+        log.info("Context compression enabled, token budget {}", context_token_budget or "unlimited")
+
+    # Semantic answer cache, scoped to the indexed data and the models the answers were generated with
+    answer_cache = None
+    if answer_cache_threshold:
+        scope = f"{collection_name}:{get_index_version(chroma_db_path, collection_name)}:{embedding_model}:{llm_model}"
+        with startup.stage("answer_cache"):
+            answer_cache = SemanticAnswerCache(
+                embed_model,
+                threshold=answer_cache_threshold,
+                scope=scope,
+                max_entries=answer_cache_max_entries,
+                ttl_seconds=answer_cache_ttl_seconds,
+                persist_path=answer_cache_path or None,
+            )
+        atexit.register(answer_cache.save)
+        log.info("Answer cache enabled with similarity threshold {} (scope {})", answer_cache_threshold, scope)
+
+    # Queries are only traced when their metrics are collected
+    query_metrics = initialize_query_metrics(embed_model, startup, http_clients.stats) if metrics else None
+
+    # Initialize RAG query interface
+    return RAGQueryInterface(
+        index,
+        max_sessions=max_sessions,
+        session_ttl_seconds=session_ttl_seconds,
+        answer_cache=answer_cache,
+        retriever=retriever,
+        chat_mode=chat_mode,
+        latency_budget_seconds=latency_budget_seconds,
+        node_postprocessors=node_postprocessors,
+        metrics=query_metrics,
+        coalesce_queries=coalesce_queries,
+    )
+
+
+def main(concurrency_limit: int = 16, api: bool = True, warm_up: bool = True, **options):
+    """
+    Serve the Gradio interface, and the JSON API unless disabled.
+
+    Args:
+        concurrency_limit (int): Maximum number of queries answered concurrently by each interface, 0 for no limit
+        api (bool): Whether to serve the JSON API under `API_PREFIX` next to the Gradio interface
+        warm_up (bool): Whether to warm up the engine before reporting it ready, see `warm_up_engine`
+        **options: Arguments of `initialize_rag_interface`
+    """
+    startup = StartupProfile()
+    startup.mark_imported()
+    rag_interface = initialize_rag_interface(startup=startup, **options)
+    with startup.stage("interface"):
+        gradio_interface = GradioInterface(rag_interface)
+
+    # Warm up on the event loop of the server once it listens, so that the probes are answered meanwhile.
+    # The embedding cache is bypassed, the point being to connect to the API.
+    if warm_up:
+        embed_model = Settings.embed_model
+        if isinstance(embed_model, CachedEmbedding):
+            embed_model = embed_model.embed_model
+        warm_up_task = partial(warm_up_engine, startup, rag_interface.retriever, embed_model, Settings.llm)
+        gradio_interface.run_on_startup(warm_up_task)
+    else:
+        startup.mark_ready()
+
+    # Launch the Gradio interface, answering up to `concurrency_limit` queries at once
+    if not api:
+        gradio_interface.launch(
+            concurrency_limit=concurrency_limit or None, share=False, server_name="0.0.0.0", server_port=8000
+        )
+        return
 
-    # Launch the Gradio interface
-    gradio_interface.launch(share=False, server_name="0.0.0.0", server_port=8000)
+    # Serve the JSON API and the Gradio interface from the same process and event loop, each answering
+    # up to `concurrency_limit` queries at once
+    with startup.stage("interface"):
+        api_interface = APIInterface(rag_interface, concurrency_limit=concurrency_limit or None, startup=startup)
+        app = gradio_interface.mount(api_interface.app, concurrency_limit=concurrency_limit or None)
+    log.info("Serving the API under {} next to the Gradio interface", API_PREFIX)
+    uvicorn.run(app, host="0.0.0.0", port=8000)
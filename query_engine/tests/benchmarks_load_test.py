@@ -0,0 +1,109 @@
+import json
+import random
+
+import httpx
+import pytest
+from benchmarks.load_test import QueryResult, cli, make_conversations, summarize
+from benchmarks.stub_llm import STUB_ANSWER
+from benchmarks.stub_openai import LatencyDistribution, StubOpenAIServer
+from click.testing import CliRunner
+
+
+@pytest.fixture
+def stub():
+    server = StubOpenAIServer(embedding_latency=LatencyDistribution.parse("0.01"), dimensions=8).start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize(
+    ("spec", "low", "high"),
+    [("0.2", 0.2, 0.2), ("uniform:0.1,0.3", 0.1, 0.3), ("normal:0.5,0.1", 0, 2), ("lognormal:0.5,0.4", 0, 10)],
+)
+def test_latency_distributions(spec, low, high):
+    distribution = LatencyDistribution.parse(spec)
+    rng = random.Random(0)  # noqa: S311
+
+    samples = [distribution.sample(rng) for _ in range(1000)]
+
+    assert all(low <= sample <= high for sample in samples)
+    assert LatencyDistribution.parse(str(distribution)) == distribution
+
+
+@pytest.mark.parametrize("spec", ["gamma:1", "uniform:0.1", "constant:-1"])
+def test_invalid_latency_distributions(spec):
+    with pytest.raises(ValueError, match="distribution"):
+        LatencyDistribution.parse(spec)
+
+
+def test_stub_embeddings(stub):
+    response = httpx.post(f"{stub.api_base}/embeddings", json={"model": "m", "input": ["uno", "due", "uno"]}).json()
+
+    embeddings = [item["embedding"] for item in response["data"]]
+    assert len(embeddings[0]) == 8
+    assert embeddings[0] == embeddings[2] != embeddings[1]
+    assert stub.stats_dict()["embedded_texts"] == 3
+
+
+def test_stub_chat_completions(stub):
+    body = {"model": "m", "messages": [{"role": "user", "content": "Di cosa parla il talk?"}]}
+
+    response = httpx.post(f"{stub.api_base}/chat/completions", json=body).json()
+    streamed = httpx.post(f"{stub.api_base}/chat/completions", json=body | {"stream": True}).text
+
+    assert response["choices"][0]["message"]["content"] == STUB_ANSWER
+    assert response["usage"]["prompt_tokens"] == 5
+    chunks = [line.removeprefix("data: ") for line in streamed.splitlines() if line.startswith("data: ")]
+    assert chunks[-1] == "[DONE]"
+    assert "".join(json.loads(chunk)["choices"][0]["delta"]["content"] for chunk in chunks[:-1]) == STUB_ANSWER
+    assert stub.stats_dict()["chat_requests"] == 2
+
+
+def test_make_conversations():
+    texts = ["uno due tre quattro cinque sei sette otto nove dieci", "alfa beta gamma"]
+
+    conversations = make_conversations(texts, conversations=5, turns=3, seed=1, query_words=4)
+
+    assert conversations == make_conversations(texts, conversations=5, turns=3, seed=1, query_words=4)
+    assert [len(conversation) for conversation in conversations] == [3] * 5
+    assert all("Cosa dice il talk" in conversation[0] for conversation in conversations)
+
+
+def test_make_conversations_with_distinct_questions():
+    texts = ["uno due tre quattro cinque sei sette otto nove dieci", "alfa beta gamma"]
+
+    conversations = make_conversations(texts, conversations=20, turns=2, seed=1, query_words=4, distinct_questions=2)
+
+    assert len({conversation[0] for conversation in conversations}) == 2
+
+
+def test_summarize():
+    results = [
+        QueryResult(turn=i % 2, latency_seconds=0.1 * (i + 1), stage_seconds={"llm": 0.05, "embedding": 0.01})
+        for i in range(9)
+    ] + [QueryResult(turn=0, latency_seconds=5.0, error="HTTP 504")]
+
+    summary = summarize(results, wall_seconds=3.0)
+
+    assert (summary["queries"], summary["errors"], summary["error_rate"]) == (10, 1, 0.1)
+    assert summary["throughput_qps"] == 3.0
+    assert summary["latency_p50_ms"] == 500.0
+    assert summary["latency_p50_ms"] <= summary["latency_p95_ms"] <= summary["latency_p99_ms"] < 1000
+    assert set(summary["stages"]) == {"embedding", "llm"}
+    assert summary["stages"]["llm"]["p99_ms"] == 50.0
+    assert set(summary["turns"]) == {"0", "1"}
+
+
+def test_compare(tmp_path):
+    level = {"users": 4, "throughput_qps": 10.0, "latency_p95_ms": 1000.0, "error_rate": 0.0}
+    baseline, better, worse = tmp_path / "baseline.json", tmp_path / "better.json", tmp_path / "worse.json"
+    baseline.write_text(json.dumps({"results": [level]}))
+    better.write_text(json.dumps({"results": [level | {"throughput_qps": 12.0}]}))
+    worse.write_text(json.dumps({"results": [level | {"error_rate": 0.01}]}))
+    runner = CliRunner()
+
+    assert runner.invoke(cli, ["compare", str(baseline), str(better)]).exit_code == 0
+    result = runner.invoke(cli, ["compare", str(baseline), str(worse)])
+    assert result.exit_code == 1
+    assert "error_rate" in result.output
+    assert "REGRESSION" in result.output
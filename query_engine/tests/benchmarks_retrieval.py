@@ -0,0 +1,60 @@
+import chromadb
+import numpy as np
+import pytest
+from benchmarks.retrieval import (
+    QUERY_ENGINE_DIR,
+    compute_centroids,
+    normalize,
+    recall,
+    run_scale,
+    scale_corpus,
+    synthetic_embeddings,
+)
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    talk_ids = [f"talk{i % 10}" for i in range(60)]
+    return synthetic_embeddings(talk_ids, dim=16, chunk_spread=0.5, rng=rng), talk_ids
+
+
+def test_scale_corpus(corpus):
+    embeddings, talk_ids = corpus
+
+    scaled_embeddings, scaled_talk_ids = scale_corpus(embeddings, talk_ids, 3, 0.5, np.random.default_rng(1))
+
+    assert scaled_embeddings.shape == (180, 16)
+    assert len(set(scaled_talk_ids)) == 30
+    np.testing.assert_array_equal(scaled_embeddings[:60], embeddings)
+    np.testing.assert_allclose(np.linalg.norm(scaled_embeddings, axis=1), 1, atol=1e-5)
+
+
+def test_compute_centroids(corpus):
+    embeddings, talk_ids = corpus
+
+    talks, centroids = compute_centroids(embeddings, talk_ids)
+
+    assert len(talks) == 10
+    expected = normalize(embeddings[[i for i, talk_id in enumerate(talk_ids) if talk_id == talks[0]]].sum(axis=0))
+    np.testing.assert_allclose(centroids[0], expected, atol=1e-5)
+
+
+def test_recall():
+    assert recall([["a", "b"], ["c", "x"]], [["a", "b"], ["c", "d"]]) == 0.75
+
+
+def test_run_scale(tmp_path, corpus, monkeypatch):
+    """Test that flat and two-stage search are compared on a small corpus"""
+    monkeypatch.syspath_prepend(str(QUERY_ENGINE_DIR / "src"))
+    embeddings, talk_ids = corpus
+    queries = embeddings[:5]
+    client = chromadb.PersistentClient(path=str(tmp_path))
+
+    result = run_scale(client, embeddings, talk_ids, queries, similarity_top_k=2, talk_top_ks=[1, 10], talk_key="ref_doc_id")
+
+    assert result["chunks"] == 60
+    assert result["talks"] == 10
+    assert set(result["methods"]) == {"flat", "two_stage_1", "two_stage_10"}
+    assert result["methods"]["two_stage_10"]["recall_at_2"] == 1.0
+    assert result["methods"]["two_stage_1"]["distinct_talks"] == 1.0
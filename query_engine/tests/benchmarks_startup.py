@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+
+import pytest
+from benchmarks.startup import cli, read_rss_mb, summarize
+from click.testing import CliRunner
+
+
+def make_run(ready_seconds, first_query_ms, stages):
+    return {
+        "live_seconds": ready_seconds - 1,
+        "ready_seconds": ready_seconds,
+        "stage_seconds": stages,
+        "ready_rss_mb": 300.0,
+        "peak_rss_mb": 350.0,
+        "first_query_ms": first_query_ms,
+        "second_query_ms": 500.0,
+    }
+
+
+def test_summarize():
+    runs = [
+        make_run(10.0, 900.0, {"import": 6.0, "warm_up.retrieval": 2.0}),
+        make_run(12.0, 700.0, {"import": 7.0, "warm_up.retrieval": 2.2}),
+        make_run(11.0, 800.0, {"import": 8.0}),
+    ]
+
+    summary = summarize(runs)
+
+    assert (summary["ready_seconds"], summary["live_seconds"], summary["first_query_ms"]) == (11.0, 10.0, 800.0)
+    assert summary["stage_seconds"] == {"import": 7.0, "warm_up.retrieval": 2.0}
+
+
+def test_compare(tmp_path):
+    results = summarize([make_run(10.0, 800.0, {"import": 6.0})])
+    baseline, slower = tmp_path / "baseline.json", tmp_path / "slower.json"
+    baseline.write_text(json.dumps({"results": results}))
+    slower_results = summarize([make_run(10.0, 800.0, {"import": 6.0, "warm_up.llm": 3.0})]) | {"ready_seconds": 13.0}
+    slower.write_text(json.dumps({"results": slower_results}))
+    runner = CliRunner()
+
+    assert runner.invoke(cli, ["compare", str(baseline), str(baseline)]).exit_code == 0
+    result = runner.invoke(cli, ["compare", str(baseline), str(slower)])
+    assert result.exit_code == 1
+    assert "ready_seconds" in result.output
+    assert "REGRESSION" in result.output
+    assert "warm_up.llm" in result.output
+
+
+def test_compare_report_without_memory(tmp_path):
+    """Test that a report of the previous format, without the memory metrics, is still compared"""
+    results = summarize([make_run(10.0, 800.0, {"import": 6.0})])
+    baseline, candidate = tmp_path / "baseline.json", tmp_path / "candidate.json"
+    baseline.write_text(json.dumps({"results": {k: v for k, v in results.items() if not k.endswith("_rss_mb")}}))
+    candidate.write_text(json.dumps({"results": results}))
+
+    result = CliRunner().invoke(cli, ["compare", str(baseline), str(candidate)])
+
+    assert result.exit_code == 0
+    assert "ready_rss_mb" not in result.output
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_read_rss_mb():
+    rss_mb, peak_rss_mb = read_rss_mb(os.getpid())
+
+    assert 0 < rss_mb <= peak_rss_mb
+    assert read_rss_mb(2**22 + 1) == (0.0, 0.0)
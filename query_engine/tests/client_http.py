@@ -0,0 +1,144 @@
+import asyncio
+import socket
+import time
+
+import httpx
+import pytest
+from benchmarks.stub_openai import StubOpenAIServer
+from src.clients.http_client import (
+    AsyncRetryTransport,
+    HTTPClientStats,
+    LatencyWindow,
+    RetryPolicy,
+    RetryTransport,
+    initialize_http_clients,
+)
+from src.components.embeddings import initialize_embedding_model
+from src.components.llm import initialize_llm
+
+FAST_RETRIES = RetryPolicy(max_retries=8, backoff_base=0.001, backoff_max=0.01)
+EMBEDDING = {"model": "m", "input": ["ciao"]}
+
+
+class LatencySequence:
+    """Latencies of the successive requests, in the stub latency distribution interface."""
+
+    def __init__(self, *latencies: float):
+        self.latencies = iter(latencies)
+
+    def sample(self, _rng) -> float:
+        return next(self.latencies, 0.0)
+
+
+@pytest.fixture
+def stub():
+    server = StubOpenAIServer(dimensions=8).start()
+    yield server
+    server.stop()
+
+
+def retrying_client(retry_policy: RetryPolicy = FAST_RETRIES) -> tuple[httpx.Client, HTTPClientStats]:
+    stats = HTTPClientStats()
+    return httpx.Client(transport=RetryTransport(httpx.HTTPTransport(), retry_policy, stats)), stats
+
+
+def test_retries_server_errors(stub):
+    stub.error_rate = 0.3
+    client, stats = retrying_client()
+
+    statuses = [client.post(f"{stub.api_base}/embeddings", json=EMBEDDING).status_code for _ in range(20)]
+
+    assert statuses == [200] * 20
+    assert stats.retries == stub.stats_dict()["errors"] > 0
+    assert stats.requests == 20 + stats.retries
+
+
+def test_returns_last_response_once_retries_exhausted(stub):
+    stub.error_rate = 1.0
+    client, stats = retrying_client(RetryPolicy(max_retries=2, backoff_base=0.001))
+
+    response = client.post(f"{stub.api_base}/embeddings", json=EMBEDDING)
+
+    assert response.status_code == 500
+    assert stats.as_dict() == {"requests": 3, "retries": 2, "hedges": 0, "hedge_wins": 0}
+
+
+def test_does_not_retry_client_errors(stub):
+    client, stats = retrying_client()
+
+    assert client.post(f"{stub.api_base}/unknown", json=EMBEDDING).status_code == 404
+    assert stats.requests == 1
+
+
+def test_retries_connection_errors():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    client, stats = retrying_client(RetryPolicy(max_retries=2, backoff_base=0.001))
+
+    with pytest.raises(httpx.ConnectError):
+        client.get(f"http://127.0.0.1:{port}/v1/models")
+    assert stats.retries == 2
+
+
+def test_retry_delay():
+    policy = RetryPolicy(max_retries=3, backoff_base=1.0, backoff_max=5.0)
+
+    assert 0.5 <= policy.retry_delay(0) <= 1.0
+    assert 2.0 <= policy.retry_delay(2, httpx.Response(503)) <= 4.0
+    assert policy.retry_delay(0, httpx.Response(429, headers={"retry-after-ms": "250"})) == 0.25
+    assert policy.retry_delay(0, httpx.Response(429, headers={"retry-after": "60"})) == 5.0
+    assert policy.retry_delay(0, httpx.Response(400)) is None
+    assert policy.retry_delay(3, httpx.Response(503)) is None
+
+
+def test_hedges_slow_requests(stub):
+    # The first request is slow, its hedge answers at once
+    stub.embedding_latency = LatencySequence(1.0)
+    stats = HTTPClientStats()
+    latencies = LatencyWindow(min_samples=1)
+    latencies.record("/v1/embeddings", 0.01)
+    transport = AsyncRetryTransport(httpx.AsyncHTTPTransport(), FAST_RETRIES, stats, hedge_quantile=0.5, latencies=latencies)
+
+    async def embed():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.post(f"{stub.api_base}/embeddings", json=EMBEDDING)
+
+    start = time.perf_counter()
+    response = asyncio.run(embed())
+
+    assert response.status_code == 200
+    assert time.perf_counter() - start < 0.5
+    assert stats.hedges == stats.hedge_wins == 1
+    assert stub.stats_dict()["embedding_requests"] == 2
+
+
+def test_async_client_reuses_its_connections(stub):
+    http_clients = initialize_http_clients()
+    pool = http_clients.async_client._transport.transport._pool  # noqa: SLF001
+
+    async def embed():
+        statuses = [(await http_clients.async_client.post(f"{stub.api_base}/embeddings", json=EMBEDDING)).status_code]
+        statuses += [(await http_clients.async_client.post(f"{stub.api_base}/embeddings", json=EMBEDDING)).status_code]
+        connections = len(pool.connections)
+        await http_clients.async_client.aclose()
+        return statuses, connections
+
+    # Sequential requests on the long-lived loop share one kept-alive connection, closed with the client
+    assert asyncio.run(embed()) == ([200, 200], 1)
+    assert not pool.connections
+
+
+def test_openai_models_use_http_clients(stub, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    monkeypatch.setenv("OPENAI_API_BASE", stub.api_base)
+    stub.error_rate = 0.3
+    http_clients = initialize_http_clients(max_retries=8)
+
+    llm = initialize_llm("gpt-4o-mini", http_clients=http_clients)
+    embed_model = initialize_embedding_model("text-embedding-3-small", http_clients=http_clients)
+    embeddings = [embed_model.get_text_embedding(f"testo {i}") for i in range(5)]
+
+    assert llm.max_retries == embed_model.max_retries == 0
+    assert all(len(embedding) == 8 for embedding in embeddings)
+    assert http_clients.stats.requests == 5 + http_clients.stats.retries
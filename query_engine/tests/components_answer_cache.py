@@ -0,0 +1,133 @@
+import asyncio
+
+import numpy as np
+import pytest
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from src.components.answer_cache import SemanticAnswerCache, get_index_version, normalize_question
+
+VECTORS = {
+    "chi è marta tortia?": [1.0, 0.0, 0.0],
+    "chi e' marta tortia": [0.99, 0.1, 0.0],
+    "di cosa parla il talk di torino?": [0.0, 1.0, 0.0],
+    "cosa si dice sul cibo?": [0.0, 0.0, 1.0],
+}
+
+
+class DictEmbedding(BaseEmbedding):
+    """Embedding stub returning fixed vectors by normalized text"""
+
+    calls: int = 0
+
+    def _vector(self, text):
+        self.calls += 1
+        return VECTORS[normalize_question(text)]
+
+    def _get_query_embedding(self, query):
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._vector(query)
+
+    def _get_text_embedding(self, text):
+        return self._vector(text)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def ask(cache, question):
+    return asyncio.run(cache.alookup(question))
+
+
+def test_similar_question_hits_the_cache():
+    cache = SemanticAnswerCache(DictEmbedding(), threshold=0.95)
+
+    lookup = ask(cache, "Chi è Marta Tortia?")
+    assert lookup.answer is None
+    cache.put("Chi è Marta Tortia?", "Una speaker di TEDxTorino.", lookup.embedding)
+
+    hit = ask(cache, "chi e' Marta Tortia")
+
+    assert hit.answer == "Una speaker di TEDxTorino."
+    assert hit.similarity == pytest.approx(0.99 / np.linalg.norm([0.99, 0.1]), rel=1e-5)
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "bypassed": 0, "hit_rate": 0.5}
+
+
+def test_dissimilar_question_misses():
+    cache = SemanticAnswerCache(DictEmbedding(), threshold=0.95)
+    cache.put("Chi è Marta Tortia?", "Una speaker.", VECTORS["chi è marta tortia?"])
+
+    lookup = ask(cache, "Di cosa parla il talk di Torino?")
+
+    assert lookup.answer is None
+    assert lookup.similarity == pytest.approx(0.0)
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = SemanticAnswerCache(DictEmbedding(), ttl_seconds=60, clock=clock)
+    cache.put("Chi è Marta Tortia?", "Una speaker.", VECTORS["chi è marta tortia?"])
+
+    clock.now += 61
+
+    assert ask(cache, "Chi è Marta Tortia?").answer is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(DictEmbedding(), max_entries=2)
+    cache.put("Chi è Marta Tortia?", "uno", VECTORS["chi è marta tortia?"])
+    cache.put("Di cosa parla il talk di Torino?", "due", VECTORS["di cosa parla il talk di torino?"])
+    ask(cache, "Chi è Marta Tortia?")
+
+    cache.put("Cosa si dice sul cibo?", "tre", VECTORS["cosa si dice sul cibo?"])
+
+    assert len(cache) == 2
+    assert ask(cache, "Chi è Marta Tortia?").answer == "uno"
+    assert ask(cache, "Di cosa parla il talk di Torino?").answer is None
+
+
+def test_cache_is_persisted_per_scope(tmp_path):
+    path = tmp_path / "answers.npz"
+    cache = SemanticAnswerCache(DictEmbedding(), scope="tedx:v1", persist_path=path)
+    cache.put("Chi è Marta Tortia?", "Una speaker.", VECTORS["chi è marta tortia?"])
+    cache.save()
+
+    same_scope = SemanticAnswerCache(DictEmbedding(), scope="tedx:v1", persist_path=path)
+    other_scope = SemanticAnswerCache(DictEmbedding(), scope="tedx:v2", persist_path=path)
+
+    assert ask(same_scope, "chi e' marta tortia").answer == "Una speaker."
+    assert len(other_scope) == 0
+
+
+def test_save_is_throttled(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "answers.npz"
+    cache = SemanticAnswerCache(DictEmbedding(), persist_path=path, persist_interval_seconds=60, clock=clock)
+
+    cache.put("Chi è Marta Tortia?", "uno", VECTORS["chi è marta tortia?"])
+    assert not path.exists()
+
+    clock.now += 60
+    cache.put("Cosa si dice sul cibo?", "due", VECTORS["cosa si dice sul cibo?"])
+    assert path.exists()
+
+
+def test_invalid_threshold():
+    with pytest.raises(ValueError, match="threshold"):
+        SemanticAnswerCache(DictEmbedding(), threshold=0)
+
+
+def test_index_version_follows_the_manifest(tmp_path):
+    assert get_index_version(str(tmp_path), "tedx") == "unversioned"
+
+    (tmp_path / "tedx.manifest.json").write_text('{"files": {}}')
+    first = get_index_version(str(tmp_path), "tedx")
+    (tmp_path / "tedx.manifest.json").write_text('{"files": {"a.txt": {}}}')
+
+    assert first != get_index_version(str(tmp_path), "tedx")
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+
+import pytest
+from src.components.batch_queries import BatchQuestion, answer_question, read_completed, read_questions, run_batch
+from src.components.query_trace import QueryTrace
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+class FakeAnswerer:
+    """Answers after `latency_seconds`, failing the first `failures` attempts of every question"""
+
+    def __init__(self, latency_seconds=0.0, failures=0):
+        self.latency_seconds = latency_seconds
+        self.failures = failures
+        self.attempts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, question):
+        self.attempts[question] = self.attempts.get(question, 0) + 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency_seconds)
+        finally:
+            self.in_flight -= 1
+        if self.attempts[question] <= self.failures:
+            error_msg = "LLM unavailable"
+            raise RuntimeError(error_msg)
+        trace = QueryTrace(llm_calls=1, prompt_tokens=100, completion_tokens=20, youtube_ids=["video1"])
+        trace.stage_seconds["llm"] = self.latency_seconds
+        return f"Risposta a {question}", trace
+
+
+def test_read_questions(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"question": "Prima?"}\n\n{"id": "q2", "question": "Seconda?"}\n', encoding="utf-8")
+
+    assert read_questions(path) == [BatchQuestion(id="1", question="Prima?"), BatchQuestion(id="q2", question="Seconda?")]
+
+
+@pytest.mark.parametrize(
+    ("records", "match"),
+    [([{"id": "q1"}], "no question"), ([{"id": "q1", "question": "A?"}, {"id": "q1", "question": "B?"}], "Duplicate")],
+)
+def test_read_questions_errors(tmp_path, records, match):
+    path = tmp_path / "questions.jsonl"
+    write_jsonl(path, records)
+
+    with pytest.raises(ValueError, match=match):
+        read_questions(path)
+
+
+def test_batch_runs_concurrently(tmp_path):
+    questions = [BatchQuestion(id=str(i), question=f"Domanda {i}?") for i in range(20)]
+    answerer = FakeAnswerer(latency_seconds=0.1)
+    output = tmp_path / "answers.jsonl"
+
+    start = time.perf_counter()
+    stats = asyncio.run(run_batch(questions, answerer, output, concurrency=10))
+
+    # 20 questions of 0.1s each, 10 at a time
+    assert time.perf_counter() - start < 0.5
+    assert answerer.max_in_flight == 10
+    assert (stats.answered, stats.failed, stats.skipped) == (20, 0, 0)
+    records = read_jsonl(output)
+    assert sorted(record["id"] for record in records) == sorted(question.id for question in questions)
+    record = records[0]
+    assert record["answer"] == f"Risposta a {record['question']}"
+    assert record["youtube_ids"] == ["video1"]
+    assert (record["llm_calls"], record["prompt_tokens"], record["completion_tokens"]) == (1, 100, 20)
+    assert set(record["latency_seconds"]) == {"total", "embedding", "retrieval", "llm"}
+    assert record["latency_seconds"]["total"] >= 0.1
+
+
+def test_failed_questions_are_retried():
+    record = asyncio.run(answer_question(BatchQuestion("1", "Domanda?"), FakeAnswerer(failures=2), backoff_base=0.01))
+
+    assert record["attempts"] == 3
+    assert record["error"] is None
+    assert record["answer"] == "Risposta a Domanda?"
+
+
+def test_failures_after_every_retry_are_recorded(tmp_path):
+    output = tmp_path / "answers.jsonl"
+
+    stats = asyncio.run(
+        run_batch([BatchQuestion("1", "Domanda?")], FakeAnswerer(failures=5), output, max_retries=1, backoff_base=0.01)
+    )
+
+    assert stats.failed == 1
+    [record] = read_jsonl(output)
+    assert record["attempts"] == 2
+    assert record["answer"] is None
+    assert record["error"] == "RuntimeError: LLM unavailable"
+
+
+def test_resume(tmp_path):
+    output = tmp_path / "answers.jsonl"
+    write_jsonl(output, [{"id": "1", "answer": "Risposta", "error": None}, {"id": "2", "answer": None, "error": "Timeout"}])
+    # A record cut short by an interrupted run
+    with output.open("a", encoding="utf-8") as file:
+        file.write('{"id": "3", "answer": "Rispo')
+    questions = [BatchQuestion(id=str(i), question=f"Domanda {i}?") for i in range(1, 5)]
+    answerer = FakeAnswerer()
+
+    assert read_completed(output) == {"1"}
+    stats = asyncio.run(run_batch(questions, answerer, output))
+
+    assert (stats.answered, stats.skipped) == (3, 1)
+    assert sorted(answerer.attempts) == ["Domanda 2?", "Domanda 3?", "Domanda 4?"]
+    assert read_completed(output) == {"1", "2", "3", "4"}
+
+
+def test_overwrite(tmp_path):
+    output = tmp_path / "answers.jsonl"
+    write_jsonl(output, [{"id": "1", "answer": "Vecchia risposta", "error": None}])
+
+    asyncio.run(run_batch([BatchQuestion("1", "Domanda?")], FakeAnswerer(), output, resume=False))
+
+    assert [record["answer"] for record in read_jsonl(output)] == ["Risposta a Domanda?"]
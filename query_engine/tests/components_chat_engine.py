@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from benchmarks.stub_llm import STUB_ANSWER, StubLLM
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from src.components.chat_engine import CHAT_MODES, create_chat_engine
+
+
+class RecordingRetriever(BaseRetriever):
+    """Retriever recording the questions it is asked"""
+
+    def __init__(self):
+        super().__init__()
+        index = VectorStoreIndex([TextNode(text=f"passaggio {i}") for i in range(5)], embed_model=MockEmbedding(embed_dim=4))
+        self.retriever = index.as_retriever(similarity_top_k=2)
+        self.questions = []
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        self.questions.append(query_bundle.query_str)
+        return self.retriever.retrieve(query_bundle)
+
+
+def converse(chat_engine, llm, questions):
+    """Ask the questions in turn and return the answers and the LLM calls of every turn"""
+
+    async def run():
+        answers, calls = [], []
+        for question in questions:
+            llm.calls = 0
+            answers.append(str(await chat_engine.achat(question)))
+            calls.append(llm.calls)
+        return answers, calls
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    ("chat_mode", "expected_calls"),
+    [("condense_plus_context", [1, 2, 2]), ("context", [1, 1, 1]), ("agent", [3, 3, 3])],
+)
+def test_llm_calls_per_turn(chat_mode, expected_calls):
+    llm = StubLLM()
+    retriever = RecordingRetriever()
+    chat_engine = create_chat_engine(retriever, llm=llm, chat_mode=chat_mode)
+
+    answers, calls = converse(chat_engine, llm, ["Di cosa parla Marta Tortia?", "E del cibo?", "Con quali esempi?"])
+
+    assert calls == expected_calls
+    assert answers == [STUB_ANSWER] * 3
+    assert len(retriever.questions) == 3
+
+
+def test_condense_plus_context_rewrites_follow_up_questions():
+    """Test that follow-up questions are retrieved once, as rewritten by the LLM, and first questions as is"""
+    llm = StubLLM(answer="Domanda riscritta")
+    retriever = RecordingRetriever()
+    chat_engine = create_chat_engine(retriever, llm=llm, chat_mode="condense_plus_context")
+
+    converse(chat_engine, llm, ["Di cosa parla Marta Tortia?", "E del cibo?"])
+
+    assert retriever.questions == ["Di cosa parla Marta Tortia?", "Domanda riscritta"]
+
+
+def test_context_mode_keeps_the_conversation():
+    llm = StubLLM()
+    chat_engine = create_chat_engine(RecordingRetriever(), llm=llm, chat_mode="context")
+
+    converse(chat_engine, llm, ["Di cosa parla Marta Tortia?", "E del cibo?"])
+
+    assert [message.content for message in chat_engine.chat_history] == [
+        "Di cosa parla Marta Tortia?",
+        STUB_ANSWER,
+        "E del cibo?",
+        STUB_ANSWER,
+    ]
+
+
+def test_unknown_chat_mode():
+    with pytest.raises(ValueError, match="chat mode"):
+        create_chat_engine(RecordingRetriever(), llm=StubLLM(), chat_mode="best")
+
+
+def test_chat_modes_default_first():
+    assert CHAT_MODES[0] == "condense_plus_context"
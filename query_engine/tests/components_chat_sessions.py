@@ -0,0 +1,127 @@
+import asyncio
+import time
+from unittest.mock import Mock
+
+import pytest
+from src.components.chat_sessions import ChatSessionPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowChatEngine:
+    """Chat engine stub answering after a fixed delay"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.messages = []
+
+    async def achat(self, message):
+        await asyncio.sleep(self.delay)
+        self.messages.append(message)
+        return f"risposta a {message}"
+
+
+def test_sessions_get_their_own_chat_engine():
+    pool = ChatSessionPool(Mock)
+
+    first = pool.get("a")
+    second = pool.get("b")
+
+    assert first.chat_engine is not second.chat_engine
+    assert pool.get("a") is first
+    assert len(pool) == 2
+
+
+def test_least_recently_used_session_is_evicted():
+    pool = ChatSessionPool(Mock, max_sessions=2)
+    pool.get("a")
+    pool.get("b")
+    pool.get("a")
+
+    pool.get("c")
+
+    assert "a" in pool
+    assert "b" not in pool
+    assert "c" in pool
+    assert pool.evictions == 1
+
+
+def test_idle_sessions_expire():
+    clock = FakeClock()
+    pool = ChatSessionPool(Mock, ttl_seconds=10, clock=clock)
+    first = pool.get("a")
+    pool.get("b")
+
+    clock.now = 8
+    pool.get("b")
+    clock.now = 15
+    pool.get("c")
+
+    assert "a" not in pool
+    assert "b" in pool
+    assert pool.get("a") is not first
+
+
+def test_reset_drops_the_session():
+    pool = ChatSessionPool(Mock)
+    first = pool.get("a")
+
+    pool.reset("a")
+    pool.reset("unknown")
+
+    assert "a" not in pool
+    assert pool.get("a") is not first
+
+
+def test_invalid_max_sessions():
+    with pytest.raises(ValueError, match="max_sessions"):
+        ChatSessionPool(Mock, max_sessions=0)
+
+
+def test_concurrent_sessions_do_not_wait_for_each_other():
+    delay = 0.2
+    pool = ChatSessionPool(lambda: SlowChatEngine(delay))
+
+    async def ask(session_id):
+        session = pool.get(session_id)
+        async with session.lock:
+            return await session.chat_engine.achat(session_id)
+
+    async def run():
+        return await asyncio.gather(*(ask(f"session{i}") for i in range(10)))
+
+    start = time.perf_counter()
+    answers = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert answers == [f"risposta a session{i}" for i in range(10)]
+    assert elapsed < 5 * delay
+
+
+def test_messages_of_a_session_are_serialized():
+    pool = ChatSessionPool(lambda: SlowChatEngine(0.05))
+    active = 0
+    overlaps = 0
+
+    async def ask(message):
+        nonlocal active, overlaps
+        session = pool.get("same")
+        async with session.lock:
+            active += 1
+            overlaps += active > 1
+            await session.chat_engine.achat(message)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*(ask(f"domanda {i}") for i in range(3)))
+
+    asyncio.run(run())
+
+    assert overlaps == 0
+    assert pool.get("same").chat_engine.messages == ["domanda 0", "domanda 1", "domanda 2"]
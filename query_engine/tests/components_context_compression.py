@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from benchmarks.stub_llm import StubLLM
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from src.components.chat_engine import create_chat_engine
+from src.components.context_compression import (
+    NUM_TOKENS_KEY,
+    ContextCompressor,
+    count_tokens,
+    merge_chunks,
+    pack_passages,
+)
+
+TRANSCRIPT = (
+    "Il cibo racconta la storia di una città. Ogni mercato è un archivio di ricette. "
+    "A Torino i quartieri cambiano e con loro cambiano i sapori. Le ricette delle nonne sopravvivono nelle trattorie. "
+    "Mangiare insieme è il primo modo di conoscere chi arriva da lontano."
+)
+
+
+def chunk(start, end, score=1.0, talk="talk1", text=TRANSCRIPT, num_tokens=None):
+    metadata = {"youtube_id": talk}
+    if num_tokens is not None:
+        metadata[NUM_TOKENS_KEY] = num_tokens
+    node = TextNode(text=text[start:end], start_char_idx=start, end_char_idx=end, metadata=metadata)
+    return NodeWithScore(node=node, score=score)
+
+
+def test_merge_overlapping_chunks():
+    passages = merge_chunks([chunk(60, 160, score=0.5), chunk(0, 100, score=0.9), chunk(140, 220, score=0.7)])
+
+    assert len(passages) == 1
+    assert passages[0].node.text == TRANSCRIPT[0:220]
+    assert passages[0].node.start_char_idx == 0
+    assert passages[0].node.end_char_idx == 220
+    assert passages[0].score == 0.9
+
+
+def test_merge_adjacent_chunks():
+    """Test that chunks split without overlap are merged, with the whitespace between them restored"""
+    passages = merge_chunks([chunk(0, 40), chunk(41, 80)])
+
+    assert [passage.node.text for passage in passages] == [TRANSCRIPT[0:80]]
+
+
+def test_distant_chunks_and_talks_are_not_merged():
+    passages = merge_chunks([chunk(0, 40, score=0.9), chunk(120, 180, score=0.5), chunk(20, 60, score=0.7, talk="talk2")])
+
+    assert [(passage.node.metadata["youtube_id"], passage.node.text) for passage in passages] == [
+        ("talk1", TRANSCRIPT[0:40]),
+        ("talk2", TRANSCRIPT[20:60]),
+        ("talk1", TRANSCRIPT[120:180]),
+    ]
+
+
+def test_contained_and_duplicate_chunks_are_dropped():
+    duplicate = chunk(0, 100, score=0.4)
+    duplicate.node.metadata["youtube_id"] = "copy"
+    passages = merge_chunks([chunk(0, 100, score=0.6), chunk(20, 80, score=0.8), duplicate])
+
+    assert [(passage.node.text, passage.score) for passage in passages] == [(TRANSCRIPT[0:100], 0.8)]
+
+
+def test_chunks_without_offsets_are_kept_as_is():
+    node = NodeWithScore(node=TextNode(text="Un passaggio senza posizione", metadata={"youtube_id": "talk1"}), score=0.3)
+    shifted = chunk(0, 40)
+    shifted.node.text = "Testo modificato"
+
+    passages = merge_chunks([node, shifted, chunk(30, 60)])
+
+    assert node in passages
+    assert shifted in passages
+    assert len(passages) == 3
+
+
+def test_merged_passage_tokens():
+    """Test that only the tokens of the new part of an overlapping chunk are counted"""
+    passages = merge_chunks([chunk(0, 100, num_tokens=20), chunk(50, 150, num_tokens=20), chunk(151, 200, num_tokens=8)])
+
+    assert passages[0].node.metadata[NUM_TOKENS_KEY] == 20 + 10 + 8
+    assert count_tokens(passages[0].node) == 38
+
+
+def test_count_tokens_without_stored_count():
+    assert count_tokens(chunk(0, 40).node) > 0
+    assert count_tokens(chunk(0, 40, num_tokens=7).node) == 7
+
+
+def test_pack_passages():
+    passages = [chunk(0, 10, score=0.9, num_tokens=60), chunk(20, 30, score=0.8, num_tokens=50), chunk(40, 50, num_tokens=30)]
+
+    assert pack_passages(passages, 100) == [passages[0], passages[2]]
+    assert pack_passages(passages, 0) == passages
+    # The best passage is kept even if it alone exceeds the budget
+    assert pack_passages(passages, 10) == [passages[0]]
+
+
+def test_context_compressor():
+    compressor = ContextCompressor(token_budget=30)
+    nodes = [chunk(0, 100, score=0.9, num_tokens=20), chunk(50, 150, num_tokens=20), chunk(0, 50, talk="talk2", num_tokens=20)]
+
+    passages = compressor.postprocess_nodes(nodes)
+
+    assert [passage.node.text for passage in passages] == [TRANSCRIPT[0:150]]
+    assert compressor.postprocess_nodes([]) == []
+
+
+def test_context_compressor_rejects_negative_budget():
+    with pytest.raises(ValueError, match="greater than or equal"):
+        ContextCompressor(token_budget=-1)
+
+
+class OverlappingChunksRetriever(BaseRetriever):
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:  # noqa: ARG002
+        return [chunk(0, 100, score=0.9), chunk(50, 150, score=0.8)]
+
+
+@pytest.mark.parametrize("chat_mode", ["condense_plus_context", "agent"])
+def test_chat_engine_compresses_the_context(chat_mode):
+    chat_engine = create_chat_engine(
+        OverlappingChunksRetriever(), llm=StubLLM(), chat_mode=chat_mode, node_postprocessors=[ContextCompressor()]
+    )
+
+    response = asyncio.run(chat_engine.achat("Di cosa parla il talk?"))
+
+    assert [result.node.text for result in response.source_nodes] == [TRANSCRIPT[0:150]]
@@ -1,6 +1,8 @@
+import asyncio
 import pytest
+from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.embeddings.openai import OpenAIEmbedding
-from src.components.embeddings import initialize_embedding_model
+from src.components.embeddings import CachedEmbedding, initialize_embedding_model
 
 def test_initialize_embedding_model_returns_correct_type():
     """Test that the function returns an OpenAIEmbedding instance"""
@@ -11,4 +13,110 @@ def test_initialize_embedding_model_returns_correct_type():
 def test_initialize_embedding_model_type_error():
     """Test that the function raises TypeError for non-string input"""
     with pytest.raises(ValueError):
-        initialize_embedding_model(123)
\ No newline at end of file
+        initialize_embedding_model(123)
+
+
+class CountingEmbedding(BaseEmbedding):
+    """Deterministic embedding model counting how many texts it embeds"""
+
+    calls: int = 0
+
+    def _embed(self, text):
+        self.calls += 1
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+    def _get_query_embedding(self, query):
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._embed(query)
+
+    def _get_text_embedding(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "embeddings.sqlite3")
+
+
+def test_initialize_embedding_model_with_cache(cache_path):
+    """Test that a cache path wraps the model in a CachedEmbedding"""
+    model = initialize_embedding_model("text-embedding-ada-002", cache_path=cache_path)
+    assert isinstance(model, CachedEmbedding)
+    assert isinstance(model.embed_model, OpenAIEmbedding)
+    assert model.model_name == "text-embedding-ada-002"
+
+
+def test_initialize_embedding_model_empty_cache_path():
+    """Test that an empty cache path disables the cache"""
+    model = initialize_embedding_model("text-embedding-ada-002", cache_path="")
+    assert isinstance(model, OpenAIEmbedding)
+
+
+def test_cached_embedding_hits_and_misses(cache_path):
+    """Test that identical texts are embedded only once"""
+    inner = CountingEmbedding(model_name="fake")
+    model = CachedEmbedding(embed_model=inner, cache_path=cache_path, max_size_bytes=1024 * 1024)
+
+    first = model.get_text_embedding_batch(["ciao mondo", "buongiorno", "ciao mondo"])
+    second = model.get_text_embedding_batch(["buongiorno", "ciao   mondo"])
+
+    assert inner.calls == 2
+    assert first[0] == first[2] == second[1]
+    assert first[1] == second[0]
+    assert model.misses == 2
+    assert model.hits == 3
+    assert model.stats()["hit_rate"] == pytest.approx(0.6)
+
+
+def test_cached_embedding_query_and_async(cache_path):
+    """Test that query and async embeddings go through the cache"""
+    inner = CountingEmbedding(model_name="fake")
+    model = CachedEmbedding(embed_model=inner, cache_path=cache_path, max_size_bytes=1024 * 1024)
+
+    query_embedding = model.get_query_embedding("chi ha parlato di clima?")
+    async_embedding = asyncio.run(model.aget_query_embedding("chi ha parlato di clima?"))
+
+    assert query_embedding == async_embedding
+    assert inner.calls == 1
+
+
+def test_cached_embedding_persists_across_instances(cache_path):
+    """Test that the cache is shared by instances using the same file"""
+    inner = CountingEmbedding(model_name="fake")
+    CachedEmbedding(embed_model=inner, cache_path=cache_path, max_size_bytes=1024 * 1024).get_text_embedding("testo")
+
+    other = CachedEmbedding(embed_model=inner, cache_path=cache_path, max_size_bytes=1024 * 1024)
+    other.get_text_embedding("testo")
+
+    assert inner.calls == 1
+    assert other.hits == 1
+
+
+def test_cached_embedding_keyed_by_model_name(cache_path):
+    """Test that different models do not share cache entries"""
+    inner1 = CountingEmbedding(model_name="fake-1")
+    inner2 = CountingEmbedding(model_name="fake-2")
+    CachedEmbedding(embed_model=inner1, cache_path=cache_path, max_size_bytes=1024 * 1024).get_text_embedding("testo")
+    CachedEmbedding(embed_model=inner2, cache_path=cache_path, max_size_bytes=1024 * 1024).get_text_embedding("testo")
+
+    assert inner1.calls == 1
+    assert inner2.calls == 1
+
+
+def test_cached_embedding_eviction(cache_path):
+    """Test that the least recently used entries are evicted when the cache is full"""
+    inner = CountingEmbedding(model_name="fake")
+    # Each entry takes 3 floats (12 bytes) plus a 64 characters key
+    model = CachedEmbedding(embed_model=inner, cache_path=cache_path, max_size_bytes=76 * 3)
+
+    model.get_text_embedding_batch(["uno", "due", "tre"])
+    model.get_text_embedding("uno")  # refresh "uno"
+    model.get_text_embedding("quattro")
+
+    assert model.stats()["size_bytes"] <= 76 * 3
+    model.get_text_embedding("uno")
+    assert inner.calls == 4
+    model.get_text_embedding("due")
+    assert inner.calls == 5
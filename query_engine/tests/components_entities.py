@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import chromadb
+import pytest
+from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import FilterOperator
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.components.entities import EntityMatcher, get_entity_catalog_path
+from src.components.lexical_index import LexicalIndex
+from src.components.retrievers import PreFilteredRetriever, initialize_retriever
+
+from tests.components_lexical_index import TEXTS, write_lexical_index
+
+ENTITIES = {
+    "speech_author": ["Marta Tortia", "Lorenzo Piccolo", "Alteria", "Luca Colli"],
+    "speech_location": ["TEDxTorino", "TEDxForlì", "TEDxMantova Youth", "TEDxYouth@ITTColombo"],
+    "youtube_id": ["Aj5Eewf_5ug", "-B6CP7KUKW4"],
+}
+
+
+@pytest.fixture
+def matcher():
+    return EntityMatcher(ENTITIES)
+
+
+@pytest.mark.parametrize(
+    ("question", "expected"),
+    [
+        ("Cosa ha detto Marta Tortia sull'ascolto?", {"speech_author": ["Marta Tortia"]}),
+        ("cosa dice marta tortia", {"speech_author": ["Marta Tortia"]}),
+        ("I talk di TEDxTorino", {"speech_location": ["TEDxTorino"]}),
+        ("I talk di TEDx Torino", {"speech_location": ["TEDxTorino"]}),
+        ("a TEDxForli", {"speech_location": ["TEDxForlì"]}),
+        ("a TEDxMantova Youth", {"speech_location": ["TEDxMantova Youth"]}),
+        ("a TEDxYouth@ITTColombo", {"speech_location": ["TEDxYouth@ITTColombo"]}),
+        ("il video -B6CP7KUKW4", {"youtube_id": ["-B6CP7KUKW4"]}),
+        ("Alteria canta?", {"speech_author": ["Alteria"]}),
+        (
+            "Luca Colli a TEDxTorino e Marta Tortia",
+            {"speech_author": ["Luca Colli", "Marta Tortia"], "speech_location": ["TEDxTorino"]},
+        ),
+    ],
+)
+def test_match(matcher, question, expected):
+    assert matcher.match(question) == expected
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "parlami di intelligenza artificiale",
+        "un piccolo albero",  # surname alone
+        "Torino",  # city alone
+        "alteria",  # single-word name, not capitalized
+        "aj5eewf_5ug",  # YouTube ids are case sensitive
+        "TEDx",
+    ],
+)
+def test_no_match(matcher, question):
+    assert matcher.match(question) == {}
+    assert matcher.filters(question) is None
+
+
+def test_filters(matcher):
+    """Test that values of a field are alternatives, and fields must all match"""
+    filters = matcher.filters("Marta Tortia e Luca Colli a TEDxTorino")
+
+    by_key = {metadata_filter.key: metadata_filter for metadata_filter in filters.filters}
+    assert by_key["speech_author"].operator == FilterOperator.IN
+    assert by_key["speech_author"].value == ["Luca Colli", "Marta Tortia"]
+    assert by_key["speech_location"].operator == FilterOperator.EQ
+    assert by_key["speech_location"].value == "TEDxTorino"
+
+
+def test_from_catalog(tmp_path):
+    path = get_entity_catalog_path(str(tmp_path), "talks")
+    catalog = {"format_version": 1, "count": 3, "fields": {"speech_author": {"Marta Tortia": 3}}}
+    path.write_text(json.dumps(catalog))
+
+    matcher = EntityMatcher.from_catalog(path)
+
+    assert path == tmp_path / "talks.entities.json"
+    assert matcher.match("Marta Tortia") == {"speech_author": ["Marta Tortia"]}
+
+
+def test_from_catalog_unsupported_version(tmp_path):
+    path = tmp_path / "talks.entities.json"
+    path.write_text(json.dumps({"format_version": 2, "fields": {}}))
+
+    with pytest.raises(ValueError):
+        EntityMatcher.from_catalog(path)
+
+
+@pytest.fixture
+def vector_index(tmp_path, monkeypatch):
+    """Chroma index of the chunks of two speakers"""
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=8))
+    authors = ["Luca Colli", "Luca Colli", "Marta Tortia", "Marta Tortia"]
+    nodes = [
+        TextNode(id_=node_id, text=text, metadata={"speech_author": author})
+        for (node_id, text), author in zip(TEXTS.items(), authors, strict=True)
+    ]
+    collection = chromadb.PersistentClient(path=str(tmp_path / "db")).create_collection("test_collection")
+    storage_context = StorageContext.from_defaults(vector_store=ChromaVectorStore(chroma_collection=collection))
+    return VectorStoreIndex(nodes, storage_context=storage_context)
+
+
+@pytest.mark.parametrize("hybrid", [False, True])
+def test_entity_filter_retriever(tmp_path, vector_index, matcher, hybrid):
+    """Test that only the chunks of the speaker mentioned in the question are retrieved"""
+    lexical_index = LexicalIndex(write_lexical_index(tmp_path / "talks.lexical", TEXTS)) if hybrid else None
+    retriever = PreFilteredRetriever(vector_index, matcher, lexical_index=lexical_index, similarity_top_k=4)
+
+    results = retriever.retrieve("Cosa racconta marta tortia del cibo?")
+
+    assert sorted(result.node.node_id for result in results) == ["node2", "node3"]
+    assert asyncio.run(retriever.aretrieve("Cosa racconta marta tortia del cibo?")) == results
+
+
+def test_entity_filter_retriever_falls_back_without_matching_chunks(vector_index, matcher):
+    """Test that the unfiltered search answers when the mentioned speaker has no chunk"""
+    retriever = PreFilteredRetriever(vector_index, matcher, similarity_top_k=4)
+
+    results = retriever.retrieve("Cosa canta Alteria?")
+
+    assert len(results) == 4
+
+
+def test_entity_filter_retriever_without_entities(vector_index, matcher):
+    retriever = initialize_retriever(vector_index, entity_matcher=matcher)
+
+    assert isinstance(retriever, PreFilteredRetriever)
+    assert len(retriever.retrieve("Parlami del cibo")) == 2
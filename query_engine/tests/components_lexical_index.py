@@ -0,0 +1,187 @@
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pytest
+from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from src.components.lexical_index import LexicalIndex, get_lexical_index_path, tokenize
+from src.components.retrievers import HybridRetriever, initialize_retriever, reciprocal_rank_fusion
+
+TEXTS = {
+    "node0": "il cibo e il cibo della nonna",
+    "node1": "gli alberi della città",
+    "node2": "cibo e alberi",
+    "node3": "Marta Tortia racconta il suo viaggio",
+}
+
+
+def write_lexical_index(path, texts):
+    """Write a lexical index in the format built by the data_loader"""
+    path.mkdir(parents=True)
+    node_ids = list(texts)
+    postings: dict[str, dict[int, int]] = {}
+    doc_lengths = []
+    for doc, text in enumerate(texts.values()):
+        terms = tokenize(text)
+        doc_lengths.append(len(terms))
+        for term in terms:
+            postings.setdefault(term, {}).setdefault(doc, 0)
+            postings[term][doc] += 1
+    terms = sorted(postings)
+    (path / "terms.txt").write_text("\n".join(terms))
+    (path / "node_ids.txt").write_text("\n".join(node_ids))
+    np.save(path / "offsets.npy", np.cumsum([0] + [len(postings[term]) for term in terms]).astype(np.int64))
+    np.save(path / "postings_docs.npy", np.array([doc for term in terms for doc in postings[term]], dtype=np.int32))
+    np.save(path / "postings_tf.npy", np.array([tf for term in terms for tf in postings[term].values()], dtype=np.uint16))
+    np.save(path / "doc_lengths.npy", np.array(doc_lengths, dtype=np.int32))
+    header = {
+        "format_version": 1,
+        "analyzer": "italian-snowball-v1",
+        "count": len(node_ids),
+        "num_terms": len(terms),
+        "avg_length": sum(doc_lengths) / max(len(doc_lengths), 1),
+    }
+    (path / "lexical.json").write_text(json.dumps(header))
+    return path
+
+
+def brute_force_bm25(texts, query, k1=1.2, b=0.75):
+    documents = [tokenize(text) for text in texts.values()]
+    avg_length = sum(map(len, documents)) / len(documents)
+    scores = {}
+    for node_id, terms in zip(texts, documents):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in document for document in documents)
+            tf = terms.count(term)
+            idf = np.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(terms) / avg_length))
+        if score > 0:
+            scores[node_id] = score
+    return scores
+
+
+@pytest.fixture
+def lexical_index(tmp_path):
+    return LexicalIndex(write_lexical_index(tmp_path / "talks.lexical", TEXTS))
+
+
+def test_tokenize_removes_stop_words_and_stems():
+    """Test the Italian analyzer, which must stay in sync with the data_loader one"""
+    assert tokenize("Marta Tortia parlava dell'importanza del cibo a TEDxTorino nel 2019") == [
+        "mart",
+        "tort",
+        "parl",
+        "import",
+        "cib",
+        "tedxtorin",
+        "2019",
+    ]
+
+
+def test_get_lexical_index_path_is_inside_db_path(tmp_path):
+    assert get_lexical_index_path(str(tmp_path), "talks") == tmp_path / "talks.lexical"
+
+
+def test_lexical_index_loads_lazily(lexical_index):
+    assert not lexical_index.loaded
+    assert len(lexical_index) == 4
+    assert lexical_index.loaded
+
+
+@pytest.mark.parametrize("query", ["cibo", "alberi e cibo", "chi è Marta Tortia?"])
+def test_lexical_index_matches_brute_force_bm25(lexical_index, query):
+    """Test the vectorized scores against the BM25 formula"""
+    expected = brute_force_bm25(TEXTS, query)
+
+    results = lexical_index.search(query, top_k=10)
+
+    assert dict(results) == pytest.approx(expected, rel=1e-5)
+    assert [score for _, score in results] == pytest.approx(sorted(expected.values(), reverse=True), rel=1e-5)
+
+
+def test_lexical_index_search_top_k(lexical_index):
+    results = lexical_index.search("alberi e cibo", top_k=1)
+
+    assert results == lexical_index.search("alberi e cibo", top_k=10)[:1]
+
+
+def test_lexical_index_search_unknown_terms(lexical_index):
+    assert lexical_index.search("astronave", top_k=10) == []
+    assert lexical_index.search("il della", top_k=10) == []
+
+
+def test_lexical_index_rejects_other_analyzer(tmp_path):
+    path = write_lexical_index(tmp_path / "talks.lexical", TEXTS)
+    header = json.loads((path / "lexical.json").read_text())
+    (path / "lexical.json").write_text(json.dumps({**header, "analyzer": "english-porter-v1"}))
+
+    with pytest.raises(ValueError):
+        LexicalIndex(path).load()
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+
+    assert [node_id for node_id, _ in fused] == ["c", "a", "b", "d"]
+    assert dict(fused)["c"] == pytest.approx(1 / 63 + 1 / 61)
+
+
+@pytest.fixture
+def vector_index(monkeypatch):
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=8))
+    nodes = [TextNode(id_=node_id, text=text) for node_id, text in TEXTS.items()]
+    storage_context = StorageContext.from_defaults()
+    storage_context.docstore.add_documents(nodes)
+    return VectorStoreIndex(nodes, storage_context=storage_context)
+
+
+def test_hybrid_retriever_returns_lexical_hits(vector_index, lexical_index):
+    """Test that a chunk found only by BM25 is fetched and ranked first"""
+    retriever = HybridRetriever(vector_index, lexical_index, similarity_top_k=2, candidate_top_k=1)
+
+    results = retriever.retrieve("Tortia")
+
+    assert len(results) == 2
+    assert results[0].node.node_id == "node3"
+    assert results[0].node.text == TEXTS["node3"]
+
+
+def test_hybrid_retriever_async(vector_index, lexical_index):
+    retriever = HybridRetriever(vector_index, lexical_index, similarity_top_k=2, candidate_top_k=1)
+
+    results = asyncio.run(retriever.aretrieve("Tortia"))
+
+    assert [result.node.node_id for result in results] == [
+        result.node.node_id for result in retriever.retrieve("Tortia")
+    ]
+
+
+def test_hybrid_retriever_async_searches_off_the_event_loop(monkeypatch, vector_index, lexical_index):
+    """Test that the BM25 branch, fetching the filtered chunks with a blocking call, does not run on the event loop"""
+    retriever = HybridRetriever(vector_index, lexical_index, similarity_top_k=2, candidate_top_k=1)
+    lexical_search = retriever._lexical_search
+    threads = []
+
+    def record_thread(query_str):
+        threads.append(threading.get_ident())
+        return lexical_search(query_str)
+
+    monkeypatch.setattr(retriever, "_lexical_search", record_thread)
+
+    async def aretrieve():
+        return threading.get_ident(), await retriever.aretrieve("Tortia")
+
+    loop_thread, results = asyncio.run(aretrieve())
+
+    assert results[0].node.node_id == "node3"
+    assert threads
+    assert loop_thread not in threads
+
+
+def test_initialize_retriever(vector_index, lexical_index):
+    assert isinstance(initialize_retriever(vector_index, lexical_index), HybridRetriever)
+    assert not isinstance(initialize_retriever(vector_index), HybridRetriever)
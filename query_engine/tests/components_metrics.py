@@ -0,0 +1,57 @@
+from src.components.metrics import Histogram, QueryMetrics
+from src.components.query_trace import QueryTrace
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.samples("latency", {"stage": "llm"}) == [
+        'latency_bucket{stage="llm",le="0.1"} 2',
+        'latency_bucket{stage="llm",le="1"} 3',
+        'latency_bucket{stage="llm",le="+Inf"} 4',
+        'latency_sum{stage="llm"} 2.65',
+        'latency_count{stage="llm"} 4',
+    ]
+
+
+def test_record_queries():
+    metrics = QueryMetrics()
+    trace = QueryTrace(llm_calls=2, prompt_tokens=100, completion_tokens=20, embedding_tokens=8)
+    trace.stage_seconds |= {"embedding": 0.02, "retrieval": 0.05, "llm": 1.2}
+
+    metrics.record("answered", 1.3, trace)
+    metrics.record("cached", 0.01, QueryTrace())
+    metrics.record("error", 0.2)
+    lines = metrics.render().splitlines()
+
+    assert 'rag_queries_total{outcome="answered"} 1' in lines
+    assert 'rag_queries_total{outcome="cached"} 1' in lines
+    assert 'rag_queries_total{outcome="error"} 1' in lines
+    assert "rag_query_duration_seconds_count 3" in lines
+    # The cached answer did not go through retrieval
+    assert 'rag_stage_duration_seconds_count{stage="retrieval"} 1' in lines
+    assert 'rag_stage_duration_seconds_bucket{stage="llm",le="1"} 0' in lines
+    assert "rag_llm_calls_total 2" in lines
+    assert 'rag_tokens_total{kind="completion"} 20' in lines
+    assert 'rag_tokens_total{kind="embedding"} 8' in lines
+
+
+def test_collectors_are_read_when_rendered():
+    metrics = QueryMetrics()
+    sessions = []
+    metrics.add_collector("rag_chat_sessions", "gauge", "Chat sessions", lambda: [({}, len(sessions))])
+    metrics.add_collector("rag_cache_lookups_total", "counter", "Lookups", lambda: [({"result": 'a"b'}, 0.5)])
+
+    sessions.append("session")
+    lines = metrics.render().splitlines()
+
+    assert lines[-6:] == [
+        "# HELP rag_chat_sessions Chat sessions",
+        "# TYPE rag_chat_sessions gauge",
+        "rag_chat_sessions 1",
+        "# HELP rag_cache_lookups_total Lookups",
+        "# TYPE rag_cache_lookups_total counter",
+        'rag_cache_lookups_total{result="a\\"b"} 0.5',
+    ]
@@ -0,0 +1,97 @@
+import asyncio
+
+from benchmarks.stub_llm import StubLLM
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from src.components.chat_engine import create_chat_engine
+from src.components.query_trace import QueryTrace, _record_llm_call, _usage, current_trace, trace_query
+
+
+def make_retriever():
+    nodes = [TextNode(text=f"passaggio {i}", metadata={"youtube_id": f"video{i % 2}"}) for i in range(4)]
+    return VectorStoreIndex(nodes, embed_model=MockEmbedding(embed_dim=4)).as_retriever(similarity_top_k=3)
+
+
+def test_trace_of_a_question():
+    chat_engine = create_chat_engine(make_retriever(), llm=StubLLM(latency_seconds=0.05), chat_mode="condense_plus_context")
+
+    async def ask(question):
+        with trace_query() as trace:
+            await chat_engine.achat(question)
+        return trace
+
+    first = asyncio.run(ask("Di cosa parla il talk?"))
+    follow_up = asyncio.run(ask("E del cibo?"))
+
+    assert first.llm_calls == 1
+    assert follow_up.llm_calls == 2
+    assert sorted(first.youtube_ids) == ["video0", "video1"]
+    assert first.prompt_tokens > 0
+    assert first.completion_tokens > 0
+    assert first.stage_seconds["llm"] >= 0.05
+    assert 0 < first.stage_seconds["retrieval"] < first.stage_seconds["llm"]
+    assert first.stage_seconds["embedding"] > 0
+    assert first.embedding_tokens > 0
+
+
+def test_concurrent_questions_have_separate_traces():
+    retriever = make_retriever()
+    llm = StubLLM(latency_seconds=0.05)
+
+    async def ask(question):
+        chat_engine = create_chat_engine(retriever, llm=llm, chat_mode="context")
+        with trace_query() as trace:
+            await chat_engine.achat(question)
+        return trace
+
+    async def run():
+        return await asyncio.gather(*(ask(f"Domanda {i}?") for i in range(5)))
+
+    traces = asyncio.run(run())
+
+    assert [trace.llm_calls for trace in traces] == [1] * 5
+    # Overlapping questions do not add up their LLM time (5 x 0.05s)
+    assert all(trace.stage_seconds["llm"] < 0.2 for trace in traces)
+
+
+def test_events_outside_a_trace_are_ignored():
+    chat_engine = create_chat_engine(make_retriever(), llm=StubLLM(), chat_mode="context")
+    with trace_query() as trace:
+        pass
+
+    asyncio.run(chat_engine.achat("Di cosa parla il talk?"))
+
+    assert trace.llm_calls == 0
+
+
+def test_nested_stage_calls_are_counted_once():
+    trace = QueryTrace()
+    trace.start("retrieval")
+    trace.start("retrieval")
+
+    assert not trace.end("retrieval")
+    assert trace.end("retrieval")
+    assert not trace.end("retrieval")
+    assert trace.stage_seconds["retrieval"] > 0
+
+
+def test_reported_token_usage():
+    raw = {"usage": {"prompt_tokens": 120, "completion_tokens": 30}}
+    response = ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content="risposta"), raw=raw)
+    trace = QueryTrace()
+
+    _record_llm_call(trace, "domanda", str(response.message.content), response.raw)
+
+    assert (trace.prompt_tokens, trace.completion_tokens) == (120, 30)
+    assert _usage(None) == (None, None)
+
+
+def test_nested_traces_share_the_outer_trace():
+    assert current_trace() is None
+    with trace_query() as outer:
+        with trace_query() as inner:
+            assert inner is outer
+        assert current_trace() is outer
+    assert current_trace() is None
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+from src.components.single_flight import SingleFlight
+
+
+class Producer:
+    """Computation emitting `chunks` one at a time, every `delay` seconds, and counting its runs"""
+
+    def __init__(self, chunks=("a", "b", "c"), delay=0.01, error=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.error = error
+        self.runs = 0
+        self.cancelled = False
+
+    async def __call__(self, emit):
+        self.runs += 1
+        try:
+            for chunk in self.chunks:
+                await asyncio.sleep(self.delay)
+                emit(chunk)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return "".join(self.chunks)
+
+
+async def collect(flights, key, produce):
+    flight, leader = flights.join(key, produce)
+    return [chunk async for chunk in flight.stream()], flight.result, leader
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    produce = Producer()
+
+    async def run():
+        return await asyncio.gather(*(collect(flights, "domanda", produce) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert produce.runs == 1
+    assert [leader for _, _, leader in results] == [True, False, False, False, False]
+    assert all(chunks == ["a", "b", "c"] and result == "abc" for chunks, result, _ in results)
+    assert (flights.started, flights.joined, len(flights)) == (1, 4, 0)
+
+
+def test_late_caller_receives_the_chunks_already_emitted():
+    flights = SingleFlight()
+    produce = Producer()
+
+    async def run():
+        first = asyncio.create_task(collect(flights, "domanda", produce))
+        # Joins once "a" is emitted
+        await asyncio.sleep(0.015)
+        return await asyncio.gather(first, collect(flights, "domanda", produce))
+
+    (first_chunks, _, _), (late_chunks, _, leader) = asyncio.run(run())
+
+    assert first_chunks == late_chunks == ["a", "b", "c"]
+    assert not leader
+    assert produce.runs == 1
+
+
+def test_different_keys_and_sequential_callers_run_again():
+    flights = SingleFlight()
+    produce = Producer(delay=0)
+
+    async def run():
+        await asyncio.gather(collect(flights, "a", produce), collect(flights, "b", produce))
+        await collect(flights, "a", produce)
+
+    asyncio.run(run())
+
+    assert produce.runs == flights.started == 3
+    assert flights.joined == 0
+
+
+def test_error_is_raised_to_every_caller():
+    flights = SingleFlight()
+    produce = Producer(error=ValueError("boom"))
+
+    async def run():
+        return await asyncio.gather(*(collect(flights, "domanda", produce) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert produce.runs == 1
+    assert len(flights) == 0
+
+
+def test_computation_survives_while_a_caller_waits():
+    flights = SingleFlight()
+    produce = Producer(delay=0.05)
+
+    async def run():
+        first = asyncio.create_task(collect(flights, "domanda", produce))
+        second = asyncio.create_task(collect(flights, "domanda", produce))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    chunks, result, _ = asyncio.run(run())
+
+    assert chunks == ["a", "b", "c"]
+    assert result == "abc"
+    assert not produce.cancelled
+
+
+def test_computation_is_cancelled_once_every_caller_is_gone():
+    flights = SingleFlight()
+    produce = Producer(delay=0.05)
+
+    async def run():
+        callers = [asyncio.create_task(collect(flights, "domanda", produce)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        # The next caller starts a new computation instead of joining the cancelled one
+        return await collect(flights, "domanda", produce)
+
+    chunks, _, leader = asyncio.run(run())
+
+    assert produce.cancelled
+    assert leader
+    assert chunks == ["a", "b", "c"]
+    assert produce.runs == 2
+
+
+@pytest.mark.parametrize("timeout", [0.01, 0.5])
+def test_caller_timeout_leaves_the_others_waiting(timeout):
+    flights = SingleFlight()
+    produce = Producer(delay=0.05)
+
+    async def run():
+        impatient = asyncio.wait_for(collect(flights, "domanda", produce), timeout)
+        return await asyncio.gather(impatient, collect(flights, "domanda", produce), return_exceptions=True)
+
+    impatient, patient = asyncio.run(run())
+
+    assert isinstance(impatient, TimeoutError) == (timeout < 0.15)
+    assert patient[0] == ["a", "b", "c"]
+    assert produce.runs == 1
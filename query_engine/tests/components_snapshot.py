@@ -0,0 +1,174 @@
+import json
+import numpy as np
+import pytest
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters, VectorStoreQuery
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from src.components.vector_store import SnapshotVectorStore, get_snapshot_path, initialize_vector_index
+
+DIM = 64
+
+
+def write_snapshot(path, embeddings, dtype="int8", full_precision=True):
+    """Write a snapshot in the format exported by the data_loader"""
+    path.mkdir(parents=True)
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    if dtype == "int8":
+        scales = (np.abs(embeddings).max(axis=1) / 127).astype(np.float32)
+        quantized = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    else:
+        scales = np.ones(len(embeddings), dtype=np.float32)
+        quantized = embeddings.astype(np.float16)
+    np.save(path / "embeddings.npy", quantized)
+    np.save(path / "scales.npy", scales)
+    if full_precision:
+        np.save(path / "embeddings_full.npy", embeddings.astype(np.float32))
+
+    nodes = [TextNode(id_=f"node{i}", text=f"testo {i}", metadata={"talk": f"talk{i % 3}"}) for i in range(len(embeddings))]
+    columns = {
+        "node_id": [node.node_id for node in nodes],
+        "text": [node.text for node in nodes],
+        "metadata": [json.dumps(node_to_metadata_dict(node, remove_text=True)) for node in nodes],
+    }
+    for column, values in columns.items():
+        encoded = [value.encode() for value in values]
+        (path / f"{column}.bin").write_bytes(b"".join(encoded))
+        np.save(path / f"{column}.offsets.npy", np.cumsum([0] + [len(value) for value in encoded]))
+
+    header = {"format_version": 1, "count": len(embeddings), "dim": DIM, "dtype": dtype, "full_precision": full_precision}
+    (path / "snapshot.json").write_text(json.dumps(header))
+    return path
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).normal(size=(500, DIM)).astype(np.float32)
+
+
+def exact_top_k(embeddings, query, k):
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return [f"node{i}" for i in np.argsort(-(normalized @ query))[:k]]
+
+
+def test_snapshot_vector_store_returns_nodes(tmp_path, embeddings):
+    """Test that a query returns the stored nodes, text and metadata included"""
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings))
+
+    result = vector_store.query(VectorStoreQuery(query_embedding=embeddings[7].tolist(), similarity_top_k=3))
+
+    assert len(vector_store) == 500
+    assert result.ids[0] == "node7"
+    assert result.nodes[0].text == "testo 7"
+    assert result.nodes[0].metadata == {"talk": "talk1"}
+    assert result.similarities[0] == pytest.approx(1.0, abs=1e-2)
+    assert result.similarities == sorted(result.similarities, reverse=True)
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_snapshot_vector_store_matches_exact_search(tmp_path, embeddings, dtype):
+    """Test that quantized scoring finds (almost) the same neighbours as an exact search"""
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings, dtype=dtype))
+    queries = np.random.default_rng(1).normal(size=(20, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    hits = 0
+    for query in queries:
+        result = vector_store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=10))
+        hits += len(set(result.ids) & set(exact_top_k(embeddings, query, 10)))
+
+    assert hits / (10 * len(queries)) >= 0.9
+
+
+def test_snapshot_vector_store_rescoring_is_exact(tmp_path, embeddings):
+    """Test that rescoring the candidates in full precision gives the exact ranking and scores"""
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings), rescore_top_k=50)
+    query = np.random.default_rng(2).normal(size=DIM).astype(np.float32)
+    query /= np.linalg.norm(query)
+
+    result = vector_store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5))
+
+    assert result.ids == exact_top_k(embeddings, query, 5)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    assert result.similarities[0] == pytest.approx(float(normalized[int(result.ids[0][4:])] @ query), abs=1e-5)
+
+
+def test_snapshot_vector_store_rescoring_requires_full_precision(tmp_path, embeddings):
+    """Test that rescoring is rejected for snapshots without full-precision embeddings"""
+    path = write_snapshot(tmp_path / "snap", embeddings, full_precision=False)
+
+    with pytest.raises(ValueError):
+        SnapshotVectorStore(path, rescore_top_k=10)
+
+
+def test_snapshot_vector_store_is_read_only(tmp_path, embeddings):
+    """Test that the snapshot cannot be modified through the vector store"""
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings))
+
+    with pytest.raises(NotImplementedError):
+        vector_store.add([TextNode(text="nuovo")])
+    with pytest.raises(NotImplementedError):
+        vector_store.delete("node0")
+
+
+def test_initialize_vector_index_snapshot_mode(tmp_path, embeddings, monkeypatch):
+    """Test that the snapshot storage mode serves the snapshot without opening Chroma"""
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=DIM))
+    write_snapshot(get_snapshot_path(str(tmp_path), "test_collection"), embeddings)
+
+    index = initialize_vector_index("test_collection", str(tmp_path), storage_mode="snapshot")
+
+    assert isinstance(index, VectorStoreIndex)
+    assert isinstance(index.vector_store, SnapshotVectorStore)
+    assert len(index.as_retriever(similarity_top_k=4).retrieve("ciao")) == 4
+    assert not (tmp_path / "chroma.sqlite3").exists()
+
+
+def test_initialize_vector_index_snapshot_mode_without_snapshot(tmp_path):
+    """Test that the snapshot storage mode fails fast, naming the loader option, when no snapshot was exported"""
+    with pytest.raises(FileNotFoundError, match="SNAPSHOT_DTYPE"):
+        initialize_vector_index("test_collection", str(tmp_path), storage_mode="snapshot")
+
+
+def test_snapshot_vector_store_get_nodes(tmp_path, embeddings):
+    """Test fetching nodes by id, as the hybrid retriever does for BM25-only hits"""
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings))
+
+    nodes = vector_store.get_nodes(node_ids=["node42", "missing", "node3"])
+
+    assert [node.node_id for node in nodes] == ["node42", "node3"]
+    assert nodes[0].text == "testo 42"
+
+
+def test_snapshot_vector_store_filters(tmp_path, embeddings):
+    """Test that filtered queries only score the nodes matching the metadata filters"""
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings))
+    filters = MetadataFilters(filters=[MetadataFilter(key="talk", value="talk1")])
+    query = embeddings[7] / np.linalg.norm(embeddings[7])
+
+    result = vector_store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5, filters=filters))
+
+    ranking = exact_top_k(embeddings, query, len(embeddings))
+    assert result.ids == [node_id for node_id in ranking if int(node_id.removeprefix("node")) % 3 == 1][:5]
+    assert {node.metadata["talk"] for node in result.nodes} == {"talk1"}
+
+
+def test_snapshot_vector_store_filters_without_embedding(tmp_path, embeddings):
+    """Test fetching every node matching the filters, as the hybrid retriever does for BM25"""
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings))
+    filters = MetadataFilters(filters=[MetadataFilter(key="talk", value=["talk0", "talk2"], operator=FilterOperator.IN)])
+
+    result = vector_store.query(VectorStoreQuery(similarity_top_k=1000, filters=filters))
+
+    assert len(result.nodes) == len([i for i in range(len(embeddings)) if i % 3 != 1])
+    nodes = vector_store.get_nodes(node_ids=["node0", "node1", "node2"], filters=filters)
+    assert [node.node_id for node in nodes] == ["node0", "node2"]
+
+
+def test_snapshot_vector_store_unsupported_filters(tmp_path, embeddings):
+    vector_store = SnapshotVectorStore(write_snapshot(tmp_path / "snap", embeddings))
+    filters = MetadataFilters(filters=[MetadataFilter(key="talk", value="talk1", operator=FilterOperator.NE)])
+
+    with pytest.raises(ValueError):
+        vector_store.query(VectorStoreQuery(query_embedding=embeddings[0].tolist(), similarity_top_k=5, filters=filters))
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from src.components.startup import StartupProfile, process_uptime, warm_up_engine
+
+
+class FailingEmbedding(MockEmbedding):
+    async def _aget_query_embedding(self, query):
+        raise ConnectionError("API unreachable")
+
+
+class UnreachableLLM:
+    def _get_aclient(self):
+        raise ConnectionError("API unreachable")
+
+
+def make_retriever():
+    nodes = [TextNode(text=f"passaggio {i}") for i in range(4)]
+    return VectorStoreIndex(nodes, embed_model=MockEmbedding(embed_dim=4)).as_retriever()
+
+
+def test_startup_profile():
+    profile = StartupProfile()
+    profile.mark_imported()
+    with profile.stage("index"):
+        time.sleep(0.01)
+
+    assert list(profile.stage_seconds) == ["import", "index"]
+    assert profile.stage_seconds["index"] >= 0.01
+    assert profile.summary()["ready_seconds"] is None
+    assert not profile.ready
+
+    profile.mark_ready()
+
+    assert profile.ready
+    assert profile.ready_seconds >= sum(profile.stage_seconds.values())
+
+
+def test_process_uptime_includes_the_imports():
+    # The test session imported pytest, llama_index and the components before running this test
+    assert process_uptime() > 0.1
+
+
+def test_warm_up_engine():
+    profile = StartupProfile()
+
+    asyncio.run(warm_up_engine(profile, make_retriever(), MockEmbedding(embed_dim=4)))
+
+    assert profile.ready
+    assert list(profile.stage_seconds) == ["warm_up.embedding", "warm_up.retrieval", "warm_up.tokenizer"]
+
+
+def test_failed_warm_up_steps_are_skipped():
+    profile = StartupProfile()
+
+    asyncio.run(warm_up_engine(profile, make_retriever(), FailingEmbedding(embed_dim=4), UnreachableLLM()))
+
+    # Retrieval needs the question embedding, the engine is ready anyway
+    assert profile.ready
+    assert list(profile.stage_seconds) == ["warm_up.embedding", "warm_up.tokenizer", "warm_up.llm"]
@@ -0,0 +1,108 @@
+import asyncio
+
+import chromadb
+import pytest
+from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import NodeRelationship, QueryBundle, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import FilterOperator
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.components.retrievers import PreFilteredRetriever, initialize_retriever
+from src.components.talk_index import TalkIndex, get_talk_collection_name
+from src.components.vector_store import get_chroma_collection
+
+# Chunks of two talks, talkA around the first axis and talkB around the second
+CHUNKS = {
+    "a1": ("talkA", [1.0, 0.0, 0.0]),
+    "a2": ("talkA", [0.6, 0.0, 0.8]),
+    "b1": ("talkB", [0.0, 1.0, 0.0]),
+    "b2": ("talkB", [0.0, 0.6, 0.8]),
+}
+
+
+@pytest.fixture
+def client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "db"))
+
+
+@pytest.fixture
+def vector_index(client, monkeypatch):
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=3))
+    nodes = [
+        TextNode(
+            id_=node_id,
+            text=f"testo {node_id}",
+            embedding=embedding,
+            relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=talk_id)},
+        )
+        for node_id, (talk_id, embedding) in CHUNKS.items()
+    ]
+    collection = client.create_collection("test_collection")
+    storage_context = StorageContext.from_defaults(vector_store=ChromaVectorStore(chroma_collection=collection))
+    return VectorStoreIndex(nodes, storage_context=storage_context)
+
+
+@pytest.fixture
+def talk_collection(client):
+    """Talk vectors as written by the data_loader: the centroids of the chunks of each talk"""
+    collection = client.create_collection(get_talk_collection_name("test_collection"))
+    collection.add(ids=["talkA", "talkB"], embeddings=[[0.89, 0.0, 0.45], [0.0, 0.89, 0.45]])
+    return collection
+
+
+def test_talk_index_search(talk_collection):
+    talk_index = TalkIndex(talk_collection, top_k=1)
+
+    assert talk_index.search([0.1, 1.0, 0.0]) == ["talkB"]
+    assert talk_index.search([0.1, 1.0, 0.0], top_k=2) == ["talkB", "talkA"]
+
+    filters = talk_index.filters([0.1, 1.0, 0.0])
+    assert filters.filters[0].key == "ref_doc_id"
+    assert filters.filters[0].value == ["talkB"]
+    assert filters.filters[0].operator == FilterOperator.IN
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_two_stage_retrieval(vector_index, talk_collection, use_async):
+    """Test that only the chunks of the closest talk are searched"""
+    retriever = PreFilteredRetriever(vector_index, talk_index=TalkIndex(talk_collection, top_k=1), similarity_top_k=4)
+    query_bundle = QueryBundle("domanda", embedding=[0.5, 0.55, 0.9])
+
+    results = asyncio.run(retriever.aretrieve(query_bundle)) if use_async else retriever.retrieve(query_bundle)
+
+    assert [result.node.node_id for result in results] == ["b2", "b1"]
+
+
+def test_two_stage_retrieval_embeds_the_question(vector_index, talk_collection):
+    retriever = PreFilteredRetriever(vector_index, talk_index=TalkIndex(talk_collection, top_k=1), similarity_top_k=4)
+
+    results = retriever.retrieve("domanda")
+
+    assert len(results) == 2
+    assert len({result.node.ref_doc_id for result in results}) == 1
+
+
+def test_two_stage_retrieval_falls_back_without_matching_chunks(client, vector_index):
+    """Test that the unfiltered search answers when the talk vectors are stale"""
+    talk_collection = client.create_collection("stale_talks")
+    talk_collection.add(ids=["removed"], embeddings=[[1.0, 0.0, 0.0]])
+    retriever = PreFilteredRetriever(vector_index, talk_index=TalkIndex(talk_collection), similarity_top_k=4)
+
+    results = retriever.retrieve(QueryBundle("domanda", embedding=[1.0, 0.0, 0.0]))
+
+    assert len(results) == 4
+
+
+def test_initialize_retriever_two_stage(vector_index, talk_collection):
+    retriever = initialize_retriever(vector_index, talk_index=TalkIndex(talk_collection))
+
+    assert isinstance(retriever, PreFilteredRetriever)
+    assert retriever.entity_matcher is None
+
+
+@pytest.mark.usefixtures("talk_collection")
+def test_get_chroma_collection(tmp_path):
+    collection = get_chroma_collection(str(tmp_path / "db"), get_talk_collection_name("test_collection"))
+
+    assert collection.count() == 2
+    assert get_chroma_collection(str(tmp_path / "db"), "missing_talks") is None
@@ -1,7 +1,8 @@
 import pytest
 import os
 import tempfile
-from llama_index.core import VectorStoreIndex
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
 import chromadb
 
 # Import the function to test
@@ -27,4 +28,22 @@ def test_initialize_vector_index_invalid_path():
     
     # Execute and Assert
     with pytest.raises(Exception):  # Adjust the exception type based on ChromaDB's specific exception
-        initialize_vector_index(collection_name, invalid_path)
\ No newline at end of file
+        initialize_vector_index(collection_name, invalid_path)
+
+def test_initialize_vector_index_chroma_mode_without_docstore(temp_db_path, chroma_client, monkeypatch):
+    """Test that the default storage mode needs nothing but the Chroma collection"""
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=3))
+    chroma_client.create_collection("test_collection")
+
+    index = initialize_vector_index("test_collection", temp_db_path)
+
+    assert isinstance(index, VectorStoreIndex)
+    assert not os.path.exists(os.path.join(temp_db_path, "docstore.json"))
+
+
+def test_initialize_vector_index_invalid_storage_mode(temp_db_path, chroma_client):
+    """Test that an unknown storage mode is rejected"""
+    chroma_client.create_collection("test_collection")
+
+    with pytest.raises(ValueError):
+        initialize_vector_index("test_collection", temp_db_path, storage_mode="docstore")
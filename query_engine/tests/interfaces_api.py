@@ -0,0 +1,187 @@
+import asyncio
+import importlib
+import json
+import time
+from pathlib import Path
+
+import pytest
+from benchmarks.stub_llm import STUB_ANSWER, StubLLM
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+
+@pytest.fixture
+def interfaces(monkeypatch):
+    """The interfaces module, which imports the components as the service does"""
+    monkeypatch.syspath_prepend(str(SRC_DIR))
+    return importlib.import_module("interfaces")
+
+
+@pytest.fixture
+def rag_interface(interfaces, monkeypatch):
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=4))
+    monkeypatch.setattr(Settings, "_llm", StubLLM())
+    index = VectorStoreIndex([TextNode(text=f"passaggio {i}") for i in range(5)])
+    return interfaces.RAGQueryInterface(index, latency_budget_seconds=5)
+
+
+@pytest.fixture
+def client(interfaces, rag_interface):
+    with TestClient(interfaces.APIInterface(rag_interface, concurrency_limit=4).app) as client:
+        yield client
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_health_and_ready(client):
+    assert client.get("/api/health").json() == {"status": "ok"}
+    assert client.get("/api/ready").json()["status"] == "ready"
+
+
+def test_query_continues_the_session(client, rag_interface):
+    first = client.post("/api/query", json={"question": "Di cosa parla il talk?"}).json()
+    assert first["answer"] == STUB_ANSWER
+    assert first["latency_seconds"] >= 0
+    assert set(first["stage_seconds"]) == {"queue", "embedding", "retrieval", "llm"}
+
+    second = client.post("/api/query", json={"question": "E del cibo?", "session_id": first["session_id"]}).json()
+
+    assert second["session_id"] == first["session_id"]
+    assert len(rag_interface.sessions.get(first["session_id"]).chat_engine.chat_history) == 4
+
+
+def test_query_without_session_starts_a_new_one(client):
+    sessions = {
+        client.post("/api/query", json={"question": "Di cosa parla il talk?"}).json()["session_id"] for _ in range(2)
+    }
+
+    assert len(sessions) == 2
+
+
+@pytest.mark.parametrize("question", ["", "   "])
+def test_query_rejects_empty_questions(client, question):
+    assert client.post("/api/query", json={"question": question}).status_code == 422
+
+
+def test_query_over_latency_budget(client, rag_interface, interfaces, monkeypatch):
+    monkeypatch.setattr(Settings, "_llm", StubLLM(latency_seconds=2))
+    rag_interface.latency_budget_seconds = 0.2
+
+    response = client.post("/api/query", json={"question": "Di cosa parla il talk?"})
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == interfaces.TIMEOUT_MESSAGE
+
+
+def test_stream_query(client):
+    response = client.post("/api/query/stream", json={"question": "Di cosa parla il talk?", "session_id": "s1"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert {event for event, _ in events[:-1]} == {"token"}
+    assert "".join(data["token"] for _, data in events[:-1]) == STUB_ANSWER
+    assert events[-1][0] == "done"
+    assert events[-1][1]["answer"] == STUB_ANSWER
+    assert events[-1][1]["session_id"] == "s1"
+
+
+def test_stream_query_over_latency_budget(client, rag_interface, interfaces, monkeypatch):
+    monkeypatch.setattr(Settings, "_llm", StubLLM(latency_seconds=2))
+    rag_interface.latency_budget_seconds = 0.2
+
+    events = parse_events(client.post("/api/query/stream", json={"question": "Di cosa parla il talk?"}).text)
+
+    assert events[-1] == ("error", {"error": "timeout", "message": interfaces.TIMEOUT_MESSAGE, "answer": ""})
+
+
+def test_batch_query(client, rag_interface):
+    questions = [f"Domanda {i}?" for i in range(6)]
+
+    response = client.post("/api/query/batch", json={"questions": questions}).json()
+
+    assert [answer["question"] for answer in response["answers"]] == questions
+    assert {answer["answer"] for answer in response["answers"]} == {STUB_ANSWER}
+    # The batch sessions are dropped once answered
+    assert len(rag_interface.sessions) == 0
+
+
+def test_batch_query_limits(client, interfaces):
+    assert client.post("/api/query/batch", json={"questions": []}).status_code == 422
+    too_many = ["Domanda?"] * (interfaces.MAX_BATCH_QUESTIONS + 1)
+    assert client.post("/api/query/batch", json={"questions": too_many}).status_code == 422
+
+
+def test_reset_session(client, rag_interface):
+    session_id = client.post("/api/query", json={"question": "Di cosa parla il talk?"}).json()["session_id"]
+
+    assert client.delete(f"/api/sessions/{session_id}").status_code == 204
+    assert session_id not in rag_interface.sessions
+    # Resetting an unknown session is not an error
+    assert client.delete("/api/sessions/unknown").status_code == 204
+
+
+def test_api_next_to_gradio(interfaces, rag_interface):
+    api_interface = interfaces.APIInterface(rag_interface)
+    app = interfaces.GradioInterface(rag_interface).mount(api_interface.app)
+
+    assert isinstance(app, FastAPI)
+    with TestClient(app) as client:
+        assert client.get("/api/health").json() == {"status": "ok"}
+        assert "gradio" in client.get("/").text.lower()
+
+
+def test_ready_once_warmed_up(interfaces, rag_interface):
+    from src.components.startup import StartupProfile
+
+    startup = StartupProfile()
+    gradio_interface = interfaces.GradioInterface(rag_interface)
+    api_interface = interfaces.APIInterface(rag_interface, startup=startup)
+    warm_up_done = asyncio.Event()
+
+    async def warm_up():
+        with startup.stage("warm_up"):
+            await warm_up_done.wait()
+        startup.mark_ready()
+
+    gradio_interface.run_on_startup(warm_up)
+    with TestClient(gradio_interface.mount(api_interface.app)) as client:
+        # The server answers while warming up, but is not ready yet
+        assert client.get("/api/health").status_code == 200
+        warming_up = client.get("/api/ready")
+        client.portal.call(warm_up_done.set)
+        deadline = time.monotonic() + 5
+        while (ready := client.get("/api/ready")).status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert warming_up.status_code == 503
+    assert warming_up.json()["status"] == "warming_up"
+    assert ready.json()["status"] == "ready"
+    assert ready.json()["startup"]["stage_seconds"]["warm_up"] > 0
+    assert ready.json()["startup"]["ready_seconds"] > 0
+
+
+def test_metrics_endpoint(interfaces, rag_interface):
+    from src.components.metrics import QueryMetrics
+
+    without_metrics = TestClient(interfaces.APIInterface(rag_interface).app)
+    assert without_metrics.get("/metrics").status_code == 404
+
+    rag_interface = interfaces.RAGQueryInterface(rag_interface.index, metrics=QueryMetrics())
+    with TestClient(interfaces.APIInterface(rag_interface).app) as client:
+        client.post("/api/query", json={"question": "Di cosa parla il talk?"})
+        response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'rag_queries_total{outcome="answered"} 1' in response.text
+    assert "# TYPE rag_stage_duration_seconds histogram" in response.text
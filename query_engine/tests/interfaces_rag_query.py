@@ -0,0 +1,170 @@
+import asyncio
+import importlib
+from pathlib import Path
+
+import pytest
+from benchmarks.stub_llm import STUB_ANSWER, StubLLM
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+
+@pytest.fixture
+def interfaces(monkeypatch):
+    """The interfaces module, which imports the components as the service does"""
+    monkeypatch.syspath_prepend(str(SRC_DIR))
+    return importlib.import_module("interfaces")
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=4))
+    return VectorStoreIndex([TextNode(text=f"passaggio {i}") for i in range(5)])
+
+
+def ask(rag_interface, question, stream=False):
+    async def run():
+        if not stream:
+            history, _ = await rag_interface.query(question, [])
+            return history
+        updates = [history async for history, _ in rag_interface.stream_query(question, [])]
+        return updates[-1]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_query_within_latency_budget(interfaces, index, monkeypatch, stream):
+    monkeypatch.setattr(Settings, "_llm", StubLLM(latency_seconds=0.01))
+    rag_interface = interfaces.RAGQueryInterface(index, latency_budget_seconds=5)
+
+    assert ask(rag_interface, "Di cosa parla il talk?", stream=stream) == [("Di cosa parla il talk?", STUB_ANSWER)]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_query_over_latency_budget(interfaces, index, monkeypatch, stream):
+    """Test that a question still unanswered after the latency budget is abandoned"""
+    monkeypatch.setattr(Settings, "_llm", StubLLM(latency_seconds=2))
+    rag_interface = interfaces.RAGQueryInterface(index, latency_budget_seconds=0.2)
+
+    history = ask(rag_interface, "Di cosa parla il talk?", stream=stream)
+
+    assert history == [("Di cosa parla il talk?", interfaces.TIMEOUT_MESSAGE)]
+    # The session is usable again
+    assert not rag_interface.sessions.get(interfaces.DEFAULT_SESSION_ID).lock.locked()
+
+
+def sample(metrics, line_prefix):
+    """Value of the first exposed sample starting with `line_prefix`"""
+    return float(next(line for line in metrics.render().splitlines() if line.startswith(line_prefix)).split()[-1])
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_query_metrics(interfaces, index, monkeypatch, stream):
+    from src.components.metrics import QueryMetrics
+
+    monkeypatch.setattr(Settings, "_llm", StubLLM(latency_seconds=0.05))
+    metrics = QueryMetrics()
+    rag_interface = interfaces.RAGQueryInterface(index, chat_mode="context", metrics=metrics)
+
+    ask(rag_interface, "Di cosa parla il talk?", stream=stream)
+
+    assert sample(metrics, 'rag_queries_total{outcome="answered"}') == 1
+    assert sample(metrics, "rag_query_duration_seconds_count") == 1
+    for stage in ("embedding", "retrieval", "llm"):
+        assert sample(metrics, f'rag_stage_duration_seconds_count{{stage="{stage}"}}') == 1
+    assert sample(metrics, 'rag_stage_duration_seconds_bucket{stage="llm",le="0.025"}') == 0
+    assert sample(metrics, "rag_llm_calls_total") == 1
+    assert sample(metrics, 'rag_tokens_total{kind="prompt"}') > 0
+    assert sample(metrics, 'rag_tokens_total{kind="embedding"}') > 0
+    assert sample(metrics, "rag_chat_sessions") == 1
+
+
+def test_query_metrics_outcomes(interfaces, index, monkeypatch):
+    from src.components.metrics import QueryMetrics
+
+    monkeypatch.setattr(Settings, "_llm", StubLLM(latency_seconds=2))
+    metrics = QueryMetrics()
+    rag_interface = interfaces.RAGQueryInterface(index, latency_budget_seconds=0.1, metrics=metrics)
+
+    ask(rag_interface, "Di cosa parla il talk?")
+
+    assert sample(metrics, 'rag_queries_total{outcome="timeout"}') == 1
+    assert sample(metrics, 'rag_queries_total{outcome="answered"}') == 0
+
+
+def ask_together(rag_interface, questions, stream=False):
+    """Ask each question in its own new session, all at once, returning the answers"""
+
+    async def answer(question, session_id):
+        if not stream:
+            return await rag_interface.answer(question, session_id)
+        return "".join([token async for token in rag_interface.stream_answer(question, session_id)])
+
+    async def run():
+        return await asyncio.gather(*(answer(question, f"sessione-{i}") for i, question in enumerate(questions)))
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_identical_questions_are_coalesced(interfaces, index, monkeypatch, stream):
+    from src.components.metrics import QueryMetrics
+
+    llm = StubLLM(latency_seconds=0.1)
+    monkeypatch.setattr(Settings, "_llm", llm)
+    metrics = QueryMetrics()
+    rag_interface = interfaces.RAGQueryInterface(index, chat_mode="context", metrics=metrics, coalesce_queries=True)
+    questions = ["Di cosa parla il talk?", "di cosa  parla il TALK?", "Di cosa parla il talk?", "Chi parla?"]
+
+    answers = ask_together(rag_interface, questions, stream=stream)
+
+    assert answers == [STUB_ANSWER] * 4
+    assert llm.calls == 2
+    assert sample(metrics, 'rag_queries_total{outcome="answered"}') == 2
+    assert sample(metrics, 'rag_queries_total{outcome="coalesced"}') == 2
+    assert sample(metrics, 'rag_query_flights_total{result="joined"}') == 2
+    # Every session remembers its own question and the shared answer
+    for i, question in enumerate(questions):
+        history = rag_interface.sessions.get(f"sessione-{i}").chat_engine.chat_history
+        assert [message.content for message in history] == [question, STUB_ANSWER]
+
+
+def test_follow_up_questions_are_not_coalesced(interfaces, index, monkeypatch):
+    llm = StubLLM(latency_seconds=0.05)
+    monkeypatch.setattr(Settings, "_llm", llm)
+    rag_interface = interfaces.RAGQueryInterface(index, chat_mode="context", coalesce_queries=True)
+
+    async def run():
+        ask_first = (rag_interface.answer("Di cosa parla il talk?", f"sessione-{i}") for i in range(2))
+        await asyncio.gather(*ask_first)
+        ask_again = (rag_interface.answer("Di cosa parla il talk?", f"sessione-{i}") for i in range(2))
+        await asyncio.gather(*ask_again)
+
+    asyncio.run(run())
+
+    assert llm.calls == 3
+    assert rag_interface.flights.joined == 1
+
+
+def test_coalesced_question_within_latency_budget(interfaces, index, monkeypatch):
+    """Test that a caller giving up on the budget does not cancel the answer of the others"""
+    llm = StubLLM(latency_seconds=0.3)
+    monkeypatch.setattr(Settings, "_llm", llm)
+    rag_interface = interfaces.RAGQueryInterface(index, chat_mode="context", coalesce_queries=True)
+
+    async def run():
+        first = asyncio.create_task(rag_interface.answer("Di cosa parla il talk?", "impaziente"))
+        await asyncio.sleep(0.01)
+        rag_interface.latency_budget_seconds = None
+        second = await rag_interface.answer("Di cosa parla il talk?", "paziente")
+        return await asyncio.gather(first, return_exceptions=True), second
+
+    rag_interface.latency_budget_seconds = 0.1
+    (first,), second = asyncio.run(run())
+
+    assert isinstance(first, TimeoutError)
+    assert second == STUB_ANSWER
+    assert llm.calls == 1